@@ -1,10 +1,18 @@
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFileDialog, \
-    QLabel, QPushButton, QCheckBox, QSizePolicy, QHBoxLayout, QComboBox, QMessageBox
-
-from .ImageWidget import ImageWidget, convert_numpy_to_qimage
-import SLIX
-from SLIX._cmd import Cluster
-
+    QLabel, QPushButton, QCheckBox, QSizePolicy, QHBoxLayout, QComboBox, QMessageBox, QMenu, QSlider, \
+    QDialog, QTableWidget, QTableWidgetItem, QDialogButtonBox
+
+from .ImageWidget import ImageWidget
+from .ColorMapEngine import ColorMapEngine
+from .DatasetRegistry import DatasetRegistry
+from .ParameterMapCache import ParameterMapCache
+from .MemoryUsage import get_memory_usage
+from .ThreadWorkers.Classification import ClassificationEngine, ClassificationWorker, TiledClassificationWorker
+from .ThreadWorkers.BatchClassification import find_folders, BatchClassificationWorker
+from .ThreadWorkers.Loader import LoadingService, PreparationWorker
+
+import glob
 import matplotlib
 import numpy
 import os
@@ -16,11 +24,35 @@ class ClusterWidget(QWidget):
     """
     Widget for clustering images.
     """
+    # Sliders of the classification thresholds: name of the threshold, label, range of the slider,
+    # factor converting the slider value to the threshold and unit
+    threshold_settings = (
+        ('flat_min_peakdistance', 'Flat min. peak distance', 0, 360, 1, '°'),
+        ('flat_max_peakdistance', 'Flat max. peak distance', 0, 360, 1, '°'),
+        ('flat_max_low_prominence_peaks', 'Flat max. low prominence peaks', 0, 10, 1, ''),
+        ('crossing_min_signal', 'Crossing min. signal', 0, 200, 0.01, ' % of mean'),
+        ('inclined_min_signal', 'Inclined min. signal', 0, 200, 0.01, ' % of flat mean'),
+        ('inclined_min_peakdistance', 'Inclined min. peak distance', 0, 360, 1, '°'),
+        ('inclined_max_peakdistance', 'Inclined max. peak distance', 0, 360, 1, '°'),
+    )
+    # Time in milliseconds after the last threshold change until the preview is shown in full resolution
+    preview_refine_delay = 300
 
     def __init__(self):
         super().__init__()
 
         self.folder = None
+        # Name of the generated dataset used instead of the folder
+        self.dataset = None
+        self.dataset_registry = None
+        # Parameter maps read from folders so far
+        self.parameter_map_cache = ParameterMapCache()
+        # Classification engine of the selected parameter maps and the parameter maps it classifies
+        self.classification_engine = None
+        self.classification_parameter_maps = None
+        # Colorization engine of the full mask of the classification engine
+        self.preview_engine = None
+        self.loading_service = LoadingService(self)
 
         self.layout = None
         self.sidebar = None
@@ -29,16 +61,31 @@ class ClusterWidget(QWidget):
         self.sidebar_checkbox_all = None
         self.sidebar_checkbox_flat = None
         self.sidebar_checkbox_crossing = None
+        self.sidebar_checkbox_tiled = None
         self.sidebar_checkbox_inclined = None
 
         self.sidebar_button_preview = None
         self.sidebar_button_generate = None
         self.sidebar_button_open_folder = None
+        self.sidebar_button_generated = None
+        self.sidebar_button_series = None
 
         self.sidebar_color_map = None
+        # Slider and label of each threshold by the name of the threshold
+        self.threshold_sliders = {}
+        self.sidebar_button_reset_thresholds = None
+
+        # Shows the preview in full resolution after the thresholds were changed
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.preview_refine_delay)
+        self.preview_timer.timeout.connect(self.show_preview)
 
         self.setup_ui()
 
+    def __del__(self):
+        self.loading_service.shutdown()
+
     def setup_ui(self) -> None:
         """
         Set up the main layout.
@@ -78,6 +125,15 @@ class ClusterWidget(QWidget):
         self.sidebar_button_open_folder.clicked.connect(self.open_folder)
         self.sidebar.addWidget(self.sidebar_button_open_folder)
 
+        self.sidebar_button_generated = QPushButton("Generated")
+        self.sidebar_button_generated.setToolTip("Use parameter maps generated in this session "
+                                                 "without reading their files again.")
+        generated_menu = QMenu(self.sidebar_button_generated)
+        generated_menu.aboutToShow.connect(lambda: self.populate_dataset_menu(generated_menu))
+        self.sidebar_button_generated.setMenu(generated_menu)
+        self.sidebar_button_generated.setEnabled(False)
+        self.sidebar.addWidget(self.sidebar_button_generated)
+
         self.sidebar.addWidget(QLabel("Color map:"))
         self.sidebar_color_map = QComboBox()
         for cmap in matplotlib.cm.cmap_d.keys():
@@ -105,6 +161,17 @@ class ClusterWidget(QWidget):
         self.sidebar_checkbox_crossing.setChecked(False)
         self.sidebar.addWidget(self.sidebar_checkbox_crossing)
 
+        self.sidebar_checkbox_tiled = QCheckBox("Save tile by tile (low memory)")
+        self.sidebar_checkbox_tiled.setToolTip("Classify the parameter maps tile by tile while reading them from "
+                                               "their files and stream the masks into tiled TIFF files.\n"
+                                               "The parameter maps don't have to fit into the memory.")
+        self.sidebar_checkbox_tiled.setChecked(False)
+        self.sidebar.addWidget(self.sidebar_checkbox_tiled)
+
+        self.sidebar.addStretch(5)
+
+        self.setup_ui_thresholds()
+
         self.sidebar.addStretch(5)
 
         self.sidebar_button_preview = QPushButton("Preview all")
@@ -117,6 +184,203 @@ class ClusterWidget(QWidget):
         self.sidebar_button_generate.setEnabled(False)
         self.sidebar.addWidget(self.sidebar_button_generate)
 
+        self.sidebar_button_series = QPushButton("Save series...")
+        self.sidebar_button_series.setToolTip("Classify all sections in the subfolders of a folder in parallel "
+                                              "and write a summary of the class fractions.\n"
+                                              "Sections whose masks are newer than their parameter maps are skipped.")
+        self.sidebar_button_series.clicked.connect(self.save_series)
+        self.sidebar.addWidget(self.sidebar_button_series)
+
+    def setup_ui_thresholds(self) -> None:
+        """
+        Set up the sliders of the classification thresholds.
+
+        Returns:
+             None
+        """
+        self.sidebar.addWidget(QLabel("<b>Thresholds:</b>"))
+        for name, text, minimum, maximum, factor, unit in self.threshold_settings:
+            label = QLabel()
+            slider = QSlider(Qt.Horizontal)
+            slider.setRange(minimum, maximum)
+            slider.setValue(round(ClassificationEngine.default_thresholds[name] / factor))
+            slider.valueChanged.connect(lambda _, name=name: self.threshold_changed(name))
+            self.threshold_sliders[name] = (slider, label)
+            self.update_threshold_label(name)
+            self.sidebar.addWidget(label)
+            self.sidebar.addWidget(slider)
+
+        self.sidebar_button_reset_thresholds = QPushButton("Reset thresholds")
+        self.sidebar_button_reset_thresholds.clicked.connect(self.reset_thresholds)
+        self.sidebar.addWidget(self.sidebar_button_reset_thresholds)
+
+    def thresholds(self) -> dict:
+        """
+        Get the classification thresholds chosen with the sliders.
+
+        Returns:
+            The thresholds by their name.
+        """
+        return {name: self.threshold_sliders[name][0].value() * factor
+                for name, _, _, _, factor, _ in self.threshold_settings}
+
+    def update_threshold_label(self, name: str) -> None:
+        """
+        Show the value of a threshold next to its name.
+
+        Args:
+            name: Name of the threshold.
+
+        Returns:
+            None
+        """
+        slider, label = self.threshold_sliders[name]
+        _, text, _, _, _, unit = next(setting for setting in self.threshold_settings if setting[0] == name)
+        if name == 'crossing_min_signal' and slider.value() == 0:
+            label.setText(f"{text}: off")
+        else:
+            label.setText(f"{text}: {slider.value()}{unit}")
+
+    def threshold_changed(self, name: str) -> None:
+        """
+        Called when a threshold slider is moved. Only the pixels affected by the changed threshold
+        are classified again. A downsampled preview is shown immediately and refined to the full
+        resolution when the threshold wasn't changed for a short time.
+
+        Args:
+            name: Name of the threshold.
+
+        Returns:
+            None
+        """
+        self.update_threshold_label(name)
+        if self.classification_engine is None:
+            # The thresholds are used when the next engine is created
+            return
+        pixels = self.classification_engine.set_thresholds(**{name: self.thresholds()[name]})
+        if self.preview_engine is None or 'full_mask' not in self.classification_engine.masks:
+            return
+        full_mask = self.classification_engine.masks['full_mask']
+        self.preview_engine.update(pixels, numpy.take(full_mask, pixels))
+        self.show_preview(self.preview_stride())
+        self.preview_timer.start()
+
+    def reset_thresholds(self) -> None:
+        """
+        Reset all thresholds to the thresholds of SLIX.
+
+        Returns:
+            None
+        """
+        for name, _, _, _, factor, _ in self.threshold_settings:
+            self.threshold_sliders[name][0].setValue(round(ClassificationEngine.default_thresholds[name] / factor))
+
+    def preview_stride(self) -> int:
+        """
+        Get the largest stride at which the preview still covers the image widget.
+
+        Returns:
+            The stride.
+        """
+        height, width = self.preview_engine.index_image.shape
+        size = self.image_widget.size()
+        return max(1, min(height // max(size.height(), 1), width // max(size.width(), 1)))
+
+    def show_preview(self, stride: int = 1) -> None:
+        """
+        Show the colored full mask.
+
+        Args:
+            stride: Only every stride-th row and column is shown.
+
+        Returns:
+            None
+        """
+        if self.preview_engine is None:
+            return
+        self.image_widget.set_image([self.preview_engine.to_qimage(self.sidebar_color_map.currentText(), stride)])
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the cached parameter maps and the shown preview.
+
+        Returns:
+            The estimated memory in bytes.
+        """
+        return get_memory_usage(self.parameter_map_cache.parameter_maps, self.classification_engine,
+                                self.preview_engine) + \
+            self.image_widget.memory_usage()
+
+    def set_dataset_registry(self, dataset_registry: DatasetRegistry) -> None:
+        """
+        Set the registry whose datasets are offered in addition to opening a folder.
+
+        Args:
+            dataset_registry: The dataset registry of the application.
+
+        Returns:
+            None
+        """
+        self.dataset_registry = dataset_registry
+        self.dataset_registry.datasetsChanged.connect(self.update_dataset_button)
+        self.update_dataset_button()
+
+    def update_dataset_button(self) -> None:
+        """
+        Enable the button of the generated datasets if the registry contains a dataset.
+        If the used dataset was removed, the preview and saving are disabled until a new one is selected.
+
+        Returns:
+            None
+        """
+        self.sidebar_button_generated.setEnabled(len(self.dataset_registry.names()) > 0)
+        if self.dataset is not None and self.dataset not in self.dataset_registry.names():
+            self.dataset = None
+            self.sidebar_button_preview.setEnabled(False)
+            self.sidebar_button_generate.setEnabled(False)
+
+    def populate_dataset_menu(self, menu: QMenu) -> None:
+        """
+        List the generated datasets in a menu.
+
+        Args:
+            menu: The menu of the generated datasets button.
+
+        Returns:
+            None
+        """
+        menu.clear()
+        for name in self.dataset_registry.names():
+            menu.addAction(name, lambda _=False, name=name: self.open_dataset(name))
+
+    def open_dataset(self, name: str) -> None:
+        """
+        Use a generated dataset instead of a folder and show its preview.
+
+        Args:
+            name: Name of the dataset.
+
+        Returns:
+            None
+        """
+        self.dataset = name
+        self.sidebar_button_preview.setEnabled(True)
+        self.sidebar_button_generate.setEnabled(True)
+        self.generate_preview()
+
+    def load_parameter_maps(self) -> (dict, str):
+        """
+        Get the parameter maps of the selected dataset or read them from the selected folder.
+        Only the parameter maps required for the classification are read. Files which did not
+        change since they were read last are taken from the cache.
+
+        Returns:
+            The parameter maps and the basename used for the names of the saved masks.
+        """
+        if self.dataset is not None:
+            return self.dataset_registry.parameter_maps(self.dataset), f'{self.dataset}_basename'
+        return self.parameter_map_cache.load(self.folder)
+
     def open_folder(self):
         """
         Let the user select a folder save the selected folder for future actions.
@@ -133,6 +397,7 @@ class ClusterWidget(QWidget):
             return
 
         self.folder = folder
+        self.dataset = None
         self.sidebar_button_preview.setEnabled(True)
         self.sidebar_button_generate.setEnabled(True)
 
@@ -143,34 +408,55 @@ class ClusterWidget(QWidget):
         Returns:
             None
         """
-        if self.folder is None:
-            # Do nothing if the user didn't open a folder
+        if self.folder is None and self.dataset is None:
+            # Do nothing if the user didn't open a folder or dataset
             return
 
-        loaded_parameter_maps, _ = Cluster.load_parameter_maps(self.folder)
-        try:
-            result_mask = SLIX.classification.full_mask(loaded_parameter_maps['high_prominence_peaks'],
-                                                        loaded_parameter_maps['low_prominence_peaks'],
-                                                        loaded_parameter_maps['peakdistance'],
-                                                        loaded_parameter_maps['max'])
-        except KeyError:
+        engine, _ = self.classification()
+        if engine is None:
             QMessageBox.warning(self, "Error", "Could not generate preview.\n"
                                                "Make sure you have selected a folder with all parameter maps.")
             return
 
-        # Get the color map from matplotlib based on the selected item in the QWidget
-        colormap = matplotlib.cm.get_cmap(self.sidebar_color_map.currentText())
-        # Normalize the image to the range [0, 1] and apply the color map to it
-        shown_image = result_mask.astype(numpy.float32)
-        shown_image = (shown_image - shown_image.min()) / (shown_image.max() - shown_image.min())
-        shown_image = colormap(shown_image)
-        # Convert NumPy RGBA array to RGB array
-        shown_image = shown_image[:, :, :3]
-        self.image_widget.set_image(convert_numpy_to_qimage(shown_image))
+        # Only classify again if one of the parameter maps changed, e.g. when only the color map changed
+        if self.preview_engine is None:
+            result_mask = engine.evaluate(['full_mask'])['full_mask']
+            # Normalize the mask once with the range of the classes, so changed pixels can be colored alone.
+            # Applying a color map is a lookup table gather afterwards.
+            self.preview_engine = ColorMapEngine(result_mask, value_range=(0, 6))
+            # Sort the parameter maps for the threshold sliders while the preview is shown
+            self.loading_service.load('thresholds', PreparationWorker(engine, ClassificationEngine.threshold_indices),
+                                      None, lambda _: None)
+        self.preview_timer.stop()
+        self.show_preview()
+
+    def classification(self) -> (ClassificationEngine, str):
+        """
+        Get the classification engine of the selected dataset or folder. The engine and its masks are
+        reused as long as the parameter maps did not change.
+
+        Returns:
+            The classification engine and the basename used for the names of the saved masks
+            or None if a parameter map is missing.
+        """
+        loaded_parameter_maps, basename = self.load_parameter_maps()
+        try:
+            parameter_maps = [loaded_parameter_maps[parameter]
+                              for parameter in ParameterMapCache.classification_parameters]
+        except KeyError:
+            return None, basename
+
+        if self.classification_engine is None or \
+                any(new is not old for new, old in zip(parameter_maps, self.classification_parameter_maps)):
+            self.classification_engine = ClassificationEngine(*parameter_maps, thresholds=self.thresholds())
+            self.classification_parameter_maps = parameter_maps
+            self.preview_engine = None
+        return self.classification_engine, basename
 
     def save(self) -> None:
         """
-        Saves the chosen parameter maps to a folder.
+        Saves the chosen masks to a folder. The masks are computed and written concurrently in the background.
+        In the low memory mode, the parameter maps are classified tile by tile instead.
 
         Returns:
             None
@@ -182,75 +468,140 @@ class ClusterWidget(QWidget):
             # The user canceled the selection
             return
 
-        # Get the parameter maps and the basename from the images in the chosen folder
-        loaded_parameter_maps, basename = Cluster.load_parameter_maps(self.folder)
-        # Flat mask might get set before reaching the inclined region.
-        # This ensures that the flat mask will not get generated twice saving
-        # time.
-        flat_mask = None
-        # If the user has selected to generate the flat mask, generate it.
-        # Save the result in the folder the user has chosen. The filename will be
-        # determined by the input file name.
-        if self.sidebar_checkbox_flat.isChecked():
-            name = basename.replace('basename', 'flat_mask')
-            try:
-                flat_mask = SLIX.classification.flat_mask(loaded_parameter_maps['high_prominence_peaks'],
-                                                          loaded_parameter_maps['low_prominence_peaks'],
-                                                          loaded_parameter_maps['peakdistance'])
-                filename = f'{folder}/{name}.tiff'
-                SLIX.io.imwrite(filename, flat_mask)
-            except KeyError:
-                QMessageBox.warning(self, "Error", "Could not generate flat mask.\n"
-                                                   "Make sure you have selected a folder with all parameter maps.")
-                return
-        # If the user has selected to generate the crossing mask, generate it.
-        # Save the result in the folder the user has chosen. The filename will be
-        # determined by the input file name.
-        if self.sidebar_checkbox_crossing.isChecked():
-            name = basename.replace('basename', 'crossing_mask')
-            try:
-                mask = SLIX.classification.crossing_mask(loaded_parameter_maps['high_prominence_peaks'],
-                                                         loaded_parameter_maps['max'])
-                filename = f'{folder}/{name}.tiff'
-                SLIX.io.imwrite(filename, mask)
-            except KeyError:
-                QMessageBox.warning(self, "Error", "Could not generate crossing mask.\n"
-                                                   "Make sure you have selected a folder with all parameter maps.")
-                return
-        # If the user has selected to generate the inclined mask, generate it.
-        # Save the result in the folder the user has chosen. The filename will be
-        # determined by the input file name.
-        if self.sidebar_checkbox_inclined.isChecked():
-            name = basename.replace('basename', 'inclined_mask')
-            try:
-                if flat_mask is None:
-                    flat_mask = SLIX.classification.flat_mask(loaded_parameter_maps['high_prominence_peaks'],
-                                                              loaded_parameter_maps['low_prominence_peaks'],
-                                                              loaded_parameter_maps['peakdistance'])
-
-                mask = SLIX.classification.inclinated_mask(loaded_parameter_maps['high_prominence_peaks'],
-                                                           loaded_parameter_maps['peakdistance'],
-                                                           loaded_parameter_maps['max'],
-                                                           flat_mask)
-                filename = f'{folder}/{name}.tiff'
-                SLIX.io.imwrite(filename, mask)
-            except KeyError:
-                QMessageBox.warning(self, "Error", "Could not generate inclined mask.\n"
-                                                   "Make sure you have selected a folder with all parameter maps.")
-                return
-        # If the user has selected to generate the mask containing all parameters, generate it.
-        # Save the result in the folder the user has chosen. The filename will be
-        # determined by the input file name.
-        if self.sidebar_checkbox_all.isChecked():
-            name = basename.replace('basename', 'full_mask')
-            try:
-                mask = SLIX.classification.full_mask(loaded_parameter_maps['high_prominence_peaks'],
-                                                     loaded_parameter_maps['low_prominence_peaks'],
-                                                     loaded_parameter_maps['peakdistance'],
-                                                     loaded_parameter_maps['max'])
-                filename = f'{folder}/{name}.tiff'
-                SLIX.io.imwrite(filename, mask)
-            except KeyError:
-                QMessageBox.warning(self, "Error", "Could not generate mask.\n"
-                                                   "Make sure you have selected a folder with all parameter maps.")
-                return
+        # Get the parameter maps and the basename from the chosen dataset or the images in the chosen folder
+        if self.sidebar_checkbox_tiled.isChecked():
+            sources, basename = self.parameter_map_sources()
+            engine = None
+        else:
+            engine, basename = self.classification()
+            sources = engine
+        if sources is None:
+            QMessageBox.warning(self, "Error", "Could not generate the masks.\n"
+                                               "Make sure you have selected a folder with all parameter maps.")
+            return
+
+        # The filenames will be determined by the input file name
+        filenames = {name: f'{folder}/{basename.replace("basename", name)}.tiff' for name in self.chosen_masks()}
+        if len(filenames) == 0:
+            return
+
+        if engine is None:
+            self.loading_service.load('save', TiledClassificationWorker(sources, filenames, self.thresholds()),
+                                      'Saving masks...', self.masks_saved, 100)
+        else:
+            # The masks are saved with the current thresholds even if the sliders are moved while saving
+            self.loading_service.load('save', ClassificationWorker(engine.copy(), filenames), 'Saving masks...',
+                                      self.masks_saved, len(engine.required_masks(list(filenames))))
+
+    def chosen_masks(self) -> [str]:
+        """
+        Get the masks chosen with the checkboxes.
+
+        Returns:
+            The names of the masks.
+        """
+        return [name for checkbox, name in ((self.sidebar_checkbox_flat, 'flat_mask'),
+                                            (self.sidebar_checkbox_crossing, 'crossing_mask'),
+                                            (self.sidebar_checkbox_inclined, 'inclined_mask'),
+                                            (self.sidebar_checkbox_all, 'full_mask'))
+                if checkbox.isChecked()]
+
+    def save_series(self) -> None:
+        """
+        Classify all sections of a series. Each subfolder of the chosen folder containing the parameter maps
+        is classified in its own process and the masks are written into the subfolder. The fractions of the
+        classes of each section are written into cluster_summary.csv in the chosen folder.
+
+        Returns:
+            None
+        """
+        if self.folder is None:
+            self.folder = os.path.expanduser('~')
+        series_folder = QFileDialog.getExistingDirectory(self, 'Open Series Folder', self.folder)
+        if len(series_folder) == 0:
+            # The user canceled the selection
+            return
+        masks = self.chosen_masks()
+        if len(masks) == 0:
+            return
+
+        folders = find_folders([series_folder, os.path.join(glob.escape(series_folder), '*')])
+        if len(folders) == 0:
+            QMessageBox.warning(self, "Error", "The chosen folder and its subfolders don't contain "
+                                               "all parameter maps required for the classification.")
+            return
+
+        worker = BatchClassificationWorker(folders, masks, os.path.join(series_folder, 'cluster_summary.csv'),
+                                           self.thresholds(), self.sidebar_checkbox_tiled.isChecked())
+        self.loading_service.load('series', worker, 'Classifying sections...', self.show_series_summary,
+                                  len(folders))
+
+    def show_series_summary(self, result: (str, [dict])) -> None:
+        """
+        Show the summary of a classified series in a table.
+
+        Args:
+            result: The path of the written summary and its rows.
+
+        Returns:
+            None
+        """
+        filename, rows = result
+        columns = ['folder', 'status'] + list(ClassificationEngine.full_mask_classes) + ['message']
+        table = QTableWidget(len(rows), len(columns))
+        table.setHorizontalHeaderLabels([column.replace('_', ' ').capitalize() for column in columns])
+        for row_index, row in enumerate(rows):
+            for column_index, column in enumerate(columns):
+                value = row[column]
+                if column in ClassificationEngine.full_mask_classes and value != '':
+                    value = f'{100 * value:.1f} %'
+                elif column == 'folder':
+                    value = os.path.basename(value)
+                table.setItem(row_index, column_index, QTableWidgetItem(str(value)))
+        table.resizeColumnsToContents()
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Series classification")
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel(f"The summary was saved to {filename}."))
+        layout.addWidget(table)
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        dialog.resize(800, 400)
+        dialog.exec_()
+        dialog.deleteLater()
+
+    def parameter_map_sources(self) -> (list, str):
+        """
+        Get the parameter maps required for the classification without reading them.
+
+        Returns:
+            The memory mapped parameter maps of the selected dataset or the paths of the parameter maps in the
+            selected folder (or None if a parameter map is missing) and the basename used for the names of the
+            saved masks.
+        """
+        if self.dataset is not None:
+            parameter_maps = self.dataset_registry.parameter_maps(self.dataset)
+            basename = f'{self.dataset}_basename'
+        else:
+            parameter_maps, basename = ParameterMapCache.find_files(self.folder,
+                                                                    ParameterMapCache.classification_parameters)
+        try:
+            return [parameter_maps[parameter] for parameter in ParameterMapCache.classification_parameters], \
+                basename
+        except KeyError:
+            return None, basename
+
+    def masks_saved(self, filenames: [str]) -> None:
+        """
+        Inform the user that the masks were saved.
+
+        Args:
+            filenames: Paths of the saved masks.
+
+        Returns:
+            None
+        """
+        QMessageBox.information(self, "Saving finished", f"{len(filenames)} masks were saved to "
+                                                         f"{os.path.dirname(filenames[0])}.")
@@ -0,0 +1,172 @@
+import matplotlib
+import numpy
+from PyQt5.QtGui import QImage
+
+__all__ = ['get_colormap', 'ColorMapEngine']
+
+
+def get_colormap(name: str) -> matplotlib.colors.Colormap:
+    """
+    Get a matplotlib colormap by its name.
+
+    Args:
+        name: Name of the colormap.
+
+    Returns:
+        The matplotlib colormap.
+    """
+    try:
+        return matplotlib.colormaps[name]
+    except AttributeError:
+        # matplotlib < 3.5
+        return matplotlib.cm.get_cmap(name)
+
+
+class ColorMapEngine:
+    """
+    Colorizes a 2D parameter map through lookup tables.
+    The parameter map is normalized and quantized to an uint8 index image once.
+    Applying a colormap is then a single gather of a 256 entry lookup table.
+    """
+    # Number of colors of the colormap in each lookup table
+    number_of_colors = 255
+    # Index of NaN pixels. They are black in RGB images and transparent in QImages.
+    nan_index = 255
+
+    def __init__(self, image: numpy.ndarray, chunk_rows: int = 256, value_range: tuple = None):
+        """
+        Initialize the engine.
+
+        Args:
+            image: A 2D NumPy array.
+
+            chunk_rows: Number of rows quantized at once.
+
+            value_range: Optional (minimum, maximum) mapped to the ends of the colormap.
+                         Defaults to the minimum and maximum of the image.
+        """
+        if value_range is None:
+            value_range = (numpy.nanmin(image), numpy.nanmax(image))
+        self.value_range = value_range
+        self.index_image = self.quantize(image, chunk_rows, value_range)
+        # Lookup tables for the colormaps used so far
+        self.rgb_lookup_tables = {}
+        self.qimage_lookup_tables = {}
+
+    @classmethod
+    def quantize(cls, image: numpy.ndarray, chunk_rows: int = 256, value_range: tuple = None) -> numpy.ndarray:
+        """
+        Normalize an image to the range [0, 1] and quantize it to the number of colors
+        the same way matplotlib maps a normalized float image to its colormap entries.
+
+        Args:
+            image: A 2D NumPy array.
+
+            chunk_rows: Number of rows processed at once.
+
+            value_range: Optional (minimum, maximum) used for the normalization.
+                         Defaults to the minimum and maximum of the image.
+
+        Returns:
+            An uint8 index image. NaN values get the nan_index.
+        """
+        if value_range is None:
+            value_range = (numpy.nanmin(image), numpy.nanmax(image))
+        min_val, max_val = value_range
+        scale = cls.number_of_colors / numpy.maximum(max_val - min_val, 1e-15)
+
+        index_image = numpy.empty(image.shape, dtype=numpy.uint8)
+        for start in range(0, image.shape[0], chunk_rows):
+            chunk = (image[start:start + chunk_rows].astype(numpy.float32) - min_val) * scale
+            nan_mask = numpy.isnan(chunk)
+            chunk = numpy.nan_to_num(chunk, copy=False)
+            index_chunk = index_image[start:start + chunk_rows]
+            index_chunk[...] = numpy.clip(chunk, 0, cls.number_of_colors - 1)
+            index_chunk[nan_mask] = cls.nan_index
+        return index_image
+
+    def update(self, indices: numpy.ndarray, values: numpy.ndarray) -> None:
+        """
+        Change single pixels of the parameter map without quantizing the whole map again.
+        The values are normalized with the value range of the engine.
+
+        Args:
+            indices: Indices of the pixels in the flattened parameter map.
+
+            values: New values of the pixels.
+
+        Returns:
+            None
+        """
+        numpy.put(self.index_image, indices, self.quantize(values, value_range=self.value_range))
+
+    def rgb_lookup_table(self, colormap: str) -> numpy.ndarray:
+        """
+        Get the RGB lookup table of a colormap.
+
+        Args:
+            colormap: Name of the matplotlib colormap.
+
+        Returns:
+            A (256, 3) uint8 NumPy array. The last entry is the black color of NaN pixels.
+        """
+        if colormap not in self.rgb_lookup_tables:
+            matplotlib_colormap = get_colormap(colormap)
+            # matplotlib < 3.6
+            resample = getattr(matplotlib_colormap, 'resampled', None) or matplotlib_colormap._resample
+            colors = resample(self.number_of_colors)(numpy.arange(self.number_of_colors))
+            lookup_table = numpy.zeros((self.nan_index + 1, 3), dtype=numpy.uint8)
+            lookup_table[:self.number_of_colors] = 255 * colors[:, :3]
+            self.rgb_lookup_tables[colormap] = lookup_table
+        return self.rgb_lookup_tables[colormap]
+
+    def qimage_lookup_table(self, colormap: str) -> numpy.ndarray:
+        """
+        Get the lookup table of a colormap in the pixel format of QImage.Format_ARGB32.
+
+        Args:
+            colormap: Name of the matplotlib colormap.
+
+        Returns:
+            A (256,) uint32 NumPy array. The last entry is the transparent color of NaN pixels.
+        """
+        if colormap not in self.qimage_lookup_tables:
+            colors = self.rgb_lookup_table(colormap).astype(numpy.uint32)
+            lookup_table = 0xFF000000 | (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+            lookup_table[self.nan_index] = 0
+            self.qimage_lookup_tables[colormap] = lookup_table
+        return self.qimage_lookup_tables[colormap]
+
+    def colorize(self, colormap: str) -> numpy.ndarray:
+        """
+        Apply a colormap to the parameter map.
+
+        Args:
+            colormap: Name of the matplotlib colormap.
+
+        Returns:
+            A (x, y, 3) uint8 RGB NumPy array.
+        """
+        return numpy.take(self.rgb_lookup_table(colormap), self.index_image, axis=0)
+
+    def to_qimage(self, colormap: str, stride: int = 1) -> QImage:
+        """
+        Apply a colormap to the parameter map and write the result directly into a QImage.
+
+        Args:
+            colormap: Name of the matplotlib colormap.
+
+            stride: Only every stride-th row and column is colored. Used for fast, downsampled previews.
+
+        Returns:
+            An ARGB32 QImage. NaN pixels are transparent.
+        """
+        index_image = self.index_image[::stride, ::stride]
+        height, width = index_image.shape
+        qimage = QImage(width, height, QImage.Format_ARGB32)
+        buffer = qimage.bits()
+        buffer.setsize(qimage.byteCount())
+        pixels = numpy.ndarray((height, width), dtype=numpy.uint32, buffer=buffer,
+                               strides=(qimage.bytesPerLine(), 4))
+        numpy.take(self.qimage_lookup_table(colormap), index_image, out=pixels, mode='clip')
+        return qimage
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import uuid
+
+import numpy
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .MemoryUsage import get_memory_usage
+
+__all__ = ['to_memmap', 'DatasetRegistry']
+
+
+def to_memmap(image: numpy.ndarray, directory: str) -> numpy.ndarray:
+    """
+    Copy an array into a memory mapped file, so the operating system can page it out when the memory gets low.
+    On systems which allow it, the file is removed immediately and only exists as long as the array is mapped.
+
+    Args:
+        image: The array.
+
+        directory: Folder in which the memory mapped file is created.
+
+    Returns:
+        The memory mapped copy of the array or the array itself if the file could not be created.
+    """
+    if image.size == 0:
+        return image
+    filename = os.path.join(directory, f'{uuid.uuid4().hex}.raw')
+    try:
+        mapped_image = numpy.memmap(filename, dtype=image.dtype, mode='w+', shape=image.shape)
+    except (OSError, ValueError):
+        return image
+    mapped_image[:] = image
+    try:
+        os.remove(filename)
+    except OSError:
+        # The file is removed with the directory of the registry
+        pass
+    return mapped_image
+
+
+class DatasetRegistry(QObject):
+    """
+    Application wide registry of the parameter maps generated in the current session.
+    Each dataset is a dictionary of the parameter maps of one generation run, named like the
+    suffixes of the written files (e.g. 'dir_1', 'peakdistance' or 'high_prominence_peaks').
+    The other tabs can use the parameter maps directly instead of reading the written files again.
+    """
+    # Signal to inform the connected widgets that a dataset was added or removed
+    datasetsChanged = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        # Folder of the memory mapped parameter maps
+        self.temporary_directory = tempfile.TemporaryDirectory(prefix='QtSLIX_')
+        self.directory = self.temporary_directory.name
+        self.datasets = {}
+
+    def register(self, name: str, parameter_maps: dict) -> None:
+        """
+        Add a dataset. An existing dataset with the same name is replaced.
+
+        Args:
+            name: Name of the dataset, e.g. the file name pattern of the written files.
+
+            parameter_maps: The parameter maps of the dataset.
+
+        Returns:
+            None
+        """
+        if len(parameter_maps) == 0:
+            return
+        self.datasets[name] = dict(parameter_maps)
+        self.datasetsChanged.emit()
+
+    def remove(self, name: str) -> None:
+        """
+        Remove a dataset and release its parameter maps.
+
+        Args:
+            name: Name of the dataset.
+
+        Returns:
+            None
+        """
+        if self.datasets.pop(name, None) is not None:
+            self.datasetsChanged.emit()
+
+    def clear(self) -> None:
+        """
+        Remove all datasets.
+
+        Returns:
+            None
+        """
+        self.datasets = {}
+        self.datasetsChanged.emit()
+
+    def names(self, required: [str] = ()) -> [str]:
+        """
+        Get the names of the datasets.
+
+        Args:
+            required: Only return the datasets containing all of these parameter maps.
+
+        Returns:
+            The names of the datasets in the order they were registered.
+        """
+        return [name for name, parameter_maps in self.datasets.items()
+                if all(parameter in parameter_maps for parameter in required)]
+
+    def parameter_maps(self, name: str) -> dict:
+        """
+        Get the parameter maps of a dataset.
+
+        Args:
+            name: Name of the dataset.
+
+        Returns:
+            A dictionary of the parameter maps.
+        """
+        return self.datasets[name]
+
+    def directions(self, name: str) -> numpy.ndarray:
+        """
+        Get the direction stack of a dataset in the same form as loading the direction files.
+
+        Args:
+            name: Name of the dataset.
+
+        Returns:
+            The (H, W, k) directions or None if the dataset has no directions.
+        """
+        parameter_maps = self.datasets[name]
+        if 'directions' in parameter_maps:
+            return parameter_maps['directions']
+        if 'dir' in parameter_maps:
+            return parameter_maps['dir']
+        return None
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the parameter maps which could not be memory mapped.
+
+        Returns:
+            The estimated memory in bytes.
+        """
+        return get_memory_usage(self.datasets)
@@ -0,0 +1,237 @@
+import numpy
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QGridLayout, QComboBox, QLineEdit, QSpinBox, \
+    QLabel, QDialogButtonBox, QTableWidget, QTableWidgetItem, QAbstractItemView, QScrollArea, QWidget, \
+    QMessageBox
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt
+
+from .ColorMapEngine import ColorMapEngine
+from .ThreadWorkers.FilterSweep import sweep_outputs, sweep_settings
+
+__all__ = ['FilterSweepDialog', 'FilterSweepResultsDialog']
+
+
+class FilterSweepDialog(QDialog):
+    """
+    Dialog choosing the grid of filter settings of a filter sweep.
+    """
+    # Default values of the parameters of each filtering method
+    default_parameters = {"Fourier": ("0.1, 0.2, 0.3", "0.01, 0.025, 0.05"),
+                          "Savitzky-Golay": ("5, 9, 13", "2, 3")}
+
+    def __init__(self, parent: QWidget = None, filtering: str = "Fourier", max_workers: int = 1):
+        """
+        Initialize the dialog.
+
+        Args:
+            parent: The parent widget.
+
+            filtering: The preselected filtering method.
+
+            max_workers: The preselected number of settings evaluated at the same time.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Filter sweep")
+
+        self.filtering = QComboBox()
+        self.filtering.addItems(list(self.default_parameters))
+        self.parameters_1 = QLineEdit()
+        self.parameters_2 = QLineEdit()
+        self.filtering.currentTextChanged.connect(self.filtering_changed)
+        self.filtering.setCurrentText(filtering)
+        self.filtering_changed(self.filtering.currentText())
+        self.output = QComboBox()
+        self.output.addItems(list(sweep_outputs))
+        self.output.setCurrentText('peakdistance')
+        self.max_workers = QSpinBox()
+        self.max_workers.setRange(1, 256)
+        self.max_workers.setValue(max_workers)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        form.addRow("Filter:", self.filtering)
+        form.addRow("Parameter 1 values:", self.parameters_1)
+        form.addRow("Parameter 2 values:", self.parameters_2)
+        form.addRow("Compared parameter map:", self.output)
+        form.addRow("Parallel settings:", self.max_workers)
+        layout.addLayout(form)
+        layout.addWidget(QLabel("Each combination of the comma separated values is evaluated on the region of "
+                                "interest."))
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def filtering_changed(self, filtering: str) -> None:
+        """
+        Show the default values of the parameters of the chosen filtering method.
+
+        Args:
+            filtering: The filtering method.
+
+        Returns:
+            None
+        """
+        parameters_1, parameters_2 = self.default_parameters[filtering]
+        self.parameters_1.setText(parameters_1)
+        self.parameters_2.setText(parameters_2)
+
+    @staticmethod
+    def parse_values(text: str) -> [float]:
+        """
+        Parse comma separated numbers.
+
+        Args:
+            text: The numbers, e.g. "0.1, 0.2".
+
+        Returns:
+            The numbers without duplicates in the given order.
+        """
+        values = []
+        for value in text.replace(';', ',').split(','):
+            if value.strip() != '' and float(value) not in values:
+                values.append(float(value))
+        if len(values) == 0:
+            raise ValueError("At least one value is required.")
+        return values
+
+    def settings(self) -> [(str, float, float)]:
+        """
+        Get the chosen grid of filter settings.
+
+        Returns:
+            The filter settings (filtering, parameter 1, parameter 2).
+        """
+        return sweep_settings(self.filtering.currentText(), self.parse_values(self.parameters_1.text()),
+                              self.parse_values(self.parameters_2.text()))
+
+    def accept(self) -> None:
+        """
+        Close the dialog if the values of the parameters are valid.
+
+        Returns:
+            None
+        """
+        try:
+            self.settings()
+        except ValueError as e:
+            QMessageBox.warning(self, "Filter sweep", f"Invalid parameter values: {e}")
+            return
+        super().accept()
+
+
+class FilterSweepResultsDialog(QDialog):
+    """
+    Dialog comparing the results of a filter sweep.
+    A table shows the duration and the peak statistics of each setting and small multiples show the
+    compared parameter map of each setting with the same color scale.
+    """
+    # Largest height or width of each small multiple
+    thumbnail_size = 200
+
+    def __init__(self, parent: QWidget, results: [dict], output: str):
+        """
+        Initialize the dialog.
+
+        Args:
+            parent: The parent widget.
+
+            results: The results of the settings as returned by QtSLIX.ThreadWorkers.FilterSweep.sweep.
+
+            output: Name of the compared parameter map.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Filter sweep")
+        self.results = results
+        self.chosen_setting = None
+
+        layout = QVBoxLayout(self)
+        self.table = self.create_table()
+        layout.addWidget(self.table, stretch=1)
+        layout.addWidget(QLabel(f"<b>{output}</b> of each setting:"))
+        scroll_area = QScrollArea()
+        scroll_area.setWidget(self.create_small_multiples(output))
+        layout.addWidget(scroll_area, stretch=2)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        use_button = buttons.addButton("Use selected setting", QDialogButtonBox.AcceptRole)
+        use_button.setEnabled(False)
+        self.table.itemSelectionChanged.connect(lambda: use_button.setEnabled(len(self.table.selectedItems()) > 0))
+        buttons.accepted.connect(self.use_selected_setting)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.resize(900, 700)
+
+    def create_table(self) -> QTableWidget:
+        """
+        Create the table with the duration and peak statistics of each setting.
+
+        Returns:
+            The table.
+        """
+        columns = ["Filter", "Parameter 1", "Parameter 2", "Time (s)", "Mean peaks", "Two peaks (%)"]
+        table = QTableWidget(len(self.results), len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SingleSelection)
+        for row, result in enumerate(self.results):
+            values = [result['filtering'], f"{result['parameter_1']:g}", f"{result['parameter_2']:g}",
+                      f"{result['seconds']:.2f}", f"{result['mean_peaks']:.2f}",
+                      f"{100 * result['two_peak_fraction']:.1f}"]
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(value))
+        table.resizeColumnsToContents()
+        return table
+
+    def create_small_multiples(self, output: str) -> QWidget:
+        """
+        Create the small multiples of the compared parameter map.
+        The rows show the values of the first parameter and the columns the values of the second parameter.
+
+        Args:
+            output: Name of the compared parameter map.
+
+        Returns:
+            The widget containing the small multiples.
+        """
+        if output.startswith('dir'):
+            value_range, colormap = (0, 180), 'hsv'
+        else:
+            # All settings share the same color scale
+            value_range = (min(float(numpy.nanmin(result['parameter_map'])) for result in self.results),
+                           max(float(numpy.nanmax(result['parameter_map'])) for result in self.results))
+            colormap = 'viridis'
+        parameters_1 = sorted({result['parameter_1'] for result in self.results})
+        parameters_2 = sorted({result['parameter_2'] for result in self.results})
+
+        widget = QWidget()
+        grid = QGridLayout(widget)
+        for column, parameter_2 in enumerate(parameters_2):
+            grid.addWidget(QLabel(f"Parameter 2 = {parameter_2:g}"), 0, column + 1, Qt.AlignCenter)
+        for row, parameter_1 in enumerate(parameters_1):
+            grid.addWidget(QLabel(f"Parameter 1 = {parameter_1:g}"), row + 1, 0)
+        for result in self.results:
+            image = ColorMapEngine(result['parameter_map'], value_range=value_range).to_qimage(colormap)
+            label = QLabel()
+            label.setPixmap(QPixmap.fromImage(image).scaled(self.thumbnail_size, self.thumbnail_size,
+                                                            Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            label.setToolTip(f"Mean peaks: {result['mean_peaks']:.2f}, "
+                             f"two peaks: {100 * result['two_peak_fraction']:.1f} %")
+            grid.addWidget(label, parameters_1.index(result['parameter_1']) + 1,
+                           parameters_2.index(result['parameter_2']) + 1)
+        return widget
+
+    def use_selected_setting(self) -> None:
+        """
+        Remember the selected setting and close the dialog.
+
+        Returns:
+            None
+        """
+        rows = self.table.selectionModel().selectedRows()
+        if len(rows) == 0:
+            return
+        result = self.results[rows[0].row()]
+        self.chosen_setting = (result['filtering'], result['parameter_1'], result['parameter_2'])
+        self.accept()
@@ -1,9 +1,16 @@
+import collections
+import time
+
 import numpy
-from PyQt5.QtWidgets import QWidget, QScrollBar, QVBoxLayout, QLabel
-from PyQt5.QtGui import QImage, QPixmap, QResizeEvent
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QScrollBar, QVBoxLayout, QHBoxLayout, QLabel, \
+    QPushButton, QSpinBox, QDoubleSpinBox, QRubberBand
+from PyQt5.QtGui import QImage, QPixmap, QResizeEvent, QMouseEvent, QPainter
+from PyQt5.QtCore import Qt, QObject, QThread, QSize, QTimer, QElapsedTimer, QRect, QPoint, pyqtSignal
+
+from .MemoryUsage import get_memory_usage
 
-__all__ = ['normalize_image', 'convert_numpy_to_qimage', 'ImageWidget']
+__all__ = ['normalize_image', 'convert_numpy_to_qimage', 'quantize_image', 'levels_lookup_table',
+           'LevelsImageStack', 'SlicePrefetcher', 'ImageWidget']
 
 
 def normalize_image(image: numpy.ndarray) -> numpy.ndarray:
@@ -131,10 +138,201 @@ def convert_numpy_to_qimage(image: numpy.array) -> [QImage]:
     return __convert_numpy_to_qimage_3d(image, num_measurements)
 
 
+def quantize_image(image: numpy.ndarray, chunk_rows: int = 256) -> (numpy.ndarray, numpy.ndarray):
+    """
+    Quantize a NumPy array to 8 or 16 bit indices and compute the histogram of the indices.
+    8 and 16 bit images are used as they are. All other images are scaled between their
+    minimum and maximum to 16 bit. The histogram is accumulated while streaming over
+    the image in chunks of rows.
+
+    Args:
+        image: A 2D or 3D NumPy array.
+
+        chunk_rows: Number of rows processed at once.
+
+    Returns:
+        The index image and the histogram with 256 or 65536 entries.
+    """
+    if image.dtype == numpy.uint8 or image.dtype == numpy.uint16:
+        num_bins = numpy.iinfo(image.dtype).max + 1
+        histogram = numpy.zeros(num_bins, dtype=numpy.int64)
+        for start in range(0, image.shape[0], chunk_rows):
+            histogram += numpy.bincount(image[start:start + chunk_rows].ravel(), minlength=num_bins)
+        return image, histogram
+
+    num_bins = 65536
+    min_val = numpy.nanmin(image)
+    max_val = numpy.nanmax(image)
+    scale = (num_bins - 1) / numpy.maximum(max_val - min_val, 1e-15)
+
+    index_image = numpy.empty(image.shape, dtype=numpy.uint16)
+    histogram = numpy.zeros(num_bins, dtype=numpy.int64)
+    for start in range(0, image.shape[0], chunk_rows):
+        chunk = (image[start:start + chunk_rows].astype(numpy.float32) - min_val) * scale
+        chunk = numpy.nan_to_num(chunk, copy=False)
+        index_image[start:start + chunk_rows] = numpy.clip(chunk + 0.5, 0, num_bins - 1)
+        histogram += numpy.bincount(index_image[start:start + chunk_rows].ravel(), minlength=num_bins)
+    return index_image, histogram
+
+
+def levels_lookup_table(histogram: numpy.ndarray, lower_percentile: float = 0,
+                        upper_percentile: float = 100, gamma: float = 1) -> numpy.ndarray:
+    """
+    Create a lookup table mapping the bins of a histogram to the range [0, 255].
+    Values below the lower percentile are clipped to 0, values above the upper
+    percentile are clipped to 255. Values in between are stretched linearly and
+    corrected by the gamma value.
+
+    Args:
+        histogram: Histogram of an image as returned by quantize_image.
+
+        lower_percentile: Percentile in the range [0, 100] which will be mapped to 0.
+
+        upper_percentile: Percentile in the range [0, 100] which will be mapped to 255.
+
+        gamma: Gamma correction. Values above 1 brighten the mid tones.
+
+    Returns:
+        A uint8 NumPy array with one entry for each bin of the histogram.
+    """
+    cumulative_histogram = numpy.cumsum(histogram)
+    total = cumulative_histogram[-1]
+    lower_bin = numpy.searchsorted(cumulative_histogram, total * lower_percentile / 100, side='right')
+    upper_bin = numpy.searchsorted(cumulative_histogram, total * upper_percentile / 100, side='left')
+    upper_bin = max(upper_bin, lower_bin + 1)
+
+    lookup_table = (numpy.arange(len(histogram), dtype=numpy.float32) - lower_bin) / (upper_bin - lower_bin)
+    lookup_table = numpy.clip(lookup_table, 0, 1) ** (1 / gamma)
+    return (255 * lookup_table + 0.5).astype(numpy.uint8)
+
+
+class LevelsImageStack:
+    """
+    A list-like stack of QImages generated from a NumPy array through a lookup table.
+    The array is quantized and its histogram is computed once. Changing the levels
+    only recomputes the lookup table. The QImages are created when they are requested.
+    """
+    def __init__(self, image: numpy.ndarray):
+        """
+        Initialize the stack.
+
+        Args:
+            image: A 2D or 3D NumPy array.
+        """
+        self.index_image, self.histogram = quantize_image(image)
+        # RGB and RGBA images are shown as one image, all other 3D images as a stack of slices
+        self.is_stack = self.index_image.ndim == 3 and self.index_image.shape[2] not in (3, 4)
+        self.lookup_table = None
+        self.set_levels()
+
+    @classmethod
+    def from_index_image(cls, index_image: numpy.ndarray, histogram: numpy.ndarray) -> 'LevelsImageStack':
+        """
+        Create a stack from an image which was already quantized, e.g. a downsampled preview.
+        The levels are computed from the given histogram instead of the histogram of the index image.
+
+        Args:
+            index_image: An uint8 or uint16 image as returned by quantize_image.
+
+            histogram: The histogram of the quantized image with 256 or 65536 entries.
+
+        Returns:
+            The stack.
+        """
+        stack = cls.__new__(cls)
+        stack.index_image = index_image
+        stack.histogram = histogram
+        stack.is_stack = index_image.ndim == 3 and index_image.shape[2] not in (3, 4)
+        stack.lookup_table = None
+        stack.set_levels()
+        return stack
+
+    def set_levels(self, lower_percentile: float = 0, upper_percentile: float = 100, gamma: float = 1) -> None:
+        """
+        Set the levels used to generate the QImages.
+
+        Args:
+            lower_percentile: Percentile in the range [0, 100] which will be shown as black.
+
+            upper_percentile: Percentile in the range [0, 100] which will be shown as white.
+
+            gamma: Gamma correction. Values above 1 brighten the mid tones.
+
+        Returns:
+            None
+        """
+        self.lookup_table = levels_lookup_table(self.histogram, lower_percentile, upper_percentile, gamma)
+
+    def __len__(self) -> int:
+        if self.is_stack:
+            return self.index_image.shape[2]
+        return 1
+
+    def __getitem__(self, index: int) -> QImage:
+        if self.is_stack:
+            image = self.lookup_table[self.index_image[..., index]]
+        else:
+            image = self.lookup_table[self.index_image]
+
+        if image.ndim == 2:
+            image_format = QImage.Format_Grayscale8
+        elif image.shape[2] == 3:
+            image_format = QImage.Format_RGB888
+        else:
+            image_format = QImage.Format_RGBA8888
+        qimage = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], image_format)
+        # Create a copy to prevent crashes due to the data pointed at the QImage being deleted
+        return qimage.copy()
+
+
+class SlicePrefetcher(QObject):
+    """
+    Worker class scaling the slices of an image stack in the background.
+    This class lives in a separate thread of the ImageWidget and prepares the
+    neighbouring slices of the currently shown slice before they are requested.
+    """
+    # Signal to inform the ImageWidget that a slice was prepared. The arguments are
+    # the generation of the request, the index of the slice and the scaled image.
+    slicePrepared = pyqtSignal(int, int, QImage)
+
+    def __init__(self):
+        super().__init__()
+        # Generation of the newest request. Older requests will be skipped.
+        self.generation = 0
+
+    def prefetch(self, generation: int, images: [QImage], indices: [int], size: QSize) -> None:
+        """
+        Scale the requested slices to the given size.
+
+        Args:
+            generation: Generation of the request. If a newer request was made, the
+                        remaining slices of this request will be skipped.
+
+            images: A list of QImages.
+
+            indices: Indices of the slices which should be prepared.
+
+            size: Size the slices will be scaled to.
+
+        Returns:
+            None
+        """
+        for index in indices:
+            if generation != self.generation:
+                return
+            scaled_image = images[index].scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.slicePrepared.emit(generation, index, scaled_image)
+
+
 class ImageWidget(QWidget):
     """
     A widget for displaying images.
     """
+    # Signal to request the preparation of slices from the prefetcher
+    prefetchRequested = pyqtSignal(int, object, list, QSize)
+    # Signal with the selected region of interest as QRect in pixels of the image or None if it was removed
+    roiSelected = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
 
@@ -144,7 +342,43 @@ class ImageWidget(QWidget):
         self.image: [QImage] = None
         self.pixmap = None
 
+        # Number of slices before and after the current slice which will be prepared in the background
+        self.prefetch_distance = 4
+        # Maximum number of scaled slices kept in the cache
+        self.slice_cache_limit = 128
+        # Scaled slices for the current label size
+        self.slice_cache = {}
+        self.slice_cache_size = QSize()
+        self.slice_generation = 0
+
+        self.prefetcher = None
+        self.prefetcher_thread = None
+
+        self.levels_lower_percentile = None
+        self.levels_upper_percentile = None
+        self.levels_gamma = None
+
+        self.playback_button = None
+        self.playback_fps = None
+        self.playback_label = None
+        self.playback_timer = None
+        self.playback_clock = QElapsedTimer()
+        self.playback_start_index = 0
+        self.playback_frame_number = 0
+        self.playback_dropped_frames = 0
+        # Points in time of the last shown frames to determine the achieved FPS
+        self.playback_frame_times = collections.deque(maxlen=30)
+
+        # Region of interest in pixels of the image, selected with a rubber band
+        self.roi_selection_enabled = False
+        self.roi = None
+        # Image drawn over the region of interest, e.g. parameter maps generated for the region
+        self.roi_overlay = None
+        self.rubber_band = None
+        self.rubber_band_origin = None
+
         self.init_ui()
+        self.init_prefetcher()
 
     def init_ui(self) -> None:
         """
@@ -167,6 +401,7 @@ class ImageWidget(QWidget):
         self.image_label.setScaledContents(False)
         self.image_label.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.image_label)
+        self.rubber_band = QRubberBand(QRubberBand.Rectangle, self.image_label)
 
         # This scroll bar will be used to scroll through the images
         self.image_scroll_bar = QScrollBar(Qt.Horizontal)
@@ -177,8 +412,303 @@ class ImageWidget(QWidget):
         self.image_scroll_bar.valueChanged.connect(self.scroll_bar_changed)
         self.layout.addWidget(self.image_scroll_bar)
 
+        self.init_levels_ui()
+        self.init_playback_ui()
+
         self.setLayout(self.layout)
 
+    def init_levels_ui(self) -> None:
+        """
+        Initialize the controls for the contrast stretching of the image.
+
+        Returns:
+            None
+        """
+        levels_layout = QHBoxLayout()
+
+        levels_layout.addWidget(QLabel("Levels (%):"))
+        self.levels_lower_percentile = QDoubleSpinBox()
+        self.levels_lower_percentile.setRange(0, 100)
+        self.levels_lower_percentile.setSingleStep(0.1)
+        self.levels_lower_percentile.setDecimals(2)
+        self.levels_lower_percentile.setValue(0.1)
+        levels_layout.addWidget(self.levels_lower_percentile)
+
+        self.levels_upper_percentile = QDoubleSpinBox()
+        self.levels_upper_percentile.setRange(0, 100)
+        self.levels_upper_percentile.setSingleStep(0.1)
+        self.levels_upper_percentile.setDecimals(2)
+        self.levels_upper_percentile.setValue(99.9)
+        levels_layout.addWidget(self.levels_upper_percentile)
+
+        levels_layout.addWidget(QLabel("Gamma:"))
+        self.levels_gamma = QDoubleSpinBox()
+        self.levels_gamma.setRange(0.1, 10)
+        self.levels_gamma.setSingleStep(0.1)
+        self.levels_gamma.setDecimals(2)
+        self.levels_gamma.setValue(1)
+        levels_layout.addWidget(self.levels_gamma)
+
+        for control in (self.levels_lower_percentile, self.levels_upper_percentile, self.levels_gamma):
+            control.setEnabled(False)
+            control.valueChanged.connect(self.levels_changed)
+        levels_layout.addStretch(1)
+
+        self.layout.addLayout(levels_layout)
+
+    def init_playback_ui(self) -> None:
+        """
+        Initialize the controls for the cine playback of the image stack.
+
+        Returns:
+            None
+        """
+        playback_layout = QHBoxLayout()
+
+        self.playback_button = QPushButton("Play")
+        self.playback_button.setCheckable(True)
+        self.playback_button.setEnabled(False)
+        self.playback_button.toggled.connect(self.toggle_playback)
+        playback_layout.addWidget(self.playback_button)
+
+        playback_layout.addWidget(QLabel("FPS:"))
+        self.playback_fps = QSpinBox()
+        self.playback_fps.setRange(1, 120)
+        self.playback_fps.setValue(10)
+        self.playback_fps.valueChanged.connect(self.playback_fps_changed)
+        playback_layout.addWidget(self.playback_fps)
+
+        # Shows the achieved FPS and render time during the playback
+        self.playback_label = QLabel()
+        playback_layout.addWidget(self.playback_label, stretch=1)
+
+        self.playback_timer = QTimer(self)
+        self.playback_timer.setTimerType(Qt.PreciseTimer)
+        self.playback_timer.timeout.connect(self.playback_step)
+
+        self.layout.addLayout(playback_layout)
+
+    def init_prefetcher(self) -> None:
+        """
+        Move the slice prefetcher to its own thread.
+
+        Returns:
+            None
+        """
+        self.prefetcher_thread = QThread(self)
+        self.prefetcher = SlicePrefetcher()
+        self.prefetcher.moveToThread(self.prefetcher_thread)
+        self.prefetchRequested.connect(self.prefetcher.prefetch)
+        self.prefetcher.slicePrepared.connect(self.slice_prepared)
+        self.prefetcher_thread.finished.connect(self.prefetcher.deleteLater)
+
+        # Stop the thread before it gets destroyed together with this widget
+        prefetcher, prefetcher_thread = self.prefetcher, self.prefetcher_thread
+        self.destroyed.connect(lambda: ImageWidget.stop_prefetcher(prefetcher, prefetcher_thread))
+        self.prefetcher_thread.start()
+
+    @staticmethod
+    def stop_prefetcher(prefetcher: SlicePrefetcher, prefetcher_thread: QThread) -> None:
+        """
+        Stop the thread of the slice prefetcher.
+
+        Args:
+            prefetcher: The slice prefetcher.
+
+            prefetcher_thread: The thread the slice prefetcher lives in.
+
+        Returns:
+            None
+        """
+        # Skip all pending requests
+        prefetcher.generation = -1
+        prefetcher_thread.quit()
+        prefetcher_thread.wait()
+
+    def clear_slice_cache(self) -> None:
+        """
+        Remove all scaled slices from the cache and skip all pending prefetch requests.
+
+        Returns:
+            None
+        """
+        self.slice_cache = {}
+        self.slice_cache_size = self.image_label.size()
+        self.slice_generation += 1
+        self.prefetcher.generation = self.slice_generation
+
+    def get_slice(self, index: int) -> QImage:
+        """
+        Get a slice scaled to the size of the image label.
+        If the slice was not prepared by the prefetcher yet, it will be scaled here.
+
+        Args:
+            index: Index of the slice.
+
+        Returns:
+            The scaled slice.
+        """
+        if self.slice_cache_size != self.image_label.size():
+            self.clear_slice_cache()
+        if index not in self.slice_cache:
+            self.slice_cache[index] = self.image[index].scaled(self.slice_cache_size,
+                                                               Qt.KeepAspectRatio,
+                                                               Qt.SmoothTransformation)
+        return self.slice_cache[index]
+
+    def slice_prepared(self, generation: int, index: int, image: QImage) -> None:
+        """
+        Called when the prefetcher finished scaling a slice.
+
+        Args:
+            generation: Generation of the request.
+
+            index: Index of the slice.
+
+            image: The scaled slice.
+
+        Returns:
+            None
+        """
+        # Ignore slices which were prepared for an old image or size
+        if generation != self.slice_generation:
+            return
+        self.slice_cache[index] = image
+
+    def prefetch_slices(self, index: int) -> None:
+        """
+        Request the neighbouring slices of the given slice from the prefetcher.
+        Slices far away from the given slice are removed from the cache if it is full.
+
+        Args:
+            index: Index of the currently shown slice.
+
+        Returns:
+            None
+        """
+        num_slices = len(self.image)
+        # The measurement covers a full rotation, so the neighbours wrap around.
+        distances = {}
+        for offset in range(1, self.prefetch_distance + 1):
+            for neighbour in ((index + offset) % num_slices, (index - offset) % num_slices):
+                distances.setdefault(neighbour, offset)
+
+        if len(self.slice_cache) > self.slice_cache_limit:
+            def circular_distance(i):
+                return min((i - index) % num_slices, (index - i) % num_slices)
+            for i in sorted(self.slice_cache, key=circular_distance)[self.slice_cache_limit:]:
+                del self.slice_cache[i]
+
+        missing_slices = [i for i in distances if i not in self.slice_cache]
+        if len(missing_slices) > 0:
+            self.prefetchRequested.emit(self.slice_generation, self.image,
+                                        missing_slices, self.slice_cache_size)
+
+    def show_slice(self, index: int) -> None:
+        """
+        Show the slice with the given index and prepare its neighbours.
+
+        Args:
+            index: Index of the slice.
+
+        Returns:
+            None
+        """
+        self.pixmap = QPixmap.fromImage(self.get_slice(index))
+        if self.roi is not None and self.roi_overlay is not None:
+            painter = QPainter(self.pixmap)
+            painter.drawImage(self.image_to_pixmap(self.roi), self.roi_overlay)
+            painter.end()
+        self.image_label.setPixmap(self.pixmap)
+        self.update_rubber_band()
+        self.prefetch_slices(index)
+
+    def levels_changed(self) -> None:
+        """
+        Called when the levels are changed.
+        This method will update the lookup table and the displayed image.
+
+        Returns:
+            None
+        """
+        if not isinstance(self.image, LevelsImageStack):
+            return
+        self.image.set_levels(self.levels_lower_percentile.value(),
+                              self.levels_upper_percentile.value(),
+                              self.levels_gamma.value())
+        self.clear_slice_cache()
+        self.show_slice(self.image_scroll_bar.value())
+
+    def toggle_playback(self, checked: bool) -> None:
+        """
+        Start or stop the cine playback of the image stack.
+
+        Args:
+            checked: True if the playback should be started.
+
+        Returns:
+            None
+        """
+        if checked:
+            self.playback_button.setText("Pause")
+            self.restart_playback()
+        else:
+            self.playback_button.setText("Play")
+            self.playback_timer.stop()
+
+    def restart_playback(self) -> None:
+        """
+        Restart the playback clock from the currently shown slice.
+
+        Returns:
+            None
+        """
+        self.playback_start_index = self.image_scroll_bar.value()
+        self.playback_frame_number = 0
+        self.playback_dropped_frames = 0
+        self.playback_frame_times.clear()
+        self.playback_clock.start()
+        self.playback_timer.start(int(1000 / self.playback_fps.value()))
+
+    def playback_fps_changed(self) -> None:
+        """
+        Called when the target FPS is changed.
+
+        Returns:
+            None
+        """
+        if self.playback_timer.isActive():
+            self.restart_playback()
+
+    def playback_step(self) -> None:
+        """
+        Show the next frame of the cine playback.
+        The frame is chosen from the elapsed time since the playback started.
+        If rendering falls behind, the frames in between are dropped instead of queued.
+
+        Returns:
+            None
+        """
+        frame_number = int(self.playback_clock.elapsed() * self.playback_fps.value() / 1000)
+        if frame_number <= self.playback_frame_number:
+            return
+        self.playback_dropped_frames += frame_number - self.playback_frame_number - 1
+        self.playback_frame_number = frame_number
+
+        start_time = time.perf_counter()
+        self.image_scroll_bar.setValue((self.playback_start_index + frame_number) % len(self.image))
+        end_time = time.perf_counter()
+
+        self.playback_frame_times.append(end_time)
+        if len(self.playback_frame_times) > 1:
+            achieved_fps = (len(self.playback_frame_times) - 1) / \
+                           (self.playback_frame_times[-1] - self.playback_frame_times[0])
+        else:
+            achieved_fps = 0
+        self.playback_label.setText(f"{achieved_fps:.1f} FPS, "
+                                    f"render time: {1000 * (end_time - start_time):.1f} ms, "
+                                    f"dropped: {self.playback_dropped_frames}")
+
     def scroll_bar_changed(self) -> None:
         """
         Called when the scroll bar is changed.
@@ -187,28 +717,238 @@ class ImageWidget(QWidget):
         Returns:
             None
         """
-        self.pixmap = QPixmap.fromImage(self.image[self.image_scroll_bar.value()])
-        self.image_label.setPixmap(self.pixmap.scaled(self.image_label.size(),
-                                                      Qt.KeepAspectRatio,
-                                                      Qt.SmoothTransformation))
+        self.show_slice(self.image_scroll_bar.value())
 
     def set_image(self, image: [QImage]) -> None:
         """
         Set the image to be displayed.
 
         Args:
-            image: A list of QImages.
+            image: A list of QImages or a LevelsImageStack.
 
         Returns:
             None
         """
+        for control in (self.levels_lower_percentile, self.levels_upper_percentile, self.levels_gamma):
+            control.setEnabled(isinstance(image, LevelsImageStack))
+        self.playback_button.setChecked(False)
+        self.playback_button.setEnabled(len(image) > 1)
+        self.playback_label.clear()
+
         self.image = image
-        self.pixmap = QPixmap.fromImage(self.image[0])
-        self.image_label.setPixmap(self.pixmap.scaled(self.image_label.size(),
-                                                      Qt.KeepAspectRatio,
-                                                      Qt.SmoothTransformation))
+        if self.roi is not None:
+            self.roi = None
+            self.roi_overlay = None
+            self.roiSelected.emit(None)
+        if isinstance(self.image, LevelsImageStack):
+            self.image.set_levels(self.levels_lower_percentile.value(),
+                                  self.levels_upper_percentile.value(),
+                                  self.levels_gamma.value())
+        self.clear_slice_cache()
+        self.image_scroll_bar.blockSignals(True)
         self.image_scroll_bar.setRange(0, len(self.image) - 1)
         self.image_scroll_bar.setValue(0)
+        self.image_scroll_bar.blockSignals(False)
+        self.show_slice(0)
+
+    def clear_image(self) -> None:
+        """
+        Remove the displayed image and its scaled slices to release their memory.
+
+        Returns:
+            None
+        """
+        image = QImage(1, 1, QImage.Format_Grayscale8)
+        image.fill(0)
+        self.set_image([image])
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the displayed image and the scaled slices.
+
+        Returns:
+            The estimated memory in bytes.
+        """
+        return get_memory_usage(self.image, self.slice_cache)
+
+    def set_array(self, image: numpy.ndarray) -> None:
+        """
+        Set a NumPy array to be displayed. In contrast to set_image, the contrast of the
+        shown image can be adjusted with the levels controls of the widget.
+
+        Args:
+            image: A 2D or 3D NumPy array.
+
+        Returns:
+            None
+        """
+        self.set_image(LevelsImageStack(image))
+
+    def image_size(self) -> QSize:
+        """
+        Get the size of the displayed image in pixels.
+
+        Returns:
+            The size of the image.
+        """
+        if isinstance(self.image, LevelsImageStack):
+            return QSize(self.image.index_image.shape[1], self.image.index_image.shape[0])
+        if isinstance(self.image, QImage):
+            return self.image.size()
+        return self.image[0].size()
+
+    def image_to_pixmap(self, rect: QRect) -> QRect:
+        """
+        Map a rectangle in pixels of the image to the scaled pixmap shown in the image label.
+
+        Args:
+            rect: The rectangle in pixels of the image.
+
+        Returns:
+            The rectangle in pixels of the pixmap.
+        """
+        image_size = self.image_size()
+        scale_x = self.pixmap.width() / max(image_size.width(), 1)
+        scale_y = self.pixmap.height() / max(image_size.height(), 1)
+        return QRect(QPoint(round(rect.left() * scale_x), round(rect.top() * scale_y)),
+                     QPoint(round((rect.right() + 1) * scale_x) - 1, round((rect.bottom() + 1) * scale_y) - 1))
+
+    def pixmap_offset(self) -> QPoint:
+        """
+        Get the position of the centered pixmap in the image label.
+
+        Returns:
+            The upper left corner of the pixmap.
+        """
+        return QPoint((self.image_label.width() - self.pixmap.width()) // 2,
+                      (self.image_label.height() - self.pixmap.height()) // 2)
+
+    def label_to_image(self, point: QPoint) -> QPoint:
+        """
+        Map a point of the image label to the pixel of the image below it.
+
+        Args:
+            point: The point in coordinates of the image label.
+
+        Returns:
+            The pixel of the image, clipped to the image.
+        """
+        image_size = self.image_size()
+        point = point - self.pixmap_offset()
+        x = int(point.x() * image_size.width() / max(self.pixmap.width(), 1))
+        y = int(point.y() * image_size.height() / max(self.pixmap.height(), 1))
+        return QPoint(min(max(x, 0), image_size.width() - 1), min(max(y, 0), image_size.height() - 1))
+
+    def set_roi_selection_enabled(self, enabled: bool) -> None:
+        """
+        Enable or disable the selection of a region of interest by dragging a rectangle over the image.
+
+        Args:
+            enabled: True if a region can be selected.
+
+        Returns:
+            None
+        """
+        self.roi_selection_enabled = enabled
+        if not enabled:
+            self.set_roi(None)
+
+    def set_roi(self, roi: QRect) -> None:
+        """
+        Set the region of interest and remove its overlay.
+
+        Args:
+            roi: The region in pixels of the image or None to remove the region.
+
+        Returns:
+            None
+        """
+        self.roi = roi
+        self.roi_overlay = None
+        if not isinstance(self.image, QImage):
+            self.show_slice(self.image_scroll_bar.value())
+        self.roiSelected.emit(roi)
+
+    def set_roi_overlay(self, overlay: QImage) -> None:
+        """
+        Draw an image over the region of interest. The image is scaled to the size of the region.
+
+        Args:
+            overlay: The image or None to remove the overlay.
+
+        Returns:
+            None
+        """
+        self.roi_overlay = overlay
+        if not isinstance(self.image, QImage):
+            self.show_slice(self.image_scroll_bar.value())
+
+    def update_rubber_band(self) -> None:
+        """
+        Move the rubber band to the region of interest of the currently shown pixmap.
+
+        Returns:
+            None
+        """
+        if self.roi is None:
+            self.rubber_band.hide()
+            return
+        self.rubber_band.setGeometry(self.image_to_pixmap(self.roi).translated(self.pixmap_offset()))
+        self.rubber_band.show()
+
+    def mousePressEvent(self, a0: QMouseEvent) -> None:
+        """
+        Start the selection of a region of interest.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        if not self.roi_selection_enabled or a0.button() != Qt.LeftButton or isinstance(self.image, QImage):
+            super().mousePressEvent(a0)
+            return
+        self.rubber_band_origin = self.image_label.mapFrom(self, a0.pos())
+        self.rubber_band.setGeometry(QRect(self.rubber_band_origin, QSize()))
+        self.rubber_band.show()
+
+    def mouseMoveEvent(self, a0: QMouseEvent) -> None:
+        """
+        Resize the rubber band while a region of interest is selected.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        if self.rubber_band_origin is None:
+            super().mouseMoveEvent(a0)
+            return
+        self.rubber_band.setGeometry(QRect(self.rubber_band_origin,
+                                           self.image_label.mapFrom(self, a0.pos())).normalized())
+
+    def mouseReleaseEvent(self, a0: QMouseEvent) -> None:
+        """
+        Finish the selection of a region of interest. A click without dragging removes the region.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        if self.rubber_band_origin is None:
+            super().mouseReleaseEvent(a0)
+            return
+        top_left = self.label_to_image(self.rubber_band_origin)
+        bottom_right = self.label_to_image(self.image_label.mapFrom(self, a0.pos()))
+        self.rubber_band_origin = None
+        roi = QRect(top_left, bottom_right).normalized()
+        if roi.width() < 2 or roi.height() < 2:
+            roi = None
+        self.set_roi(roi)
 
     def resizeEvent(self, a0: QResizeEvent) -> None:
         """
@@ -221,7 +961,10 @@ class ImageWidget(QWidget):
         Returns:
             None
         """
-        if self.pixmap and not self.pixmap.isNull() and self.image_label:
+        if not isinstance(self.image, QImage) and self.image_label:
+            # The slice cache will be cleared as the label size changed
+            self.show_slice(self.image_scroll_bar.value())
+        elif self.pixmap and not self.pixmap.isNull() and self.image_label:
             self.image_label.setPixmap(self.pixmap.scaled(self.image_label.size(),
                                                           Qt.KeepAspectRatio,
                                                           Qt.SmoothTransformation))
@@ -1,11 +1,13 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QTabWidget, \
-                            QMessageBox
-from PyQt5.QtCore import QUrl
+                            QMessageBox, QLabel, QFileDialog, QInputDialog
+from PyQt5.QtCore import QUrl, QTimer, QSettings
 from PyQt5.QtGui import QDesktopServices, QCloseEvent
 
 from .ClusterWidget import ClusterWidget
 from .ParameterGeneratorWidget import ParameterGeneratorWidget
 from .VisualizationWidget import VisualizationWidget
+from .MemoryUsage import format_memory_usage
+from .DatasetRegistry import DatasetRegistry
 
 __all__ = ['MainWindow']
 
@@ -22,11 +24,17 @@ class MainWindow(QMainWindow):
 
         self.layout = None
         self.helpmenu = None
+        self.settingsmenu = None
+        self.settings = QSettings('QtSLIX', 'QtSLIX')
         self.tab_bar = None
+        self.memory_label = None
+        self.memory_timer = None
 
         self.parameter_generator_widget = None
         self.visualization_widget = None
         self.cluster_widget = None
+        # Parameter maps generated in this session, shared by all tabs
+        self.dataset_registry = DatasetRegistry()
 
         self.setWindowTitle('QtSLIX')
         self.setMinimumSize(1280, 720)
@@ -62,6 +70,7 @@ class MainWindow(QMainWindow):
                                      QMessageBox.No)
         if reply == QMessageBox.Yes:
             a0.accept()
+            self.memory_timer.stop()
             if self.tab_bar:
                 del self.tab_bar
             if self.parameter_generator_widget:
@@ -92,7 +101,17 @@ class MainWindow(QMainWindow):
         self.tab_bar.addTab(self.cluster_widget, 'Clustering')
         self.layout.addWidget(self.tab_bar)
 
+        self.parameter_generator_widget.set_dataset_registry(self.dataset_registry)
+        self.visualization_widget.set_dataset_registry(self.dataset_registry)
+        self.cluster_widget.set_dataset_registry(self.dataset_registry)
+
+        preview_cache = self.parameter_generator_widget.preview_cache
+        preview_cache.directory = self.settings.value('preview_cache/directory', preview_cache.directory, str)
+        preview_cache.cache_limit = self.settings.value('preview_cache/limit', preview_cache.cache_limit, int)
+        self.set_separate_process(self.settings.value('jobs/separate_process', False, bool))
+
         self.create_menu_bar()
+        self.create_status_bar()
 
     def create_menu_bar(self) -> None:
         """
@@ -101,12 +120,106 @@ class MainWindow(QMainWindow):
         Returns:
              None
         """
+        self.settingsmenu = self.menuBar().addMenu('&Settings')
+        self.settingsmenu.addAction('Preview cache &folder...', self.choose_preview_cache_directory)
+        self.settingsmenu.addAction('Preview cache &size...', self.choose_preview_cache_limit)
+        self.settingsmenu.addAction('&Clear preview cache', self.clear_preview_cache)
+        self.settingsmenu.addSeparator()
+        separate_process_action = self.settingsmenu.addAction('Run generation in separate &process')
+        separate_process_action.setCheckable(True)
+        separate_process_action.setChecked(self.parameter_generator_widget.separate_process)
+        separate_process_action.toggled.connect(self.set_separate_process)
+
         self.helpmenu = self.menuBar().addMenu('&Help')
         self.helpmenu.addAction('&About', self.about)
         self.helpmenu.addAction('&License', self.license)
         self.helpmenu.addAction('&Credits', self.credits)
         self.helpmenu.addAction('&About Qt', self.about_qt)
 
+    def choose_preview_cache_directory(self) -> None:
+        """
+        Choose the folder of the cached previews of opened measurements.
+
+        Returns:
+             None
+        """
+        preview_cache = self.parameter_generator_widget.preview_cache
+        directory = QFileDialog.getExistingDirectory(self, 'Preview cache folder', preview_cache.directory)
+        if not directory:
+            return
+        preview_cache.directory = directory
+        self.settings.setValue('preview_cache/directory', directory)
+
+    def choose_preview_cache_limit(self) -> None:
+        """
+        Choose the maximum size of the cached previews on the disk.
+        The least recently used previews are removed if the cache is larger.
+
+        Returns:
+             None
+        """
+        preview_cache = self.parameter_generator_widget.preview_cache
+        limit, ok = QInputDialog.getInt(self, 'Preview cache size',
+                                        f'Maximum size of the preview cache in MiB '
+                                        f'(currently used: {format_memory_usage(preview_cache.memory_usage())}):',
+                                        preview_cache.cache_limit // 2 ** 20, 1, 1024 ** 2)
+        if not ok:
+            return
+        preview_cache.cache_limit = limit * 2 ** 20
+        preview_cache.evict()
+        self.settings.setValue('preview_cache/limit', preview_cache.cache_limit)
+
+    def set_separate_process(self, separate_process: bool) -> None:
+        """
+        Choose whether the parameter maps, FOMs and vector maps are generated in a separate process.
+        A crashing generation doesn't end the session then and cancelling it stops it immediately.
+
+        Args:
+            separate_process: If True, the generations run in a separate process.
+
+        Returns:
+             None
+        """
+        self.parameter_generator_widget.separate_process = separate_process
+        self.visualization_widget.separate_process = separate_process
+        self.settings.setValue('jobs/separate_process', separate_process)
+
+    def clear_preview_cache(self) -> None:
+        """
+        Remove all cached previews of opened measurements.
+
+        Returns:
+             None
+        """
+        self.parameter_generator_widget.preview_cache.clear()
+
+    def create_status_bar(self) -> None:
+        """
+        Create the status bar showing the memory held by each tab. The memory is updated periodically.
+
+        Returns:
+             None
+        """
+        self.memory_label = QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.update_memory_usage)
+        self.memory_timer.start(1000)
+        self.update_memory_usage()
+
+    def update_memory_usage(self) -> None:
+        """
+        Show the memory currently held by each tab in the status bar.
+
+        Returns:
+             None
+        """
+        memory_usage = []
+        for index in range(self.tab_bar.count()):
+            widget = self.tab_bar.widget(index)
+            memory_usage.append(f'{self.tab_bar.tabText(index)}: {format_memory_usage(widget.memory_usage())}')
+        self.memory_label.setText('Memory – ' + ' | '.join(memory_usage))
+
     def close(self) -> None:
         """
         Close the application.
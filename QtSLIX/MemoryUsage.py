@@ -0,0 +1,182 @@
+import os
+import threading
+
+import numpy
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QImage, QPixmap
+
+__all__ = ['get_memory_usage', 'format_memory_usage', 'available_memory', 'MemoryBudget']
+
+
+def get_memory_usage(*objects) -> int:
+    """
+    Estimate the memory held by NumPy arrays and images.
+    Lists, tuples, dictionaries and the attributes of plain objects (e.g. the engines and image stacks)
+    are searched for arrays and images. Arrays sharing the same memory are only counted once.
+    Workers may change the caches of the engines while they are searched, so the containers
+    are copied before they are searched.
+
+    Args:
+        *objects: The objects whose memory is estimated.
+
+    Returns:
+        The estimated memory in bytes.
+    """
+    def copy_values(values) -> list:
+        # A container changed in another thread while it is copied raises a RuntimeError
+        for _ in range(10):
+            try:
+                return list(values)
+            except RuntimeError:
+                continue
+        return []
+
+    counted = set()
+    memory_usage = 0
+    pending = list(objects)
+    while len(pending) > 0:
+        obj = pending.pop()
+        if obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+            continue
+        if isinstance(obj, numpy.ndarray):
+            # Views are counted through the array owning the memory
+            while isinstance(obj.base, numpy.ndarray):
+                obj = obj.base
+            if id(obj) not in counted:
+                counted.add(id(obj))
+                # Memory mapped files are paged in and out by the operating system
+                if not isinstance(obj, numpy.memmap):
+                    memory_usage += obj.nbytes
+        elif id(obj) in counted:
+            continue
+        elif isinstance(obj, QImage):
+            counted.add(id(obj))
+            memory_usage += obj.sizeInBytes()
+        elif isinstance(obj, QPixmap):
+            counted.add(id(obj))
+            memory_usage += obj.width() * obj.height() * obj.depth() // 8
+        elif isinstance(obj, dict):
+            counted.add(id(obj))
+            pending.extend(copy_values(obj.values()))
+        elif isinstance(obj, (list, tuple, set)):
+            counted.add(id(obj))
+            pending.extend(copy_values(obj))
+        elif hasattr(obj, '__dict__') and not isinstance(obj, QObject):
+            counted.add(id(obj))
+            pending.extend(copy_values(vars(obj).values()))
+    return memory_usage
+
+
+def format_memory_usage(number_of_bytes: int) -> str:
+    """
+    Format a number of bytes with a binary unit.
+
+    Args:
+        number_of_bytes: The number of bytes.
+
+    Returns:
+        The formatted number, e.g. "1.5 GiB".
+    """
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if number_of_bytes < 1024:
+            break
+        number_of_bytes /= 1024
+    else:
+        unit = 'TiB'
+    if unit == 'B':
+        return f'{int(number_of_bytes)} B'
+    return f'{number_of_bytes:.1f} {unit}'
+
+
+def available_memory() -> int:
+    """
+    Get the memory which can be used without swapping.
+
+    Returns:
+        The available memory in bytes or None if it can't be determined on this system.
+    """
+    try:
+        # Includes the page cache which the system releases when needed
+        with open('/proc/meminfo') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class MemoryBudget:
+    """
+    Limits the memory used by tasks running at the same time.
+    Each task reserves its estimated memory before it starts and waits while the other running tasks
+    use too much of the budget. A task always starts if no other task is running, even if its estimate
+    exceeds the budget.
+    """
+
+    def __init__(self, limit: int = None):
+        """
+        Initialize the budget.
+
+        Args:
+            limit: Number of bytes the tasks may use at the same time. If None, the tasks are not limited.
+        """
+        self.limit = limit
+        self.reserved = 0
+        self.running_tasks = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, number_of_bytes: int) -> None:
+        """
+        Wait until the memory of a task can be reserved and reserve it.
+
+        Args:
+            number_of_bytes: Estimated memory of the task.
+
+        Returns:
+            None
+        """
+        with self.condition:
+            while self.limit is not None and self.running_tasks > 0 and \
+                    self.reserved + number_of_bytes > self.limit:
+                self.condition.wait()
+            self.reserved += number_of_bytes
+            self.running_tasks += 1
+
+    def release(self, number_of_bytes: int) -> None:
+        """
+        Release the memory of a finished task.
+
+        Args:
+            number_of_bytes: Estimated memory of the task as passed to acquire.
+
+        Returns:
+            None
+        """
+        with self.condition:
+            self.reserved -= number_of_bytes
+            self.running_tasks -= 1
+            self.condition.notify_all()
+
+    def run(self, number_of_bytes: int, function, *args):
+        """
+        Run a task as soon as its memory can be reserved.
+
+        Args:
+            number_of_bytes: Estimated memory of the task.
+
+            function: The task.
+
+            *args: Arguments of the task.
+
+        Returns:
+            The return value of the task.
+        """
+        self.acquire(number_of_bytes)
+        try:
+            return function(*args)
+        finally:
+            self.release(number_of_bytes)
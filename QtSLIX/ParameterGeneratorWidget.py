@@ -1,12 +1,21 @@
 import os.path
 
+import numpy
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, \
-    QFileDialog, QCheckBox, QPushButton, QProgressDialog, \
-    QSizePolicy, QComboBox, QDoubleSpinBox, QLabel, QMessageBox
-from PyQt5.QtCore import QThread, QLocale
-
-from .ImageWidget import ImageWidget, convert_numpy_to_qimage
-from .ThreadWorkers.ParameterGenerator import ParameterGeneratorWorker
+    QFileDialog, QCheckBox, QPushButton, \
+    QSizePolicy, QComboBox, QDoubleSpinBox, QSpinBox, QLabel, QMessageBox
+from PyQt5.QtCore import QLocale
+
+from .ImageWidget import ImageWidget, LevelsImageStack
+from .MemoryUsage import get_memory_usage
+from .ColorMapEngine import ColorMapEngine
+from .DatasetRegistry import DatasetRegistry
+from .PreviewCache import PreviewCache
+from .ThreadWorkers.ParameterGenerator import ParameterGeneratorWorker, ParameterPreviewWorker
+from .ThreadWorkers.Loader import ImageLoaderWorker, LoadingService
+from .ThreadWorkers.FilterSweep import FilterSweepWorker
+from .ThreadWorkers.ProcessExecution import ProcessWorker
+from .FilterSweepDialog import FilterSweepDialog, FilterSweepResultsDialog
 
 import SLIX
 
@@ -28,6 +37,7 @@ class ParameterGeneratorWidget(QWidget):
         self.sidebar = None
         self.sidebar_button_open_measurement = None
         self.sidebar_button_open_folder = None
+        self.sidebar_button_unload = None
         self.sidebar_checkbox_filtering = None
         self.sidebar_filtering_algorithm = None
         self.sidebar_filtering_parameter_1 = None
@@ -43,22 +53,46 @@ class ParameterGeneratorWidget(QWidget):
         self.sidebar_checkbox_peaks = None
         self.sidebar_checkbox_detailed = None
         self.sidebar_checkbox_use_gpu = None
+        self.sidebar_parallel_maps = None
+        self.sidebar_checkbox_checkpoints = None
         self.sidebar_dir_correction_parameter = None
         self.sidebar_button_generate = None
+        self.sidebar_button_preview_roi = None
+        self.sidebar_button_filter_sweep = None
+        self.sidebar_roi_overlay = None
+        self.sidebar_roi_info = None
         self.image_widget = None
 
         self.filename = None
         self.image = None
-        self.worker_thread = None
-        self.worker = None
-        self.progress_dialog = None
+        # Shape of the measurement, also known if only its cached preview was loaded
+        self.measurement_shape = None
+        # Parameter maps generated for the region of interest by their suffix
+        self.roi_parameter_maps = {}
+        self.output_path_name = None
+        self.dataset_registry = None
+        self.loading_service = LoadingService(self)
+        # Quick-look previews of opened measurements. The measurement itself is only read when it is needed.
+        self.preview_cache = PreviewCache()
+        # If True, the parameter maps are generated in a separate process
+        self.separate_process = False
 
         self.setup_ui()
 
     def __del__(self):
-        if self.worker_thread is not None:
-            self.worker_thread.terminate()
-            self.worker_thread.deleteLater()
+        self.loading_service.shutdown()
+
+    def set_dataset_registry(self, dataset_registry: DatasetRegistry) -> None:
+        """
+        Set the registry to which the generated parameter maps are added.
+
+        Args:
+            dataset_registry: The dataset registry of the application.
+
+        Returns:
+            None
+        """
+        self.dataset_registry = dataset_registry
 
     def setup_ui(self) -> None:
         """
@@ -95,6 +129,12 @@ class ParameterGeneratorWidget(QWidget):
         self.sidebar_button_open_folder.clicked.connect(self.open_folder)
         self.sidebar.addWidget(self.sidebar_button_open_folder)
 
+        self.sidebar_button_unload = QPushButton("Unload")
+        self.sidebar_button_unload.setToolTip("Release the memory of the loaded measurement.")
+        self.sidebar_button_unload.clicked.connect(self.unload)
+        self.sidebar_button_unload.setEnabled(False)
+        self.sidebar.addWidget(self.sidebar_button_unload)
+
         self.sidebar.addStretch(5)
 
         # Filtering part
@@ -191,6 +231,44 @@ class ParameterGeneratorWidget(QWidget):
         self.sidebar_checkbox_use_gpu.setChecked(SLIX.toolbox.gpu_available)
         self.sidebar.addWidget(self.sidebar_checkbox_use_gpu)
 
+        self.sidebar.addWidget(QLabel("Parallel parameter maps:"))
+        self.sidebar_parallel_maps = QSpinBox()
+        self.sidebar_parallel_maps.setToolTip("Number of parameter maps generated at the same time after the peaks "
+                                              "were found. Maps wait for each other when the memory gets low.")
+        self.sidebar_parallel_maps.setRange(1, 6)
+        self.sidebar_parallel_maps.setValue(min(os.cpu_count() or 1, 6))
+        self.sidebar.addWidget(self.sidebar_parallel_maps)
+
+        self.sidebar_checkbox_checkpoints = QCheckBox("Resumable")
+        self.sidebar_checkbox_checkpoints.setToolTip("Record the finished parameter maps and intermediate results "
+                                                     "next to the parameter maps, so a cancelled generation can "
+                                                     "be resumed.")
+        self.sidebar_checkbox_checkpoints.setChecked(False)
+        self.sidebar.addWidget(self.sidebar_checkbox_checkpoints)
+
+        self.sidebar.addStretch(1)
+
+        # Region of interest part
+        self.sidebar.addWidget(QLabel("<b>Region of interest:</b>"))
+        self.sidebar_button_preview_roi = QPushButton("Preview ROI")
+        self.sidebar_button_preview_roi.setToolTip("Generate the parameter maps of the region dragged over the "
+                                                   "measurement and show them without writing them.")
+        self.sidebar_button_preview_roi.clicked.connect(self.preview_roi)
+        self.sidebar_button_preview_roi.setEnabled(False)
+        self.sidebar.addWidget(self.sidebar_button_preview_roi)
+        self.sidebar_button_filter_sweep = QPushButton("Filter sweep...")
+        self.sidebar_button_filter_sweep.setToolTip("Compare a grid of filter settings on the region of interest.")
+        self.sidebar_button_filter_sweep.clicked.connect(self.sweep_filters)
+        self.sidebar_button_filter_sweep.setEnabled(False)
+        self.sidebar.addWidget(self.sidebar_button_filter_sweep)
+        self.sidebar_roi_overlay = QComboBox()
+        self.sidebar_roi_overlay.setEnabled(False)
+        self.sidebar_roi_overlay.currentIndexChanged.connect(self.show_roi_overlay)
+        self.sidebar.addWidget(self.sidebar_roi_overlay)
+        self.sidebar_roi_info = QLabel("Drag a rectangle over the measurement.")
+        self.sidebar_roi_info.setWordWrap(True)
+        self.sidebar.addWidget(self.sidebar_roi_info)
+
         self.sidebar.addStretch(5)
 
         self.sidebar_button_generate = QPushButton("Generate")
@@ -207,6 +285,8 @@ class ParameterGeneratorWidget(QWidget):
         """
         self.image_widget = ImageWidget()
         self.image_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.image_widget.set_roi_selection_enabled(True)
+        self.image_widget.roiSelected.connect(self.roi_changed)
 
     def open_measurement(self) -> None:
         """
@@ -224,12 +304,7 @@ class ParameterGeneratorWidget(QWidget):
                                            "*.tiff ;; *.tif ;; *.h5 ;; *.nii ;; *.nii.gz")[0]
         if not file:
             return
-        self.filename = file
-        self.image = SLIX.io.imread(file)
-        self.sidebar_button_generate.setEnabled(True)
-
-        if self.image_widget:
-            self.image_widget.set_image(convert_numpy_to_qimage(self.image))
+        self.load_measurement(file)
 
     def open_folder(self) -> None:
         """
@@ -249,16 +324,98 @@ class ParameterGeneratorWidget(QWidget):
         if not folder:
             return
 
-        self.filename = folder
-        self.image = SLIX.io.imread(folder)
-        # Couldn't read any image from the folder
-        if self.image is None:
-            QMessageBox.warning(self, "Error", "Couldn't read any image from the folder.")
+        self.load_measurement(folder)
+
+    def load_measurement(self, filename: str) -> None:
+        """
+        Load a measurement file or folder in the background.
+        If a preview of the measurement is cached, only the preview is shown and the measurement is loaded
+        when the parameter maps are generated. Otherwise, the measurement and its preview are set when the
+        loading finished and the preview is written into the cache.
+
+        Args:
+            filename: The measurement file or folder.
+
+        Returns:
+            None
+        """
+        preview = self.preview_cache.get(filename)
+        if preview is not None:
+            self.loading_service.cancel('measurement')
+            level_image = self.preview_cache.choose_level(preview, self.image_widget.width(),
+                                                          self.image_widget.height())
+            self.measurement_shape = preview['shape']
+            self.set_measurement(filename, (None, LevelsImageStack.from_index_image(level_image,
+                                                                                    preview['histogram'])))
             return
+        self.loading_service.load('measurement',
+                                  ImageLoaderWorker(filename, lambda image: self.prepare_measurement(filename, image)),
+                                  'Loading measurement...',
+                                  lambda measurement: self.set_measurement(filename, measurement))
+
+    def prepare_measurement(self, filename: str, image: numpy.ndarray) -> (numpy.ndarray, LevelsImageStack):
+        """
+        Prepare the preview of a loaded measurement and write it into the preview cache.
+
+        Args:
+            filename: The measurement file or folder.
+
+            image: The loaded measurement.
+
+        Returns:
+            The measurement and its preview.
+        """
+        preview = LevelsImageStack(image)
+        self.preview_cache.put(filename, preview.index_image, preview.histogram)
+        return image, preview
+
+    def set_measurement(self, filename: str, measurement: (numpy.ndarray, LevelsImageStack)) -> None:
+        """
+        Set the loaded measurement and show its preview in the image widget.
+
+        Args:
+            filename: The measurement file or folder.
+
+            measurement: The loaded measurement or None if only its cached preview was loaded, and the preview.
+
+        Returns:
+            None
+        """
+        self.filename = filename
+        self.image, preview = measurement
+        if self.image is not None:
+            self.measurement_shape = self.image.shape
         self.sidebar_button_generate.setEnabled(True)
+        self.sidebar_button_unload.setEnabled(True)
 
         if self.image_widget:
-            self.image_widget.set_image(convert_numpy_to_qimage(self.image))
+            self.image_widget.set_image(preview)
+
+    def unload(self) -> None:
+        """
+        Release the loaded measurement and its preview. A running generation is cancelled.
+
+        Returns:
+            None
+        """
+        self.loading_service.cancel('measurement')
+        self.loading_service.cancel('generate')
+        self.loading_service.cancel('roi_preview')
+        self.loading_service.cancel('filter_sweep')
+        self.image = None
+        self.measurement_shape = None
+        self.image_widget.clear_image()
+        self.sidebar_button_generate.setEnabled(False)
+        self.sidebar_button_unload.setEnabled(False)
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the loaded measurement and its preview.
+
+        Returns:
+            The estimated memory in bytes.
+        """
+        return get_memory_usage(self.image, self.roi_parameter_maps) + self.image_widget.memory_usage()
 
     def show_error_message(self, message: str) -> None:
         """
@@ -287,43 +444,295 @@ class ParameterGeneratorWidget(QWidget):
         if not output_folder:
             return
 
-        # Show a progress bar while the parameter maps are generated
-        if self.progress_dialog:
-            del self.progress_dialog
-        self.progress_dialog = QProgressDialog("Generating...", "Cancel", 0, 0, self)
+        if self.image is None:
+            # Only the cached preview was shown so far
+            self.loading_service.load('measurement', ImageLoaderWorker(self.filename), 'Loading measurement...',
+                                      lambda image: self.start_generation(image, output_folder))
+        else:
+            self.start_generation(self.image, output_folder)
+
+    def start_generation(self, image: numpy.ndarray, output_folder: str) -> None:
+        """
+        Generate the parameter maps of a loaded measurement in the background.
+
+        Args:
+            image: The loaded measurement.
 
+            output_folder: Folder of the generated parameter maps.
+
+        Returns:
+            None
+        """
+        self.image = image
         if self.sidebar_checkbox_filtering.isChecked():
             filtering_algorithm = self.sidebar_filtering_algorithm.currentText()
         else:
             filtering_algorithm = "None"
 
-        # Move the main workload to another thread to prevent freezing the GUI
-        self.worker_thread = QThread()
-        self.worker = ParameterGeneratorWorker(self.filename, self.image, output_folder,
-                                               filtering_algorithm,
-                                               self.sidebar_filtering_parameter_1.value(),
-                                               self.sidebar_filtering_parameter_2.value(),
-                                               self.sidebar_checkbox_use_gpu.isChecked(),
-                                               self.sidebar_checkbox_detailed.isChecked(),
-                                               self.sidebar_checkbox_minimum.isChecked(),
-                                               self.sidebar_checkbox_maximum.isChecked(),
-                                               self.sidebar_checkbox_average.isChecked(),
-                                               self.sidebar_checkbox_crossing_direction.isChecked(),
-                                               self.sidebar_checkbox_non_crossing_direction.isChecked(),
-                                               self.sidebar_checkbox_peaks.isChecked(),
-                                               self.sidebar_checkbox_peak_width.isChecked(),
-                                               self.sidebar_checkbox_peak_distance.isChecked(),
-                                               self.sidebar_checkbox_peak_prominence.isChecked(),
-                                               self.sidebar_dir_correction_parameter.value())
-        # Update the progress bar whenever a step is finished
-        self.worker.currentStep.connect(self.progress_dialog.setLabelText)
-        self.worker.finishedWork.connect(self.worker_thread.quit)
-        self.worker.errorMessage.connect(self.show_error_message)
-        self.worker.moveToThread(self.worker_thread)
-        # Show the progress bar
-        self.progress_dialog.show()
-
-        self.worker_thread.started.connect(self.worker.process)
-        self.worker_thread.finished.connect(self.progress_dialog.close)
-        self.progress_dialog.canceled.connect(self.worker_thread.requestInterruption)
-        self.worker_thread.start()
+        dataset_directory = self.dataset_registry.directory if self.dataset_registry else None
+        arguments = (self.filename, self.image, output_folder,
+                     filtering_algorithm,
+                     self.sidebar_filtering_parameter_1.value(),
+                     self.sidebar_filtering_parameter_2.value(),
+                     self.sidebar_checkbox_use_gpu.isChecked(),
+                     self.sidebar_checkbox_detailed.isChecked(),
+                     self.sidebar_checkbox_minimum.isChecked(),
+                     self.sidebar_checkbox_maximum.isChecked(),
+                     self.sidebar_checkbox_average.isChecked(),
+                     self.sidebar_checkbox_crossing_direction.isChecked(),
+                     self.sidebar_checkbox_non_crossing_direction.isChecked(),
+                     self.sidebar_checkbox_peaks.isChecked(),
+                     self.sidebar_checkbox_peak_width.isChecked(),
+                     self.sidebar_checkbox_peak_distance.isChecked(),
+                     self.sidebar_checkbox_peak_prominence.isChecked(),
+                     self.sidebar_dir_correction_parameter.value(),
+                     dataset_directory)
+        keyword_arguments = {'max_workers': self.sidebar_parallel_maps.value(),
+                             'checkpoint': self.sidebar_checkbox_checkpoints.isChecked()}
+        run_parameters = ParameterGeneratorWorker.run_parameters_of(
+            filtering_algorithm, self.sidebar_filtering_parameter_1.value(),
+            self.sidebar_filtering_parameter_2.value(), self.sidebar_checkbox_detailed.isChecked(),
+            self.sidebar_dir_correction_parameter.value())
+        if keyword_arguments['checkpoint'] and ParameterGeneratorWorker.find_resumable_manifest(
+                ParameterGeneratorWorker.output_path_name_of(self.filename, output_folder), self.filename,
+                run_parameters) is not None:
+            reply = QMessageBox.question(self, "Resume generation",
+                                         "A cancelled generation of this measurement with the same settings was "
+                                         "found in the output folder. Do you want to resume it?\n"
+                                         "Otherwise, all parameter maps are generated again.",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            keyword_arguments['resume'] = reply == QMessageBox.Yes
+        # Move the main workload to another thread to prevent freezing the GUI.
+        # The worker and its filtered measurement are released when the generation finished.
+        if self.separate_process:
+            # A crash of the generation doesn't end the session and cancelling it stops it immediately
+            worker = ProcessWorker(ParameterGeneratorWorker, arguments, keyword_arguments, dataset_directory)
+        else:
+            worker = ParameterGeneratorWorker(*arguments, **keyword_arguments)
+        self.loading_service.load('generate', worker, 'Generating...', self.generation_finished)
+
+    def roi_changed(self, roi) -> None:
+        """
+        Called when a region of interest was selected or removed in the image widget.
+        The preview of the previous region is discarded.
+
+        Args:
+            roi: The region in pixels of the shown image or None.
+
+        Returns:
+            None
+        """
+        self.loading_service.cancel('roi_preview')
+        self.loading_service.cancel('filter_sweep')
+        self.roi_parameter_maps = {}
+        self.sidebar_roi_overlay.blockSignals(True)
+        self.sidebar_roi_overlay.clear()
+        self.sidebar_roi_overlay.blockSignals(False)
+        self.sidebar_roi_overlay.setEnabled(False)
+        self.sidebar_button_preview_roi.setEnabled(roi is not None and self.measurement_shape is not None)
+        self.sidebar_button_filter_sweep.setEnabled(self.sidebar_button_preview_roi.isEnabled())
+        if not self.sidebar_button_preview_roi.isEnabled():
+            self.sidebar_roi_info.setText("Drag a rectangle over the measurement.")
+        else:
+            top, left, bottom, right = self.measurement_roi()
+            self.sidebar_roi_info.setText(f"{right - left} × {bottom - top} pixels selected.")
+
+    def measurement_roi(self) -> (int, int, int, int):
+        """
+        Map the region of interest of the image widget to pixels of the measurement.
+        The shown image might be a downsampled preview of the measurement.
+
+        Returns:
+            The region (top, left, bottom, right) in pixels of the measurement.
+        """
+        roi = self.image_widget.roi
+        image_size = self.image_widget.image_size()
+        scale_y = self.measurement_shape[0] / image_size.height()
+        scale_x = self.measurement_shape[1] / image_size.width()
+        return (int(roi.top() * scale_y), int(roi.left() * scale_x),
+                min(int(numpy.ceil((roi.bottom() + 1) * scale_y)), self.measurement_shape[0]),
+                min(int(numpy.ceil((roi.right() + 1) * scale_x)), self.measurement_shape[1]))
+
+    def preview_roi(self) -> None:
+        """
+        Called when pressing a button. Generates the chosen parameter maps of the region of interest
+        with the current settings and shows them over the region.
+
+        Returns:
+            None
+        """
+        if self.image_widget.roi is None:
+            return
+        if self.image is None:
+            # Only the cached preview was shown so far
+            self.loading_service.load('measurement', ImageLoaderWorker(self.filename), 'Loading measurement...',
+                                      self.start_roi_preview)
+        else:
+            self.start_roi_preview(self.image)
+
+    def start_roi_preview(self, image: numpy.ndarray) -> None:
+        """
+        Generate the parameter maps of the region of interest of a loaded measurement in the background.
+
+        Args:
+            image: The loaded measurement.
+
+        Returns:
+            None
+        """
+        self.image = image
+        if self.sidebar_checkbox_filtering.isChecked():
+            filtering_algorithm = self.sidebar_filtering_algorithm.currentText()
+        else:
+            filtering_algorithm = "None"
+        worker = ParameterPreviewWorker(self.filename, self.image, self.measurement_roi(),
+                                        filtering_algorithm,
+                                        self.sidebar_filtering_parameter_1.value(),
+                                        self.sidebar_filtering_parameter_2.value(),
+                                        self.sidebar_checkbox_use_gpu.isChecked(),
+                                        self.sidebar_checkbox_minimum.isChecked(),
+                                        self.sidebar_checkbox_maximum.isChecked(),
+                                        self.sidebar_checkbox_average.isChecked(),
+                                        self.sidebar_checkbox_crossing_direction.isChecked(),
+                                        self.sidebar_checkbox_non_crossing_direction.isChecked(),
+                                        self.sidebar_checkbox_peaks.isChecked(),
+                                        self.sidebar_checkbox_peak_width.isChecked(),
+                                        self.sidebar_checkbox_peak_distance.isChecked(),
+                                        self.sidebar_checkbox_peak_prominence.isChecked(),
+                                        self.sidebar_dir_correction_parameter.value(),
+                                        max_workers=self.sidebar_parallel_maps.value())
+        self.loading_service.load('roi_preview', worker, 'Generating ROI preview...', self.roi_preview_finished)
+
+    def roi_preview_finished(self, result: ((int, int, int, int), dict, float)) -> None:
+        """
+        Offer the parameter maps generated for the region of interest as overlays.
+
+        Args:
+            result: The region, the generated parameter maps by their suffix and the duration in seconds.
+
+        Returns:
+            None
+        """
+        roi, self.roi_parameter_maps, duration = result
+        top, left, bottom, right = roi
+        self.sidebar_roi_info.setText(f"{right - left} × {bottom - top} pixels generated in {duration:.2f} s.")
+        previous_overlay = self.sidebar_roi_overlay.currentText()
+        self.sidebar_roi_overlay.blockSignals(True)
+        self.sidebar_roi_overlay.clear()
+        self.sidebar_roi_overlay.addItems(list(self.roi_parameter_maps))
+        if previous_overlay in self.roi_parameter_maps:
+            self.sidebar_roi_overlay.setCurrentText(previous_overlay)
+        self.sidebar_roi_overlay.blockSignals(False)
+        self.sidebar_roi_overlay.setEnabled(len(self.roi_parameter_maps) > 0)
+        self.show_roi_overlay()
+
+    def show_roi_overlay(self) -> None:
+        """
+        Show the chosen parameter map of the region of interest over the region.
+        Directions are shown with a cyclic color map.
+
+        Returns:
+            None
+        """
+        name = self.sidebar_roi_overlay.currentText()
+        if name not in self.roi_parameter_maps:
+            self.image_widget.set_roi_overlay(None)
+            return
+        parameter_map = self.roi_parameter_maps[name]
+        if parameter_map.ndim == 3:
+            parameter_map = parameter_map[:, :, 0]
+        if name.startswith('dir'):
+            engine = ColorMapEngine(parameter_map, value_range=(0, 180))
+            self.image_widget.set_roi_overlay(engine.to_qimage('hsv'))
+        else:
+            self.image_widget.set_roi_overlay(ColorMapEngine(parameter_map).to_qimage('viridis'))
+
+    def sweep_filters(self) -> None:
+        """
+        Called when pressing a button. Asks for a grid of filter settings and evaluates them
+        on the region of interest in parallel.
+
+        Returns:
+            None
+        """
+        if self.image_widget.roi is None:
+            return
+        dialog = FilterSweepDialog(self, self.sidebar_filtering_algorithm.currentText(), os.cpu_count() or 1)
+        if dialog.exec_() != FilterSweepDialog.Accepted:
+            dialog.deleteLater()
+            return
+        settings = dialog.settings()
+        output = dialog.output.currentText()
+        max_workers = dialog.max_workers.value()
+        dialog.deleteLater()
+
+        if self.image is None:
+            # Only the cached preview was shown so far
+            self.loading_service.load('measurement', ImageLoaderWorker(self.filename), 'Loading measurement...',
+                                      lambda image: self.start_filter_sweep(image, settings, output, max_workers))
+        else:
+            self.start_filter_sweep(self.image, settings, output, max_workers)
+
+    def start_filter_sweep(self, image: numpy.ndarray, settings: [(str, float, float)], output: str,
+                           max_workers: int) -> None:
+        """
+        Evaluate filter settings on the region of interest of a loaded measurement in the background.
+
+        Args:
+            image: The loaded measurement.
+
+            settings: The filter settings (filtering, parameter 1, parameter 2).
+
+            output: Name of the compared parameter map.
+
+            max_workers: Maximum number of settings evaluated at the same time.
+
+        Returns:
+            None
+        """
+        self.image = image
+        worker = FilterSweepWorker(self.image, self.measurement_roi(), settings, output,
+                                   self.sidebar_dir_correction_parameter.value(), max_workers)
+        self.loading_service.load('filter_sweep', worker, 'Evaluating filter settings...',
+                                  lambda results: self.show_filter_sweep(results, output), len(settings))
+
+    def show_filter_sweep(self, results: [dict], output: str) -> None:
+        """
+        Compare the results of a filter sweep. The chosen setting is applied to the filtering options.
+
+        Args:
+            results: The results of the evaluated filter settings.
+
+            output: Name of the compared parameter map.
+
+        Returns:
+            None
+        """
+        dialog = FilterSweepResultsDialog(self, results, output)
+        dialog.exec_()
+        chosen_setting = dialog.chosen_setting
+        dialog.deleteLater()
+        if chosen_setting is None:
+            return
+        filtering, parameter_1, parameter_2 = chosen_setting
+        self.sidebar_checkbox_filtering.setChecked(True)
+        self.sidebar_filtering_algorithm.setCurrentText(filtering)
+        for spin_box, value in ((self.sidebar_filtering_parameter_1, parameter_1),
+                                (self.sidebar_filtering_parameter_2, parameter_2)):
+            spin_box.setMaximum(max(spin_box.maximum(), value))
+            spin_box.setValue(value)
+
+    def generation_finished(self, result: (str, dict)) -> None:
+        """
+        Remember the output path name of the finished generation and offer
+        the generated parameter maps to the other tabs.
+
+        Args:
+            result: Output folder and file pattern of the generated parameter maps and the kept parameter maps.
+
+        Returns:
+            None
+        """
+        self.output_path_name, parameter_maps = result
+        if self.dataset_registry is not None:
+            self.dataset_registry.register(os.path.basename(self.output_path_name), parameter_maps)
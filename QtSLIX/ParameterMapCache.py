@@ -0,0 +1,126 @@
+import collections
+import glob
+import os
+
+import numpy
+
+import SLIX
+
+__all__ = ['ParameterMapCache']
+
+
+class ParameterMapCache:
+    """
+    Cache of the parameter maps read from folders, e.g. for the clustering.
+    Each file is only read again if its size or modification time changed. Only the requested
+    parameter maps are read. The least recently used maps are removed when the cache limit is reached.
+    """
+    # Parameter maps required for the classification
+    classification_parameters = ('high_prominence_peaks', 'low_prominence_peaks', 'peakdistance', 'max')
+    # File extensions of parameter maps
+    extensions = ('.tiff', '.tif', '.h5', '.nii', '.nii.gz')
+
+    def __init__(self, cache_limit: int = 2 ** 30):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_limit: Maximum number of bytes of the cached parameter maps.
+                         The most recently read parameter map is always kept.
+        """
+        self.cache_limit = cache_limit
+        # Loaded parameter maps by their filename. Each entry consists of the size and
+        # modification time of the file when it was read and the parameter map.
+        self.parameter_maps = collections.OrderedDict()
+
+    @classmethod
+    def find_files(cls, folder: str, parameters: [str]) -> (dict, str):
+        """
+        Find the files of parameter maps in a folder. A file belongs to a parameter if its name,
+        without the extension, ends with the name of the parameter like the files written by SLIX.
+
+        Args:
+            folder: The folder.
+
+            parameters: Names of the parameters, e.g. 'peakdistance'.
+
+        Returns:
+            The filenames by their parameter and the basename used for the names of the saved masks
+            (the name of the first file with the parameter replaced by 'basename').
+        """
+        filenames = {}
+        basename = None
+        for filename in sorted(glob.glob(os.path.join(glob.escape(folder), '*'))):
+            name = os.path.basename(filename)
+            if not name.endswith(cls.extensions):
+                continue
+            name = name[:-len('.nii.gz')] if name.endswith('.nii.gz') else os.path.splitext(name)[0]
+            for parameter in parameters:
+                if name.endswith(parameter) and parameter not in filenames:
+                    filenames[parameter] = filename
+                    if basename is None:
+                        basename = name[:-len(parameter)] + 'basename'
+        return filenames, basename
+
+    def get(self, filename: str) -> numpy.ndarray:
+        """
+        Get a parameter map. It is only read if it was not read before or the file changed since then.
+
+        Args:
+            filename: The file of the parameter map.
+
+        Returns:
+            The parameter map.
+        """
+        status = os.stat(filename)
+        key = (status.st_size, status.st_mtime_ns)
+        if filename in self.parameter_maps and self.parameter_maps[filename][0] == key:
+            self.parameter_maps.move_to_end(filename)
+            return self.parameter_maps[filename][1]
+
+        parameter_map = SLIX.io.imread(filename)
+        self.parameter_maps[filename] = (key, parameter_map)
+        self.parameter_maps.move_to_end(filename)
+        while len(self.parameter_maps) > 1 and self.memory_usage() > self.cache_limit:
+            self.parameter_maps.popitem(last=False)
+        return parameter_map
+
+    def load(self, folder: str, parameters: [str] = classification_parameters) -> (dict, str):
+        """
+        Get the parameter maps of a folder. Parameters without a file in the folder are missing in the result.
+
+        Args:
+            folder: The folder.
+
+            parameters: Names of the parameters which are loaded.
+
+        Returns:
+            The parameter maps by their parameter and the basename used for the names of the saved masks.
+        """
+        filenames, basename = self.find_files(folder, parameters)
+        parameter_maps = {}
+        for parameter, filename in filenames.items():
+            try:
+                parameter_maps[parameter] = self.get(filename)
+            except (ValueError, OSError):
+                # Unreadable files are treated like missing files
+                pass
+        return parameter_maps, basename
+
+    def memory_usage(self) -> int:
+        """
+        Get the memory held by the cached parameter maps.
+
+        Returns:
+            The memory in bytes.
+        """
+        return sum(parameter_map.nbytes for _, parameter_map in self.parameter_maps.values())
+
+    def clear(self) -> None:
+        """
+        Remove all cached parameter maps.
+
+        Returns:
+            None
+        """
+        self.parameter_maps.clear()
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy
+
+__all__ = ['PreviewCache']
+
+
+class PreviewCache:
+    """
+    Cache of quick-look previews of measurements stored in sidecar files.
+    When a measurement is opened for the first time, a small pyramid of downsampled slices of the quantized
+    measurement and the histogram of the whole measurement are written into a compressed file. Opening the
+    measurement again shows the preview from this file without reading the measurement.
+    The files are named by the path, size and modification time of the measurement, so changed measurements
+    are read again. The least recently used files are removed when the cache limit is reached.
+    """
+    # Default maximum number of bytes of all files in the cache
+    default_cache_limit = 512 * 2 ** 20
+    # Largest height or width of the finest level of the pyramid. Each further level is halved.
+    preview_size = 1024
+    pyramid_levels = 3
+    # Version of the file layout. Files of other versions are ignored.
+    file_version = 1
+
+    def __init__(self, directory: str = None, cache_limit: int = default_cache_limit):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Folder of the cached previews. Defaults to QtSLIX/previews in the cache folder of the user.
+
+            cache_limit: Maximum number of bytes of all files in the cache.
+                         The most recently written preview is always kept.
+        """
+        if not directory:
+            directory = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'),
+                                                                                   '.cache')),
+                                     'QtSLIX', 'previews')
+        self.directory = directory
+        self.cache_limit = cache_limit
+
+    @staticmethod
+    def source_identity(filename: str) -> str:
+        """
+        Get a key identifying the current content of a measurement file or folder.
+
+        Args:
+            filename: The measurement file or folder.
+
+        Returns:
+            A hexadecimal key which changes when the measurement is changed.
+        """
+        filename = os.path.abspath(filename)
+        if os.path.isdir(filename):
+            paths = sorted(os.path.join(filename, name) for name in os.listdir(filename))
+        else:
+            paths = [filename]
+        identity = [filename]
+        for path in paths:
+            status = os.stat(path)
+            identity.append((os.path.basename(path), status.st_size, status.st_mtime_ns))
+        return hashlib.sha1(json.dumps(identity).encode()).hexdigest()
+
+    def path(self, filename: str) -> str:
+        """
+        Get the path of the cached preview of a measurement.
+
+        Args:
+            filename: The measurement file or folder.
+
+        Returns:
+            The path of the sidecar file.
+        """
+        return os.path.join(self.directory, f'{self.source_identity(filename)}.npz')
+
+    def get(self, filename: str) -> dict:
+        """
+        Get the cached preview of a measurement.
+
+        Args:
+            filename: The measurement file or folder.
+
+        Returns:
+            None if the measurement is not cached. Otherwise, a dictionary containing the levels of the pyramid
+            (quantized images from fine to coarse), the histogram and the shape of the whole measurement.
+        """
+        try:
+            path = self.path(filename)
+            with numpy.load(path, allow_pickle=False) as data:
+                if int(data['version']) != self.file_version:
+                    return None
+                preview = {'levels': [data[f'level_{level}'] for level in range(int(data['number_of_levels']))],
+                           'histogram': data['histogram'],
+                           'shape': tuple(int(length) for length in data['shape'])}
+            # The modification time marks the least recently used previews
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return preview
+
+    def create_preview(self, index_image: numpy.ndarray, histogram: numpy.ndarray) -> dict:
+        """
+        Downsample a quantized measurement to a pyramid of previews.
+
+        Args:
+            index_image: The quantized measurement as returned by quantize_image.
+
+            histogram: The histogram of the quantized measurement.
+
+        Returns:
+            A dictionary containing the levels of the pyramid, the histogram and the shape of the measurement.
+        """
+        stride = max(1, -(-max(index_image.shape[:2]) // self.preview_size))
+        levels = []
+        for _ in range(self.pyramid_levels):
+            levels.append(numpy.ascontiguousarray(index_image[::stride, ::stride]))
+            if min(levels[-1].shape[:2]) <= 1:
+                break
+            stride *= 2
+        return {'levels': levels, 'histogram': histogram, 'shape': index_image.shape}
+
+    def put(self, filename: str, index_image: numpy.ndarray, histogram: numpy.ndarray) -> dict:
+        """
+        Write the preview of a measurement into the cache and remove the least recently used previews
+        if the cache limit is exceeded.
+
+        Args:
+            filename: The measurement file or folder.
+
+            index_image: The quantized measurement as returned by quantize_image.
+
+            histogram: The histogram of the quantized measurement.
+
+        Returns:
+            The preview as returned by get.
+        """
+        preview = self.create_preview(index_image, histogram)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(filename)
+            arrays = {f'level_{level}': level_image for level, level_image in enumerate(preview['levels'])}
+            # Write into a temporary file first, so other instances never read an incomplete file
+            file_descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            try:
+                with os.fdopen(file_descriptor, 'wb') as file:
+                    numpy.savez_compressed(file, version=self.file_version,
+                                           number_of_levels=len(preview['levels']),
+                                           histogram=preview['histogram'], shape=numpy.array(preview['shape']),
+                                           **arrays)
+                os.replace(temporary_path, path)
+            finally:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+            self.evict(keep=path)
+        except OSError:
+            # The preview is still returned if the cache folder can't be written
+            pass
+        return preview
+
+    @staticmethod
+    def choose_level(preview: dict, width: int, height: int) -> numpy.ndarray:
+        """
+        Choose the coarsest level of a preview which still covers the given size.
+
+        Args:
+            preview: The preview as returned by get.
+
+            width: Width of the widget showing the preview.
+
+            height: Height of the widget showing the preview.
+
+        Returns:
+            The quantized image of the chosen level.
+        """
+        for level_image in reversed(preview['levels']):
+            if level_image.shape[0] >= height and level_image.shape[1] >= width:
+                return level_image
+        return preview['levels'][0]
+
+    def files(self) -> [os.DirEntry]:
+        """
+        Get the cached previews.
+
+        Returns:
+            The sidecar files from the least to the most recently used.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.npz')]
+        except OSError:
+            return []
+        return sorted(entries, key=lambda entry: entry.stat().st_mtime_ns)
+
+    def memory_usage(self) -> int:
+        """
+        Get the size of all cached previews on the disk.
+
+        Returns:
+            The size in bytes.
+        """
+        return sum(entry.stat().st_size for entry in self.files())
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Remove the least recently used previews until the cache limit is reached.
+
+        Args:
+            keep: Path of a preview which is not removed.
+
+        Returns:
+            None
+        """
+        files = self.files()
+        size = sum(entry.stat().st_size for entry in files)
+        for entry in files:
+            if size <= self.cache_limit:
+                break
+            if keep is not None and os.path.abspath(entry.path) == os.path.abspath(keep):
+                continue
+            try:
+                file_size = entry.stat().st_size
+                os.remove(entry.path)
+                size -= file_size
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """
+        Remove all cached previews.
+
+        Returns:
+            None
+        """
+        for entry in self.files():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
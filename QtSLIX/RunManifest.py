@@ -0,0 +1,206 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy
+
+__all__ = ['RunManifest']
+
+
+class RunManifest:
+    """
+    Manifest of a parameter generation run, stored as a JSON file next to the generated parameter maps.
+    It records the measurement and the settings of the run, the parameter maps which were written completely
+    and the intermediate results (filtered measurement, peaks and centroids) saved as checkpoints.
+    A cancelled or killed run with the same measurement and settings can be resumed from this state.
+    """
+    # Version of the file layout. Manifests of other versions are ignored.
+    file_version = 1
+
+    def __init__(self, output_path_name: str):
+        """
+        Initialize the manifest. The file is only read by load.
+
+        Args:
+            output_path_name: Output folder and file pattern of the parameter maps, e.g. "output/measurement".
+        """
+        self.path = f'{output_path_name}_manifest.json'
+        self.checkpoint_directory = f'{output_path_name}_checkpoints'
+        self.data = {}
+        # Parameter maps are completed in several threads
+        self.lock = threading.Lock()
+
+    def load(self) -> bool:
+        """
+        Read the manifest file.
+
+        Returns:
+            True if a valid manifest was read.
+        """
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+            if data.get('version') != self.file_version:
+                return False
+        except (OSError, ValueError, AttributeError):
+            return False
+        self.data = data
+        return True
+
+    def save(self) -> None:
+        """
+        Write the manifest file. The file is replaced at once, so a killed run never leaves an incomplete manifest.
+
+        Returns:
+            None
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(file_descriptor, 'w') as file:
+                json.dump(self.data, file, indent=2)
+            os.replace(temporary_path, self.path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def matches(self, measurement: str, parameters: dict) -> bool:
+        """
+        Check if the manifest belongs to a run with the same measurement and settings.
+
+        Args:
+            measurement: Identity of the measurement as returned by PreviewCache.source_identity.
+
+            parameters: The settings which determine the values of the parameter maps.
+
+        Returns:
+            True if the run can be resumed.
+        """
+        return self.data.get('measurement') == measurement and self.data.get('parameters') == parameters
+
+    def is_finished(self) -> bool:
+        """
+        Check if the recorded run finished.
+
+        Returns:
+            True if the run finished.
+        """
+        return self.data.get('finished', False)
+
+    def start(self, measurement: str, parameters: dict) -> None:
+        """
+        Start recording a new run. The checkpoints of a previous run are removed.
+
+        Args:
+            measurement: Identity of the measurement as returned by PreviewCache.source_identity.
+
+            parameters: The settings which determine the values of the parameter maps.
+
+        Returns:
+            None
+        """
+        shutil.rmtree(self.checkpoint_directory, ignore_errors=True)
+        self.data = {'version': self.file_version, 'measurement': measurement, 'parameters': parameters,
+                     'completed_maps': [], 'map_types': {}, 'checkpoints': [], 'finished': False}
+        self.save()
+
+    def is_complete(self, name: str, filename: str) -> bool:
+        """
+        Check if a parameter map was written completely.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+            filename: The file of the parameter map. It must still exist.
+
+        Returns:
+            True if the parameter map doesn't have to be generated again.
+        """
+        return name in self.data.get('completed_maps', []) and os.path.isfile(filename)
+
+    def mark_complete(self, name: str, dtype: numpy.dtype = None) -> None:
+        """
+        Record a completely written parameter map.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+            dtype: Data type of the generated parameter map. The written file may use another data type.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if name not in self.data['completed_maps']:
+                self.data['completed_maps'].append(name)
+                if dtype is not None:
+                    self.data.setdefault('map_types', {})[name] = numpy.dtype(dtype).str
+                self.save()
+
+    def map_type(self, name: str) -> numpy.dtype:
+        """
+        Get the data type of a completed parameter map when it was generated.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+        Returns:
+            The data type or None if it wasn't recorded.
+        """
+        dtype = self.data.get('map_types', {}).get(name)
+        return None if dtype is None else numpy.dtype(dtype)
+
+    def save_checkpoint(self, name: str, array: numpy.ndarray) -> None:
+        """
+        Save an intermediate result of the run.
+
+        Args:
+            name: Name of the intermediate result, e.g. "peaks".
+
+            array: The intermediate result.
+
+        Returns:
+            None
+        """
+        os.makedirs(self.checkpoint_directory, exist_ok=True)
+        path = os.path.join(self.checkpoint_directory, f'{name}.npy')
+        with open(f'{path}.tmp', 'wb') as file:
+            numpy.save(file, array)
+        os.replace(f'{path}.tmp', path)
+        with self.lock:
+            if name not in self.data['checkpoints']:
+                self.data['checkpoints'].append(name)
+                self.save()
+
+    def load_checkpoint(self, name: str) -> numpy.ndarray:
+        """
+        Load an intermediate result of the run.
+
+        Args:
+            name: Name of the intermediate result, e.g. "peaks".
+
+        Returns:
+            The memory mapped intermediate result or None if it wasn't saved.
+        """
+        if name not in self.data.get('checkpoints', []):
+            return None
+        try:
+            # Copy-on-write, so the checkpoint itself is never changed
+            return numpy.load(os.path.join(self.checkpoint_directory, f'{name}.npy'), mmap_mode='c')
+        except (OSError, ValueError):
+            return None
+
+    def finish(self) -> None:
+        """
+        Mark the run as finished and remove its checkpoints.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.data['finished'] = True
+            self.data['checkpoints'] = []
+            self.save()
+        shutil.rmtree(self.checkpoint_directory, ignore_errors=True)
@@ -0,0 +1,337 @@
+import concurrent.futures
+import csv
+import glob
+import json
+import multiprocessing
+import os
+
+import numpy
+from PyQt5.QtCore import QThread, QObject, pyqtSignal
+
+import SLIX
+from ..ParameterMapCache import ParameterMapCache
+from .Classification import ClassificationEngine, open_parameter_maps
+
+__all__ = ['find_folders', 'section_output_folders', 'is_up_to_date', 'summary_row', 'classify_folder',
+           'classify_folders', 'write_summary', 'BatchClassificationWorker']
+
+
+def find_folders(patterns: [str]) -> [str]:
+    """
+    Find the folders containing all parameter maps required for the classification.
+
+    Args:
+        patterns: Folders or glob patterns of folders, e.g. 'series/*'.
+
+    Returns:
+        The sorted folders without duplicates.
+    """
+    folders = set()
+    for pattern in patterns:
+        for folder in glob.glob(pattern, recursive=True) or [pattern]:
+            if not os.path.isdir(folder):
+                continue
+            filenames, _ = ParameterMapCache.find_files(folder, ParameterMapCache.classification_parameters)
+            if len(filenames) == len(ParameterMapCache.classification_parameters):
+                folders.add(os.path.normpath(folder))
+    return sorted(folders)
+
+
+def section_output_folders(folders: [str], output_folder: str = None) -> dict:
+    """
+    Get the folders of the written masks of each section. In a common output folder, each section gets
+    its own subfolder with the path of the section relative to the sections' common parent folder,
+    so sections whose parameter maps have the same names don't overwrite each other's masks.
+
+    Args:
+        folders: Folders of the parameter maps.
+
+        output_folder: Common folder of the written masks. If None, the masks are written into
+                       the folder of each section.
+
+    Returns:
+        The folder of the written masks by the folder of each section.
+    """
+    if output_folder is None or len(folders) == 0:
+        return {folder: folder for folder in folders}
+    parent_folder = os.path.commonpath([os.path.dirname(os.path.abspath(folder)) for folder in folders])
+    return {folder: os.path.join(output_folder, os.path.relpath(os.path.abspath(folder), parent_folder))
+            for folder in folders}
+
+
+def is_up_to_date(input_filenames: [str], output_filenames: [str], thresholds_filename: str = None,
+                  thresholds: dict = None) -> bool:
+    """
+    Check if all output files exist and are newer than all input files.
+    If a thresholds file is given, the output files were also written with the same thresholds.
+
+    Args:
+        input_filenames: Paths of the input files.
+
+        output_filenames: Paths of the output files.
+
+        thresholds_filename: Optional path of the JSON file with the thresholds of the output files.
+
+        thresholds: All thresholds of the classification. Only used with a thresholds file.
+
+    Returns:
+        True if the output files don't have to be written again.
+    """
+    try:
+        oldest_output = min(os.stat(filename).st_mtime_ns for filename in output_filenames)
+    except (OSError, ValueError):
+        # A file is missing or there are no output files
+        return False
+    if thresholds_filename is not None:
+        try:
+            with open(thresholds_filename, 'r') as file:
+                if json.load(file).get('thresholds') != thresholds:
+                    return False
+        except (OSError, ValueError, AttributeError):
+            # The masks were written by an older version or the file is damaged
+            return False
+    return all(os.stat(filename).st_mtime_ns <= oldest_output for filename in input_filenames)
+
+
+def summary_row(folder: str, message: str = '') -> dict:
+    """
+    Create the summary row of a folder which could not be classified.
+
+    Args:
+        folder: The folder.
+
+        message: The error message.
+
+    Returns:
+        The summary row without class fractions.
+    """
+    row = {'folder': folder, 'status': 'failed', 'pixels': '', 'message': message}
+    row.update({name: '' for name in ClassificationEngine.full_mask_classes})
+    return row
+
+
+def classify_folder(folder: str, masks: [str], output_folder: str = None, thresholds: dict = None,
+                    tiled: bool = False, force: bool = False) -> dict:
+    """
+    Classify the parameter maps of one folder and write the chosen masks.
+    The folder is skipped if its masks are newer than its parameter maps and were written with the same
+    thresholds, which are stored next to the masks. This function runs in the processes of classify_folders.
+
+    Args:
+        folder: Folder of the parameter maps.
+
+        masks: Names of the written masks, e.g. 'full_mask'.
+
+        output_folder: Folder of the written masks. Defaults to the folder of the parameter maps.
+
+        thresholds: Thresholds which differ from the default thresholds of the classification.
+
+        tiled: Classify the parameter maps tile by tile instead of reading them completely.
+
+        force: Classify the folder even if its masks are up to date.
+
+    Returns:
+        A row of the summary containing the folder, the status ('classified', 'skipped' or 'failed'),
+        the number of pixels, the fraction of each class of the full mask and an error message.
+    """
+    row = summary_row(folder)
+    try:
+        input_filenames, basename = ParameterMapCache.find_files(folder, ParameterMapCache.classification_parameters)
+        if len(input_filenames) != len(ParameterMapCache.classification_parameters):
+            raise ValueError('The folder does not contain all parameter maps required for the classification.')
+        if output_folder is None:
+            output_folder = folder
+        os.makedirs(output_folder, exist_ok=True)
+        filenames = {name: os.path.join(output_folder, f'{basename.replace("basename", name)}.tiff')
+                     for name in masks}
+        thresholds_filename = os.path.join(output_folder, f'{basename.replace("basename", "thresholds")}.json')
+        used_thresholds = dict(ClassificationEngine.default_thresholds)
+        used_thresholds.update(thresholds or {})
+
+        class_counts = numpy.zeros(len(ClassificationEngine.full_mask_classes), dtype=numpy.int64)
+        if not force and is_up_to_date(input_filenames.values(), filenames.values(), thresholds_filename,
+                                       used_thresholds):
+            row['status'] = 'skipped'
+            if 'full_mask' not in filenames:
+                return row
+            class_counts += numpy.bincount(SLIX.io.imread(filenames['full_mask']).ravel(),
+                                           minlength=len(class_counts))
+        else:
+            sources = [input_filenames[parameter] for parameter in ParameterMapCache.classification_parameters]
+            if tiled:
+                with open_parameter_maps(sources) as parameter_maps:
+                    ClassificationEngine.evaluate_tiled(parameter_maps, filenames, thresholds,
+                                                        class_counts=class_counts)
+            else:
+                engine = ClassificationEngine(*[SLIX.io.imread(source) for source in sources], thresholds=thresholds)
+                full_mask = engine.evaluate(['full_mask'], filenames, max_workers=1)['full_mask']
+                class_counts += numpy.bincount(full_mask.ravel(), minlength=len(class_counts))
+            with open(thresholds_filename, 'w') as file:
+                json.dump({'thresholds': used_thresholds}, file, indent=2)
+            row['status'] = 'classified'
+
+        pixels = int(class_counts.sum())
+        row['pixels'] = pixels
+        for name, count in zip(ClassificationEngine.full_mask_classes, class_counts):
+            row[name] = count / max(pixels, 1)
+    except Exception as e:
+        # A failed folder must not stop the classification of the series
+        row['status'] = 'failed'
+        row['message'] = str(e) or type(e).__name__
+    return row
+
+
+def classify_folders(folders: [str], masks: [str], output_folder: str = None, thresholds: dict = None,
+                     tiled: bool = False, force: bool = False, max_workers: int = None, callback=None) -> [dict]:
+    """
+    Classify the parameter maps of many folders in a pool of processes.
+
+    Args:
+        folders: Folders of the parameter maps.
+
+        masks: Names of the written masks, e.g. 'full_mask'.
+
+        output_folder: Folder of the written masks. Each section is written into its own subfolder,
+                       see section_output_folders. Defaults to the folder of each section.
+
+        thresholds: Thresholds which differ from the default thresholds of the classification.
+
+        tiled: Classify the parameter maps tile by tile instead of reading them completely.
+
+        force: Classify all folders even if their masks are up to date.
+
+        max_workers: Maximum number of folders classified at the same time. Defaults to the number of CPUs.
+
+        callback: Optional function which gets called with the summary row of each finished folder.
+                  If it returns False, the folders which were not started yet are skipped.
+
+    Returns:
+        The summary rows of the finished folders in the order of the folders.
+    """
+    if len(folders) == 0:
+        return []
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(folders)))
+    rows = {}
+    output_folders = section_output_folders(folders, output_folder)
+    # Forking a process with running Qt threads is unsafe
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(classify_folder, folder, masks, output_folders[folder], thresholds, tiled,
+                                   force): folder for folder in folders}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                folder = futures[future]
+                try:
+                    rows[folder] = future.result()
+                except concurrent.futures.BrokenExecutor:
+                    # A process was terminated, e.g. because the memory ran out
+                    rows[folder] = summary_row(folder, 'The classification process was terminated.')
+                except Exception as e:
+                    # E.g. the arguments or the result could not be transferred
+                    rows[folder] = summary_row(folder, str(e) or type(e).__name__)
+                if callback is not None and callback(rows[folder]) is False:
+                    break
+        finally:
+            # Folders which are already classified are finished, the others are not started
+            for future in futures:
+                future.cancel()
+    return [rows[folder] for folder in folders if folder in rows]
+
+
+def write_summary(filename: str, rows: [dict]) -> None:
+    """
+    Write the summary of a batch classification into a CSV file.
+
+    Args:
+        filename: Path of the CSV file.
+
+        rows: The summary rows returned by classify_folders.
+
+    Returns:
+        None
+    """
+    columns = ['folder', 'status', 'pixels'] + list(ClassificationEngine.full_mask_classes) + ['message']
+    with open(filename, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class BatchClassificationWorker(QObject):
+    """
+    Worker class classifying the parameter maps of many folders.
+    This class gets called from the ClusterWidget when the user classifies a series of sections.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # Emits the path of the summary and the summary rows or None if the classification was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Signal to inform the connected widget how many folders were finished so far
+    progress = pyqtSignal(int)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, folders: [str], masks: [str], summary_filename: str, thresholds: dict = None,
+                 tiled: bool = False, max_workers: int = None):
+        """
+        Initialize the worker.
+
+        Args:
+            folders: Folders of the parameter maps.
+
+            masks: Names of the written masks, e.g. 'full_mask'.
+
+            summary_filename: Path of the written summary.
+
+            thresholds: Thresholds which differ from the default thresholds of the classification.
+
+            tiled: Classify the parameter maps tile by tile instead of reading them completely.
+
+            max_workers: Maximum number of folders classified at the same time.
+        """
+        super().__init__()
+        self.folders = folders
+        self.masks = masks
+        self.summary_filename = summary_filename
+        self.thresholds = thresholds
+        self.tiled = tiled
+        self.max_workers = max_workers
+        self.finished_folders = 0
+
+    def folder_finished(self, row: dict) -> bool:
+        """
+        Report a finished folder.
+
+        Args:
+            row: The summary row of the folder.
+
+        Returns:
+            False if the classification was interrupted.
+        """
+        self.finished_folders += 1
+        self.progress.emit(self.finished_folders)
+        self.currentStep.emit(f"Classified {self.finished_folders} of {len(self.folders)} sections "
+                              f"({os.path.basename(row['folder'])}: {row['status']})")
+        return not QThread.currentThread().isInterruptionRequested()
+
+    def process(self) -> None:
+        """
+        Classify the folders and write the summary.
+
+        Returns:
+            None
+        """
+        self.currentStep.emit("Starting classification...")
+        result = None
+        try:
+            rows = classify_folders(self.folders, self.masks, thresholds=self.thresholds, tiled=self.tiled,
+                                    max_workers=self.max_workers, callback=self.folder_finished)
+            if not QThread.currentThread().isInterruptionRequested():
+                write_summary(self.summary_filename, rows)
+                result = (self.summary_filename, rows)
+        except (ValueError, OSError, concurrent.futures.BrokenExecutor) as e:
+            self.errorMessage.emit(f'Could not classify the sections.\nError message:\n{e}')
+        self.finishedWork.emit(result)
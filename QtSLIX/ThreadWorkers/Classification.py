@@ -0,0 +1,931 @@
+import concurrent.futures
+import contextlib
+import os
+import queue
+import threading
+
+import nibabel
+import h5py
+import numpy
+import tifffile
+from PyQt5.QtCore import QThread, QObject, pyqtSignal
+
+import SLIX
+from .Loader import read_errors
+
+__all__ = ['NiftiParameterMap', 'HDF5ParameterMap', 'open_parameter_map', 'open_parameter_maps', 'ThresholdIndex',
+           'TileWriter', 'ClassificationEngine', 'ClassificationWorker', 'TiledClassificationWorker']
+
+
+class NiftiParameterMap:
+    """
+    2D parameter map of a NIfTI file which is read lazily. Only the selected part of the file is read
+    when the map is sliced. The axes are swapped like in SLIX.io.imread.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Open the file.
+
+        Args:
+            filename: Path of the NIfTI file.
+        """
+        self.proxy = nibabel.load(filename).dataobj
+        if len(self.proxy.shape) < 2 or any(size != 1 for size in self.proxy.shape[2:]):
+            raise ValueError(f'{filename} is not a 2D parameter map')
+        self.shape = (self.proxy.shape[1], self.proxy.shape[0])
+        self.dtype = numpy.dtype(numpy.float64)
+
+    def __getitem__(self, key: tuple) -> numpy.ndarray:
+        rows, columns = key
+        data = self.proxy[(columns, rows) + (0,) * (len(self.proxy.shape) - 2)]
+        return numpy.asarray(data, dtype=numpy.float64).T
+
+
+class HDF5ParameterMap:
+    """
+    2D parameter map of a HDF5 dataset which is read lazily. Only the selected part of the dataset is read
+    when the map is sliced. The file stays open until the map is closed or released.
+    """
+
+    def __init__(self, filename: str, dataset: str = '/Image'):
+        """
+        Open the file.
+
+        Args:
+            filename: Path of the HDF5 file.
+
+            dataset: The dataset of the parameter map.
+        """
+        self.file = h5py.File(filename, 'r')
+        try:
+            self.dataset = self.file[dataset]
+        except KeyError:
+            self.file.close()
+            raise
+        self.shape = self.dataset.shape
+        self.dtype = self.dataset.dtype
+
+    def __getitem__(self, key: tuple) -> numpy.ndarray:
+        return self.dataset[key]
+
+    def __del__(self):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the file.
+
+        Returns:
+            None
+        """
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def open_parameter_map(source, dataset: str = '/Image'):
+    """
+    Open a 2D parameter map without reading it completely. Uncompressed TIFF files are memory mapped,
+    compressed TIFF files are decoded into a temporary memory mapped file. HDF5 datasets and
+    NIfTI files are read when the returned map is sliced.
+
+    Args:
+        source: Path of the parameter map or an array, which is returned as it is.
+
+        dataset: Dataset of HDF5 files.
+
+    Returns:
+        An array-like object with a shape which supports slicing with two slices.
+    """
+    if not isinstance(source, str):
+        return source
+    if source.endswith('.nii') or source.endswith('.nii.gz'):
+        return NiftiParameterMap(source)
+    if source.endswith('.h5'):
+        parameter_map = HDF5ParameterMap(source, dataset)
+    elif source.endswith('.tiff') or source.endswith('.tif'):
+        try:
+            parameter_map = tifffile.memmap(source, mode='r')
+        except ValueError:
+            # Compressed or fragmented image data can't be mapped directly
+            parameter_map = tifffile.imread(source, out='memmap')
+        parameter_map = numpy.squeeze(parameter_map)
+    else:
+        raise ValueError(f'{source} has an unsupported file format')
+    if len(parameter_map.shape) != 2:
+        if isinstance(parameter_map, HDF5ParameterMap):
+            parameter_map.close()
+        raise ValueError(f'{source} is not a 2D parameter map')
+    return parameter_map
+
+
+@contextlib.contextmanager
+def open_parameter_maps(sources: list):
+    """
+    Open several parameter maps with open_parameter_map. The opened HDF5 files are closed when
+    the context is left, even if opening one of the maps failed.
+
+    Args:
+        sources: Paths of the parameter maps or arrays.
+
+    Returns:
+        Context manager with the list of the opened parameter maps.
+    """
+    parameter_maps = []
+    try:
+        for source in sources:
+            parameter_maps.append(open_parameter_map(source))
+        yield parameter_maps
+    finally:
+        for parameter_map in parameter_maps:
+            if isinstance(parameter_map, HDF5ParameterMap):
+                parameter_map.close()
+
+
+class ThresholdIndex:
+    """
+    Pixels of a parameter map sorted by their value. The pixels whose value lies between
+    an old and a new threshold are found by a binary search instead of comparing the whole map again.
+    """
+
+    def __init__(self, parameter_map: numpy.ndarray, candidates: numpy.ndarray):
+        """
+        Sort the pixels of a parameter map.
+
+        Args:
+            parameter_map: The parameter map.
+
+            candidates: Boolean mask of the pixels which depend on the threshold. Only these pixels are sorted.
+        """
+        indices = numpy.flatnonzero(candidates)
+        if parameter_map.size < 2 ** 31:
+            indices = indices.astype(numpy.int32)
+        # Memory mapped parameter maps are converted, so the sorted values are not treated as memory mapped
+        values = numpy.take(numpy.asarray(parameter_map), indices)
+        # Maps of counts (e.g. the number of peaks) are integers, which are sorted by a radix sort
+        order = numpy.argsort(values, kind='stable')
+        self.indices = indices[order]
+        self.values = values[order]
+
+    def between(self, old_threshold: float, new_threshold: float) -> numpy.ndarray:
+        """
+        Get the pixels whose value lies between two thresholds, including both thresholds.
+
+        Args:
+            old_threshold: One threshold.
+
+            new_threshold: The other threshold.
+
+        Returns:
+            The indices of the pixels in the flattened parameter map.
+        """
+        if numpy.isnan(old_threshold) or numpy.isnan(new_threshold):
+            return self.indices
+        lower, upper = sorted((old_threshold, new_threshold))
+        start = numpy.searchsorted(self.values, lower, side='left')
+        stop = numpy.searchsorted(self.values, upper, side='right')
+        return self.indices[start:stop]
+
+
+class ClassificationEngine:
+    """
+    Classification of the parameter maps of one measurement following SLIX.classification.
+    Each mask is computed at most once and reused for the masks depending on it, e.g. the
+    full mask is combined from the cached flat, crossing and inclined masks.
+    Independent masks are computed concurrently.
+
+    The thresholds of the classification can be changed afterwards. Only the pixels whose
+    parameters lie between the old and the new threshold are classified again.
+    """
+    # Masks which have to be computed before each mask
+    dependencies = {
+        'flat_mask': (),
+        'crossing_mask': (),
+        'inclined_mask': ('flat_mask',),
+        'full_mask': ('flat_mask', 'crossing_mask', 'inclined_mask'),
+    }
+    # Thresholds of SLIX.classification. The signal thresholds are relative to the mean maximum signal
+    # of the whole image (crossing) or of the flat fibers (inclined). SLIX.classification.crossing_mask
+    # doesn't use its signal condition, so it is disabled by default.
+    default_thresholds = {
+        'flat_min_peakdistance': 145,
+        'flat_max_peakdistance': 215,
+        'flat_max_low_prominence_peaks': 1,
+        'crossing_min_signal': 0,
+        'inclined_min_signal': 1,
+        'inclined_min_peakdistance': 120,
+        'inclined_max_peakdistance': 150,
+    }
+    # Names of the classes of the full mask by their value
+    full_mask_classes = ('unclassified', 'flat', 'crossing_2', 'crossing_3', 'lightly_inclined', 'inclined', 'steep')
+    # zlib level of the written TIFF masks. The masks compress well even with the fastest level.
+    compression_level = 1
+
+    def __init__(self, high_prominence_peaks: numpy.ndarray, low_prominence_peaks: numpy.ndarray,
+                 peakdistance: numpy.ndarray, max_image: numpy.ndarray, thresholds: dict = None):
+        """
+        Initialize the engine.
+
+        Args:
+            high_prominence_peaks: Number of peaks with a high prominence.
+
+            low_prominence_peaks: Number of peaks with a low prominence.
+
+            peakdistance: Mean distance between the prominent peaks.
+
+            max_image: Maximum signal of the measurement.
+
+            thresholds: Thresholds which differ from the default thresholds.
+        """
+        self.high_prominence_peaks = high_prominence_peaks
+        self.low_prominence_peaks = low_prominence_peaks
+        self.peakdistance = peakdistance
+        self.max_image = max_image
+        self.thresholds = dict(self.default_thresholds)
+        if thresholds is not None:
+            self.thresholds.update(thresholds)
+        # Computed masks by their name
+        self.masks = {}
+        # Each mask is computed by one thread while the other threads wait for it
+        self.locks = {name: threading.Lock() for name in self.dependencies}
+        # Mean maximum signal of the image
+        self.mean_signal = None
+        # Sum and number of the maximum signals of the flat fibers
+        self.flat_signal = None
+        # Sorted pixels of the peak distance, low prominence peaks and maximum signal
+        self.threshold_index = None
+        self.threshold_index_lock = threading.Lock()
+
+    def copy(self) -> 'ClassificationEngine':
+        """
+        Create an engine with the same parameter maps and thresholds and copies of the computed masks.
+        Changing the thresholds of one engine doesn't change the masks of the other one.
+
+        Returns:
+            The copied engine.
+        """
+        engine = ClassificationEngine(self.high_prominence_peaks, self.low_prominence_peaks,
+                                      self.peakdistance, self.max_image, self.thresholds)
+        engine.masks = {name: mask.copy() for name, mask in self.masks.items()}
+        engine.mean_signal = self.mean_signal
+        engine.flat_signal = self.flat_signal
+        engine.threshold_index = self.threshold_index
+        return engine
+
+    def mask(self, name: str) -> numpy.ndarray:
+        """
+        Get a mask. It is computed if it was not computed before.
+
+        Args:
+            name: Name of the mask, one of 'flat_mask', 'crossing_mask', 'inclined_mask' or 'full_mask'.
+
+        Returns:
+            The mask.
+        """
+        with self.locks[name]:
+            if name not in self.masks:
+                self.masks[name] = getattr(self, f'compute_{name}')()
+            return self.masks[name]
+
+    @classmethod
+    def required_masks(cls, names: [str]) -> [str]:
+        """
+        Get the masks and all masks they depend on.
+
+        Args:
+            names: Names of the masks.
+
+        Returns:
+            The names of the masks and their dependencies.
+        """
+        required = []
+        for name in names:
+            for dependency in cls.required_masks(cls.dependencies[name]) + [name]:
+                if dependency not in required:
+                    required.append(dependency)
+        return required
+
+    @staticmethod
+    def select(image: numpy.ndarray, indices: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Get the selected pixels of an image.
+
+        Args:
+            image: The image.
+
+            indices: Indices of the pixels in the flattened image. If None, the whole image is returned.
+
+        Returns:
+            The selected pixels or the image.
+        """
+        if indices is None:
+            return image
+        return numpy.take(numpy.asarray(image), indices)
+
+    def compute_flat_mask(self, indices: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the mask of the flat fibers like SLIX.classification.flat_mask.
+
+        Args:
+            indices: Only classify these pixels of the flattened parameter maps.
+
+        Returns:
+            The mask.
+        """
+        high_prominence_peaks = self.select(self.high_prominence_peaks, indices)
+        peakdistance = self.select(self.peakdistance, indices)
+        return (high_prominence_peaks == 2) & \
+            (self.select(self.low_prominence_peaks, indices) <= self.thresholds['flat_max_low_prominence_peaks']) & \
+            (peakdistance > self.thresholds['flat_min_peakdistance']) & \
+            (peakdistance < self.thresholds['flat_max_peakdistance'])
+
+    def crossing_signal_threshold(self, thresholds: dict) -> float:
+        """
+        Get the minimum maximum signal of the crossing fibers.
+
+        Args:
+            thresholds: The thresholds of the classification.
+
+        Returns:
+            The threshold or -inf if the signal isn't used.
+        """
+        if thresholds['crossing_min_signal'] <= 0:
+            return -numpy.inf
+        if self.mean_signal is None:
+            self.mean_signal = float(numpy.mean(self.max_image, dtype=numpy.float64))
+        return thresholds['crossing_min_signal'] * self.mean_signal
+
+    def compute_crossing_mask(self, indices: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the mask of the crossing fibers like SLIX.classification.crossing_mask.
+
+        Args:
+            indices: Only classify these pixels of the flattened parameter maps.
+
+        Returns:
+            The mask.
+        """
+        high_prominence_peaks = self.select(self.high_prominence_peaks, indices)
+        crossing = numpy.zeros(high_prominence_peaks.shape, dtype=numpy.uint8)
+        signal = self.select(self.max_image, indices) >= self.crossing_signal_threshold(self.thresholds)
+        crossing[(high_prominence_peaks == 4) & signal] = 1
+        crossing[(high_prominence_peaks == 6) & signal] = 2
+        return crossing
+
+    def inclined_signal_threshold(self, thresholds: dict) -> float:
+        """
+        Get the minimum maximum signal of the inclined fibers.
+
+        Args:
+            thresholds: The thresholds of the classification.
+
+        Returns:
+            The threshold or NaN if there are no flat fibers.
+        """
+        if self.flat_signal is None:
+            flat_mask = self.mask('flat_mask')
+            self.flat_signal = (float(numpy.sum(self.max_image[flat_mask], dtype=numpy.float64)),
+                                int(numpy.count_nonzero(flat_mask)))
+        signal_sum, count = self.flat_signal
+        if count == 0:
+            return numpy.nan
+        return thresholds['inclined_min_signal'] * signal_sum / count
+
+    def compute_inclined_mask(self, indices: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Compute the mask of the inclined fibers from the flat mask like SLIX.classification.inclinated_mask.
+
+        Args:
+            indices: Only classify these pixels of the flattened parameter maps.
+
+        Returns:
+            The mask.
+        """
+        high_prominence_peaks = self.select(self.high_prominence_peaks, indices)
+        peakdistance = self.select(self.peakdistance, indices)
+        signal_threshold = self.inclined_signal_threshold(self.thresholds)
+        inclined = numpy.zeros(high_prominence_peaks.shape, dtype=numpy.uint8)
+        two_peaks = (high_prominence_peaks == 2) & (self.select(self.max_image, indices) > signal_threshold)
+
+        inclined[self.select(self.mask('flat_mask'), indices)] = 1
+        inclined[two_peaks & (peakdistance > self.thresholds['inclined_min_peakdistance']) &
+                 (peakdistance < self.thresholds['inclined_max_peakdistance'])] = 2
+        inclined[two_peaks & (peakdistance < self.thresholds['inclined_min_peakdistance'])] = 3
+        inclined[high_prominence_peaks == 1] = 4
+        return inclined
+
+    def compute_full_mask(self, indices: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Combine the flat, crossing and inclined masks like SLIX.classification.full_mask.
+
+        Args:
+            indices: Only combine these pixels of the flattened masks.
+
+        Returns:
+            The mask.
+        """
+        crossing = self.select(self.mask('crossing_mask'), indices)
+        inclined = self.select(self.mask('inclined_mask'), indices)
+        full_mask = self.select(self.mask('flat_mask'), indices).astype(numpy.uint8)
+        full_mask[crossing == 1] = 2
+        full_mask[crossing == 2] = 3
+        full_mask[inclined == 2] = 4
+        full_mask[inclined == 3] = 5
+        full_mask[inclined == 4] = 6
+        return full_mask
+
+    def threshold_indices(self) -> dict:
+        """
+        Get the pixels of the peak distance, the number of low prominence peaks and the maximum signal
+        sorted by their value. Only pixels whose classification depends on the thresholds are sorted.
+        The pixels are sorted once when this method is called for the first time.
+
+        Returns:
+            The ThresholdIndex of each parameter map by its name.
+        """
+        with self.threshold_index_lock:
+            if self.threshold_index is None:
+                two_peaks = self.high_prominence_peaks == 2
+                self.threshold_index = {
+                    'peakdistance': ThresholdIndex(self.peakdistance, two_peaks),
+                    'low_prominence_peaks': ThresholdIndex(self.low_prominence_peaks, two_peaks),
+                    'max': ThresholdIndex(self.max_image, two_peaks | (self.high_prominence_peaks == 4) |
+                                          (self.high_prominence_peaks == 6)),
+                }
+            return self.threshold_index
+
+    def set_thresholds(self, **thresholds) -> numpy.ndarray:
+        """
+        Change thresholds of the classification and update the computed masks.
+        Only the pixels whose parameters lie between the old and the new thresholds are classified again.
+
+        Args:
+            **thresholds: The changed thresholds by their name, e.g. flat_min_peakdistance=140.
+
+        Returns:
+            The indices of the pixels in the flattened masks which were classified again.
+        """
+        for name in thresholds:
+            if name not in self.default_thresholds:
+                raise ValueError(f'Unknown threshold {name}')
+        old_thresholds = self.thresholds
+        new_thresholds = dict(old_thresholds)
+        new_thresholds.update(thresholds)
+        if len(self.masks) == 0:
+            # The masks are computed with the new thresholds when they are needed
+            self.thresholds = new_thresholds
+            return numpy.empty(0, dtype=numpy.intp)
+
+        index = self.threshold_indices()
+        changed_pixels = []
+        for name, parameter in (('flat_min_peakdistance', 'peakdistance'),
+                                ('flat_max_peakdistance', 'peakdistance'),
+                                ('inclined_min_peakdistance', 'peakdistance'),
+                                ('inclined_max_peakdistance', 'peakdistance'),
+                                ('flat_max_low_prominence_peaks', 'low_prominence_peaks')):
+            if old_thresholds[name] != new_thresholds[name]:
+                changed_pixels.append(index[parameter].between(old_thresholds[name], new_thresholds[name]))
+        old_crossing_signal = self.crossing_signal_threshold(old_thresholds)
+        new_crossing_signal = self.crossing_signal_threshold(new_thresholds)
+        if old_crossing_signal != new_crossing_signal:
+            changed_pixels.append(index['max'].between(old_crossing_signal, new_crossing_signal))
+        old_inclined_signal = None
+        if 'inclined_mask' in self.masks:
+            old_inclined_signal = self.inclined_signal_threshold(old_thresholds)
+        self.thresholds = new_thresholds
+
+        pixels = self.unique_pixels(changed_pixels)
+        if 'flat_mask' in self.masks:
+            flat_mask = self.masks['flat_mask']
+            old_flat = numpy.take(flat_mask, pixels)
+            new_flat = self.compute_flat_mask(pixels)
+            numpy.put(flat_mask, pixels, new_flat)
+            if self.flat_signal is not None:
+                # The mean signal of the flat fibers changes with the flat fibers
+                signal = numpy.take(self.max_image, pixels).astype(numpy.float64)
+                self.flat_signal = (self.flat_signal[0] + numpy.sum(signal[new_flat]) - numpy.sum(signal[old_flat]),
+                                    self.flat_signal[1] + int(numpy.count_nonzero(new_flat)) -
+                                    int(numpy.count_nonzero(old_flat)))
+        if old_inclined_signal is not None:
+            new_inclined_signal = self.inclined_signal_threshold(new_thresholds)
+            if not (old_inclined_signal == new_inclined_signal or
+                    numpy.isnan(old_inclined_signal) and numpy.isnan(new_inclined_signal)):
+                pixels = self.unique_pixels([pixels, index['max'].between(old_inclined_signal,
+                                                                          new_inclined_signal)])
+
+        for name in ('crossing_mask', 'inclined_mask', 'full_mask'):
+            if name in self.masks:
+                numpy.put(self.masks[name], pixels, getattr(self, f'compute_{name}')(pixels))
+        return pixels
+
+    @staticmethod
+    def unique_pixels(pixels: [numpy.ndarray]) -> numpy.ndarray:
+        """
+        Combine lists of pixels and remove duplicates.
+
+        Args:
+            pixels: Arrays of indices.
+
+        Returns:
+            The combined indices.
+        """
+        pixels = [array for array in pixels if len(array) > 0]
+        if len(pixels) == 0:
+            return numpy.empty(0, dtype=numpy.intp)
+        if len(pixels) == 1:
+            return pixels[0]
+        return numpy.unique(numpy.concatenate(pixels))
+
+    @classmethod
+    def write(cls, filename: str, mask: numpy.ndarray) -> None:
+        """
+        Write a mask. TIFF files are written with a fast compression, all other formats through SLIX.io.imwrite.
+
+        Args:
+            filename: Path of the written file.
+
+            mask: The mask.
+
+        Returns:
+            None
+        """
+        if filename.endswith('.tiff') or filename.endswith('.tif'):
+            if mask.dtype == bool:
+                mask = mask.view(numpy.uint8)
+            tifffile.imwrite(filename, mask, compression='zlib', compressionargs={'level': cls.compression_level})
+        else:
+            SLIX.io.imwrite(filename, mask)
+
+    def evaluate(self, names: [str], filenames: dict = None, callback=None, max_workers: int = None) -> dict:
+        """
+        Compute masks and their dependencies concurrently and optionally write them to files.
+        Each mask is written as soon as it is computed while the other masks are still computed.
+
+        Args:
+            names: Names of the masks.
+
+            filenames: Optional filenames by the names of the masks which will be written.
+
+            callback: Optional function which gets called with the name of each finished mask.
+                      If it returns False, the remaining masks are not started.
+
+            max_workers: Maximum number of masks computed at the same time.
+                         Defaults to the number of required masks.
+
+        Returns:
+            The masks by their name.
+        """
+        if filenames is None:
+            filenames = {}
+        required = self.required_masks(list(names) + list(filenames))
+        if len(required) == 0:
+            return {}
+
+        def compute_and_write(name):
+            mask = self.mask(name)
+            if name in filenames:
+                self.write(filenames[name], mask)
+            return name
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(required)) as executor:
+            futures = [executor.submit(compute_and_write, name) for name in required]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    name = future.result()
+                    if callback is not None and callback(name) is False:
+                        break
+            finally:
+                # Don't start the remaining masks if the evaluation failed or was interrupted
+                for future in futures:
+                    future.cancel()
+        return {name: self.masks[name] for name in names if name in self.masks}
+
+    @classmethod
+    def evaluate_tiled(cls, parameter_maps: list, filenames: dict, thresholds: dict = None, tile_size: int = 256,
+                       callback=None, class_counts: numpy.ndarray = None) -> bool:
+        """
+        Classify parameter maps tile by tile and stream the masks into tiled TIFF files.
+        Only a few tiles of the parameter maps and masks are kept in memory, independent of the size of the maps.
+        The mean signals used by the classification are collected in a first pass over the tiles, so the
+        written masks are the same as the masks of the whole parameter maps.
+
+        Args:
+            parameter_maps: The high prominence peaks, low prominence peaks, peak distance and maximum signal,
+                            e.g. memory mapped arrays or maps returned by open_parameter_map.
+
+            filenames: Filenames of the TIFF files by the names of the written masks.
+
+            thresholds: Thresholds which differ from the default thresholds.
+
+            tile_size: Height and width of the classified and written tiles. Has to be a multiple of 16.
+
+            callback: Optional function which gets called with the progress in percent after each tile.
+                      If it returns False, the classification is cancelled and the files are removed.
+
+            class_counts: Optional array with an entry for each class of the full mask
+                          to which the number of pixels of each class is added.
+
+        Returns:
+            True if the classification finished, False if it was cancelled.
+        """
+        shape = parameter_maps[0].shape
+        if any(parameter_map.shape != shape for parameter_map in parameter_maps):
+            raise ValueError('The parameter maps have different shapes')
+        tiles = [(slice(row, row + tile_size), slice(column, column + tile_size))
+                 for row in range(0, shape[0], tile_size) for column in range(0, shape[1], tile_size)]
+        steps = 2 * len(tiles)
+        step = 0
+
+        def read(tile):
+            return [numpy.asarray(parameter_map[tile]) for parameter_map in parameter_maps]
+
+        def report_progress():
+            return callback is None or callback(int(100 * step / steps)) is not False
+
+        # The mean signal of the whole image and of all flat fibers
+        signal_sum = 0.0
+        flat_signal_sum = 0.0
+        flat_count = 0
+        for tile in tiles:
+            engine = cls(*read(tile), thresholds=thresholds)
+            flat_mask = engine.mask('flat_mask')
+            signal_sum += float(numpy.sum(engine.max_image, dtype=numpy.float64))
+            flat_signal_sum += float(numpy.sum(engine.max_image[flat_mask], dtype=numpy.float64))
+            flat_count += int(numpy.count_nonzero(flat_mask))
+            step += 1
+            if not report_progress():
+                return False
+
+        writers = {}
+        finished = False
+        try:
+            for name, filename in filenames.items():
+                writers[name] = TileWriter(filename, shape, tile_size, cls.compression_level)
+            for tile in tiles:
+                engine = cls(*read(tile), thresholds=thresholds)
+                engine.mean_signal = signal_sum / (shape[0] * shape[1])
+                engine.flat_signal = (flat_signal_sum, flat_count)
+                for name, writer in writers.items():
+                    writer.write(engine.mask(name))
+                if class_counts is not None:
+                    class_counts += numpy.bincount(engine.mask('full_mask').ravel(),
+                                                   minlength=len(cls.full_mask_classes))
+                step += 1
+                if not report_progress():
+                    return False
+            finished = True
+        finally:
+            # Incomplete files are removed if the classification failed or was cancelled
+            errors = []
+            for writer in writers.values():
+                try:
+                    writer.close(cancel=not finished)
+                except (OSError, ValueError) as e:
+                    errors.append(e)
+            if len(errors) > 0:
+                raise errors[0]
+        return True
+
+
+class TileWriter:
+    """
+    Writes a 2D uint8 image tile by tile into a tiled TIFF file. The tiles are compressed and
+    written in a background thread while the next tiles are computed.
+    """
+    # Number of tiles waiting to be written
+    queue_size = 8
+
+    def __init__(self, filename: str, shape: tuple, tile_size: int, compression_level: int = 1):
+        """
+        Create the file and start the writing thread.
+
+        Args:
+            filename: Path of the TIFF file.
+
+            shape: Height and width of the image.
+
+            tile_size: Height and width of the tiles. Has to be a multiple of 16.
+
+            compression_level: zlib level of the tiles.
+        """
+        self.filename = filename
+        self.shape = shape
+        self.tile_size = tile_size
+        self.compression_level = compression_level
+        self.queue = queue.Queue(self.queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """
+        Write the tiles of the queue until all tiles were written or the writing was cancelled.
+
+        Returns:
+            None
+        """
+        def tiles():
+            while True:
+                tile = self.queue.get()
+                if tile is None:
+                    return
+                if tile is InterruptedError:
+                    raise InterruptedError
+                yield tile
+
+        try:
+            # Files larger than 4 GiB need BigTIFF
+            with tifffile.TiffWriter(self.filename,
+                                     bigtiff=self.shape[0] * self.shape[1] > 2 ** 32 - 2 ** 25) as tiff:
+                tiff.write(tiles(), shape=self.shape, dtype=numpy.uint8, tile=(self.tile_size, self.tile_size),
+                           compression='zlib', compressionargs={'level': self.compression_level})
+        except InterruptedError:
+            os.remove(self.filename)
+        except (OSError, ValueError) as e:
+            self.error = e
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+
+    def put(self, item) -> None:
+        """
+        Add an item to the queue unless the writing thread stopped.
+
+        Args:
+            item: A tile, None after the last tile or InterruptedError to cancel the writing.
+
+        Returns:
+            None
+        """
+        while self.thread.is_alive():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        if self.error is not None:
+            raise self.error
+        # The writer stops iterating after the last tile and the file is removed after cancelling
+        if item is not None and item is not InterruptedError:
+            raise OSError(f'Could not write {self.filename}')
+
+    def write(self, tile: numpy.ndarray) -> None:
+        """
+        Write the next tile. Tiles at the right and bottom border may be smaller than the tile size.
+
+        Args:
+            tile: The tile.
+
+        Returns:
+            None
+        """
+        padded_tile = numpy.zeros((self.tile_size, self.tile_size), dtype=numpy.uint8)
+        padded_tile[:tile.shape[0], :tile.shape[1]] = tile
+        self.put(padded_tile)
+
+    def close(self, cancel: bool = False) -> None:
+        """
+        Wait until all tiles were written.
+
+        Args:
+            cancel: Remove the file instead of finishing it.
+
+        Returns:
+            None
+        """
+        try:
+            self.put(InterruptedError if cancel else None)
+        except (OSError, ValueError):
+            # The error of the writing thread is raised below
+            pass
+        self.thread.join()
+        if self.error is not None and not cancel:
+            raise self.error
+
+
+class ClassificationWorker(QObject):
+    """
+    Worker class computing and saving classification masks.
+    This class gets called from the ClusterWidget when the user saves the masks.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # Emits the written filenames or None if the saving failed or was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Signal to inform the connected widget how many masks were finished so far
+    progress = pyqtSignal(int)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, engine: ClassificationEngine, filenames: dict):
+        """
+        Initialize the worker.
+
+        Args:
+            engine: The classification engine of the parameter maps.
+
+            filenames: Filenames by the names of the masks which will be written.
+        """
+        super().__init__()
+        self.engine = engine
+        self.filenames = filenames
+        self.finished_masks = 0
+
+    def mask_finished(self, name: str) -> bool:
+        """
+        Report a finished mask.
+
+        Args:
+            name: Name of the finished mask.
+
+        Returns:
+            False if the saving was interrupted.
+        """
+        self.finished_masks += 1
+        self.progress.emit(self.finished_masks)
+        if name in self.filenames:
+            self.currentStep.emit(f"Saved {os.path.basename(self.filenames[name])}")
+        return not QThread.currentThread().isInterruptionRequested()
+
+    def process(self) -> None:
+        """
+        Compute the masks and write them concurrently.
+
+        Returns:
+            None
+        """
+        self.currentStep.emit("Generating masks...")
+        try:
+            self.engine.evaluate([], self.filenames, self.mask_finished)
+            result = list(self.filenames.values())
+        except (ValueError, OSError) as e:
+            result = None
+            self.errorMessage.emit(f'Could not save the masks.\nError message:\n{e}')
+        if QThread.currentThread().isInterruptionRequested():
+            result = None
+        self.finishedWork.emit(result)
+
+
+class TiledClassificationWorker(QObject):
+    """
+    Worker class classifying parameter maps tile by tile and streaming the masks into files.
+    This class gets called from the ClusterWidget when the user saves the masks in the low memory mode.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # Emits the written filenames or None if the saving failed or was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Signal to inform the connected widget about the progress in percent
+    progress = pyqtSignal(int)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, sources: list, filenames: dict, thresholds: dict = None):
+        """
+        Initialize the worker.
+
+        Args:
+            sources: Paths or arrays of the high prominence peaks, low prominence peaks,
+                     peak distance and maximum signal.
+
+            filenames: Filenames of the TIFF files by the names of the written masks.
+
+            thresholds: Thresholds which differ from the default thresholds.
+        """
+        super().__init__()
+        self.sources = sources
+        self.filenames = filenames
+        self.thresholds = thresholds
+
+    def report_progress(self, progress: int) -> bool:
+        """
+        Report the progress of the classification.
+
+        Args:
+            progress: Progress in percent.
+
+        Returns:
+            False if the saving was interrupted.
+        """
+        self.progress.emit(progress)
+        return not QThread.currentThread().isInterruptionRequested()
+
+    def process(self) -> None:
+        """
+        Open the parameter maps and classify them tile by tile.
+
+        Returns:
+            None
+        """
+        result = None
+        try:
+            self.currentStep.emit("Opening parameter maps...")
+            with open_parameter_maps(self.sources) as parameter_maps:
+                self.currentStep.emit("Classifying tiles...")
+                if ClassificationEngine.evaluate_tiled(parameter_maps, self.filenames, self.thresholds,
+                                                       callback=self.report_progress):
+                    result = list(self.filenames.values())
+        except read_errors as e:
+            self.errorMessage.emit(f'Could not save the masks.\nError message:\n{e}')
+        self.finishedWork.emit(result)
@@ -0,0 +1,208 @@
+import concurrent.futures
+import itertools
+import time
+
+import numpy
+from PyQt5.QtCore import QThread, QObject, pyqtSignal
+
+import SLIX
+from .ParameterGenerator import parallel_kernel_workers, filter_measurement
+
+__all__ = ['sweep_outputs', 'sweep_settings', 'evaluate_setting', 'sweep', 'FilterSweepWorker']
+
+# Parameter maps which can be compared between the settings of a sweep
+sweep_outputs = ('high_prominence_peaks', 'peakdistance', 'peakwidth', 'peakprominence', 'dir_1')
+
+
+def sweep_settings(filtering: str, parameters_1: [float], parameters_2: [float]) -> [(str, float, float)]:
+    """
+    Create the grid of filter settings of a sweep.
+
+    Args:
+        filtering: Filtering method, "Fourier" or "Savitzky-Golay".
+
+        parameters_1: Values of the first parameter of the filtering method.
+
+        parameters_2: Values of the second parameter of the filtering method.
+
+    Returns:
+        The filter settings (filtering, parameter 1, parameter 2) of all combinations of the values.
+    """
+    return [(filtering, parameter_1, parameter_2)
+            for parameter_1, parameter_2 in itertools.product(parameters_1, parameters_2)]
+
+
+def evaluate_setting(image: numpy.ndarray, filtering: str, parameter_1: float, parameter_2: float,
+                     output: str, dir_correction: float = 0) -> dict:
+    """
+    Filter a measurement with one setting of a sweep and generate the statistics of its peaks.
+    This function runs in the threads of sweep.
+
+    Args:
+        image: The measurement, usually a small region of interest.
+
+        filtering: Filtering method, "Fourier", "Savitzky-Golay" or "None".
+
+        parameter_1: First parameter of the filtering method.
+
+        parameter_2: Second parameter of the filtering method.
+
+        output: Name of the generated parameter map, one of sweep_outputs.
+
+        dir_correction: Direction correction in degree.
+
+    Returns:
+        A dictionary with the setting, the duration in seconds, the mean number of significant peaks,
+        the fraction of pixels with two significant peaks and the generated parameter map.
+    """
+    start_time = time.perf_counter()
+    image = filter_measurement(image, filtering, parameter_1, parameter_2)
+    peaks = SLIX.toolbox.significant_peaks(image, use_gpu=False, return_numpy=True)
+    number_of_peaks = numpy.sum(peaks, axis=-1, dtype=numpy.uint16)
+
+    if output == 'high_prominence_peaks':
+        parameter_map = number_of_peaks
+    elif output == 'peakwidth':
+        parameter_map = SLIX.toolbox.mean_peak_width(image, peaks, use_gpu=False)
+    elif output == 'peakprominence':
+        parameter_map = SLIX.toolbox.mean_peak_prominence(image, peaks, use_gpu=False, return_numpy=True)
+    elif output in ('peakdistance', 'dir_1'):
+        centroids = SLIX.toolbox.centroid_correction(image, peaks, use_gpu=False, return_numpy=True)
+        if output == 'peakdistance':
+            parameter_map = SLIX.toolbox.mean_peak_distance(peaks, centroids, use_gpu=False, return_numpy=True)
+        else:
+            parameter_map = SLIX.toolbox.direction(peaks, centroids, use_gpu=False, number_of_directions=3,
+                                                   correction_angle=dir_correction, return_numpy=True)[:, :, 0]
+    else:
+        raise ValueError(f'Unknown parameter map {output}')
+
+    return {'filtering': filtering, 'parameter_1': parameter_1, 'parameter_2': parameter_2,
+            'seconds': time.perf_counter() - start_time,
+            'mean_peaks': float(numpy.mean(number_of_peaks)),
+            'two_peak_fraction': float(numpy.mean(number_of_peaks == 2)),
+            'parameter_map': numpy.asarray(parameter_map)}
+
+
+def sweep(image: numpy.ndarray, settings: [(str, float, float)], output: str, dir_correction: float = 0,
+          max_workers: int = None, callback=None) -> [dict]:
+    """
+    Evaluate many filter settings on the same measurement in a pool of threads.
+    NumPy, SciPy and the parallel Numba functions of SLIX release the GIL, so the settings run concurrently
+    without copying the measurement.
+
+    Args:
+        image: The measurement, usually a small region of interest.
+
+        settings: The filter settings (filtering, parameter 1, parameter 2), e.g. from sweep_settings.
+
+        output: Name of the generated parameter map, one of sweep_outputs.
+
+        dir_correction: Direction correction in degree.
+
+        max_workers: Maximum number of settings evaluated at the same time. Defaults to the number of CPUs.
+
+        callback: Optional function which gets called with the result of each finished setting.
+                  If it returns False, the settings which were not started yet are skipped.
+
+    Returns:
+        The results of evaluate_setting of the finished settings in the order of the settings.
+    """
+    if len(settings) == 0:
+        return []
+    max_workers = min(parallel_kernel_workers(max_workers), len(settings))
+
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(evaluate_setting, image, *setting, output, dir_correction): index
+                   for index, setting in enumerate(settings)}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if callback is not None and callback(results[index]) is False:
+                    break
+        finally:
+            # Settings which are already running are finished, the others are not started
+            for future in futures:
+                future.cancel()
+    return [results[index] for index in sorted(results)]
+
+
+class FilterSweepWorker(QObject):
+    """
+    Worker class evaluating a grid of filter settings on a region of interest.
+    This class gets called from the ParameterGeneratorWidget when the user starts a filter sweep.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # Emits the results of the settings or None if the sweep was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Signal to inform the connected widget how many settings were finished so far
+    progress = pyqtSignal(int)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, image: numpy.ndarray, roi: (int, int, int, int), settings: [(str, float, float)],
+                 output: str, dir_correction: float = 0, max_workers: int = None):
+        """
+        Initialize the worker.
+
+        Args:
+            image: The measurement.
+
+            roi: Region of interest (top, left, bottom, right) in pixels of the measurement.
+
+            settings: The filter settings (filtering, parameter 1, parameter 2).
+
+            output: Name of the compared parameter map, one of sweep_outputs.
+
+            dir_correction: Direction correction in degree.
+
+            max_workers: Maximum number of settings evaluated at the same time.
+        """
+        super().__init__()
+        top, left, bottom, right = roi
+        # All settings share the same crop of the measurement
+        self.image = numpy.ascontiguousarray(image[top:bottom, left:right])
+        self.settings = settings
+        self.output = output
+        self.dir_correction = dir_correction
+        self.max_workers = max_workers
+        self.finished_settings = 0
+
+    def setting_finished(self, result: dict) -> bool:
+        """
+        Report a finished setting.
+
+        Args:
+            result: The result of the setting.
+
+        Returns:
+            False if the sweep was interrupted.
+        """
+        self.finished_settings += 1
+        self.progress.emit(self.finished_settings)
+        self.currentStep.emit(f"Evaluated {self.finished_settings} of {len(self.settings)} filter settings")
+        return not QThread.currentThread().isInterruptionRequested()
+
+    def process(self) -> None:
+        """
+        Evaluate the filter settings.
+
+        Returns:
+            None
+        """
+        self.currentStep.emit("Starting filter sweep...")
+        results = None
+        try:
+            results = sweep(self.image, self.settings, self.output, self.dir_correction, self.max_workers,
+                            self.setting_finished)
+            if QThread.currentThread().isInterruptionRequested():
+                results = None
+        except (ValueError, TypeError) as e:
+            self.errorMessage.emit(f'Could not evaluate the filter settings.\nError message:\n{e}')
+            results = None
+        # Release the crop of the measurement
+        self.image = None
+        self.finishedWork.emit(results)
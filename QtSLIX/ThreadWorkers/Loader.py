@@ -0,0 +1,416 @@
+import concurrent.futures
+import os
+import time
+
+import numpy
+from nibabel.filebasedimages import ImageFileError
+from PyQt5.QtCore import QThread, QObject, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QProgressDialog, QMessageBox
+
+import SLIX
+
+__all__ = ['read_errors', 'ImageLoaderWorker', 'StackLoaderWorker', 'PreparationWorker', 'LoadingService']
+
+# Errors raised by SLIX.io.imread for missing, unreadable or invalid TIFF, HDF5, NIfTI and other image files
+read_errors = (ValueError, OSError, KeyError, ImageFileError)
+
+
+class ImageLoaderWorker(QObject):
+    """
+    Worker class loading a single image or measurement folder.
+    An optional preparation step (e.g. a normalization) is executed in the same thread after loading.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # The loaded image is None if the loading failed or was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, filename: str, prepare=None):
+        """
+        Initialize the worker.
+
+        Args:
+            filename: File or folder which will be loaded.
+
+            prepare: Optional function which gets called with the loaded image. Its return value
+                     will be published instead of the loaded image.
+        """
+        super().__init__()
+        self.filename = filename
+        self.prepare = prepare
+
+    def process(self) -> None:
+        """
+        Load the image and prepare it.
+
+        Returns:
+            None
+        """
+        image = None
+        try:
+            self.currentStep.emit(f"Loading {os.path.basename(self.filename)}...")
+            image = SLIX.io.imread(self.filename)
+            if image is None:
+                raise ValueError("Couldn't read any image.")
+            if self.prepare is not None and not QThread.currentThread().isInterruptionRequested():
+                self.currentStep.emit(f"Preparing {os.path.basename(self.filename)}...")
+                image = self.prepare(image)
+        except read_errors as e:
+            image = None
+            self.errorMessage.emit(f'Could not load {self.filename}. Check your input files.\n'
+                                   f'Error message:\n{e}')
+        if QThread.currentThread().isInterruptionRequested():
+            image = None
+        self.finishedWork.emit(image)
+
+
+class StackLoaderWorker(QObject):
+    """
+    Worker class loading multiple images into one NumPy stack.
+    This class gets called from the VisualizationWidget when the user opens multiple direction or inclination files.
+    The files are read concurrently and written directly into a preallocated array of the shape (H, W, k).
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # The loaded stack is None if the loading failed or was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Signal to inform the connected widget how many files were loaded so far
+    progress = pyqtSignal(int)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, filenames: [str], max_workers: int = None):
+        """
+        Initialize the worker.
+
+        Args:
+            filenames: Filenames of the images which will be stacked. The images are sorted by their name.
+
+            max_workers: Maximum number of files read at the same time. Defaults to the number of files,
+                         but at most the number of CPUs.
+        """
+        super().__init__()
+        self.filenames = sorted(filenames)
+        self.max_workers = max_workers if max_workers else min(len(self.filenames), os.cpu_count() or 1)
+
+    def process(self) -> None:
+        """
+        Load the images. The shape and data type of the stack are determined by the first image.
+
+        Returns:
+            None
+        """
+        stack = None
+        try:
+            self.currentStep.emit(f"Loading {os.path.basename(self.filenames[0])}...")
+            first_image = SLIX.io.imread(self.filenames[0])
+            self.progress.emit(1)
+            if len(self.filenames) == 1:
+                stack = first_image
+            else:
+                stack = self.load_remaining_images(first_image)
+        except read_errors as e:
+            stack = None
+            self.errorMessage.emit(f'Could not load the selected files. Check your input files.\n'
+                                   f'Error message:\n{e}')
+        self.finishedWork.emit(stack)
+
+    def load_remaining_images(self, first_image: numpy.ndarray) -> numpy.ndarray:
+        """
+        Read all but the first image concurrently and fill the preallocated stack.
+
+        Args:
+            first_image: The already loaded first image.
+
+        Returns:
+            The stack of all images or None if the loading was interrupted.
+        """
+        stack = numpy.empty(first_image.shape + (len(self.filenames),), dtype=first_image.dtype)
+        stack[..., 0] = first_image
+        del first_image
+
+        self.currentStep.emit(f"Loading {len(self.filenames)} files...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(SLIX.io.imread, filename): index
+                       for index, filename in enumerate(self.filenames[1:], start=1)}
+            try:
+                for number_of_loaded_files, future in enumerate(concurrent.futures.as_completed(futures), start=2):
+                    if QThread.currentThread().isInterruptionRequested():
+                        return None
+                    index = futures[future]
+                    image = future.result()
+                    if image.shape != stack.shape[:-1]:
+                        raise ValueError(f'{self.filenames[index]} has the shape {image.shape}, '
+                                         f'expected {stack.shape[:-1]}.')
+                    stack[..., index] = image
+                    self.progress.emit(number_of_loaded_files)
+            finally:
+                # Don't start reading the remaining files if the loading failed or was interrupted
+                for future in futures:
+                    future.cancel()
+        return stack
+
+
+class PreparationWorker(QObject):
+    """
+    Worker class preparing an image which is already in memory, e.g. a parameter map of the dataset registry.
+    It is used in place of an ImageLoaderWorker when no file has to be read.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # The prepared image is None if the preparation failed or was interrupted.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, image: numpy.ndarray, prepare):
+        """
+        Initialize the worker.
+
+        Args:
+            image: The image which will be prepared.
+
+            prepare: Function which gets called with the image. Its return value will be published.
+        """
+        super().__init__()
+        self.image = image
+        self.prepare = prepare
+
+    def process(self) -> None:
+        """
+        Prepare the image.
+
+        Returns:
+            None
+        """
+        result = None
+        try:
+            self.currentStep.emit("Preparing...")
+            result = self.prepare(self.image)
+        except (ValueError, OSError) as e:
+            result = None
+            self.errorMessage.emit(f'Could not prepare the image.\nError message:\n{e}')
+        if QThread.currentThread().isInterruptionRequested():
+            result = None
+        self.finishedWork.emit(result)
+
+
+class LoadingService:
+    """
+    Runs loading and rendering workers in background threads and publishes their results to a widget.
+    A cancellable progress dialog is shown for each running job. Starting a job with the name
+    of a running job cancels the running one.
+    """
+    # Milliseconds to wait for the threads of all jobs when the service shuts down
+    shutdown_timeout = 5000
+    # Jobs whose threads could not be stopped during a shutdown. Destroying a running QThread aborts
+    # the application, so they are kept until the application exits.
+    abandoned_jobs = []
+
+    def __init__(self, parent: QWidget):
+        """
+        Initialize the service.
+
+        Args:
+            parent: Widget used as parent of the progress dialogs and error messages.
+        """
+        self.parent = parent
+        # Running jobs. Each job consists of the worker, its thread and its progress dialog.
+        self.jobs = {}
+        # Cancelled jobs whose threads did not finish yet
+        self.cancelled_jobs = []
+
+    def load(self, name: str, worker: QObject, label: str, slot, maximum: int = 0, preview_slot=None) -> None:
+        """
+        Start a loading job.
+
+        Args:
+            name: Name of the job, e.g. the attribute which will be set by the slot.
+
+            worker: The worker. It needs the signals finishedWork, currentStep and errorMessage
+                    and the method process. If it has a progress signal, the progress is shown.
+
+            label: The text shown in the progress dialog. If None, no progress dialog is shown.
+
+            slot: Method which gets called with the loaded data. It is not called if the loading failed
+                  or the job was cancelled.
+
+            maximum: Maximum value of the progress. If 0, a busy indicator is shown.
+
+            preview_slot: Optional method which gets called with each preview emitted by the
+                          previewReady signal of the worker while the job is running.
+
+        Returns:
+            None
+        """
+        self.cancel(name)
+
+        progress_dialog = None
+        if label is not None:
+            progress_dialog = QProgressDialog(label, "Cancel", 0, maximum, self.parent)
+            # The progress may restart for each step of the worker
+            progress_dialog.setAutoReset(False)
+            progress_dialog.setAutoClose(False)
+        thread = QThread()
+        if progress_dialog is not None:
+            worker.currentStep.connect(progress_dialog.setLabelText)
+            if hasattr(worker, 'progress'):
+                worker.progress.connect(progress_dialog.setValue)
+        if preview_slot is not None:
+            worker.previewReady.connect(lambda data: self.publish(name, worker, preview_slot, data))
+        worker.finishedWork.connect(thread.quit)
+        worker.finishedWork.connect(lambda data: self.publish(name, worker, slot, data))
+        worker.errorMessage.connect(self.show_error_message)
+        worker.moveToThread(thread)
+        self.jobs[name] = (worker, thread, progress_dialog)
+
+        thread.started.connect(worker.process)
+        thread.finished.connect(lambda: self.release(name, thread))
+        if progress_dialog is not None:
+            progress_dialog.canceled.connect(lambda: self.cancel(name))
+            progress_dialog.show()
+        thread.start()
+
+    def publish(self, name: str, worker: QObject, slot, data) -> None:
+        """
+        Call the slot with the loaded data if the loading was successful
+        and the job was not cancelled in the meantime.
+
+        Args:
+            name: Name of the job.
+
+            worker: The worker which emitted the data.
+
+            slot: Method which gets called with the loaded data.
+
+            data: The loaded data.
+
+        Returns:
+            None
+        """
+        # Signals which were already queued when the job was cancelled are still delivered
+        if data is not None and name in self.jobs and self.jobs[name][0] is worker:
+            slot(data)
+
+    def show_error_message(self, message: str) -> None:
+        """
+        Shows an error message.
+
+        Returns:
+            None
+        """
+        QMessageBox.warning(self.parent, "Error", message)
+
+    def is_loading(self, name: str) -> bool:
+        """
+        Check if a job is running.
+
+        Args:
+            name: Name of the job.
+
+        Returns:
+            True if the job is running.
+        """
+        return name in self.jobs
+
+    def cancel(self, name: str) -> None:
+        """
+        Cancel a running job. Its result will not be published.
+
+        Args:
+            name: Name of the job.
+
+        Returns:
+            None
+        """
+        if name not in self.jobs:
+            return
+        worker, thread, progress_dialog = self.jobs.pop(name)
+        worker.errorMessage.disconnect()
+        if progress_dialog is not None:
+            progress_dialog.canceled.disconnect()
+            progress_dialog.close()
+            # The dialogs are children of the parent widget and would accumulate otherwise
+            progress_dialog.deleteLater()
+        thread.requestInterruption()
+        # Keep the thread alive until the current read returned
+        self.cancelled_jobs.append((worker, thread))
+
+    def release(self, name: str, thread: QThread) -> None:
+        """
+        Release a job after its thread finished.
+
+        Args:
+            name: Name of the job.
+
+            thread: The finished thread.
+
+        Returns:
+            None
+        """
+        thread.wait()
+        worker = None
+        if name in self.jobs and self.jobs[name][1] is thread:
+            worker, _, progress_dialog = self.jobs.pop(name)
+            if progress_dialog is not None:
+                progress_dialog.close()
+                progress_dialog.deleteLater()
+        for job in self.cancelled_jobs:
+            if job[1] is thread:
+                worker = job[0]
+        self.cancelled_jobs = [job for job in self.cancelled_jobs if job[1] is not thread]
+        if worker is not None:
+            self.release_worker(worker, thread)
+
+    @staticmethod
+    def release_worker(worker: QObject, thread: QThread) -> None:
+        """
+        Disconnect a finished worker and its thread. The connected lambdas reference the worker
+        and the thread, which would otherwise keep the worker and the arrays it holds alive.
+
+        Args:
+            worker: The finished worker.
+
+            thread: The finished thread of the worker.
+
+        Returns:
+            None
+        """
+        for signal in (worker.finishedWork, worker.currentStep, getattr(worker, 'progress', None),
+                       getattr(worker, 'previewReady', None), thread.started, thread.finished):
+            if signal is None:
+                continue
+            try:
+                signal.disconnect()
+            except TypeError:
+                # Nothing was connected to the signal
+                pass
+
+    def shutdown(self) -> None:
+        """
+        Cancel all jobs and wait until their threads finished. Threads which don't react to the cancellation
+        within the shutdown timeout, e.g. because they are blocked in a long SLIX call, are terminated.
+        If a thread can't be terminated either, it is abandoned, so closing a widget never blocks.
+
+        Returns:
+            None
+        """
+        jobs = [(worker, thread) for worker, thread, _ in self.jobs.values()] + self.cancelled_jobs
+        for _, thread in jobs:
+            thread.requestInterruption()
+            # The queued quit of a finished worker might not have been delivered yet
+            thread.quit()
+        deadline = time.monotonic() + self.shutdown_timeout / 1000
+        for worker, thread in jobs:
+            if thread.wait(max(0, int((deadline - time.monotonic()) * 1000))):
+                continue
+            thread.terminate()
+            if not thread.wait(self.shutdown_timeout):
+                LoadingService.abandoned_jobs.append((worker, thread))
+        self.jobs = {}
+        self.cancelled_jobs = []
@@ -1,12 +1,81 @@
+import concurrent.futures
+import numba
 import numpy
 import os
+import time
 from PyQt5.QtCore import QThread, QObject, pyqtSignal
 
 import SLIX
+from ..DatasetRegistry import to_memmap
+from ..MemoryUsage import available_memory, MemoryBudget
+from ..PreviewCache import PreviewCache
+from ..RunManifest import RunManifest
 if SLIX.toolbox.gpu_available:
     import cupy
+    # Errors of the GPU which are reported instead of ending the generation
+    gpu_errors = (cupy.cuda.memory.OutOfMemoryError,)
+else:
+    gpu_errors = ()
 
-__all__ = ['ParameterGeneratorWorker']
+__all__ = ['gpu_errors', 'fourier_chunk_size', 'parallel_kernel_workers', 'filter_measurement',
+           'ParameterGeneratorWorker', 'ParameterPreviewWorker']
+
+# Maximum number of bytes of the Fourier spectrum of the line profiles filtered at once
+fourier_chunk_size = 2 ** 28
+
+
+def parallel_kernel_workers(max_workers: int = None) -> int:
+    """
+    Get the number of threads which may run the parallel Numba functions of SLIX at the same time.
+
+    Args:
+        max_workers: The requested number of threads. Defaults to the number of CPUs.
+
+    Returns:
+        The number of threads. The workqueue threading layer of Numba can't run parallel functions
+        from several threads at once, so it is 1 with this layer.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if numba.threading_layer() == 'workqueue':
+        return 1
+    return max(1, max_workers)
+
+
+def filter_measurement(image: numpy.ndarray, filtering: str, parameter_1: float, parameter_2: float) -> numpy.ndarray:
+    """
+    Filter a measurement. Used by the parameter generation, its previews and the filter sweep.
+    The Fourier filter of SLIX is applied to blocks of rows instead of starting a process pool
+    for each line profile. The result is the same, but the filter also works in threads and for the
+    small regions of the previews and sweeps.
+
+    Args:
+        image: The measurement.
+
+        filtering: Filtering method, "Fourier", "Savitzky-Golay" or "None".
+
+        parameter_1: Cutoff frequency of the Fourier filter or window length of the Savitzky-Golay filter.
+
+        parameter_2: Smoothing of the Fourier filter or polynomial order of the Savitzky-Golay filter.
+
+    Returns:
+        The filtered measurement or the measurement itself if it is not filtered.
+    """
+    if filtering == "Fourier":
+        frequencies = numpy.fft.fftfreq(image.shape[-1])
+        frequencies = frequencies / frequencies.max()
+        multiplier = 1 - (0.5 + 0.5 * numpy.tanh((numpy.abs(frequencies) - parameter_1) / parameter_2))
+        filtered_image = numpy.empty(image.shape, dtype=image.dtype)
+        # The complex spectrum of a row is 16 bytes per value
+        rows = max(1, fourier_chunk_size // max(1, 16 * image[0].size))
+        for start in range(0, image.shape[0], rows):
+            # Filtered with double precision like in SLIX
+            spectrum = numpy.fft.fft(image[start:start + rows].astype(numpy.float64), axis=-1) * multiplier
+            filtered_image[start:start + rows] = numpy.real(numpy.fft.ifft(spectrum, axis=-1))
+        return filtered_image
+    if filtering == "Savitzky-Golay":
+        return SLIX.preparation.savitzky_golay_smoothing(image, int(parameter_1), int(parameter_2))
+    return image
 
 
 class ParameterGeneratorWorker(QObject):
@@ -14,20 +83,29 @@ class ParameterGeneratorWorker(QObject):
     Worker class for the parameter generator.
     This class gets called from the ParameterGeneratorWidget when the user clicks the "Generate" button.
     """
-    # Signal to inform the ParameterGeneratorWidget that the worker has finished
-    finishedWork = pyqtSignal()
+    # Signal to inform the ParameterGeneratorWidget that the worker has finished.
+    # Emits the output path name and the kept parameter maps or None if the generation was interrupted.
+    finishedWork = pyqtSignal(object)
     # Signal to inform the ParameterGeneratorWidget what step the worker is currently working on
     currentStep = pyqtSignal(str)
     # Error message
     errorMessage = pyqtSignal(str)
 
+    # Parameter maps which can be skipped when a run is resumed, named like the attributes enabling them
+    stages = ('min', 'max', 'avg', 'peaks', 'direction', 'nc_direction', 'peak_distance', 'peak_width',
+              'peak_prominence')
+    # File extension of the parameter maps
+    output_data_type = ".tiff"
+
     def __init__(self, filename: str, image: numpy.array,
                  output_folder: str, filtering: str,
                  filtering_parm_1: float, filtering_parm_2: float,
                  use_gpu: bool, detailed: bool, min: bool, max: bool,
                  avg: bool, direction: bool, nc_direction: bool,
                  peaks: bool, peak_width: bool, peak_distance: bool,
-                 peak_prominence: bool, dir_correction: float):
+                 peak_prominence: bool, dir_correction: float, dataset_directory: str = None,
+                 max_workers: int = None, memory_fraction: float = 0.8, checkpoint: bool = False,
+                 resume: bool = False):
         """
         Initialize the worker.
 
@@ -67,6 +145,21 @@ class ParameterGeneratorWorker(QObject):
             peak_prominence: Generate peak prominence image
 
             dir_correction: Direction correction in degree
+
+            dataset_directory: If given, the generated parameter maps are kept as memory mapped
+                               files in this folder and emitted when the worker has finished
+
+            max_workers: Number of parameter maps generated at the same time after the peaks were found.
+                         Defaults to the number of CPUs.
+
+            memory_fraction: Fraction of the available memory the parameter maps generated at the same time
+                             may use. Further maps wait until enough memory is released.
+
+            checkpoint: If True, the written parameter maps and the intermediate results are recorded in a
+                        run manifest next to the parameter maps, so a cancelled run can be resumed.
+
+            resume: If True and a cancelled run with the same measurement and settings was recorded,
+                    the completed parameter maps and intermediate results of this run are reused.
         """
         super().__init__()
         self.filename = filename
@@ -87,135 +180,387 @@ class ParameterGeneratorWorker(QObject):
         self.filtering_parameter_1 = filtering_parm_1
         self.filtering_parameter_2 = filtering_parm_2
         self.dir_correction = dir_correction
+        self.dataset_directory = dataset_directory
+        self.max_workers = max_workers
+        self.memory_fraction = memory_fraction
+        self.checkpoint = checkpoint
+        self.resume = resume
+        # Manifest of the run if checkpoints are recorded
+        self.manifest = None
+        # Thread of the worker. The parameter maps may be generated in other threads.
+        self.thread = None
 
         self.output_path_name = ""
-        self.output_data_type = ".tiff"
+        # Generated parameter maps by the suffix of their file name
+        self.parameter_maps = {}
 
-    def get_output_path_name(self) -> str:
+    def is_interrupted(self) -> bool:
+        """
+        Check if the thread of the worker was interrupted. Works from the threads generating the parameter maps.
+
+        Returns:
+            True if the generation was cancelled.
+        """
+        thread = self.thread if self.thread is not None else QThread.currentThread()
+        return thread.isInterruptionRequested()
+
+    @staticmethod
+    def output_path_name_of(filename: str, output_folder: str) -> str:
+        """
+        Get the output folder and file pattern of the parameter maps of a measurement.
+
+        Args:
+            filename: The measurement file or folder.
+
+            output_folder: Folder of the generated parameter maps.
+
+        Returns:
+            The output path name, e.g. "output/measurement".
+        """
         # Get the filename without the extension to determine the output file names
-        if os.path.isdir(self.filename):
-            filename_without_extension = SLIX._cmd.ParameterGenerator.get_file_pattern(self.filename)
+        if os.path.isdir(filename):
+            filename_without_extension = SLIX._cmd.ParameterGenerator.get_file_pattern(filename)
         else:
-            filename_without_extension = \
-                os.path.splitext(os.path.basename(self.filename))[0]
-        output_path_name = f'{self.output_folder}/{filename_without_extension}'
-        # Create the output folder if it does not exist
+            filename_without_extension = os.path.splitext(os.path.basename(filename))[0]
+        return f'{output_folder}/{filename_without_extension}'
+
+    def get_output_path_name(self) -> str:
+        return self.output_path_name_of(self.filename, self.output_folder)
+
+    def parameter_map_filename(self, name: str) -> str:
+        """
+        Get the file of a parameter map.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+        Returns:
+            The path of the file in the output folder.
+        """
+        return f'{self.output_path_name}_{name}{self.output_data_type}'
+
+    @classmethod
+    def run_parameters_of(cls, filtering: str, filtering_parm_1: float, filtering_parm_2: float, detailed: bool,
+                          dir_correction: float) -> dict:
+        """
+        Get the settings which determine the values of the parameter maps. A run can only be resumed with the
+        same settings. The chosen parameter maps and the GPU option don't change the values.
+
+        Args:
+            filtering: Filtering method.
+
+            filtering_parm_1: Parameter 1 of the filtering method.
+
+            filtering_parm_2: Parameter 2 of the filtering method.
+
+            detailed: If True, the detailed parameter maps are generated.
+
+            dir_correction: Direction correction in degree.
+
+        Returns:
+            The settings as JSON serializable dictionary.
+        """
+        return {'filtering': filtering, 'filtering_parameter_1': float(filtering_parm_1),
+                'filtering_parameter_2': float(filtering_parm_2), 'detailed': bool(detailed),
+                'dir_correction': float(dir_correction), 'output_data_type': cls.output_data_type}
+
+    def run_parameters(self) -> dict:
+        """
+        Get the settings of this run which determine the values of the parameter maps.
+
+        Returns:
+            The settings as JSON serializable dictionary.
+        """
+        return self.run_parameters_of(self.filtering, self.filtering_parameter_1, self.filtering_parameter_2,
+                                      self.detailed, self.dir_correction)
+
+    def measurement_identity(self) -> str:
+        """
+        Get a key identifying the current content of the measurement file or folder.
+
+        Returns:
+            The key or None if the measurement file doesn't exist.
+        """
+        try:
+            return PreviewCache.source_identity(self.filename)
+        except OSError:
+            return None
+
+    @staticmethod
+    def find_resumable_manifest(output_path_name: str, measurement_filename: str,
+                                run_parameters: dict) -> RunManifest:
+        """
+        Find the manifest of a cancelled run with the same measurement and settings without creating a worker.
+
+        Args:
+            output_path_name: Output folder and file pattern of the parameter maps, see output_path_name_of.
+
+            measurement_filename: The measurement file or folder.
+
+            run_parameters: The settings of the run, see run_parameters_of.
+
+        Returns:
+            The manifest or None if there is no run to resume.
+        """
+        try:
+            measurement = PreviewCache.source_identity(measurement_filename)
+        except OSError:
+            return None
+        manifest = RunManifest(output_path_name)
+        if not manifest.load() or manifest.is_finished() or not manifest.matches(measurement, run_parameters):
+            return None
+        return manifest
+
+    def resumable_manifest(self) -> RunManifest:
+        """
+        Find the manifest of a cancelled run with the same measurement and settings in the output folder.
+
+        Returns:
+            The manifest or None if there is no run to resume.
+        """
+        return self.find_resumable_manifest(self.get_output_path_name(), self.filename, self.run_parameters())
+
+    def stage_maps(self, stage: str) -> [str]:
+        """
+        Get the parameter maps written by a stage of the generation.
+
+        Args:
+            stage: Name of the stage, one of stages.
+
+        Returns:
+            The suffixes of the file names of the parameter maps.
+        """
+        detailed_str = "_detailed" if self.detailed else ""
+        if stage == 'peaks':
+            if self.detailed:
+                return ['all_peaks_detailed', 'high_prominence_peaks_detailed']
+            return ['high_prominence_peaks', 'low_prominence_peaks']
+        if stage == 'direction':
+            return ['dir_1', 'dir_2', 'dir_3']
+        if stage == 'nc_direction':
+            return ['dir']
+        if stage in ('peak_distance', 'peak_width', 'peak_prominence'):
+            return [f'{stage.replace("_", "")}{detailed_str}']
+        return [stage]
+
+    def start_manifest(self) -> None:
+        """
+        Start recording the run or resume a cancelled run. The stages whose parameter maps were completed
+        by the cancelled run are disabled and their parameter maps are read again if they are kept.
+
+        Returns:
+            None
+        """
+        measurement = self.measurement_identity()
+        if not self.checkpoint or measurement is None:
+            return
+        manifest = self.resumable_manifest() if self.resume else None
+        if manifest is None:
+            self.manifest = RunManifest(self.output_path_name)
+            self.manifest.start(measurement, self.run_parameters())
+            return
+
+        self.manifest = manifest
+        self.currentStep.emit("Resuming cancelled generation...")
+        for stage in self.stages:
+            names = self.stage_maps(stage)
+            if not getattr(self, stage) or \
+                    not all(manifest.is_complete(name, self.parameter_map_filename(name)) for name in names):
+                continue
+            setattr(self, stage, False)
+            # Detailed peaks are only written
+            if self.dataset_directory is None or (stage == 'peaks' and self.detailed):
+                continue
+            images = [SLIX.io.imread(self.parameter_map_filename(name)) for name in names]
+            # The files may be written with another data type than the one of the generated maps
+            images = [image if manifest.map_type(name) is None else image.astype(manifest.map_type(name), copy=False)
+                      for name, image in zip(names, images)]
+            if stage == 'direction':
+                direction = self.keep_parameter_map('directions', numpy.stack(images, axis=-1))
+                for dim in range(direction.shape[-1]):
+                    self.parameter_maps[f'dir_{dim + 1}'] = direction[:, :, dim]
+                continue
+            for name, image in zip(names, images):
+                if stage == 'nc_direction' and image.ndim == 2:
+                    image = image[:, :, numpy.newaxis]
+                self.keep_parameter_map(name, image)
+
+    def load_checkpoint(self, name: str) -> numpy.ndarray:
+        """
+        Load an intermediate result of a resumed run.
+
+        Args:
+            name: Name of the intermediate result.
+
+        Returns:
+            The intermediate result or None if it has to be computed.
+        """
+        if self.manifest is None:
+            return None
+        return self.manifest.load_checkpoint(name)
+
+    def save_checkpoint(self, name: str, array: numpy.ndarray) -> None:
+        """
+        Save an intermediate result if checkpoints are recorded.
+
+        Args:
+            name: Name of the intermediate result.
+
+            array: The intermediate result.
+
+        Returns:
+            None
+        """
+        if self.manifest is not None:
+            self.manifest.save_checkpoint(name, array)
+
+    def keep_parameter_map(self, name: str, image: numpy.ndarray) -> numpy.ndarray:
+        """
+        Keep a generated parameter map for the other tabs if a dataset directory is given.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+            image: The parameter map.
+
+        Returns:
+            The kept, memory mapped parameter map or the parameter map itself.
+        """
+        if self.dataset_directory is None:
+            return image
+        image = to_memmap(image, self.dataset_directory)
+        self.parameter_maps[name] = image
+        return image
 
-        return output_path_name
+    def write_parameter_map(self, name: str, image: numpy.ndarray) -> None:
+        """
+        Write a generated parameter map into the output folder.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+            image: The parameter map.
+
+        Returns:
+            None
+        """
+        SLIX.io.imwrite(self.parameter_map_filename(name), image)
+        if self.manifest is not None:
+            self.manifest.mark_complete(name, image.dtype)
+
+    def result(self) -> object:
+        """
+        Get the result emitted when the generation finished.
+
+        Returns:
+            The output path name and the kept parameter maps.
+        """
+        return self.output_path_name, self.parameter_maps
 
     def apply_filtering(self) -> None:
         # If the thread is stopped, return
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
 
         # Apply filtering
-        if self.filtering != "None":
+        filtered_image = None if self.filtering == "None" else self.load_checkpoint('filtered')
+        if filtered_image is not None:
+            self.currentStep.emit("Loading filtered measurement...")
+            self.image = filtered_image
+        elif self.filtering != "None":
             self.currentStep.emit(f"Filtering: {self.filtering} "
                                   f"{self.filtering_parameter_1} "
                                   f"{self.filtering_parameter_2}")
-            if self.filtering == "Fourier":
-                self.image = SLIX.preparation.low_pass_fourier_smoothing(self.image,
-                                                                         self.filtering_parameter_1,
-                                                                         self.filtering_parameter_2)
-            elif self.filtering == "Savitzky-Golay":
-                self.image = SLIX.preparation.savitzky_golay_smoothing(self.image,
-                                                                       self.filtering_parameter_1,
-                                                                       self.filtering_parameter_2)
+            self.image = filter_measurement(self.image, self.filtering, self.filtering_parameter_1,
+                                            self.filtering_parameter_2)
+            self.save_checkpoint('filtered', self.image)
 
     def generate_minima(self) -> None:
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate minima image
         if self.min:
             self.currentStep.emit("Generating minima...")
-            min_img = numpy.min(self.image, axis=-1)
-            SLIX.io.imwrite(f'{self.output_path_name}_min'
-                            f'{self.output_data_type}', min_img)
+            min_img = self.keep_parameter_map('min', numpy.min(self.image, axis=-1))
+            self.write_parameter_map('min', min_img)
 
     def generate_maxima(self) -> None:
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate maxima image
         if self.max:
             self.currentStep.emit("Generating maxima...")
-            max_img = numpy.max(self.image, axis=-1)
-            SLIX.io.imwrite(f'{self.output_path_name}_max'
-                            f'{self.output_data_type}', max_img)
+            max_img = self.keep_parameter_map('max', numpy.max(self.image, axis=-1))
+            self.write_parameter_map('max', max_img)
 
     def generate_average(self) -> None:
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate average image
         if self.avg:
             self.currentStep.emit("Generating average...")
-            avg_img = numpy.mean(self.image, axis=-1)
-            SLIX.io.imwrite(f'{self.output_path_name}_avg'
-                            f'{self.output_data_type}', avg_img)
+            avg_img = self.keep_parameter_map('avg', numpy.mean(self.image, axis=-1))
+            self.write_parameter_map('avg', avg_img)
 
     def generate_peaks(self, peaks: numpy.ndarray, detailed: bool, gpu: bool) -> None:
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate all peaks to write low and high prominence peaks
         if self.peaks:
             self.currentStep.emit("Generating all peaks...")
             all_peaks = SLIX.toolbox.peaks(self.image, use_gpu=gpu, return_numpy=True)
             if not detailed:
-                SLIX.io.imwrite(f'{self.output_path_name}_high_prominence_peaks'
-                                f'{self.output_data_type}',
-                                numpy.sum(peaks, axis=-1,
-                                          dtype=numpy.uint16))
-                SLIX.io.imwrite(f'{self.output_path_name}_low_prominence_peaks'
-                                f'{self.output_data_type}',
-                                numpy.sum(all_peaks, axis=-1, dtype=numpy.uint16) -
-                                numpy.sum(peaks, axis=-1,
-                                          dtype=numpy.uint16))
+                high_prominence_peaks = numpy.sum(peaks, axis=-1, dtype=numpy.uint16)
+                self.write_parameter_map('high_prominence_peaks',
+                                         self.keep_parameter_map('high_prominence_peaks', high_prominence_peaks))
+                self.write_parameter_map('low_prominence_peaks',
+                                         self.keep_parameter_map('low_prominence_peaks',
+                                                                 numpy.sum(all_peaks, axis=-1, dtype=numpy.uint16) -
+                                                                 high_prominence_peaks))
             else:
-                SLIX.io.imwrite(f'{self.output_path_name}_all_peaks_detailed'
-                                f'{self.output_data_type}', all_peaks)
-                SLIX.io.imwrite(
-                    f'{self.output_path_name}_high_prominence_peaks_detailed'
-                    f'{self.output_data_type}',
-                    peaks
-                )
+                self.write_parameter_map('all_peaks_detailed', all_peaks)
+                self.write_parameter_map('high_prominence_peaks_detailed', peaks)
 
     def generate_direction(self, peaks: numpy.ndarray, centroids: numpy.ndarray, gpu: bool) -> None:
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate the direction images
         if self.direction:
             self.currentStep.emit("Generating direction...")
             direction = SLIX.toolbox.direction(peaks, centroids, use_gpu=gpu, number_of_directions=3,
                                                correction_angle=self.dir_correction, return_numpy=True)
+            # The direction files are kept as one stack like the VisualizationWidget loads them
+            direction = self.keep_parameter_map('directions', direction)
+            if self.dataset_directory is not None:
+                for dim in range(direction.shape[-1]):
+                    self.parameter_maps[f'dir_{dim + 1}'] = direction[:, :, dim]
             for dim in range(direction.shape[-1]):
-                SLIX.io.imwrite(f'{self.output_path_name}_dir_{dim + 1}'
-                                f'{self.output_data_type}',
-                                direction[:, :, dim])
+                self.write_parameter_map(f'dir_{dim + 1}', direction[:, :, dim])
             del direction
 
     def generate_non_crossing_direction(self, peaks: numpy.ndarray, centroids: numpy.ndarray, gpu: bool) -> None:
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate the non-crossing direction images
         if self.nc_direction:
             self.currentStep.emit("Generating non crossing direction...")
             nc_direction = SLIX.toolbox.direction(peaks, centroids, use_gpu=gpu,
                                                   number_of_directions=1, return_numpy=True)
-            SLIX.io.imwrite(f'{self.output_path_name}_dir'
-                            f'{self.output_data_type}',
-                            nc_direction[:, :])
+            nc_direction = self.keep_parameter_map('dir', nc_direction)
+            self.write_parameter_map('dir', nc_direction[:, :])
             del nc_direction
 
     def generate_peak_distance(self, peaks: numpy.ndarray, centroids: numpy.ndarray, detailed: bool, gpu: bool) -> None:
         detailed_str = "_detailed" if detailed else ""
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
 
         # Generate the peak distance
@@ -225,14 +570,14 @@ class ParameterGeneratorWorker(QObject):
                 peak_distance = SLIX.toolbox.peak_distance(peaks, centroids, use_gpu=gpu, return_numpy=True)
             else:
                 peak_distance = SLIX.toolbox.mean_peak_distance(peaks, centroids, use_gpu=gpu, return_numpy=True)
-            SLIX.io.imwrite(f'{self.output_path_name}_peakdistance{detailed_str}'
-                            f'{self.output_data_type}', peak_distance)
+            peak_distance = self.keep_parameter_map(f'peakdistance{detailed_str}', peak_distance)
+            self.write_parameter_map(f'peakdistance{detailed_str}', peak_distance)
             del peak_distance
 
     def generate_peak_width(self, peaks: numpy.ndarray, detailed: bool, gpu: bool) -> None:
         detailed_str = "_detailed" if detailed else ""
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate the peak width
         if self.peak_width:
@@ -241,14 +586,14 @@ class ParameterGeneratorWorker(QObject):
                 peak_width = SLIX.toolbox.peak_width(self.image, peaks, use_gpu=gpu, return_numpy=True)
             else:
                 peak_width = SLIX.toolbox.mean_peak_width(self.image, peaks, use_gpu=gpu)
-            SLIX.io.imwrite(f'{self.output_path_name}_peakwidth{detailed_str}'
-                            f'{self.output_data_type}', peak_width)
+            peak_width = self.keep_parameter_map(f'peakwidth{detailed_str}', peak_width)
+            self.write_parameter_map(f'peakwidth{detailed_str}', peak_width)
             del peak_width
 
     def generate_peak_prominence(self, peaks: numpy.ndarray, detailed: bool, gpu: bool) -> None:
         detailed_str = "_detailed" if detailed else ""
-        if QThread.currentThread().isInterruptionRequested():
-            self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
             return
         # Generate the peak prominence
         if self.peak_prominence:
@@ -257,10 +602,48 @@ class ParameterGeneratorWorker(QObject):
                 prominence = SLIX.toolbox.peak_prominence(self.image, peaks, use_gpu=gpu, return_numpy=True)
             else:
                 prominence = SLIX.toolbox.mean_peak_prominence(self.image, peaks, use_gpu=gpu, return_numpy=True)
-            SLIX.io.imwrite(f'{self.output_path_name}_peakprominence{detailed_str}'
-                            f'{self.output_data_type}', prominence)
+            prominence = self.keep_parameter_map(f'peakprominence{detailed_str}', prominence)
+            self.write_parameter_map(f'peakprominence{detailed_str}', prominence)
             del prominence
 
+    def stage_memory(self) -> int:
+        """
+        Estimate the memory used while generating one parameter map from the peaks.
+        SLIX creates arrays with one value per measurement value, e.g. the widths of all peaks, before
+        reducing them to the parameter map.
+
+        Returns:
+            A rough upper bound of the memory in bytes.
+        """
+        return 2 * self.image.size * 4
+
+    def run_stages(self, stages: [(bool, object, tuple)]) -> None:
+        """
+        Generate independent parameter maps concurrently. The NumPy and Numba functions of SLIX release the GIL,
+        so the generation takes about as long as the slowest parameter map if enough CPUs and memory are available.
+        The maps are generated one after another on the GPU.
+
+        Args:
+            stages: The parameter maps as (enabled, generating method, arguments of the method).
+
+        Returns:
+            None
+        """
+        stages = [(method, args) for enabled, method, args in stages if enabled]
+        max_workers = 1 if self.gpu else min(parallel_kernel_workers(self.max_workers), len(stages))
+        if max_workers <= 1:
+            for method, args in stages:
+                method(*args)
+            return
+
+        memory = available_memory()
+        budget = MemoryBudget(None if memory is None else int(memory * self.memory_fraction))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(budget.run, self.stage_memory(), method, *args) for method, args in stages]
+            for future in concurrent.futures.as_completed(futures):
+                # Errors are raised in the thread of the worker
+                future.result()
+
     def process(self) -> None:
         """
         Process the image. This method is called from the ParameterGeneratorWidget.
@@ -268,44 +651,171 @@ class ParameterGeneratorWorker(QObject):
         Returns:
              None
         """
+        self.thread = QThread.currentThread()
         self.output_path_name = self.get_output_path_name()
-        if os.path.isdir(self.filename):
-            SLIX.io.imwrite(f'{self.output_path_name}_Stack{self.output_data_type}', self.image)
+        self.start_manifest()
+        if os.path.isdir(self.filename) and \
+                (self.manifest is None or not self.manifest.is_complete('Stack', self.parameter_map_filename('Stack'))):
+            self.write_parameter_map('Stack', self.image)
 
         gpu = self.gpu
         detailed = self.detailed
+        failed = False
 
         try:
-            self.apply_filtering()
+            # Stages completed by a resumed run are disabled
+            if any(getattr(self, stage) for stage in self.stages):
+                self.apply_filtering()
             self.generate_minima()
             self.generate_maxima()
             self.generate_average()
 
-            if QThread.currentThread().isInterruptionRequested():
-                self.finishedWork.emit()
-                return
-            # The following steps require the significant peaks of the measurement ...
-            self.currentStep.emit("Generating significant peaks...")
-            peaks = SLIX.toolbox.significant_peaks(self.image, use_gpu=gpu, return_numpy=True)
-
-            if QThread.currentThread().isInterruptionRequested():
-                self.finishedWork.emit()
+            if self.is_interrupted():
+                self.finishedWork.emit(None)
                 return
-            # ... as well as the centroids
-            self.currentStep.emit("Generating centroids...")
-            centroids = SLIX.toolbox.centroid_correction(self.image, peaks, use_gpu=gpu, return_numpy=True)
-
-            self.generate_peaks(peaks, detailed, gpu)
-            self.generate_direction(peaks, centroids, gpu)
-            self.generate_non_crossing_direction(peaks, centroids, gpu)
-            self.generate_peak_distance(peaks, centroids, detailed, gpu)
-            self.generate_peak_width(peaks, detailed, gpu)
-            self.generate_peak_prominence(peaks, detailed, gpu)
-        except cupy.cuda.memory.OutOfMemoryError as e:
+            if not any(getattr(self, stage) for stage in self.stages[3:]):
+                # No parameter map requires the peaks
+                peaks = centroids = None
+            else:
+                # The following steps require the significant peaks of the measurement ...
+                peaks = self.load_checkpoint('peaks')
+                if peaks is None:
+                    self.currentStep.emit("Generating significant peaks...")
+                    peaks = SLIX.toolbox.significant_peaks(self.image, use_gpu=gpu, return_numpy=True)
+                    self.save_checkpoint('peaks', peaks)
+
+                if self.is_interrupted():
+                    self.finishedWork.emit(None)
+                    return
+                # ... as well as the centroids
+                centroids = self.load_checkpoint('centroids')
+                if centroids is None:
+                    self.currentStep.emit("Generating centroids...")
+                    centroids = SLIX.toolbox.centroid_correction(self.image, peaks, use_gpu=gpu, return_numpy=True)
+                    self.save_checkpoint('centroids', centroids)
+
+            # The remaining parameter maps only depend on the peaks and centroids
+            self.run_stages([(self.peaks, self.generate_peaks, (peaks, detailed, gpu)),
+                             (self.direction, self.generate_direction, (peaks, centroids, gpu)),
+                             (self.nc_direction, self.generate_non_crossing_direction, (peaks, centroids, gpu)),
+                             (self.peak_distance, self.generate_peak_distance, (peaks, centroids, detailed, gpu)),
+                             (self.peak_width, self.generate_peak_width, (peaks, detailed, gpu)),
+                             (self.peak_prominence, self.generate_peak_prominence, (peaks, detailed, gpu))])
+        except gpu_errors:
+            failed = True
             self.errorMessage.emit("cupy.cuda.memory.OutOfMemoryError: Ran out of memory during computation. "
                                    "Please disable the GPU option.")
         if self.gpu:
             mempool = cupy.get_default_memory_pool()
             mempool.free_all_blocks()
+        # Release the (filtered) measurement. The widget keeps the original measurement.
+        self.image = None
         # Tell connected components that we are done
-        self.finishedWork.emit()
+        if self.is_interrupted():
+            self.finishedWork.emit(None)
+        else:
+            if self.manifest is not None and not failed:
+                self.manifest.finish()
+            self.finishedWork.emit(self.result())
+
+
+class ParameterPreviewWorker(ParameterGeneratorWorker):
+    """
+    Worker class generating the parameter maps of a region of interest without writing them.
+    This class gets called from the ParameterGeneratorWidget when the user clicks the "Preview ROI" button.
+    All steps of the generation work on each pixel independently, so the region is cropped without padding.
+    """
+
+    def __init__(self, filename: str, image: numpy.array, roi: (int, int, int, int), filtering: str,
+                 filtering_parm_1: float, filtering_parm_2: float,
+                 use_gpu: bool, min: bool, max: bool,
+                 avg: bool, direction: bool, nc_direction: bool,
+                 peaks: bool, peak_width: bool, peak_distance: bool,
+                 peak_prominence: bool, dir_correction: float, max_workers: int = None):
+        """
+        Initialize the worker.
+
+        Args:
+            filename: Filename of the measurement image
+
+            image: NumPy array of the measurement image
+
+            roi: Region of interest (top, left, bottom, right) in pixels of the measurement
+
+            filtering: Filtering method to use
+
+            filtering_parm_1: Parameter 1 of the filtering method
+
+            filtering_parm_2: Parameter 2 of the filtering method
+
+            use_gpu: Use GPU for calculations
+
+            min: Generate minima image
+
+            max: Generate maxima image
+
+            avg: Generate average image
+
+            direction: Generate direction image
+
+            nc_direction: Generate non crossing direction image
+
+            peaks: Generate peaks image
+
+            peak_width: Generate peak width image
+
+            peak_distance: Generate peak distance image
+
+            peak_prominence: Generate peak prominence image
+
+            dir_correction: Direction correction in degree
+
+            max_workers: Number of parameter maps generated at the same time after the peaks were found
+        """
+        top, left, bottom, right = roi
+        # Detailed parameter maps can't be shown as an overlay
+        super().__init__(filename, image[top:bottom, left:right], None, filtering,
+                         filtering_parm_1, filtering_parm_2, use_gpu, False, min, max, avg, direction,
+                         nc_direction, peaks, peak_width, peak_distance, peak_prominence, dir_correction,
+                         max_workers=max_workers)
+        self.roi = roi
+        self.start_time = None
+
+    def get_output_path_name(self) -> str:
+        return ''
+
+    def write_parameter_map(self, name: str, image: numpy.ndarray) -> None:
+        """
+        Keep a generated parameter map of the region of interest instead of writing it.
+
+        Args:
+            name: Suffix of the file name of the parameter map.
+
+            image: The parameter map.
+
+        Returns:
+            None
+        """
+        # The measurement stack of a folder is not a parameter map
+        if name != 'Stack':
+            self.parameter_maps[name] = numpy.asarray(image)
+
+    def result(self) -> object:
+        """
+        Get the result emitted when the generation finished.
+
+        Returns:
+            The region of interest, the generated parameter maps by the suffix of their file name and
+            the duration of the generation in seconds.
+        """
+        return self.roi, self.parameter_maps, time.perf_counter() - self.start_time
+
+    def process(self) -> None:
+        """
+        Process the region of interest. This method is called from the ParameterGeneratorWidget.
+
+        Returns:
+             None
+        """
+        self.start_time = time.perf_counter()
+        super().process()
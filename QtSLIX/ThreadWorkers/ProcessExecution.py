@@ -0,0 +1,280 @@
+import functools
+import io
+import multiprocessing
+import os
+import pickle
+import shutil
+import signal
+import tempfile
+import threading
+import traceback
+import uuid
+
+import numpy
+from PyQt5.QtCore import QThread, QObject, Qt, pyqtSignal
+
+__all__ = ['shared_array_threshold', 'dump_shared', 'load_shared', 'run_job', 'ProcessWorker']
+
+# Arrays with at least this number of bytes are transferred through memory mapped files instead of the pipe
+shared_array_threshold = 2 ** 16
+# Signals of the workers which are forwarded from the job process. finishedWork is handled separately.
+forwarded_signals = ('currentStep', 'progress', 'previewReady', 'quantized', 'errorMessage')
+
+
+class SharedArrayPickler(pickle.Pickler):
+    """
+    Pickler writing large arrays into memory mapped files of a folder. Only the file name, data type and shape
+    of these arrays are pickled, so they are never copied through the pipe between the processes.
+    """
+    def __init__(self, file, directory: str):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        # Arrays referenced several times, e.g. by a worker and its engine, are only written once
+        self.written_arrays = {}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, numpy.ndarray) or obj.dtype.hasobject or obj.nbytes < shared_array_threshold:
+            return None
+        if id(obj) in self.written_arrays:
+            return self.written_arrays[id(obj)][1]
+        filename = os.path.join(self.directory, f'{uuid.uuid4().hex}.raw')
+        mapped_array = numpy.memmap(filename, dtype=obj.dtype, mode='w+', shape=obj.shape)
+        mapped_array[...] = obj
+        mapped_array.flush()
+        del mapped_array
+        # The array is kept, so its id is not reused while pickling
+        self.written_arrays[id(obj)] = (obj, ('ndarray', filename, obj.dtype.str, obj.shape))
+        return self.written_arrays[id(obj)][1]
+
+
+class SharedArrayUnpickler(pickle.Unpickler):
+    """
+    Unpickler mapping the arrays written by SharedArrayPickler.
+    """
+    def __init__(self, file, mode: str, remove: bool):
+        super().__init__(file)
+        self.mode = mode
+        self.remove = remove
+
+    def persistent_load(self, pid):
+        kind, filename, dtype, shape = pid
+        if kind != 'ndarray':
+            raise pickle.UnpicklingError(f'Unknown persistent object {kind}')
+        mapped_array = numpy.memmap(filename, dtype=numpy.dtype(dtype), mode=self.mode, shape=tuple(shape))
+        if self.remove:
+            try:
+                # The mapping stays valid, the memory is released when the array is deleted
+                os.remove(filename)
+            except OSError:
+                # The file is removed with the folder of the job
+                pass
+        return mapped_array
+
+
+def dump_shared(obj, directory: str) -> bytes:
+    """
+    Pickle an object. Large arrays anywhere in the object are written into memory mapped files.
+
+    Args:
+        obj: The object, e.g. the arguments of a worker or its result.
+
+        directory: Folder of the memory mapped files.
+
+    Returns:
+        The pickled object.
+    """
+    file = io.BytesIO()
+    SharedArrayPickler(file, directory).dump(obj)
+    return file.getvalue()
+
+
+def load_shared(data: bytes, mode: str = 'r+', remove: bool = True):
+    """
+    Unpickle an object pickled by dump_shared. The large arrays are memory mapped instead of read.
+
+    Args:
+        data: The pickled object.
+
+        mode: Mode of the memory mapped arrays. 'c' maps the arrays copy-on-write.
+
+        remove: If True, the files of the arrays are removed after mapping them.
+
+    Returns:
+        The object.
+    """
+    return SharedArrayUnpickler(io.BytesIO(data), mode, remove).load()
+
+
+def run_job(job: bytes, directory: str, connection) -> None:
+    """
+    Run a worker in the job process. This function is the target of the process started by ProcessWorker.
+    The signals of the worker are sent through the connection, large arrays are written into the folder of the job.
+
+    Args:
+        job: The worker class and its arguments pickled by dump_shared.
+
+        directory: Folder of the memory mapped files of the job.
+
+        connection: Sending end of the pipe to the ProcessWorker.
+
+    Returns:
+        None
+    """
+    if hasattr(os, 'setpgrp'):
+        # Cancelling the job also kills the processes started by the worker or by SLIX
+        os.setpgrp()
+    # The parameter maps may be generated in several threads
+    lock = threading.Lock()
+
+    def send(name, value):
+        with lock:
+            connection.send((name, dump_shared(value, directory)))
+
+    results = [None]
+    try:
+        worker_class, args, kwargs = load_shared(job, mode='c', remove=False)
+        worker = worker_class(*args, **kwargs)
+        del args, kwargs
+        for name in forwarded_signals:
+            worker_signal = getattr(worker, name, None)
+            if worker_signal is not None:
+                # There is no event loop in the job process, so the signals have to be delivered directly
+                worker_signal.connect(functools.partial(send, name), Qt.DirectConnection)
+        worker.finishedWork.connect(results.append, Qt.DirectConnection)
+        worker.process()
+    except Exception:
+        results.append(None)
+        send('errorMessage', f'The job failed.\nError message:\n{traceback.format_exc()}')
+    send('finishedWork', results[-1])
+    connection.close()
+
+
+class ProcessWorker(QObject):
+    """
+    Worker running another worker in a separate process.
+    A crash or the memory exhaustion of the job only ends this process, and cancelling the job kills it
+    immediately instead of waiting for the current step of the generation.
+    The arguments and the result are transferred through memory mapped files, the signals of the worker
+    are forwarded through a pipe. Arrays in the result are memory mapped.
+    """
+    # Signal to inform the connected widget that the worker has finished.
+    # Emits the result of the worker or None if the job failed or was cancelled.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the connected widget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Signal to inform the connected widget about the progress of the current step
+    progress = pyqtSignal(int)
+    # Signal with a preview of the result, if the worker emits previews
+    previewReady = pyqtSignal(object)
+    # Signal with the quantized directions, if the worker is a FOMWorker which quantized them
+    quantized = pyqtSignal(object)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    # Seconds between checking for an interruption while waiting for messages of the job
+    poll_interval = 0.05
+
+    def __init__(self, worker_class: type, args: tuple = (), kwargs: dict = None, directory: str = None):
+        """
+        Initialize the worker.
+
+        Args:
+            worker_class: Class of the worker running in the job process, e.g. ParameterGeneratorWorker.
+                          Its arguments are pickled, so they must not contain Qt objects or functions defined
+                          in other functions.
+
+            args: Positional arguments of the worker class.
+
+            kwargs: Keyword arguments of the worker class.
+
+            directory: Folder in which the folder of the memory mapped files of the job is created.
+                       Defaults to the temporary folder of the system.
+        """
+        super().__init__()
+        self.worker_class = worker_class
+        self.args = args
+        self.kwargs = {} if kwargs is None else kwargs
+        self.directory = directory
+        self.job_process = None
+
+    def kill(self) -> None:
+        """
+        Kill the job process and the processes it started.
+
+        Returns:
+            None
+        """
+        if self.job_process is None or self.job_process.exitcode is not None:
+            return
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self.job_process.pid, signal.SIGKILL)
+            except OSError:
+                # The job process did not create its own process group yet
+                pass
+        self.job_process.kill()
+
+    def receive(self, receiver) -> (bool, object):
+        """
+        Forward the messages of the job process until it finished or the job was cancelled.
+
+        Args:
+            receiver: Receiving end of the pipe to the job process.
+
+        Returns:
+            True and the result of the worker if the job finished, otherwise False and None.
+        """
+        while True:
+            if QThread.currentThread().isInterruptionRequested():
+                self.kill()
+                return False, None
+            if not receiver.poll(self.poll_interval):
+                if self.job_process.is_alive() or receiver.poll(0):
+                    continue
+                return False, None
+            try:
+                name, data = receiver.recv()
+            except EOFError:
+                # The job process ended without sending its result
+                return False, None
+            value = load_shared(data)
+            if name == 'finishedWork':
+                return True, value
+            getattr(self, name).emit(value)
+
+    def process(self) -> None:
+        """
+        Start the job process and forward its signals.
+
+        Returns:
+            None
+        """
+        result = None
+        directory = tempfile.mkdtemp(prefix='QtSLIX_job_', dir=self.directory)
+        # Forking a process with running Qt threads is unsafe
+        context = multiprocessing.get_context('spawn')
+        receiver, sender = context.Pipe(duplex=False)
+        try:
+            self.currentStep.emit("Starting job process...")
+            job = dump_shared((self.worker_class, self.args, self.kwargs), directory)
+            # The arguments are kept in the files of the job
+            self.args, self.kwargs = (), {}
+            self.job_process = context.Process(target=run_job, args=(job, directory, sender), daemon=False)
+            self.job_process.start()
+            # Only the job process may keep the sending end open, so a crash ends the pipe
+            sender.close()
+            finished, result = self.receive(receiver)
+            self.job_process.join()
+            if not finished and not QThread.currentThread().isInterruptionRequested():
+                self.errorMessage.emit(f'The job process ended unexpectedly with the exit code '
+                                       f'{self.job_process.exitcode}. It might have run out of memory.')
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            self.kill()
+            self.errorMessage.emit(f'Could not run the job in a separate process.\nError message:\n{e}')
+        finally:
+            receiver.close()
+            sender.close()
+            shutil.rmtree(directory, ignore_errors=True)
+        if QThread.currentThread().isInterruptionRequested():
+            result = None
+        self.finishedWork.emit(result)
@@ -1,8 +1,432 @@
+import collections
+import os
+import threading
+
+import numba
 import numpy
-from PyQt5.QtCore import QObject, pyqtSignal
+import tifffile
+from PyQt5 import sip
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, Qt, QLineF, QRectF
+from PyQt5.QtGui import QImage, QPainter, QPen, QColor
 import SLIX
 
-__all__ = ['FOMWorker', 'VectorWorker']
+__all__ = ['get_preview_strides', 'create_line_array', 'cached_lookup_table', 'downsample', 'FOMEngine', 'FOMWorker',
+           'ParameterMapWorker', 'VectorEngine', 'VectorWorker', 'VectorExportWorker', 'VectorLevelWorker']
+
+
+def get_preview_strides(shape: tuple, strides: tuple = (16, 4), minimum_size: int = 64) -> list:
+    """
+    Get the strides of the progressive previews of an image.
+    Previews which would be smaller than the minimum size are skipped.
+
+    Args:
+        shape: Shape of the image.
+
+        strides: Strides of the previews from coarse to fine.
+
+        minimum_size: Minimum height and width of a preview.
+
+    Returns:
+        List of the strides to use for the previews.
+    """
+    return [stride for stride in strides if min(shape[:2]) >= stride * minimum_size]
+
+
+def create_line_array(lines: numpy.ndarray):
+    """
+    Convert line segments to a sequence which can be drawn with a single QPainter.drawLines call.
+    If supported by PyQt, the segments are copied into a sip.array of QLineF without creating
+    a Python object per line.
+
+    Args:
+        lines: (n, 4) NumPy array containing the start and end points (x1, y1, x2, y2) of the lines.
+
+    Returns:
+        A sip.array of QLineF or a list of QLineF.
+    """
+    if hasattr(sip, 'array'):
+        line_array = sip.array(QLineF, len(lines))
+        if len(lines) > 0:
+            numpy.frombuffer(memoryview(line_array), dtype=numpy.float64).reshape(-1, 4)[:] = lines
+        return line_array
+    return [QLineF(*line) for line in lines]
+
+
+@numba.njit(parallel=True)
+def _downsample_2d(image: numpy.ndarray, kernel_size: int, background_threshold: float,
+                   background_value: float) -> numpy.ndarray:
+    output_height = (image.shape[0] + kernel_size - 1) // kernel_size
+    output_width = (image.shape[1] + kernel_size - 1) // kernel_size
+    output_image = numpy.empty((output_height, output_width))
+    output_image[:, :] = background_value
+
+    for i in numba.prange(output_height):
+        for j in range(output_width):
+            area = image[kernel_size * i:kernel_size * (i + 1), kernel_size * j:kernel_size * (j + 1)].flatten()
+            valid_values = numpy.sort(area[area != background_value])
+            number_of_valid_pixels = valid_values.size
+            if number_of_valid_pixels == 0 or number_of_valid_pixels < background_threshold * area.size:
+                continue
+            middle = number_of_valid_pixels // 2
+            if number_of_valid_pixels % 2 == 1:
+                output_image[i, j] = valid_values[middle]
+            else:
+                output_image[i, j] = (valid_values[middle - 1] + valid_values[middle]) / 2
+    return output_image
+
+
+def downsample(image: numpy.ndarray, kernel_size: int, background_threshold: float = 0,
+               background_value: float = 0) -> numpy.ndarray:
+    """
+    Downsample an image to the median of the valid pixels of each N x N area. The background pixels are ignored.
+    Unlike the vector maps of SLIX, which mix up the odd and even case of the median and can average
+    a background pixel into it, the result is the true median. The dimensions of the image are kept.
+
+    Args:
+        image: 2D image or 3D image with the values of each pixel in the last axis.
+
+        kernel_size: Size N of the areas. The areas at the lower and right border may be smaller.
+
+        background_threshold: Fraction of valid pixels of an area below which the area is background.
+
+        background_value: Value of the background pixels.
+
+    Returns:
+        The float64 downsampled image with the same number of dimensions as the image.
+    """
+    if image.ndim < 3:
+        return _downsample_2d(image, kernel_size, background_threshold, background_value)
+    result = numpy.empty((-(-image.shape[0] // kernel_size), -(-image.shape[1] // kernel_size), image.shape[2]))
+    for index in range(image.shape[2]):
+        result[:, :, index] = _downsample_2d(numpy.ascontiguousarray(image[:, :, index]), kernel_size,
+                                             background_threshold, background_value)
+    return result
+
+
+def cached_lookup_table(lookup_tables: collections.OrderedDict, lock: threading.Lock, maximum_size: int, key,
+                        create) -> numpy.ndarray:
+    """
+    Get a lookup table from a cache shared by all engines and the threads of their workers.
+    The least recently used lookup table is removed when the cache is full.
+
+    Args:
+        lookup_tables: The cache.
+
+        lock: Lock guarding the cache.
+
+        maximum_size: Maximum number of lookup tables in the cache.
+
+        key: Key of the lookup table, e.g. the color map.
+
+        create: Function creating the lookup table if it is not cached.
+
+    Returns:
+        The lookup table.
+    """
+    with lock:
+        if key in lookup_tables:
+            lookup_tables.move_to_end(key)
+        else:
+            lookup_tables[key] = create()
+            while len(lookup_tables) > maximum_size:
+                lookup_tables.popitem(last=False)
+        return lookup_tables[key]
+
+
+class FOMEngine:
+    """
+    Generates fiber orientation maps (FOM) through a precomputed colour wheel lookup table.
+    The direction and inclination maps are quantized to index arrays once. Generating a FOM for
+    another color map or weighting then only gathers the colors from the lookup table and applies
+    the saturation and value weighting as multiplications. The result matches
+    SLIX.visualization.direction up to the quantization of the angles.
+    """
+    # Number of quantization steps per degree
+    steps_per_degree = 10
+    # Lookup tables of the least recently used color maps, shared by all engines
+    lookup_tables = collections.OrderedDict()
+    lookup_tables_lock = threading.Lock()
+    lookup_tables_size = 4
+
+    def __init__(self, directions: numpy.ndarray, inclinations: numpy.ndarray = None):
+        """
+        Initialize the engine.
+
+        Args:
+            directions: 2D or 3D NumPy array containing the directions. Invalid directions are marked with -1.
+
+            inclinations: Optional 2D or 3D NumPy array containing the inclinations.
+        """
+        self.directions = directions
+        self.inclinations = inclinations
+        self.direction_indices = None
+        self.inclination_indices = None
+        self.number_of_valid_directions = None
+
+    @classmethod
+    def number_of_direction_steps(cls) -> int:
+        return 180 * cls.steps_per_degree
+
+    @classmethod
+    def number_of_inclination_steps(cls) -> int:
+        return 180 * cls.steps_per_degree + 1
+
+    @staticmethod
+    def in_degrees(image: numpy.ndarray) -> bool:
+        """
+        Check if an angle map is given in degrees. Uses the same criterion as SLIX.visualization.Colormap.
+
+        Args:
+            image: The angle map.
+
+        Returns:
+            True if the angles are in degrees, False if they are in radians.
+        """
+        max_val = image.max(axis=None)
+        return max_val > numpy.pi and not numpy.isclose(max_val, numpy.pi)
+
+    @property
+    def is_quantized(self) -> bool:
+        return self.direction_indices is not None
+
+    def quantize(self, chunk_rows: int = 256, callback=None) -> bool:
+        """
+        Quantize the direction and inclination maps to index arrays.
+        Invalid directions are mapped to an additional black entry of the lookup table.
+
+        Args:
+            chunk_rows: Number of rows processed at once.
+
+            callback: Optional function which gets called with the progress in percent after each chunk.
+                      If it returns False, the quantization is cancelled.
+
+        Returns:
+            True if the quantization finished, False if it was cancelled.
+        """
+        if self.is_quantized:
+            return True
+
+        direction_factor = self.steps_per_degree
+        if not self.in_degrees(self.directions):
+            direction_factor = direction_factor * 180 / numpy.pi
+        direction_indices = numpy.empty(self.directions.shape, dtype=numpy.uint16)
+        number_of_valid_directions = None
+        if self.directions.ndim == 3:
+            number_of_valid_directions = numpy.empty(self.directions.shape[:2], dtype=numpy.uint8)
+
+        inclination_indices = None
+        if self.inclinations is not None:
+            inclination_factor = self.steps_per_degree
+            if not self.in_degrees(self.inclinations):
+                inclination_factor = inclination_factor * 180 / numpy.pi
+            inclination_indices = numpy.empty(self.inclinations.shape, dtype=numpy.uint16)
+
+        for start in range(0, self.directions.shape[0], chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            directions = self.directions[rows]
+            valid = directions > -1
+            indices = numpy.rint(directions * direction_factor).astype(numpy.int64)
+            indices %= self.number_of_direction_steps()
+            indices[~valid] = self.number_of_direction_steps()
+            direction_indices[rows] = indices
+            if number_of_valid_directions is not None:
+                number_of_valid_directions[rows] = numpy.count_nonzero(valid, axis=-1)
+
+            if inclination_indices is not None:
+                inclinations = self.inclinations[rows] * inclination_factor
+                inclinations = numpy.clip(numpy.rint(inclinations), -90 * self.steps_per_degree,
+                                          90 * self.steps_per_degree)
+                inclination_indices[rows] = inclinations + 90 * self.steps_per_degree
+
+            if callback is not None and \
+                    not callback(min(100, int(100 * (start + chunk_rows) / self.directions.shape[0]))):
+                return False
+
+        if inclination_indices is not None and inclination_indices.ndim < direction_indices.ndim:
+            inclination_indices = inclination_indices[..., numpy.newaxis]
+        self.direction_indices = direction_indices
+        self.inclination_indices = inclination_indices
+        self.number_of_valid_directions = number_of_valid_directions
+        return True
+
+    def quantization(self) -> tuple:
+        """
+        Get the state of the quantization, e.g. to transfer it to the engine of another process.
+
+        Returns:
+            The direction indices, the inclination indices and the number of valid directions per pixel.
+            The arrays are None if they are not used or the directions are not quantized.
+        """
+        return self.direction_indices, self.inclination_indices, self.number_of_valid_directions
+
+    def set_quantization(self, quantization: tuple) -> None:
+        """
+        Set the state of the quantization returned by quantization.
+
+        Args:
+            quantization: The direction indices, the inclination indices and the number of valid directions.
+
+        Returns:
+            None
+        """
+        self.direction_indices, self.inclination_indices, self.number_of_valid_directions = quantization
+
+    def lookup_table(self, colormap) -> numpy.ndarray:
+        """
+        Get the colour wheel of a color map. The last direction entry is black for invalid directions.
+
+        Args:
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+        Returns:
+            A (directions + 1, 3) uint8 NumPy array if no inclination is used, else a
+            (inclinations, directions + 1, 3) uint8 NumPy array.
+        """
+        with_inclination = self.inclinations is not None
+
+        def create():
+            directions = numpy.deg2rad(numpy.arange(self.number_of_direction_steps()) / self.steps_per_degree)
+            if with_inclination:
+                inclinations = numpy.deg2rad(numpy.arange(self.number_of_inclination_steps()) /
+                                             self.steps_per_degree - 90)
+                directions, inclinations = numpy.meshgrid(directions, inclinations)
+            else:
+                inclinations = numpy.zeros_like(directions)
+            colors = (255.0 * colormap(directions, inclinations)).astype(numpy.uint8)
+            # Add black for invalid directions
+            invalid_color = numpy.zeros(colors.shape[:-2] + (1, 3), dtype=numpy.uint8)
+            return numpy.concatenate((colors, invalid_color), axis=-2)
+
+        return cached_lookup_table(self.lookup_tables, self.lookup_tables_lock, self.lookup_tables_size,
+                                   (colormap, with_inclination, self.steps_per_degree), create)
+
+    @staticmethod
+    def normalize_weighting(weighting: numpy.ndarray, directions: numpy.ndarray, stride: int = 1) -> numpy.ndarray:
+        """
+        Normalize a weighting by its maximum and match its dimensions to the directions.
+
+        Args:
+            weighting: 2D or 3D weighting.
+
+            directions: The direction map.
+
+            stride: Only every stride-th row and column of the weighting is used.
+
+        Returns:
+            The normalized float32 weighting with a trailing axis for the color channels.
+        """
+        # The maximum is taken from the full weighting so previews match the final FOM
+        weighting = weighting[::stride, ::stride].astype(numpy.float32) / weighting.max(axis=None)
+        while weighting.ndim < directions.ndim:
+            weighting = weighting[..., numpy.newaxis]
+        return weighting[..., numpy.newaxis]
+
+    def generate(self, colormap, saturation: numpy.ndarray = None, value: numpy.ndarray = None,
+                 chunk_rows: int = 256, callback=None, stride: int = 1) -> numpy.ndarray:
+        """
+        Generate the FOM. The direction maps have to be quantized first.
+
+        Args:
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+            saturation: Optional 2D or 3D saturation weighting.
+
+            value: Optional 2D or 3D value weighting.
+
+            chunk_rows: Number of rows processed at once.
+
+            callback: Optional function which gets called with the progress in percent after each chunk.
+                      If it returns False, the generation is cancelled.
+
+            stride: Only every stride-th row and column is used. Used for fast, downsampled previews.
+
+        Returns:
+            The FOM as uint8 RGB NumPy array or None if the generation was cancelled. If multiple directions
+            are given, the FOM has twice the width and height as in SLIX.visualization.direction.
+        """
+        lookup_table = self.lookup_table(colormap)
+        if saturation is not None:
+            saturation = self.normalize_weighting(saturation, self.directions, stride)
+        if value is not None:
+            value = self.normalize_weighting(value, self.directions, stride)
+
+        direction_indices = self.direction_indices[::stride, ::stride]
+        inclination_indices = None
+        if self.inclination_indices is not None:
+            inclination_indices = self.inclination_indices[::stride, ::stride]
+        number_of_valid_directions = None
+        if self.number_of_valid_directions is not None:
+            number_of_valid_directions = self.number_of_valid_directions[::stride, ::stride]
+
+        height, width = direction_indices.shape[:2]
+        if self.directions.ndim == 3:
+            fom = numpy.zeros((2 * height, 2 * width, 3), dtype=numpy.uint8)
+        else:
+            fom = numpy.empty((height, width, 3), dtype=numpy.uint8)
+
+        for start in range(0, height, chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            if inclination_indices is not None:
+                colors = lookup_table[inclination_indices[rows], direction_indices[rows]]
+            else:
+                colors = lookup_table[direction_indices[rows]]
+
+            if saturation is not None or value is not None:
+                colors = colors.astype(numpy.float32) / 255
+                # Scaling the saturation in HSV moves each channel towards the value (the maximum channel).
+                # Scaling the value in HSV scales all channels.
+                if saturation is not None:
+                    maximum = colors.max(axis=-1, keepdims=True)
+                    colors = maximum + saturation[rows] * (colors - maximum)
+                if value is not None:
+                    colors *= value[rows]
+                colors = (255.0 * numpy.clip(colors, 0, 1)).astype(numpy.uint8)
+
+            if self.directions.ndim == 3:
+                self.arrange_multiple_directions(fom[2 * start:2 * (start + chunk_rows)], colors,
+                                                 number_of_valid_directions[rows])
+            else:
+                fom[rows] = colors
+
+            if callback is not None and not callback(min(100, int(100 * (start + chunk_rows) / height))):
+                return None
+        return fom
+
+    @staticmethod
+    def arrange_multiple_directions(fom: numpy.ndarray, colors: numpy.ndarray,
+                                    number_of_valid_directions: numpy.ndarray) -> None:
+        """
+        Arrange up to three directions of each pixel in a 2x2 square of the FOM:
+
+            1 direction: 1 1    2 directions: 1 2    3 directions: 1 2
+                         1 1                  2 1                  3 0
+
+        Args:
+            fom: Part of the FOM with twice the height and width of the colors. Has to be filled with zeros.
+
+            colors: (x, y, number of directions, 3) colors of the directions.
+
+            number_of_valid_directions: Number of valid directions per pixel.
+
+        Returns:
+            None
+        """
+        valid = number_of_valid_directions[..., numpy.newaxis]
+        first = colors[..., 0, :] * (valid > 0)
+        if colors.shape[-2] > 1:
+            second = numpy.where(valid > 1, colors[..., 1, :], first)
+        else:
+            second = first
+        if colors.shape[-2] > 2:
+            third = numpy.where(valid > 2, colors[..., 2, :], second)
+        else:
+            third = second
+        fourth = numpy.where(valid > 2, 0, first)
+
+        fom[0::2, 0::2] = first
+        fom[1::2, 0::2] = second
+        fom[0::2, 1::2] = third
+        fom[1::2, 1::2] = fourth
 
 
 class FOMWorker(QObject):
@@ -10,48 +434,574 @@ class FOMWorker(QObject):
     Worker class for the visualization.
     This class gets called from the VisualizationWidget when the user clicks the "Generate" button.
     """
-    # Signal to inform the ParameterGeneratorWidget that the worker has finished
-    finishedWork = pyqtSignal(numpy.ndarray)
-    # Signal to inform the ParameterGeneratorWidget what step the worker is currently working on
+    # Signal to inform the VisualizationWidget that the worker has finished.
+    # The FOM is None if the generation failed or was cancelled.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the VisualizationWidget what step the worker is currently working on
     currentStep = pyqtSignal(str)
+    # Signal to inform the VisualizationWidget about the progress of the current step in percent
+    progress = pyqtSignal(int)
+    # Signal with a downsampled preview of the FOM. Coarse previews are followed by finer ones.
+    previewReady = pyqtSignal(object)
+    # Signal with the quantization of the engine (see FOMEngine.quantization) if the worker quantized the directions.
+    # A worker running in a separate process quantizes a copy of the engine, so the indices are sent back.
+    quantized = pyqtSignal(object)
     # Error message
     errorMessage = pyqtSignal(str)
 
-    def __init__(self, saturation_weighting, value_weighting, color_map, directions, inclination):
+    def __init__(self, saturation_weighting, value_weighting, color_map, directions, inclination,
+                 fom_engine: FOMEngine = None):
         super().__init__()
         self.directions = directions
         self.inclinations = inclination
         self.saturation_weighting = saturation_weighting
         self.value_weighting = value_weighting
         self.color_map = color_map
+        # Reusing the engine of a previous run skips the quantization of the directions
+        if fom_engine is None:
+            fom_engine = FOMEngine(directions, inclination)
+        self.fom_engine = fom_engine
+
+    def report_progress(self, percent: int) -> bool:
+        """
+        Report the progress of the current step.
+
+        Args:
+            percent: The progress in percent.
+
+        Returns:
+            False if the user cancelled the generation.
+        """
+        self.progress.emit(percent)
+        return not QThread.currentThread().isInterruptionRequested()
+
+    @staticmethod
+    def is_cancelled(_percent: int = 0) -> bool:
+        """
+        Check if the user cancelled the generation. Used as callback for the previews.
+
+        Returns:
+            False if the user cancelled the generation.
+        """
+        return not QThread.currentThread().isInterruptionRequested()
 
     def process(self) -> None:
         image = None
         try:
+            if not self.fom_engine.is_quantized:
+                self.currentStep.emit("Quantizing directions...")
+                if not self.fom_engine.quantize(callback=self.report_progress):
+                    self.finishedWork.emit(None)
+                    return
+                self.quantized.emit(self.fom_engine.quantization())
+            # Show coarse previews first. Each of them only takes a fraction of the full generation.
+            for stride in get_preview_strides(self.directions.shape):
+                self.currentStep.emit(f"Generating preview (1/{stride})...")
+                preview = self.fom_engine.generate(self.color_map, saturation=self.saturation_weighting,
+                                                   value=self.value_weighting, callback=self.is_cancelled,
+                                                   stride=stride)
+                if preview is None:
+                    self.finishedWork.emit(None)
+                    return
+                self.previewReady.emit(preview)
             self.currentStep.emit("Generating FOM...")
-            image = SLIX.visualization.direction(self.directions, inclination=self.inclinations,
-                                                 saturation=self.saturation_weighting,
-                                                 value=self.value_weighting, colormap=self.color_map)
-        except ValueError as e:
+            image = self.fom_engine.generate(self.color_map, saturation=self.saturation_weighting,
+                                             value=self.value_weighting, callback=self.report_progress)
+        except (ValueError, IndexError) as e:
             self.errorMessage.emit(f'Could not generate FOM. Check your input files.\n'
                                    f'Error message:\n{e}')
         self.finishedWork.emit(image)
 
 
+class ParameterMapWorker(QObject):
+    """
+    Worker class for the parameter map preview.
+    Applies a color map to the parameter map progressively. Downsampled previews are emitted
+    before the parameter map is colored in full resolution.
+    """
+    # Signal with the colored parameter map as QImage. None if the coloring was cancelled.
+    finishedWork = pyqtSignal(object)
+    # Signal with a downsampled preview of the colored parameter map
+    previewReady = pyqtSignal(object)
+    # Signal to inform the VisualizationWidget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, parameter_map_engine, color_map: str):
+        """
+        Initialize the worker.
+
+        Args:
+            parameter_map_engine: The QtSLIX.ColorMapEngine of the parameter map.
+
+            color_map: Name of the matplotlib color map.
+        """
+        super().__init__()
+        self.parameter_map_engine = parameter_map_engine
+        self.color_map = color_map
+
+    def process(self) -> None:
+        for stride in get_preview_strides(self.parameter_map_engine.index_image.shape):
+            if QThread.currentThread().isInterruptionRequested():
+                self.finishedWork.emit(None)
+                return
+            self.currentStep.emit(f"Generating preview (1/{stride})...")
+            self.previewReady.emit(self.parameter_map_engine.to_qimage(self.color_map, stride))
+
+        if QThread.currentThread().isInterruptionRequested():
+            self.finishedWork.emit(None)
+            return
+        self.currentStep.emit("Generating parameter map...")
+        self.finishedWork.emit(self.parameter_map_engine.to_qimage(self.color_map))
+
+
+class VectorEngine:
+    """
+    Rasterizes vector maps without matplotlib.
+    The thinned and scaled line segments are computed with NumPy, grouped by their color and
+    drawn with one QPainter.drawLines call per color onto a QImage. The segments follow
+    SLIX.visualization.unit_vectors and SLIX.visualization.unit_vector_distribution.
+    The thinned vectors are cached independently of their scale, so changing the alpha, color map,
+    vector width or scale only repeats the drawing.
+    """
+    # Number of colors used for the directions of the vectors
+    number_of_colors = 256
+    # Lookup tables of the least recently used color maps, shared by all engines
+    lookup_tables = collections.OrderedDict()
+    lookup_tables_lock = threading.Lock()
+    lookup_tables_size = 16
+    # Maximum number of bytes of the cached vector fields
+    vector_field_cache_limit = 512 * 2 ** 20
+
+    def __init__(self, directions: numpy.ndarray):
+        """
+        Initialize the engine.
+
+        Args:
+            directions: 2D or 3D NumPy array containing the directions in degrees.
+                        Invalid directions are marked with -1.
+        """
+        self.directions = directions
+        self.unit_x = None
+        self.unit_y = None
+        # Least recently used vector fields of the thinout settings used so far
+        self.vector_field_cache = collections.OrderedDict()
+        self.vector_field_cache_lock = threading.Lock()
+
+    def compute_unit_vectors(self) -> None:
+        """
+        Calculate the unit vectors of the directions if they were not calculated yet.
+
+        Returns:
+            None
+        """
+        if self.unit_x is not None:
+            return
+        unit_x, unit_y = SLIX.toolbox.unit_vectors(self.directions, use_gpu=False)
+        while unit_x.ndim < 3:
+            unit_x = unit_x[..., numpy.newaxis]
+            unit_y = unit_y[..., numpy.newaxis]
+        self.unit_x = unit_x.astype(numpy.float32)
+        self.unit_y = unit_y.astype(numpy.float32)
+
+    def lookup_table(self, colormap) -> numpy.ndarray:
+        """
+        Get the colors of the quantized vector angles for a color map.
+
+        Args:
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+        Returns:
+            A (256, 3) uint8 NumPy array.
+        """
+        def create():
+            angles = (numpy.arange(self.number_of_colors) + 0.5) * numpy.pi / self.number_of_colors
+            return (255.0 * colormap(angles, numpy.zeros_like(angles))).astype(numpy.uint8)
+
+        return cached_lookup_table(self.lookup_tables, self.lookup_tables_lock, self.lookup_tables_size,
+                                   colormap, create)
+
+    def vector_field(self, thinout: int, distribution: bool, threshold: float,
+                     weighting: numpy.ndarray = None) -> (numpy.ndarray, numpy.ndarray, numpy.ndarray):
+        """
+        Calculate the thinned vectors. The result is cached until the cache limit is reached.
+
+        Args:
+            thinout: Number of pixels N x N which are combined to one vector or,
+                     if the distribution is shown, at one position.
+
+            distribution: If True, all vectors of a N x N area are drawn at its center.
+                          Else, the median of the vectors of the area is drawn.
+
+            threshold: Fraction of background pixels of a N x N area above which no vector is drawn.
+                       Only used if the distribution is not shown.
+
+            weighting: Optional 2D weighting of the vector length.
+
+        Returns:
+            The (n, 2) float32 positions (x, y) in pixel coordinates, the (n, 2) float32 half vectors
+            of a vector with a scale of one and the (n,) uint8 color indices of the vectors.
+        """
+        thinout = max(1, int(thinout))
+        if distribution:
+            threshold = 0
+        # The weighting is part of the key by identity. Keeping it in the cache entry prevents its reuse.
+        key = (thinout, distribution, threshold, id(weighting))
+        key_weighting = weighting
+        with self.vector_field_cache_lock:
+            if key in self.vector_field_cache:
+                self.vector_field_cache.move_to_end(key)
+                return self.vector_field_cache[key][1]
+
+        self.compute_unit_vectors()
+        unit_x = self.unit_x
+        unit_y = self.unit_y
+        height, width = unit_x.shape[:2]
+
+        if distribution:
+            # Every vector is drawn at the center of its N x N area
+            pos_y = (numpy.arange(height) // thinout * thinout + thinout / 2)
+            pos_x = (numpy.arange(width) // thinout * thinout + thinout / 2)
+        else:
+            if thinout > 1:
+                unit_x = downsample(unit_x, thinout, threshold, 0)
+                unit_y = downsample(unit_y, thinout, threshold, 0)
+                if weighting is not None:
+                    weighting = downsample(weighting, thinout, 0, 0)
+            # The median of the N x N area is drawn at its upper left pixel
+            pos_y = numpy.arange(unit_x.shape[0]) * thinout
+            pos_x = numpy.arange(unit_x.shape[1]) * thinout
+        pos_x, pos_y = numpy.meshgrid(pos_x.astype(numpy.float32), pos_y.astype(numpy.float32))
+
+        number_of_directions = unit_x.shape[-1]
+        pos_x = numpy.repeat(pos_x[..., numpy.newaxis], number_of_directions, axis=-1).ravel()
+        pos_y = numpy.repeat(pos_y[..., numpy.newaxis], number_of_directions, axis=-1).ravel()
+        unit_x = unit_x.ravel()
+        unit_y = unit_y.ravel()
+
+        # Vectors of zero length are not drawn
+        valid = ~(numpy.isclose(unit_x, 0) & numpy.isclose(unit_y, 0))
+        length = numpy.sqrt(numpy.maximum(1e-15, unit_x ** 2 + unit_y ** 2))
+        unit_x = unit_x / length
+        unit_y = unit_y / length
+
+        angles = numpy.abs(numpy.arctan2(unit_y, -unit_x))
+        color_indices = numpy.clip(angles * (self.number_of_colors / numpy.pi), 0,
+                                   self.number_of_colors - 1).astype(numpy.uint8)
+
+        # Half of the vector is drawn on each side of its position
+        half_length = numpy.full(unit_x.shape, 0.5, dtype=numpy.float32)
+        if weighting is not None:
+            weighting = numpy.repeat(weighting[..., numpy.newaxis], number_of_directions, axis=-1).ravel()
+            half_length = half_length * weighting
+            valid &= numpy.nan_to_num(weighting) > 0
+
+        positions = numpy.stack((pos_x[valid], pos_y[valid]), axis=-1)
+        half_vectors = numpy.stack(((unit_x * half_length)[valid], (unit_y * half_length)[valid]),
+                                   axis=-1).astype(numpy.float32)
+        vector_field = (positions, half_vectors, color_indices[valid])
+
+        with self.vector_field_cache_lock:
+            self.vector_field_cache[key] = (key_weighting, vector_field)
+            # Remove the least recently used vector fields, but always keep the newest one
+            while len(self.vector_field_cache) > 1 and \
+                    sum(sum(array.nbytes for array in entry[1])
+                        for entry in self.vector_field_cache.values()) > self.vector_field_cache_limit:
+                self.vector_field_cache.popitem(last=False)
+        return vector_field
+
+    def segments(self, thinout: int, scale: float, distribution: bool, threshold: float,
+                 weighting: numpy.ndarray = None) -> (numpy.ndarray, numpy.ndarray):
+        """
+        Calculate the line segments of the vector map.
+
+        Args:
+            thinout: Number of pixels N x N which are combined to one vector or,
+                     if the distribution is shown, at one position.
+
+            scale: Length of the vectors in pixels. If below zero, the thinout is used.
+
+            distribution: If True, all vectors of a N x N area are drawn at its center.
+                          Else, the median of the vectors of the area is drawn.
+
+            threshold: Fraction of background pixels of a N x N area above which no vector is drawn.
+                       Only used if the distribution is not shown.
+
+            weighting: Optional 2D weighting of the vector length.
+
+        Returns:
+            The (n, 4) float64 start and end points (x1, y1, x2, y2) in pixel coordinates
+            and the (n,) uint8 color indices of the vectors.
+        """
+        positions, half_vectors, color_indices = self.vector_field(thinout, distribution, threshold, weighting)
+        if scale < 0:
+            scale = max(1, int(thinout))
+
+        lines = numpy.empty((len(positions), 4), dtype=numpy.float64)
+        numpy.multiply(half_vectors, scale, out=lines[:, 2:])
+        numpy.subtract(positions, lines[:, 2:], out=lines[:, :2])
+        lines[:, 2:] += positions
+        return lines, color_indices
+
+    @staticmethod
+    def background_qimage(background: numpy.ndarray) -> QImage:
+        """
+        Convert a 2D background image to a normalized grayscale QImage.
+
+        Args:
+            background: 2D NumPy array.
+
+        Returns:
+            Grayscale8 QImage.
+        """
+        min_val = numpy.nanmin(background)
+        max_val = numpy.nanmax(background)
+        gray = (background - min_val) * (255 / numpy.maximum(max_val - min_val, 1e-15))
+        gray = numpy.ascontiguousarray(numpy.nan_to_num(gray), dtype=numpy.uint8)
+        # Copy the image as the QImage does not own the NumPy buffer
+        return QImage(gray.data, gray.shape[1], gray.shape[0], gray.strides[0], QImage.Format_Grayscale8).copy()
+
+    def output_shape(self, pixel_scale: float) -> (int, int):
+        """
+        Get the shape of the vector map.
+
+        Args:
+            pixel_scale: Number of output pixels per pixel of the direction map.
+
+        Returns:
+            Height and width of the vector map in pixels.
+        """
+        height, width = self.directions.shape[:2]
+        return int(round(height * pixel_scale)), int(round(width * pixel_scale))
+
+    def rasterize(self, lines: numpy.ndarray, color_indices: numpy.ndarray, colormap, alpha: float,
+                  vector_width: float, pixel_scale: float, background=None,
+                  callback=None, region: tuple = None) -> numpy.ndarray:
+        """
+        Draw line segments onto an image with the shape of the direction map or a region of it.
+
+        Args:
+            lines: (n, 4) start and end points of the lines in pixel coordinates of the direction map.
+
+            color_indices: (n,) color indices of the lines.
+
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+            alpha: Opacity of the vectors.
+
+            vector_width: Width of the vectors in pixels of the direction map.
+
+            pixel_scale: Number of output pixels per pixel of the direction map.
+
+            background: Optional 2D background image or its grayscale QImage. If None, the background is white.
+
+            callback: Optional function which gets called with the progress in percent after
+                      each color. If it returns False, the drawing is cancelled.
+
+            region: Optional (x, y, width, height) region of the vector map in output pixels.
+                    Only this region is drawn. Lines outside of it are clipped.
+
+        Returns:
+            The vector map as uint8 RGB NumPy array or None if the drawing was cancelled.
+        """
+        height, width = self.directions.shape[:2]
+        if region is None:
+            output_height, output_width = self.output_shape(pixel_scale)
+            region = (0, 0, output_width, output_height)
+        region_x, region_y, region_width, region_height = region
+        image = QImage(region_width, region_height, QImage.Format_RGBX8888)
+        if image.isNull():
+            raise ValueError(f'The vector map of {region_width} x {region_height} pixels is too large to be drawn '
+                             f'in memory. Lower the DPI or use "Export high resolution" to write it tile by tile.')
+        image.fill(Qt.white)
+
+        painter = QPainter(image)
+        try:
+            if background is not None:
+                if isinstance(background, numpy.ndarray):
+                    background = self.background_qimage(background)
+                # Only draw the part of the background inside of the region
+                source_x = max(0, int(numpy.floor(region_x / pixel_scale)))
+                source_y = max(0, int(numpy.floor(region_y / pixel_scale)))
+                source_width = min(width, int(numpy.ceil((region_x + region_width) / pixel_scale))) - source_x
+                source_height = min(height, int(numpy.ceil((region_y + region_height) / pixel_scale))) - source_y
+                painter.drawImage(QRectF(source_x * pixel_scale - region_x, source_y * pixel_scale - region_y,
+                                         source_width * pixel_scale, source_height * pixel_scale),
+                                  background, QRectF(source_x, source_y, source_width, source_height))
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.translate(-region_x, -region_y)
+            # Pixel centers of the direction map lie at integer coordinates
+            painter.scale(pixel_scale, pixel_scale)
+            painter.translate(0.5, 0.5)
+
+            lookup_table = self.lookup_table(colormap)
+            order = numpy.argsort(color_indices, kind='stable')
+            lines = lines[order]
+            bounds = numpy.searchsorted(color_indices[order], numpy.arange(self.number_of_colors + 1))
+            for color_index in range(self.number_of_colors):
+                start, end = bounds[color_index], bounds[color_index + 1]
+                if start < end:
+                    red, green, blue = lookup_table[color_index]
+                    pen = QPen(QColor(int(red), int(green), int(blue), int(round(255 * alpha))))
+                    pen.setWidthF(vector_width)
+                    pen.setCapStyle(Qt.FlatCap)
+                    painter.setPen(pen)
+                    painter.drawLines(create_line_array(lines[start:end]))
+                if callback is not None and \
+                        not callback(int(100 * (color_index + 1) / self.number_of_colors)):
+                    return None
+        finally:
+            painter.end()
+
+        buffer = image.constBits()
+        buffer.setsize(image.byteCount())
+        pixels = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(image.height(), image.bytesPerLine())
+        return pixels[:, :4 * image.width()].reshape(image.height(), image.width(), 4)[..., :3].copy()
+
+    def export(self, filename: str, lines: numpy.ndarray, color_indices: numpy.ndarray, colormap,
+               alpha: float, vector_width: float, pixel_scale: float, background: numpy.ndarray = None,
+               tile_size: int = 256, callback=None) -> bool:
+        """
+        Draw line segments strip by strip and stream the strips into a tiled TIFF file.
+        Only a single strip of the vector map is kept in memory, independent of the pixel scale.
+        Lines crossing the border of a strip are drawn in each strip they overlap. The strips are
+        drawn with a few overlapping rows because the antialiasing differs at the border of an image.
+
+        Args:
+            filename: Path of the TIFF file.
+
+            lines: (n, 4) start and end points of the lines in pixel coordinates of the direction map.
+
+            color_indices: (n,) color indices of the lines.
+
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+            alpha: Opacity of the vectors.
+
+            vector_width: Width of the vectors in pixels of the direction map.
+
+            pixel_scale: Number of output pixels per pixel of the direction map.
+
+            background: Optional 2D background image. If None, the background is white.
+
+            tile_size: Height and width of the tiles in the TIFF file. Has to be a multiple of 16.
+                       Each strip is one row of tiles.
+
+            callback: Optional function which gets called with the progress in percent after
+                      each strip. If it returns False, the export is cancelled and the file is removed.
+
+        Returns:
+            True if the export finished, False if it was cancelled.
+            If the export fails, the file is removed and the error is raised.
+        """
+        output_height, output_width = self.output_shape(pixel_scale)
+        if background is not None:
+            background = self.background_qimage(background)
+
+        # Sort the lines by their vertical center to find the lines of a strip with a binary search
+        centers = (lines[:, 1] + lines[:, 3]) / 2
+        order = numpy.argsort(centers, kind='stable')
+        lines = lines[order]
+        color_indices = color_indices[order]
+        centers = centers[order]
+        # Lines reach at most this far from their center in pixels of the direction map
+        margin = vector_width + 1
+        if len(lines) > 0:
+            margin += numpy.abs(lines[:, 3] - lines[:, 1]).max() / 2
+
+        # Number of overlapping rows in output pixels
+        overlap = 4
+
+        def tiles():
+            for strip_y in range(0, output_height, tile_size):
+                strip_height = min(tile_size, output_height - strip_y)
+                top = (strip_y - overlap) / pixel_scale - 0.5 - margin
+                bottom = (strip_y + strip_height + overlap) / pixel_scale - 0.5 + margin
+                start, end = numpy.searchsorted(centers, [top, bottom])
+                strip = self.rasterize(lines[start:end], color_indices[start:end], colormap, alpha,
+                                       vector_width, pixel_scale, background,
+                                       region=(0, strip_y - overlap, output_width, strip_height + 2 * overlap))
+                strip = strip[overlap:overlap + strip_height]
+                # The writer stops iterating after the last tile. Report the progress before.
+                if callback is not None and \
+                        not callback(int(100 * (strip_y + strip_height) / output_height)):
+                    raise InterruptedError
+                for tile_x in range(0, output_width, tile_size):
+                    tile = numpy.zeros((tile_size, tile_size, 3), dtype=numpy.uint8)
+                    tile_width = min(tile_size, output_width - tile_x)
+                    tile[:strip_height, :tile_width] = strip[:, tile_x:tile_x + tile_width]
+                    yield tile
+
+        try:
+            # Files larger than 4 GiB need BigTIFF
+            with tifffile.TiffWriter(filename, bigtiff=3 * output_height * output_width > 2 ** 32 - 2 ** 25) as tiff:
+                tiff.write(tiles(), shape=(output_height, output_width, 3), dtype=numpy.uint8,
+                           tile=(tile_size, tile_size), photometric='rgb', compression='zlib')
+        except InterruptedError:
+            os.remove(filename)
+            return False
+        except (OSError, ValueError):
+            # Don't leave an incomplete file, e.g. if the disk is full
+            if os.path.exists(filename):
+                os.remove(filename)
+            raise
+        return True
+
+    def generate(self, colormap, alpha: float, thinout: int, scale: float, vector_width: float,
+                 distribution: bool, threshold: float, weighting: numpy.ndarray = None,
+                 background: numpy.ndarray = None, pixel_scale: float = 1, callback=None) -> numpy.ndarray:
+        """
+        Generate a vector map.
+
+        Args:
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+            alpha: Opacity of the vectors.
+
+            thinout: Number of pixels N x N which are combined to one vector.
+
+            scale: Length of the vectors in pixels. If below zero, the thinout is used.
+
+            vector_width: Width of the vectors in pixels of the direction map.
+
+            distribution: If True, all vectors of a N x N area are drawn at its center.
+
+            threshold: Fraction of background pixels of a N x N area above which no vector is drawn.
+
+            weighting: Optional 2D weighting of the vector length.
+
+            background: Optional 2D background image.
+
+            pixel_scale: Number of output pixels per pixel of the direction map.
+
+            callback: Optional function which gets called with the progress in percent.
+                      If it returns False, the generation is cancelled.
+
+        Returns:
+            The vector map as uint8 RGB NumPy array or None if the generation was cancelled.
+        """
+        lines, color_indices = self.segments(thinout, scale, distribution, threshold, weighting)
+        return self.rasterize(lines, color_indices, colormap, alpha, vector_width, pixel_scale,
+                              background, callback)
+
+
 class VectorWorker(QObject):
-    # Signal to inform the ParameterGeneratorWidget that the worker has finished
-    finishedWork = pyqtSignal(numpy.ndarray)
+    # Signal to inform the VisualizationWidget that the worker has finished.
+    # The vector map is None if the generation failed or was cancelled.
+    finishedWork = pyqtSignal(object)
     # Signal to inform the ParameterGeneratorWidget what step the worker is currently working on
     currentStep = pyqtSignal(str)
     # Error message
     errorMessage = pyqtSignal(str)
 
-    def __init__(self, fig, ax, input_array, alpha, thinout, scale,
+    # Signal to inform the VisualizationWidget about the progress of the current step in percent
+    progress = pyqtSignal(int)
+
+    def __init__(self, input_array, alpha, thinout, scale,
                  vector_width, distribution, threshold, colormap,
-                 background_image, value_weighting):
+                 background_image, value_weighting, pixel_scale=1, vector_engine: VectorEngine = None):
         super().__init__()
-        self.fig = fig
-        self.ax = ax
         self.input_array = input_array
         self.alpha = alpha
         self.thinout = thinout
@@ -62,55 +1012,126 @@ class VectorWorker(QObject):
         self.color_map = colormap
         self.value_background = background_image
         self.value_weighting = value_weighting
+        self.pixel_scale = pixel_scale
+        # Reusing the engine of a previous run skips the calculation of the unit vectors
+        if vector_engine is None:
+            vector_engine = VectorEngine(input_array)
+        self.vector_engine = vector_engine
+
+    def report_progress(self, percent: int) -> bool:
+        """
+        Report the progress of the current step.
+
+        Args:
+            percent: The progress in percent.
 
-    def calculate_distribution(self, UnitX, UnitY) -> None:
-        color_map = SLIX._cmd.VisualizeParameter.available_colormaps[self.color_map]
-        SLIX.visualization.unit_vector_distribution(UnitX, UnitY,
-                                                    ax=self.ax,
-                                                    thinout=self.thinout,
-                                                    alpha=self.alpha,
-                                                    scale=self.scale,
-                                                    vector_width=self.vector_width,
-                                                    colormap=color_map,
-                                                    weighting=self.value_weighting)
-
-    def calculate_unit_vectors(self, UnitX, UnitY) -> None:
-        color_map = SLIX._cmd.VisualizeParameter.available_colormaps[self.color_map]
-        SLIX.visualization.unit_vectors(UnitX, UnitY,
-                                        ax=self.ax,
-                                        thinout=self.thinout,
-                                        alpha=self.alpha,
-                                        scale=self.scale,
-                                        vector_width=self.vector_width,
-                                        background_threshold=self.threshold,
-                                        colormap=color_map,
-                                        weighting=self.value_weighting)
+        Returns:
+            False if the user cancelled the generation.
+        """
+        self.progress.emit(percent)
+        return not QThread.currentThread().isInterruptionRequested()
 
     def process(self) -> None:
         vector_image = None
 
         try:
+            color_map = SLIX._cmd.VisualizeParameter.available_colormaps[self.color_map]
             # Generate unit vectors from direction images
             self.currentStep.emit("Generating unit vectors...")
-            UnitX, UnitY = SLIX.toolbox.unit_vectors(self.input_array, use_gpu=False)
+            self.vector_engine.compute_unit_vectors()
             if self.distribution:
                 self.currentStep.emit("Visualizing vector distribution...")
-                self.calculate_distribution(UnitX, UnitY)
             else:
                 self.currentStep.emit("Visualizing unit vectors...")
-                self.calculate_unit_vectors(UnitX, UnitY)
-            if self.value_background is not None:
-                self.ax.imshow(self.value_background, cmap='gray')
-
-            self.fig.subplots_adjust(0, 0, 1, 1)
-            # Convert current plot to NumPy array
-            self.currentStep.emit("Drawing image...")
-            self.fig.canvas.draw()
-            vector_image = numpy.array(self.fig.canvas.buffer_rgba(), dtype=float)
-            vector_image = vector_image[:, :, :3]
-        except ValueError as e:
-            self.errorMessage.emit(f'Could not generate FOM. Check your input files.\n'
+            lines, color_indices = self.vector_engine.segments(self.thinout, self.scale, self.distribution,
+                                                               self.threshold, self.value_weighting)
+            if not QThread.currentThread().isInterruptionRequested():
+                self.currentStep.emit("Drawing image...")
+                vector_image = self.vector_engine.rasterize(lines, color_indices, color_map, self.alpha,
+                                                            self.vector_width, self.pixel_scale,
+                                                            self.value_background, self.report_progress)
+        except (ValueError, IndexError) as e:
+            self.errorMessage.emit(f'Could not generate vector map. Check your input files.\n'
                                    f'Error message:\n{e}')
 
         self.finishedWork.emit(vector_image)
 
+
+class VectorExportWorker(VectorWorker):
+    """
+    Worker class for the export of high resolution vector maps.
+    Instead of returning the vector map, it is streamed strip by strip into a tiled TIFF file.
+    """
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.filename = filename
+
+    def process(self) -> None:
+        filename = None
+
+        try:
+            color_map = SLIX._cmd.VisualizeParameter.available_colormaps[self.color_map]
+            self.currentStep.emit("Generating unit vectors...")
+            self.vector_engine.compute_unit_vectors()
+            lines, color_indices = self.vector_engine.segments(self.thinout, self.scale, self.distribution,
+                                                               self.threshold, self.value_weighting)
+            if not QThread.currentThread().isInterruptionRequested():
+                self.currentStep.emit("Exporting vector map...")
+                if self.vector_engine.export(self.filename, lines, color_indices, color_map, self.alpha,
+                                             self.vector_width, self.pixel_scale, self.value_background,
+                                             callback=self.report_progress):
+                    filename = self.filename
+        except (ValueError, IndexError, OSError) as e:
+            self.errorMessage.emit(f'Could not export vector map.\n'
+                                   f'Error message:\n{e}')
+
+        self.finishedWork.emit(filename)
+
+
+class VectorLevelWorker(QObject):
+    """
+    Worker class for the interactive vector overlay.
+    Calculates the line segments of one thinout level and sorts them by their vertical center,
+    so the vectors inside of a viewport can be found with a binary search.
+    """
+    # Signal with the thinout, the sorted line segments, their color indices and vertical centers.
+    # None if the calculation failed or was cancelled.
+    finishedWork = pyqtSignal(object)
+    # Signal to inform the VectorOverlayWidget what step the worker is currently working on
+    currentStep = pyqtSignal(str)
+    # Error message
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, vector_engine: VectorEngine, thinout: int, threshold: float, weighting=None):
+        """
+        Initialize the worker.
+
+        Args:
+            vector_engine: The engine of the direction map.
+
+            thinout: Number of pixels N x N which are combined to one vector.
+
+            threshold: Fraction of background pixels of a N x N area above which no vector is drawn.
+
+            weighting: Optional 2D weighting of the vector length.
+        """
+        super().__init__()
+        self.vector_engine = vector_engine
+        self.thinout = thinout
+        self.threshold = threshold
+        self.weighting = weighting
+
+    def process(self) -> None:
+        level = None
+        try:
+            self.currentStep.emit("Calculating vectors...")
+            # The length of the vectors matches their distance
+            lines, color_indices = self.vector_engine.segments(self.thinout, self.thinout, False,
+                                                               self.threshold, self.weighting)
+            centers = (lines[:, 1] + lines[:, 3]) / 2
+            order = numpy.argsort(centers, kind='stable')
+            level = (self.thinout, lines[order], color_indices[order], centers[order])
+        except (ValueError, IndexError) as e:
+            self.errorMessage.emit(f'Could not calculate vectors.\n'
+                                   f'Error message:\n{e}')
+        self.finishedWork.emit(level)
@@ -1,3 +1,11 @@
-__all__ = ['Visualization', 'ParameterGenerator']
+__all__ = ['Visualization', 'ParameterGenerator', 'Loader', 'Classification', 'BatchClassification', 'FilterSweep',
+           'ProcessExecution']
 
-from . import ParameterGenerator, Visualization
+import numba
+
+from . import ParameterGenerator, Visualization, Loader, Classification, BatchClassification, FilterSweep, \
+    ProcessExecution
+
+# SLIX uses parallel numba functions in the workers. Numba's thread pool has to be started
+# from the main thread. If it is started from a worker thread first, the process hangs on exit.
+numba.get_num_threads()
@@ -0,0 +1,429 @@
+import collections
+
+import numpy
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QPen, QColor, QPaintEvent, QWheelEvent, QMouseEvent, QResizeEvent
+from PyQt5.QtCore import Qt, QPointF, QRectF
+
+from SLIX.visualization import Colormap
+from .ThreadWorkers.Visualization import VectorEngine, VectorLevelWorker, create_line_array
+from .ThreadWorkers.Loader import LoadingService
+from .MemoryUsage import get_memory_usage
+
+__all__ = ['VectorOverlayWidget']
+
+
+class VectorOverlayWidget(QWidget):
+    """
+    Interactive vector map drawn as vector graphics over a background image.
+    The thinout is chosen automatically from the current zoom and only the vectors inside of
+    the visible viewport are drawn. The vectors of each thinout level are calculated once in
+    the background. Until a level is ready, the closest calculated level is shown.
+    """
+    # Smallest and largest zoom in screen pixels per measurement pixel
+    minimum_zoom = 1 / 256
+    maximum_zoom = 64
+    # Maximum number of bytes of the calculated thinout levels
+    levels_memory_limit = 512 * 2 ** 20
+
+    def __init__(self):
+        super().__init__()
+        self.setMinimumSize(100, 100)
+
+        self.vector_engine = None
+        self.background = None
+
+        self.colormap = Colormap.hsv_black
+        self.alpha = 1
+        self.scale = 1
+        self.vector_width = 1
+        self.threshold = 0
+        self.weighting = None
+        # Minimum distance between two vectors on the screen in pixels
+        self.minimum_spacing = 12
+
+        # Screen pixels per measurement pixel
+        self.zoom = 1.0
+        # Measurement coordinates shown at the upper left corner of the widget
+        self.offset = QPointF(0, 0)
+        self.last_mouse_position = None
+
+        # Calculated thinout levels. Each level consists of the line segments,
+        # their color indices and vertical centers sorted by the vertical centers.
+        # The least recently shown levels are removed when the memory limit is reached.
+        self.levels = collections.OrderedDict()
+        self.requested_level = None
+        self.loading_service = LoadingService(self)
+
+    def __del__(self):
+        self.loading_service.shutdown()
+
+    def set_vector_engine(self, vector_engine: VectorEngine) -> None:
+        """
+        Set the engine of the direction map which will be shown and fit it into the widget.
+
+        Args:
+            vector_engine: The engine of the direction map.
+
+        Returns:
+            None
+        """
+        if vector_engine is self.vector_engine:
+            return
+        self.vector_engine = vector_engine
+        self.clear_levels()
+        self.fit_to_view()
+
+    def set_background(self, background: numpy.ndarray) -> None:
+        """
+        Set the background image.
+
+        Args:
+            background: 2D background image or None for a white background.
+
+        Returns:
+            None
+        """
+        if background is None:
+            self.background = None
+        else:
+            self.background = VectorEngine.background_qimage(background)
+        self.update()
+
+    def set_settings(self, colormap, alpha: float, scale: float, vector_width: float,
+                     threshold: float, weighting: numpy.ndarray = None) -> None:
+        """
+        Set the settings of the vector map.
+
+        Args:
+            colormap: One of the color maps of SLIX.visualization.Colormap.
+
+            alpha: Opacity of the vectors.
+
+            scale: Length of the vectors relative to their distance.
+
+            vector_width: Width of the vectors in screen pixels.
+
+            threshold: Fraction of background pixels of a N x N area above which no vector is drawn.
+
+            weighting: Optional 2D weighting of the vector length.
+
+        Returns:
+            None
+        """
+        # The vectors only have to be calculated again if their positions or lengths changed
+        if threshold != self.threshold or weighting is not self.weighting:
+            self.clear_levels()
+        self.colormap = colormap
+        self.alpha = alpha
+        self.scale = scale
+        self.vector_width = vector_width
+        self.threshold = threshold
+        self.weighting = weighting
+        self.update()
+
+    def clear_levels(self) -> None:
+        """
+        Remove all calculated thinout levels.
+
+        Returns:
+            None
+        """
+        self.levels = collections.OrderedDict()
+        self.requested_level = None
+        self.loading_service.cancel('level')
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the calculated thinout levels and the background.
+
+        Returns:
+            The estimated memory in bytes.
+        """
+        return get_memory_usage(self.levels, self.background)
+
+    def measurement_shape(self) -> (int, int):
+        """
+        Get the height and width of the direction map.
+
+        Returns:
+            Height and width of the direction map.
+        """
+        return self.vector_engine.directions.shape[:2]
+
+    @staticmethod
+    def thinout_for_zoom(zoom: float, minimum_spacing: float, maximum_thinout: int) -> int:
+        """
+        Get the thinout level for a zoom. The levels are powers of two, so they can be
+        reused while zooming.
+
+        Args:
+            zoom: Screen pixels per measurement pixel.
+
+            minimum_spacing: Minimum distance between two vectors on the screen in pixels.
+
+            maximum_thinout: Largest allowed thinout.
+
+        Returns:
+            The smallest thinout which keeps the minimum spacing.
+        """
+        thinout = 1
+        while thinout * zoom < minimum_spacing and thinout * 2 <= maximum_thinout:
+            thinout *= 2
+        return thinout
+
+    @staticmethod
+    def visible_lines(level: tuple, rect: QRectF, margin: float) -> (numpy.ndarray, numpy.ndarray):
+        """
+        Get the line segments of a level whose center lies inside of a rectangle.
+
+        Args:
+            level: The lines, color indices and sorted vertical centers of a thinout level.
+
+            rect: Visible rectangle in measurement coordinates.
+
+            margin: Distance around the rectangle in which the centers are included as well.
+
+        Returns:
+            The visible line segments and their color indices.
+        """
+        lines, color_indices, centers_y = level
+        start, end = numpy.searchsorted(centers_y, [rect.top() - margin, rect.bottom() + margin])
+        lines = lines[start:end]
+        color_indices = color_indices[start:end]
+        centers_x = (lines[:, 0] + lines[:, 2]) / 2
+        visible = (centers_x >= rect.left() - margin) & (centers_x <= rect.right() + margin)
+        return lines[visible], color_indices[visible]
+
+    def current_thinout(self) -> int:
+        """
+        Get the thinout level of the current zoom.
+
+        Returns:
+            The thinout.
+        """
+        height, width = self.measurement_shape()
+        return self.thinout_for_zoom(self.zoom, self.minimum_spacing, max(1, min(height, width)))
+
+    def visible_rect(self) -> QRectF:
+        """
+        Get the visible part of the direction map.
+
+        Returns:
+            The visible rectangle in measurement coordinates.
+        """
+        return QRectF(self.offset.x(), self.offset.y(), self.width() / self.zoom, self.height() / self.zoom)
+
+    def fit_to_view(self) -> None:
+        """
+        Zoom such that the full direction map is visible.
+
+        Returns:
+            None
+        """
+        if self.vector_engine is None:
+            return
+        height, width = self.measurement_shape()
+        self.zoom = min(self.width() / width, self.height() / height)
+        # Pixel centers lie at integer coordinates
+        self.offset = QPointF(-0.5 - (self.width() / self.zoom - width) / 2,
+                              -0.5 - (self.height() / self.zoom - height) / 2)
+        self.update()
+
+    def request_level(self, thinout: int) -> None:
+        """
+        Calculate a thinout level in the background if it was not calculated yet.
+
+        Args:
+            thinout: The thinout.
+
+        Returns:
+            None
+        """
+        if thinout in self.levels or thinout == self.requested_level:
+            return
+        self.requested_level = thinout
+        worker = VectorLevelWorker(self.vector_engine, thinout, self.threshold, self.weighting)
+        self.loading_service.load('level', worker, None, self.set_level)
+
+    def set_level(self, level: tuple) -> None:
+        """
+        Store a calculated thinout level and show it.
+
+        Args:
+            level: The thinout, line segments, color indices and sorted vertical centers.
+
+        Returns:
+            None
+        """
+        thinout, lines, color_indices, centers_y = level
+        self.levels[thinout] = (lines, color_indices, centers_y)
+        self.levels.move_to_end(thinout)
+        # Remove the least recently shown levels, but always keep the newest one
+        while len(self.levels) > 1 and \
+                sum(array.nbytes for entry in self.levels.values() for array in entry) > self.levels_memory_limit:
+            self.levels.popitem(last=False)
+        if self.requested_level == thinout:
+            self.requested_level = None
+        self.update()
+
+    def closest_level(self, thinout: int) -> int:
+        """
+        Get the calculated level closest to a thinout.
+
+        Args:
+            thinout: The wanted thinout.
+
+        Returns:
+            The closest calculated thinout or None if no level was calculated yet.
+        """
+        if len(self.levels) == 0:
+            return None
+        return min(self.levels, key=lambda level: abs(numpy.log2(level) - numpy.log2(thinout)))
+
+    def paintEvent(self, a0: QPaintEvent) -> None:
+        """
+        Draw the visible part of the background and the vectors inside of the viewport.
+
+        Args:
+            a0: The paint event.
+
+        Returns:
+            None
+        """
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if self.vector_engine is None:
+            painter.end()
+            return
+
+        height, width = self.measurement_shape()
+        rect = self.visible_rect()
+        painter.scale(self.zoom, self.zoom)
+        painter.translate(-self.offset)
+
+        if self.background is not None:
+            # Only draw the visible part of the background
+            left = int(max(0, numpy.floor(rect.left() + 0.5)))
+            top = int(max(0, numpy.floor(rect.top() + 0.5)))
+            right = int(min(width, numpy.ceil(rect.right() + 0.5)))
+            bottom = int(min(height, numpy.ceil(rect.bottom() + 0.5)))
+            if right > left and bottom > top:
+                painter.drawImage(QRectF(left - 0.5, top - 0.5, right - left, bottom - top), self.background,
+                                  QRectF(left, top, right - left, bottom - top))
+
+        thinout = self.current_thinout()
+        self.request_level(thinout)
+        shown_thinout = self.closest_level(thinout)
+        if shown_thinout is not None:
+            self.levels.move_to_end(shown_thinout)
+            lines, color_indices = self.visible_lines(self.levels[shown_thinout], rect,
+                                                      shown_thinout * max(1, self.scale))
+            if self.scale != 1:
+                centers = (lines[:, :2] + lines[:, 2:]) / 2
+                half_vectors = (lines[:, 2:] - lines[:, :2]) * (self.scale / 2)
+                lines = numpy.hstack((centers - half_vectors, centers + half_vectors))
+
+            painter.setRenderHint(QPainter.Antialiasing)
+            lookup_table = self.vector_engine.lookup_table(self.colormap)
+            order = numpy.argsort(color_indices, kind='stable')
+            lines = lines[order]
+            bounds = numpy.searchsorted(color_indices[order], numpy.arange(VectorEngine.number_of_colors + 1))
+            for color_index in numpy.flatnonzero(numpy.diff(bounds)):
+                red, green, blue = lookup_table[color_index]
+                pen = QPen(QColor(int(red), int(green), int(blue), int(round(255 * self.alpha))))
+                # The width is given in screen pixels independent of the zoom
+                pen.setCosmetic(True)
+                pen.setWidthF(self.vector_width)
+                pen.setCapStyle(Qt.FlatCap)
+                painter.setPen(pen)
+                painter.drawLines(create_line_array(lines[bounds[color_index]:bounds[color_index + 1]]))
+        painter.end()
+
+    def wheelEvent(self, a0: QWheelEvent) -> None:
+        """
+        Zoom in or out around the mouse cursor.
+
+        Args:
+            a0: The wheel event.
+
+        Returns:
+            None
+        """
+        if self.vector_engine is None:
+            return
+        position = a0.position()
+        # Measurement coordinates under the cursor stay in place
+        anchor = self.offset + position / self.zoom
+        factor = 2 ** (a0.angleDelta().y() / 480)
+        self.zoom = min(self.maximum_zoom, max(self.minimum_zoom, self.zoom * factor))
+        self.offset = anchor - position / self.zoom
+        self.update()
+
+    def mousePressEvent(self, a0: QMouseEvent) -> None:
+        """
+        Start moving the viewport with the left mouse button.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        if a0.button() == Qt.LeftButton:
+            self.last_mouse_position = a0.localPos()
+
+    def mouseMoveEvent(self, a0: QMouseEvent) -> None:
+        """
+        Move the viewport while the left mouse button is pressed.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        if self.last_mouse_position is None:
+            return
+        self.offset -= (a0.localPos() - self.last_mouse_position) / self.zoom
+        self.last_mouse_position = a0.localPos()
+        self.update()
+
+    def mouseReleaseEvent(self, a0: QMouseEvent) -> None:
+        """
+        Stop moving the viewport.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        self.last_mouse_position = None
+
+    def mouseDoubleClickEvent(self, a0: QMouseEvent) -> None:
+        """
+        Show the full direction map again.
+
+        Args:
+            a0: The mouse event.
+
+        Returns:
+            None
+        """
+        self.fit_to_view()
+
+    def resizeEvent(self, a0: QResizeEvent) -> None:
+        """
+        Keep the center of the viewport when the widget is resized.
+
+        Args:
+            a0: The resize event.
+
+        Returns:
+            None
+        """
+        if a0.oldSize().isValid():
+            self.offset -= QPointF(a0.size().width() - a0.oldSize().width(),
+                                   a0.size().height() - a0.oldSize().height()) / (2 * self.zoom)
+        super().resizeEvent(a0)
@@ -1,16 +1,23 @@
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, \
-    QFileDialog, QCheckBox, QPushButton, QProgressDialog, \
+    QFileDialog, QCheckBox, QPushButton, \
     QSizePolicy, QTabWidget, QComboBox, QLabel, QMessageBox, \
-    QDoubleSpinBox
-from PyQt5.QtCore import QCoreApplication, QThread, QLocale, Qt
+    QDoubleSpinBox, QMenu
+from PyQt5.QtCore import QLocale, QObject
+from PyQt5.QtGui import QImage
 
 import SLIX._cmd.VisualizeParameter
 from .ImageWidget import ImageWidget, convert_numpy_to_qimage
-from .ThreadWorkers.Visualization import FOMWorker, VectorWorker
+from .VectorOverlayWidget import VectorOverlayWidget
+from .ColorMapEngine import ColorMapEngine
+from .MemoryUsage import get_memory_usage
+from .DatasetRegistry import DatasetRegistry
+from .ThreadWorkers.Visualization import FOMEngine, FOMWorker, ParameterMapWorker, VectorEngine, VectorWorker, \
+    VectorExportWorker
+from .ThreadWorkers.Loader import ImageLoaderWorker, StackLoaderWorker, PreparationWorker, LoadingService
+from .ThreadWorkers.ProcessExecution import ProcessWorker
 import numpy
 import matplotlib
 import os
-from matplotlib import pyplot as plt
 
 __all__ = ['VisualizationWidget']
 
@@ -27,11 +34,18 @@ class VisualizationWidget(QWidget):
         self.layout = None
         self.sidebar = None
         self.sidebar_tabbar = None
+        self.sidebar_button_unload = None
         self.image_widget = None
+        self.vector_overlay_widget = None
         self.filename = None
         self.dirname = None
+        self.dataset_registry = None
+        # Buttons offering the datasets of the registry
+        self.generated_direction_buttons = []
+        self.parameter_map_button_generated = None
 
         self.parameter_map = None
+        self.parameter_map_engine = None
         self.parameter_map_color_map = None
         self.parameter_map_tab_button_save = None
 
@@ -39,6 +53,7 @@ class VisualizationWidget(QWidget):
         self.inclinations = None
 
         self.fom = None
+        self.fom_engine = None
         self.fom_checkbox_weight_saturation = None
         self.fom_checkbox_weight_value = None
         self.fom_tab_button_generate = None
@@ -48,6 +63,7 @@ class VisualizationWidget(QWidget):
         self.value_weighting = None
 
         self.vector_field = None
+        self.vector_engine = None
         self.vector_checkbox_weight_value = None
         self.vector_tab_alpha_parameter = None
         self.vector_tab_thinout_parameter = None
@@ -56,22 +72,22 @@ class VisualizationWidget(QWidget):
         self.vector_tab_dpi_parameter = None
         self.vector_tab_button_generate = None
         self.vector_tab_save_button = None
+        self.vector_tab_export_button = None
+        self.vector_checkbox_interactive = None
         self.vector_checkbox_activate_distribution = None
         self.vector_tab_threshold_parameter = None
         self.vector_background = None
         self.vector_weighting = None
         self.vector_color_map = None
 
-        self.worker = None
-        self.worker_thread = None
-        self.progress_dialog = None
+        self.loading_service = LoadingService(self)
+        # If True, the FOM and vector maps are generated in a separate process
+        self.separate_process = False
 
         self.setup_ui()
 
     def __del__(self):
-        if self.worker_thread is not None:
-            self.worker_thread.terminate()
-            self.worker_thread.deleteLater()
+        self.loading_service.shutdown()
 
     def setup_ui_image_widget(self) -> None:
         """
@@ -83,6 +99,11 @@ class VisualizationWidget(QWidget):
         self.image_widget = ImageWidget()
         self.image_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
+        # Interactive vector map which replaces the image widget while it is activated
+        self.vector_overlay_widget = VectorOverlayWidget()
+        self.vector_overlay_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.vector_overlay_widget.setVisible(False)
+
     def setup_ui(self) -> None:
         """
         This method sets up the main widget.
@@ -98,9 +119,15 @@ class VisualizationWidget(QWidget):
         self.sidebar_tabbar.addTab(self.setup_parameter_map_tab(), 'Parameter Map')
         self.sidebar.addWidget(self.sidebar_tabbar)
 
+        self.sidebar_button_unload = QPushButton("Unload all")
+        self.sidebar_button_unload.setToolTip("Release the memory of all loaded and generated images.")
+        self.sidebar_button_unload.clicked.connect(self.unload)
+        self.sidebar.addWidget(self.sidebar_button_unload)
+
         self.setup_ui_image_widget()
 
         self.layout.addWidget(self.image_widget, stretch=7)
+        self.layout.addWidget(self.vector_overlay_widget, stretch=7)
         self.layout.addLayout(self.sidebar, stretch=2)
         self.setLayout(self.layout)
 
@@ -117,6 +144,7 @@ class VisualizationWidget(QWidget):
         fom_tab_button_open_measurement = QPushButton("Open Directions")
         fom_tab_button_open_measurement.clicked.connect(self.open_direction)
         fom_tab.layout.addWidget(fom_tab_button_open_measurement)
+        fom_tab.layout.addWidget(self.create_generated_directions_button())
 
         fom_tab_button_open_inclination = QPushButton("Open Inclination")
         fom_tab_button_open_inclination.clicked.connect(self.open_inclination)
@@ -128,6 +156,7 @@ class VisualizationWidget(QWidget):
         self.fom_color_map = QComboBox()
         for cmap in SLIX._cmd.VisualizeParameter.available_colormaps.keys():
             self.fom_color_map.addItem(cmap)
+        self.fom_color_map.currentIndexChanged.connect(self.fom_settings_changed)
         fom_tab.layout.addWidget(self.fom_color_map)
 
         fom_tab.layout.addStretch(1)
@@ -138,6 +167,7 @@ class VisualizationWidget(QWidget):
         fom_tab_button_open_saturation.setEnabled(False)
         fom_tab_button_open_saturation.clicked.connect(self.open_saturation_weighting)
         self.fom_checkbox_weight_saturation.stateChanged.connect(fom_tab_button_open_saturation.setEnabled)
+        self.fom_checkbox_weight_saturation.stateChanged.connect(self.fom_settings_changed)
         fom_tab.layout.addWidget(self.fom_checkbox_weight_saturation)
         fom_tab.layout.addWidget(fom_tab_button_open_saturation)
 
@@ -151,6 +181,7 @@ class VisualizationWidget(QWidget):
         fom_tab.layout.addWidget(self.fom_checkbox_weight_value)
         fom_tab.layout.addWidget(fom_tab_button_open_value)
         self.fom_checkbox_weight_value.stateChanged.connect(fom_tab_button_open_value.setEnabled)
+        self.fom_checkbox_weight_value.stateChanged.connect(self.fom_settings_changed)
 
         fom_tab.layout.addStretch(3)
 
@@ -180,6 +211,7 @@ class VisualizationWidget(QWidget):
         vector_tab_button_open_measurement = QPushButton("Open Directions")
         vector_tab_button_open_measurement.clicked.connect(self.open_direction)
         vector_tab.layout.addWidget(vector_tab_button_open_measurement)
+        vector_tab.layout.addWidget(self.create_generated_directions_button())
 
         vector_tab_button_open_background = QPushButton("Open Background Image")
         vector_tab_button_open_background.clicked.connect(self.open_vector_background)
@@ -241,6 +273,7 @@ class VisualizationWidget(QWidget):
         self.vector_tab_dpi_parameter.setSingleStep(100)
         self.vector_tab_dpi_parameter.setValue(100)
         self.vector_tab_dpi_parameter.setDecimals(0)
+        self.vector_tab_dpi_parameter.setToolTip("100 DPI correspond to one image pixel per measurement pixel.")
         vector_tab.layout.addWidget(self.vector_tab_dpi_parameter)
 
         self.vector_checkbox_activate_distribution = QCheckBox("Activate Distribution")
@@ -257,6 +290,20 @@ class VisualizationWidget(QWidget):
         self.vector_checkbox_activate_distribution.stateChanged.connect(self.vector_tab_threshold_parameter.setDisabled)
         vector_tab.layout.addWidget(self.vector_tab_threshold_parameter)
 
+        self.vector_checkbox_interactive = QCheckBox("Interactive overlay")
+        self.vector_checkbox_interactive.setToolTip("Show the vectors as zoomable overlay. The thinout is chosen "
+                                                    "from the zoom and the scale is relative to the distance "
+                                                    "of the vectors.")
+        self.vector_checkbox_interactive.setEnabled(False)
+        self.vector_checkbox_interactive.stateChanged.connect(self.toggle_vector_overlay)
+        vector_tab.layout.addWidget(self.vector_checkbox_interactive)
+        for control in (self.vector_tab_alpha_parameter, self.vector_tab_scale_parameter,
+                        self.vector_tab_vector_width_parameter, self.vector_tab_threshold_parameter):
+            control.valueChanged.connect(self.update_vector_overlay)
+        self.vector_color_map.currentIndexChanged.connect(self.update_vector_overlay)
+        self.vector_checkbox_weight_value.stateChanged.connect(self.update_vector_overlay)
+        self.vector_checkbox_activate_distribution.stateChanged.connect(self.update_vector_overlay)
+
         vector_tab.layout.addStretch(3)
 
         self.vector_tab_button_generate = QPushButton("Generate")
@@ -269,6 +316,13 @@ class VisualizationWidget(QWidget):
         self.vector_tab_save_button.setEnabled(False)
         vector_tab.layout.addWidget(self.vector_tab_save_button)
 
+        self.vector_tab_export_button = QPushButton("Export high resolution")
+        self.vector_tab_export_button.setToolTip("Render the vector map strip by strip directly into a tiled TIFF "
+                                                 "file. Use this for large measurements or a high DPI.")
+        self.vector_tab_export_button.clicked.connect(self.export_vector)
+        self.vector_tab_export_button.setEnabled(False)
+        vector_tab.layout.addWidget(self.vector_tab_export_button)
+
         vector_tab.setLayout(vector_tab.layout)
         return vector_tab
 
@@ -286,6 +340,15 @@ class VisualizationWidget(QWidget):
         parameter_map_button_open.clicked.connect(self.open_parameter_map)
         parameter_map_tab.layout.addWidget(parameter_map_button_open)
 
+        self.parameter_map_button_generated = QPushButton("Use Generated Parameter Map")
+        self.parameter_map_button_generated.setToolTip("Use a parameter map generated in this session "
+                                                       "without reading its file again.")
+        parameter_map_menu = QMenu(self.parameter_map_button_generated)
+        parameter_map_menu.aboutToShow.connect(lambda: self.populate_parameter_map_menu(parameter_map_menu))
+        self.parameter_map_button_generated.setMenu(parameter_map_menu)
+        self.parameter_map_button_generated.setEnabled(False)
+        parameter_map_tab.layout.addWidget(self.parameter_map_button_generated)
+
         parameter_map_tab.layout.addWidget(QLabel("Color map:"))
         self.parameter_map_color_map = QComboBox()
         for cmap in matplotlib.cm.cmap_d.keys():
@@ -304,6 +367,141 @@ class VisualizationWidget(QWidget):
         parameter_map_tab.setLayout(parameter_map_tab.layout)
         return parameter_map_tab
 
+    def unload(self) -> None:
+        """
+        Release all loaded and generated images. Running jobs are cancelled.
+
+        Returns:
+            None
+        """
+        for name in list(self.loading_service.jobs):
+            self.loading_service.cancel(name)
+
+        self.parameter_map = None
+        self.parameter_map_engine = None
+        self.directions = None
+        self.inclinations = None
+        self.fom = None
+        self.fom_engine = None
+        self.saturation_weighting = None
+        self.value_weighting = None
+        self.vector_field = None
+        self.vector_engine = None
+        self.vector_background = None
+        self.vector_weighting = None
+
+        for button in (self.fom_tab_button_generate, self.fom_tab_save_button, self.vector_tab_button_generate,
+                       self.vector_tab_save_button, self.vector_tab_export_button, self.vector_checkbox_interactive,
+                       self.parameter_map_tab_button_save, self.parameter_map_color_map):
+            button.setEnabled(False)
+        self.vector_checkbox_interactive.setChecked(False)
+        self.vector_overlay_widget.set_vector_engine(None)
+        self.vector_overlay_widget.set_background(None)
+        self.image_widget.clear_image()
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory held by the loaded and generated images, their engines and the shown images.
+
+        Returns:
+            The estimated memory in bytes.
+        """
+        return get_memory_usage(self.parameter_map, self.parameter_map_engine, self.directions, self.inclinations,
+                                self.fom, self.fom_engine, self.saturation_weighting, self.value_weighting,
+                                self.vector_field, self.vector_engine, self.vector_background,
+                                self.vector_weighting) + \
+            self.image_widget.memory_usage() + self.vector_overlay_widget.memory_usage()
+
+    def create_generated_directions_button(self) -> QPushButton:
+        """
+        Create a button offering the directions of the generated datasets.
+
+        Returns:
+            QPushButton: The button with a menu of the datasets.
+        """
+        button = QPushButton("Use Generated Directions")
+        button.setToolTip("Use the directions generated in this session without reading their files again.")
+        menu = QMenu(button)
+        menu.aboutToShow.connect(lambda: self.populate_directions_menu(menu))
+        button.setMenu(menu)
+        button.setEnabled(False)
+        self.generated_direction_buttons.append(button)
+        return button
+
+    def set_dataset_registry(self, dataset_registry: DatasetRegistry) -> None:
+        """
+        Set the registry whose datasets are offered in addition to opening files.
+
+        Args:
+            dataset_registry: The dataset registry of the application.
+
+        Returns:
+            None
+        """
+        self.dataset_registry = dataset_registry
+        self.dataset_registry.datasetsChanged.connect(self.update_dataset_buttons)
+        self.update_dataset_buttons()
+
+    def update_dataset_buttons(self) -> None:
+        """
+        Enable the buttons of the generated datasets if the registry contains matching parameter maps.
+
+        Returns:
+            None
+        """
+        has_directions = any(self.dataset_registry.directions(name) is not None
+                             for name in self.dataset_registry.names())
+        for button in self.generated_direction_buttons:
+            button.setEnabled(has_directions)
+        self.parameter_map_button_generated.setEnabled(len(self.dataset_registry.names()) > 0)
+
+    def populate_directions_menu(self, menu: QMenu) -> None:
+        """
+        List the datasets containing directions in a menu.
+
+        Args:
+            menu: The menu of a generated directions button.
+
+        Returns:
+            None
+        """
+        menu.clear()
+        for name in self.dataset_registry.names():
+            if self.dataset_registry.directions(name) is not None:
+                menu.addAction(name, lambda _=False, name=name:
+                               self.set_directions(self.dataset_registry.directions(name)))
+
+    def populate_parameter_map_menu(self, menu: QMenu) -> None:
+        """
+        List the 2D parameter maps of all datasets in a menu with one submenu per dataset.
+
+        Args:
+            menu: The menu of the generated parameter map button.
+
+        Returns:
+            None
+        """
+        menu.clear()
+        for name in self.dataset_registry.names():
+            dataset_menu = menu.addMenu(name)
+            for parameter, parameter_map in self.dataset_registry.parameter_maps(name).items():
+                if parameter_map.ndim == 2:
+                    dataset_menu.addAction(parameter, lambda _=False, parameter_map=parameter_map:
+                                           self.use_generated_parameter_map(parameter_map))
+
+    def use_generated_parameter_map(self, parameter_map: numpy.ndarray) -> None:
+        """
+        Show a parameter map of the dataset registry.
+
+        Args:
+            parameter_map: The parameter map.
+
+        Returns:
+            None
+        """
+        self.loading_service.load('parameter_map', PreparationWorker(parameter_map, self.prepare_parameter_map),
+                                  'Preparing parameter map...', self.set_parameter_map)
+
     def show_error_message(self, message: str) -> None:
         """
         Shows an error message.
@@ -329,32 +527,28 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename[0])
+        self.loading_service.load('directions', StackLoaderWorker(filename), 'Loading directions...',
+                                  self.set_directions, len(filename))
+
+    def set_directions(self, direction_image: numpy.ndarray) -> None:
+        """
+        Set the loaded direction stack.
 
-        try:
-            direction_image = None
-            filename.sort()
-            for file in filename:
-                # Arrange the direction images in a NumPy stack
-                single_direction_image = SLIX.io.imread(file)
-                if direction_image is None:
-                    direction_image = single_direction_image
-                else:
-                    if len(direction_image.shape) == 2:
-                        direction_image = numpy.stack((direction_image,
-                                                       single_direction_image),
-                                                      axis=-1)
-                    else:
-                        direction_image = numpy.concatenate((direction_image,
-                                                             single_direction_image
-                                                             [:, :, numpy.newaxis]),
-                                                            axis=-1)
-            self.directions = direction_image
-            self.inclinations = None
-            self.fom_tab_button_generate.setEnabled(True)
-            self.vector_tab_button_generate.setEnabled(True)
-        except ValueError as e:
-            QMessageBox.critical(self, 'Error',
-                                 f'Could not load directions. Check your input files. Error message:\n{e}')
+        Args:
+            direction_image: The loaded directions.
+
+        Returns:
+            None
+        """
+        self.directions = direction_image
+        self.inclinations = None
+        self.fom_engine = None
+        self.vector_engine = None
+        self.fom_tab_button_generate.setEnabled(True)
+        self.vector_tab_button_generate.setEnabled(True)
+        self.vector_tab_export_button.setEnabled(True)
+        self.vector_checkbox_interactive.setEnabled(True)
+        self.update_vector_overlay()
 
     def open_inclination(self) -> None:
         """
@@ -372,29 +566,21 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename[0])
+        self.loading_service.load('inclinations', StackLoaderWorker(filename), 'Loading inclinations...',
+                                  self.set_inclinations, len(filename))
 
-        try:
-            inclination_image = None
-            filename.sort()
-            for file in filename:
-                # Arrange the direction images in a NumPy stack
-                single_inclination_image = SLIX.io.imread(file)
-                if inclination_image is None:
-                    inclination_image = single_inclination_image
-                else:
-                    if len(inclination_image.shape) == 2:
-                        inclination_image = numpy.stack((inclination_image,
-                                                         single_inclination_image),
-                                                        axis=-1)
-                    else:
-                        inclination_image = numpy.concatenate((inclination_image,
-                                                               single_inclination_image
-                                                               [:, :, numpy.newaxis]),
-                                                              axis=-1)
-            self.inclinations = inclination_image
-        except ValueError as e:
-            QMessageBox.critical(self, 'Error',
-                                 f'Could not load directions. Check your input files. Error message:\n{e}')
+    def set_inclinations(self, inclination_image: numpy.ndarray) -> None:
+        """
+        Set the loaded inclination stack.
+
+        Args:
+            inclination_image: The loaded inclinations.
+
+        Returns:
+            None
+        """
+        self.inclinations = inclination_image
+        self.fom_engine = None
 
     def open_parameter_map(self) -> None:
         """
@@ -412,8 +598,33 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename)
+        self.loading_service.load('parameter_map', ImageLoaderWorker(filename, self.prepare_parameter_map),
+                                  'Loading parameter map...', self.set_parameter_map)
+
+    @staticmethod
+    def prepare_parameter_map(parameter_map: numpy.ndarray) -> (numpy.ndarray, ColorMapEngine):
+        """
+        Prepare the colorization of a loaded parameter map.
+
+        Args:
+            parameter_map: The loaded parameter map.
+
+        Returns:
+            The parameter map and the colormap engine of the parameter map.
+        """
+        return parameter_map, ColorMapEngine(parameter_map)
+
+    def set_parameter_map(self, parameter_map: (numpy.ndarray, ColorMapEngine)) -> None:
+        """
+        Set the loaded parameter map and show it in the image viewer.
+
+        Args:
+            parameter_map: The loaded parameter map and its colormap engine.
 
-        self.parameter_map = SLIX.io.imread(filename)
+        Returns:
+            None
+        """
+        self.parameter_map, self.parameter_map_engine = parameter_map
         self.parameter_map_tab_button_save.setEnabled(True)
         self.parameter_map_color_map.setEnabled(True)
         self.generate_parameter_map()
@@ -434,7 +645,21 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename)
-        self.saturation_weighting = SLIX.io.imread(filename)
+        self.loading_service.load('saturation_weighting', ImageLoaderWorker(filename),
+                                  'Loading saturation weighting...', self.set_saturation_weighting)
+
+    def set_saturation_weighting(self, saturation_weighting: numpy.ndarray) -> None:
+        """
+        Set the loaded saturation weighting map.
+
+        Args:
+            saturation_weighting: The loaded saturation weighting map.
+
+        Returns:
+            None
+        """
+        self.saturation_weighting = saturation_weighting
+        self.fom_settings_changed()
 
     def open_value_weighting(self) -> None:
         """
@@ -452,7 +677,21 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename)
-        self.value_weighting = SLIX.io.imread(filename)
+        self.loading_service.load('value_weighting', ImageLoaderWorker(filename),
+                                  'Loading value weighting...', self.set_value_weighting)
+
+    def set_value_weighting(self, value_weighting: numpy.ndarray) -> None:
+        """
+        Set the loaded value weighting map.
+
+        Args:
+            value_weighting: The loaded value weighting map.
+
+        Returns:
+            None
+        """
+        self.value_weighting = value_weighting
+        self.fom_settings_changed()
 
     def open_vector_background(self) -> None:
         """
@@ -470,9 +709,37 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename)
-        self.vector_background = SLIX.io.imread(filename)
-        while len(self.vector_background.shape) > 2:
-            self.vector_background = numpy.mean(self.vector_background, axis=-1)
+        self.loading_service.load('vector_background',
+                                  ImageLoaderWorker(filename, self.prepare_vector_background),
+                                  'Loading background image...', self.set_vector_background)
+
+    @staticmethod
+    def prepare_vector_background(vector_background: numpy.ndarray) -> numpy.ndarray:
+        """
+        Reduce a background image to a 2D grayscale image.
+
+        Args:
+            vector_background: The loaded background image.
+
+        Returns:
+            The 2D background image.
+        """
+        while len(vector_background.shape) > 2:
+            vector_background = numpy.mean(vector_background, axis=-1)
+        return vector_background
+
+    def set_vector_background(self, vector_background: numpy.ndarray) -> None:
+        """
+        Set the loaded vector background map.
+
+        Args:
+            vector_background: The prepared background image.
+
+        Returns:
+            None
+        """
+        self.vector_background = vector_background
+        self.vector_overlay_widget.set_background(vector_background)
 
     def open_vector_weighting(self) -> None:
         """
@@ -490,22 +757,47 @@ class VisualizationWidget(QWidget):
         if len(filename) == 0:
             return
         self.dirname = os.path.dirname(filename)
-        # Open and normalize the weighting image
-        self.vector_weighting = SLIX.io.imread(filename)
-        self.vector_weighting = (self.vector_weighting - self.vector_weighting.min()) / (
-                numpy.percentile(self.vector_weighting, 99) - self.vector_weighting.min())
+        self.loading_service.load('vector_weighting',
+                                  ImageLoaderWorker(filename, self.prepare_vector_weighting),
+                                  'Loading vector weighting...', self.set_vector_weighting)
+
+    @staticmethod
+    def prepare_vector_weighting(vector_weighting: numpy.ndarray) -> numpy.ndarray:
+        """
+        Normalize a vector weighting map by its minimum and 99th percentile.
+
+        Args:
+            vector_weighting: The loaded weighting image.
+
+        Returns:
+            The normalized weighting image.
+        """
+        return (vector_weighting - vector_weighting.min()) / (
+                numpy.percentile(vector_weighting, 99) - vector_weighting.min())
+
+    def set_vector_weighting(self, vector_weighting: numpy.ndarray) -> None:
+        """
+        Set the loaded vector weighting map.
+
+        Args:
+            vector_weighting: The normalized weighting image.
+
+        Returns:
+            None
+        """
+        self.vector_weighting = vector_weighting
+        self.update_vector_overlay()
 
     def generate_fom(self) -> None:
         """
         Generate fiber orientation map based on the current settings.
+        Downsampled previews are shown in the image viewer while the FOM is generated.
         The generated FOM is saved in the self.fom attribute and will be
         shown to the user in the image viewer.
 
         Returns:
              None
         """
-        self.fom_tab_button_generate.setEnabled(False)
-
         # If the FOM should be weighted by the saturation weighting,
         # set the parameter saturation_weighting to the loaded image
         if self.fom_checkbox_weight_saturation.isChecked():
@@ -521,35 +813,55 @@ class VisualizationWidget(QWidget):
         # Get the color map which will be used in the FOM generation method.
         color_map = SLIX._cmd.VisualizeParameter.available_colormaps[self.fom_color_map.currentText()]
 
-        # Show a progress bar while the parameter maps are generated
-        if self.progress_dialog:
-            del self.progress_dialog
-        self.progress_dialog = QProgressDialog("Generating...", "Cancel", 0, 0, self)
-        self.progress_dialog.setCancelButton(None)
-        self.progress_dialog.setWindowFlag(Qt.CustomizeWindowHint, True)
-        self.progress_dialog.setWindowFlag(Qt.WindowCloseButtonHint, False)
-        # Move the main workload to another thread to prevent freezing the GUI
-        if self.worker_thread:
-            del self.worker_thread
-            self.worker_thread = None
-        self.worker_thread = QThread()
-        self.worker_thread.setTerminationEnabled(True)
-        if self.worker:
-            del self.worker
-        self.worker = FOMWorker(saturation_weighting, value_weighting, color_map, self.directions, self.inclinations)
-        # Update the progress bar whenever a step is finished
-        self.worker.currentStep.connect(self.progress_dialog.setLabelText)
-        self.worker.finishedWork.connect(self.worker_thread.quit)
-        self.worker.finishedWork.connect(self.set_fom)
-        self.worker.errorMessage.connect(self.show_error_message)
-        self.worker.moveToThread(self.worker_thread)
-        # Show the progress bar
-        self.progress_dialog.show()
-
-        self.worker_thread.started.connect(self.worker.process)
-        self.worker_thread.finished.connect(self.progress_dialog.close)
-        self.progress_dialog.canceled.connect(self.worker_thread.requestInterruption)
-        self.worker_thread.start()
+        # The engine keeps the quantized directions for the next run
+        if self.fom_engine is None:
+            self.fom_engine = FOMEngine(self.directions, self.inclinations)
+        arguments = (saturation_weighting, value_weighting, color_map, self.directions, self.inclinations,
+                     self.fom_engine)
+        worker = self.create_worker(FOMWorker, arguments)
+        fom_engine = self.fom_engine
+        worker.quantized.connect(lambda quantization: self.set_fom_quantization(fom_engine, quantization))
+        # Starting the generation again cancels a running generation with the old settings
+        self.loading_service.load('fom', worker, 'Generating...', self.set_fom, maximum=100,
+                                  preview_slot=self.show_preview)
+
+    def fom_settings_changed(self) -> None:
+        """
+        Restart a running FOM generation with the new settings.
+
+        Returns:
+            None
+        """
+        if self.loading_service.is_loading('fom'):
+            self.generate_fom()
+
+    def set_fom_quantization(self, fom_engine: FOMEngine, quantization: tuple) -> None:
+        """
+        Keep the directions quantized by a FOM generation in a separate process for the next generation.
+
+        Args:
+            fom_engine: The engine which was passed to the generation.
+
+            quantization: The quantization of the engine of the generation as returned by FOMEngine.quantization.
+
+        Returns:
+            None
+        """
+        # The directions might have changed in the meantime
+        if fom_engine is self.fom_engine and not fom_engine.is_quantized:
+            fom_engine.set_quantization(quantization)
+
+    def show_preview(self, preview: numpy.ndarray) -> None:
+        """
+        Show a downsampled preview in the image viewer.
+
+        Args:
+            preview: The preview as NumPy array.
+
+        Returns:
+            None
+        """
+        self.image_widget.set_image(convert_numpy_to_qimage(preview))
 
     def set_fom(self, fom: numpy.ndarray) -> None:
         """
@@ -561,27 +873,37 @@ class VisualizationWidget(QWidget):
         Returns:
             None
         """
-        if self.worker_thread:
-            del self.worker_thread
-            self.worker_thread = None
-
         self.fom = fom
-        if self.fom is not None:
-            self.image_widget.set_image(convert_numpy_to_qimage(self.fom))
-            self.fom_tab_save_button.setEnabled(True)
-        self.fom_tab_button_generate.setEnabled(True)
+        self.image_widget.set_image(convert_numpy_to_qimage(self.fom))
+        self.fom_tab_save_button.setEnabled(True)
 
-    def generate_vector(self) -> None:
+    def create_worker(self, worker_class: type, arguments: tuple) -> QObject:
         """
-        Generate vector map based on the current settings.
+        Create a worker generating a FOM or vector map in this process or in a separate process.
+
+        Args:
+            worker_class: The class of the worker.
+
+            arguments: The positional arguments of the worker.
 
         Returns:
-            None
+            The worker or a ProcessWorker running it in a separate process.
         """
-        # This method only works when a direction is loaded. If not, do nothing.
-        if self.directions is None:
-            return
+        if not self.separate_process:
+            return worker_class(*arguments)
+        if isinstance(arguments[-1], VectorEngine):
+            # The cache of the vector engine can't be transferred. The job process computes its own unit vectors.
+            arguments = arguments[:-1] + (None,)
+        return ProcessWorker(worker_class, arguments,
+                             directory=self.dataset_registry.directory if self.dataset_registry else None)
+
+    def vector_worker_arguments(self) -> tuple:
+        """
+        Collect the arguments of the vector workers from the current settings.
 
+        Returns:
+            The positional arguments of VectorWorker.
+        """
         # Get parameters from interface
         color_map = self.vector_color_map.currentText()
         alpha = self.vector_tab_alpha_parameter.value()
@@ -595,43 +917,109 @@ class VisualizationWidget(QWidget):
         else:
             value_weighting = None
 
-        # Generate either the distrubution of vectors or the vector field
+        # The vector map is drawn with 100 DPI corresponding to one pixel per measurement pixel
+        pixel_scale = self.vector_tab_dpi_parameter.value() / 100
+
+        # The engine keeps the unit vectors for the next run
+        if self.vector_engine is None:
+            self.vector_engine = VectorEngine(self.directions)
+        return (self.directions, alpha, thinout, scale, vector_width,
+                self.vector_checkbox_activate_distribution.isChecked(), threshold,
+                color_map, self.vector_background, value_weighting, pixel_scale,
+                self.vector_engine)
+
+    def toggle_vector_overlay(self) -> None:
+        """
+        Show or hide the interactive vector overlay instead of the image widget.
+
+        Returns:
+            None
+        """
+        interactive = self.vector_checkbox_interactive.isChecked()
+        self.image_widget.setVisible(not interactive)
+        self.vector_overlay_widget.setVisible(interactive)
+        self.update_vector_overlay()
+
+    def update_vector_overlay(self) -> None:
+        """
+        Apply the current vector settings to the interactive vector overlay if it is shown.
+
+        Returns:
+            None
+        """
+        if not self.vector_checkbox_interactive.isChecked() or self.directions is None:
+            return
+        if self.vector_engine is None:
+            self.vector_engine = VectorEngine(self.directions)
+        if self.vector_checkbox_weight_value.isChecked():
+            value_weighting = self.vector_weighting
+        else:
+            value_weighting = None
+        # The overlay always shows the median vectors, so only use the threshold if it is enabled
+        if self.vector_checkbox_activate_distribution.isChecked():
+            threshold = 0
+        else:
+            threshold = self.vector_tab_threshold_parameter.value()
+        self.vector_overlay_widget.set_settings(
+            SLIX._cmd.VisualizeParameter.available_colormaps[self.vector_color_map.currentText()],
+            self.vector_tab_alpha_parameter.value(), self.vector_tab_scale_parameter.value(),
+            self.vector_tab_vector_width_parameter.value(), threshold, value_weighting)
+        self.vector_overlay_widget.set_vector_engine(self.vector_engine)
+
+    def generate_vector(self) -> None:
+        """
+        Generate vector map based on the current settings.
+
+        Returns:
+            None
+        """
+        # This method only works when a direction is loaded. If not, do nothing.
+        if self.directions is None:
+            return
+
+        # Generate either the distribution of vectors or the vector field
         # depending on the selected option. This method might fail if the
         # parameters are not valid or a measurement is missing.
-        # If it fails, show an error message.
-        fig, ax = plt.subplots(dpi=self.vector_tab_dpi_parameter.value())
-
-        # Show a progress bar while the parameter maps are generated
-        if self.progress_dialog:
-            del self.progress_dialog
-        self.progress_dialog = QProgressDialog("Generating...", "Cancel", 0, 0, self)
-        self.progress_dialog.setCancelButton(None)
-        self.progress_dialog.setWindowFlag(Qt.CustomizeWindowHint, True)
-        self.progress_dialog.setWindowFlag(Qt.WindowCloseButtonHint, False)
-
-        # Move the main workload to another thread to prevent freezing the GUI
-        if self.worker_thread:
-            del self.worker_thread
-            self.worker_thread = None
-        self.worker_thread = QThread()
-        self.worker_thread.setTerminationEnabled(True)
-        if self.worker:
-            del self.worker
-        self.worker = VectorWorker(fig, ax, self.directions, alpha, thinout, scale, vector_width,
-                                   self.vector_checkbox_activate_distribution.isChecked(), threshold,
-                                   color_map, self.vector_background, value_weighting)
-        # Update the progress bar whenever a step is finished
-        self.worker.currentStep.connect(self.progress_dialog.setLabelText)
-        self.worker.finishedWork.connect(self.worker_thread.quit)
-        self.worker.finishedWork.connect(self.set_vector)
-        self.worker.errorMessage.connect(self.show_error_message)
-        self.worker.moveToThread(self.worker_thread)
-        # Show the progress bar
-        self.progress_dialog.show()
-
-        self.worker_thread.started.connect(self.worker.process)
-        self.worker_thread.finished.connect(self.progress_dialog.close)
-        self.worker_thread.start()
+        # If it fails, an error message is shown.
+        worker = self.create_worker(VectorWorker, self.vector_worker_arguments())
+        self.loading_service.load('vector', worker, 'Generating...', self.set_vector, maximum=100)
+
+    def export_vector(self) -> None:
+        """
+        Render the vector map based on the current settings strip by strip into a tiled TIFF file.
+        In contrast to generating and saving the vector map, the full vector map is never kept in memory.
+
+        Returns:
+            None
+        """
+        if self.directions is None:
+            return
+
+        if self.dirname:
+            dirname = self.dirname
+        else:
+            dirname = os.path.expanduser('~')
+        filename, _ = QFileDialog.getSaveFileName(self, 'Export Vector Image', dirname, '*.tiff')
+        if len(filename) == 0:
+            return
+        self.dirname = os.path.dirname(filename)
+        if not filename.endswith('.tiff') and not filename.endswith('.tif'):
+            filename += '.tiff'
+
+        worker = self.create_worker(VectorExportWorker, (filename,) + self.vector_worker_arguments())
+        self.loading_service.load('vector_export', worker, 'Exporting...', self.vector_exported, maximum=100)
+
+    def vector_exported(self, filename: str) -> None:
+        """
+        Inform the user that the vector map was exported.
+
+        Args:
+            filename: Path of the exported file.
+
+        Returns:
+            None
+        """
+        QMessageBox.information(self, "Export finished", f"The vector map was exported to {filename}.")
 
     def set_vector(self, image: numpy.ndarray) -> None:
         """
@@ -643,11 +1031,9 @@ class VisualizationWidget(QWidget):
         Returns:
             None
         """
-        if image is not None:
-            self.vector_field = image
-            self.image_widget.set_image(convert_numpy_to_qimage(self.vector_field))
-            self.vector_tab_save_button.setEnabled(True)
-        self.vector_tab_button_generate.setEnabled(True)
+        self.vector_field = image
+        self.image_widget.set_image(convert_numpy_to_qimage(self.vector_field))
+        self.vector_tab_save_button.setEnabled(True)
 
     def generate_parameter_map(self) -> None:
         """
@@ -657,17 +1043,25 @@ class VisualizationWidget(QWidget):
         Returns:
             None
         """
-        # Get color map from matplotlib
-        colormap = matplotlib.cm.get_cmap(self.parameter_map_color_map.currentText())
-        # Normalize the image to the range [0, 1]
-        shown_image = self.parameter_map.copy()
-        shown_image = shown_image.astype(numpy.float32)
-        shown_image = (shown_image - shown_image.min()) / (shown_image.max() - shown_image.min())
-        # Apply colormap on normalized image
-        shown_image = colormap(shown_image)
-        # Convert NumPy RGBA array to RGB array
-        shown_image = shown_image[:, :, :3]
-        self.image_widget.set_image(convert_numpy_to_qimage(shown_image))
+        # The parameter map was already quantized when it was loaded.
+        # Applying the color map is a single lookup table gather, done progressively
+        # from downsampled previews to the full resolution. Changing the color map
+        # cancels the refinement of the previous one.
+        colormap = self.parameter_map_color_map.currentText()
+        self.loading_service.load('parameter_map_preview', ParameterMapWorker(self.parameter_map_engine, colormap),
+                                  None, self.show_parameter_map, preview_slot=self.show_parameter_map)
+
+    def show_parameter_map(self, image: QImage) -> None:
+        """
+        Show the colored parameter map or one of its previews in the image viewer.
+
+        Args:
+            image: The colored parameter map.
+
+        Returns:
+            None
+        """
+        self.image_widget.set_image([image])
 
     def save_fom(self) -> None:
         """
@@ -725,11 +1119,5 @@ class VisualizationWidget(QWidget):
             if not filename.endswith(datatype):
                 filename += datatype
 
-            colormap = matplotlib.cm.get_cmap(self.parameter_map_color_map.currentText())
-            shown_image = self.parameter_map.copy()
-            shown_image = shown_image.astype(numpy.float32)
-            shown_image = (shown_image - shown_image.min()) / (shown_image.max() - shown_image.min())
-            shown_image = colormap(shown_image)
-            # Convert NumPy RGBA array to RGB array
-            shown_image = (255 * shown_image[:, :, :3]).astype(numpy.uint8)
+            shown_image = self.parameter_map_engine.colorize(self.parameter_map_color_map.currentText())
             SLIX.io.imwrite_rgb(filename, shown_image)
@@ -4,6 +4,10 @@ Imaging ToolboX (SLIX).
 """
 __version__ = '1.0.2'
 __all__ = ['MainWindow', 'ClusterWidget', 'ImageWidget', 'VisualizationWidget',
-           'ParameterGeneratorWidget', 'ThreadWorkers']
+           'ParameterGeneratorWidget', 'ThreadWorkers', 'ColorMapEngine', 'VectorOverlayWidget',
+           'MemoryUsage', 'DatasetRegistry', 'ParameterMapCache', 'PreviewCache',
+           'FilterSweepDialog', 'RunManifest']
 
-from . import MainWindow, ClusterWidget, ImageWidget, VisualizationWidget, ParameterGeneratorWidget, ThreadWorkers
+from . import MainWindow, ClusterWidget, ImageWidget, VisualizationWidget, ParameterGeneratorWidget, ThreadWorkers, \
+    ColorMapEngine, VectorOverlayWidget, MemoryUsage, DatasetRegistry, ParameterMapCache, PreviewCache, \
+    FilterSweepDialog, RunManifest
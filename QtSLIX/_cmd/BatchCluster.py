@@ -0,0 +1,78 @@
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+import sys
+
+from QtSLIX.ThreadWorkers.BatchClassification import find_folders, classify_folders, write_summary
+from QtSLIX.ThreadWorkers.Classification import ClassificationEngine
+
+
+def create_argparse() -> ArgumentParser:
+    """
+    Create the parser of the command line arguments.
+
+    Returns:
+        The parser.
+    """
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter,
+                            description='Classification of the parameter maps of a series of sections. '
+                                        'Each folder is classified in its own process.')
+    parser.add_argument('-i', '--input', nargs='+', required=True,
+                        help='Folders of the parameter maps or glob patterns of folders, e.g. "series/*".')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Folder of the written masks. Each section is written into its own subfolder. '
+                             'Defaults to the folder of each section.')
+    parser.add_argument('--summary', default='cluster_summary.csv',
+                        help='CSV file with the fraction of each class of each section.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of sections classified at the same time. Defaults to the number of CPUs.')
+    parser.add_argument('--tiled', action='store_true',
+                        help='Classify the parameter maps tile by tile to reduce the memory usage.')
+    parser.add_argument('--force', action='store_true',
+                        help='Classify all sections, even if their masks are newer than their parameter maps.')
+    parser.add_argument('--threshold', action='append', default=[], metavar='NAME=VALUE',
+                        help='Change a threshold of the classification. Available thresholds: ' +
+                             ', '.join(f'{name} (default {value})'
+                                       for name, value in ClassificationEngine.default_thresholds.items()))
+    masks = parser.add_argument_group('output choice (none = all)')
+    masks.add_argument('--all', action='store_true')
+    masks.add_argument('--inclination', action='store_true')
+    masks.add_argument('--crossing', action='store_true')
+    masks.add_argument('--flat', action='store_true')
+    return parser
+
+
+def main():
+    parser = create_argparse()
+    args = parser.parse_args()
+
+    thresholds = {}
+    for threshold in args.threshold:
+        name, _, value = threshold.partition('=')
+        if name not in ClassificationEngine.default_thresholds:
+            parser.error(f'Unknown threshold {name}')
+        try:
+            thresholds[name] = float(value)
+        except ValueError:
+            parser.error(f'Invalid value of the threshold {name}: {value}')
+
+    masks = [name for flag, name in ((args.flat, 'flat_mask'), (args.crossing, 'crossing_mask'),
+                                     (args.inclination, 'inclined_mask'), (args.all, 'full_mask')) if flag]
+    if len(masks) == 0:
+        masks = ['flat_mask', 'crossing_mask', 'inclined_mask', 'full_mask']
+
+    folders = find_folders(args.input)
+    if len(folders) == 0:
+        print('No folders with all parameter maps required for the classification were found.', file=sys.stderr)
+        return 1
+    print(f'Classifying {len(folders)} sections...')
+
+    def report(row):
+        print(f'{row["status"]:>10}  {row["folder"]}  {row["message"]}')
+
+    rows = classify_folders(folders, masks, args.output, thresholds, args.tiled, args.force, args.workers, report)
+    write_summary(args.summary, rows)
+    print(f'Summary written to {args.summary}')
+    return int(any(row['status'] == 'failed' for row in rows))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
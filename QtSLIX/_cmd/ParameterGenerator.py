@@ -0,0 +1,111 @@
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+import os
+import sys
+
+import SLIX
+
+from QtSLIX.ThreadWorkers.ParameterGenerator import ParameterGeneratorWorker
+
+
+def create_argparse() -> ArgumentParser:
+    """
+    Create the parser of the command line arguments.
+
+    Returns:
+        The parser.
+    """
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter,
+                            description='Generation of the parameter maps of a measurement. A cancelled generation '
+                                        'with the same measurement and settings can be resumed.')
+    parser.add_argument('-i', '--input', required=True, help='Measurement file or folder.')
+    parser.add_argument('-o', '--output', required=True, help='Folder of the generated parameter maps.')
+    parser.add_argument('--filtering', choices=['None', 'Fourier', 'Savitzky-Golay'], default='None',
+                        help='Filtering of the measurement.')
+    parser.add_argument('--filtering_parameters', nargs=2, type=float, default=[0, 0], metavar=('P1', 'P2'),
+                        help='Cutoff frequency and smoothing of the Fourier filter or window length and '
+                             'polynomial order of the Savitzky-Golay filter.')
+    parser.add_argument('--correctdir', type=float, default=0, help='Direction correction in degree.')
+    parser.add_argument('--detailed', action='store_true', help='Generate the detailed parameter maps.')
+    parser.add_argument('--disable_gpu', action='store_true', help='Use the CPU even if a GPU is available.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of parameter maps generated at the same time. Defaults to the number of CPUs.')
+    parser.add_argument('--checkpoints', action='store_true',
+                        help='Record the finished parameter maps and intermediate results, so a cancelled '
+                             'generation can be resumed.')
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument('--resume', action='store_true',
+                        help='Resume a cancelled generation without asking. Implies --checkpoints.')
+    resume.add_argument('--restart', action='store_true',
+                        help='Generate all parameter maps again without asking.')
+    maps = parser.add_argument_group('output choice (none = all)')
+    maps.add_argument('--min', action='store_true')
+    maps.add_argument('--max', action='store_true')
+    maps.add_argument('--avg', action='store_true')
+    maps.add_argument('--direction', action='store_true')
+    maps.add_argument('--nc_direction', action='store_true')
+    maps.add_argument('--peaks', action='store_true')
+    maps.add_argument('--peakwidth', action='store_true')
+    maps.add_argument('--peakdistance', action='store_true')
+    maps.add_argument('--peakprominence', action='store_true')
+    return parser
+
+
+def ask_resume() -> bool:
+    """
+    Ask whether a cancelled generation should be resumed. Without a terminal, the generation is resumed.
+    The parameter maps don't differ from the ones of a new generation.
+
+    Returns:
+        True if the generation should be resumed.
+    """
+    if not sys.stdin.isatty():
+        return True
+    answer = input('A cancelled generation with the same settings was found. Resume it? [Y/n] ')
+    return answer.strip().lower() in ('', 'y', 'yes')
+
+
+def main():
+    parser = create_argparse()
+    args = parser.parse_args()
+
+    outputs = [args.min, args.max, args.avg, args.direction, args.nc_direction, args.peaks, args.peakwidth,
+               args.peakdistance, args.peakprominence]
+    if not any(outputs):
+        outputs = [True] * len(outputs)
+    minimum, maximum, average, direction, nc_direction, peaks, peak_width, peak_distance, peak_prominence = outputs
+
+    os.makedirs(args.output, exist_ok=True)
+    image = SLIX.io.imread(args.input)
+    if image is None:
+        print(f'Could not read {args.input}.', file=sys.stderr)
+        return 1
+    arguments = (args.input, image, args.output, args.filtering, *args.filtering_parameters,
+                 SLIX.toolbox.gpu_available and not args.disable_gpu, args.detailed, minimum, maximum, average,
+                 direction, nc_direction, peaks, peak_width, peak_distance, peak_prominence, args.correctdir)
+
+    checkpoint = args.checkpoints or args.resume
+    resume = False
+    run_parameters = ParameterGeneratorWorker.run_parameters_of(args.filtering, *args.filtering_parameters,
+                                                                args.detailed, args.correctdir)
+    if checkpoint and not args.restart and ParameterGeneratorWorker.find_resumable_manifest(
+            ParameterGeneratorWorker.output_path_name_of(args.input, args.output), args.input,
+            run_parameters) is not None:
+        resume = args.resume or ask_resume()
+    worker = ParameterGeneratorWorker(*arguments, max_workers=args.workers, checkpoint=checkpoint, resume=resume)
+
+    results = []
+    errors = []
+    worker.currentStep.connect(print)
+    worker.errorMessage.connect(errors.append)
+    worker.finishedWork.connect(results.append)
+    worker.process()
+    for error in errors:
+        print(error, file=sys.stderr)
+    if len(errors) > 0 or len(results) == 0 or results[-1] is None:
+        return 1
+    print(f'Parameter maps written to {args.output}')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
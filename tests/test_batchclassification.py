@@ -0,0 +1,97 @@
+import csv
+import os
+
+import numpy
+import pytest
+import SLIX
+
+from QtSLIX.ThreadWorkers import BatchClassification
+
+
+def write_section(folder, seed=0):
+    rng = numpy.random.default_rng(seed)
+    shape = (40, 30)
+    os.makedirs(folder, exist_ok=True)
+    parameter_maps = (rng.integers(0, 7, shape).astype(numpy.uint16), rng.integers(0, 4, shape).astype(numpy.uint16),
+                      rng.random(shape).astype(numpy.float32) * 240, rng.random(shape).astype(numpy.float32))
+    for name, parameter_map in zip(['high_prominence_peaks', 'low_prominence_peaks', 'peakdistance', 'max'],
+                                   parameter_maps):
+        SLIX.io.imwrite(os.path.join(folder, f'section_{name}.tiff'), parameter_map)
+    return parameter_maps
+
+
+@pytest.fixture
+def series(tmp_path):
+    write_section(str(tmp_path / 'section_1'), 1)
+    write_section(str(tmp_path / 'section_2'), 2)
+    os.makedirs(tmp_path / 'empty')
+    return tmp_path
+
+
+class TestBatchClassification:
+    def test_find_folders(self, series):
+        folders = BatchClassification.find_folders([str(series / '*'), str(series / 'section_1')])
+        assert folders == [str(series / 'section_1'), str(series / 'section_2')]
+
+    def test_classify_folder(self, series):
+        folder = str(series / 'section_1')
+        row = BatchClassification.classify_folder(folder, ['full_mask'])
+        assert row['status'] == 'classified'
+        full_mask = SLIX.io.imread(os.path.join(folder, 'section_full_mask.tiff'))
+        assert numpy.array_equal(full_mask, SLIX.classification.full_mask(*write_section(folder + '_copy', 1)))
+        assert row['pixels'] == full_mask.size
+        assert row['flat'] == pytest.approx(numpy.mean(full_mask == 1))
+
+        # The masks are newer than the parameter maps
+        skipped_row = BatchClassification.classify_folder(folder, ['full_mask'])
+        assert skipped_row['status'] == 'skipped'
+        assert skipped_row['flat'] == row['flat']
+        assert BatchClassification.classify_folder(folder, ['full_mask'], force=True)['status'] == 'classified'
+        # The flat mask doesn't exist yet
+        assert BatchClassification.classify_folder(folder, ['flat_mask', 'full_mask'])['status'] == 'classified'
+
+        # Changed thresholds make the masks out of date
+        thresholds = {'crossing_min_signal': 0.8}
+        assert BatchClassification.classify_folder(folder, ['full_mask'], thresholds=thresholds)['status'] == \
+            'classified'
+        assert BatchClassification.classify_folder(folder, ['full_mask'], thresholds=thresholds)['status'] == 'skipped'
+        assert BatchClassification.classify_folder(folder, ['full_mask'])['status'] == 'classified'
+
+        row = BatchClassification.classify_folder(str(series / 'empty'), ['full_mask'])
+        assert row['status'] == 'failed'
+        assert row['message'] != ''
+
+    def test_classify_folders(self, series, tmp_path):
+        folders = BatchClassification.find_folders([str(series / '*')])
+        finished = []
+        rows = BatchClassification.classify_folders(folders, ['full_mask'], tiled=True, max_workers=2,
+                                                    callback=finished.append)
+        assert [row['folder'] for row in rows] == folders
+        assert [row['status'] for row in rows] == ['classified', 'classified']
+        assert len(finished) == 2
+
+        summary = str(tmp_path / 'summary.csv')
+        BatchClassification.write_summary(summary, rows)
+        with open(summary, newline='') as file:
+            summary_rows = list(csv.DictReader(file))
+        assert [row['folder'] for row in summary_rows] == folders
+        assert sum(float(summary_rows[0][name]) for name in
+                   BatchClassification.ClassificationEngine.full_mask_classes) == pytest.approx(1)
+
+    def test_section_output_folders(self, tmp_path):
+        folders = [str(tmp_path / 'series_a' / 'section'), str(tmp_path / 'series_b' / 'section')]
+        output_folders = BatchClassification.section_output_folders(folders, str(tmp_path / 'masks'))
+        # Sections with the same name don't share their output folder
+        assert output_folders == {folders[0]: str(tmp_path / 'masks' / 'series_a' / 'section'),
+                                  folders[1]: str(tmp_path / 'masks' / 'series_b' / 'section')}
+        assert BatchClassification.section_output_folders(folders[:1], str(tmp_path / 'masks')) == \
+            {folders[0]: str(tmp_path / 'masks' / 'section')}
+        assert BatchClassification.section_output_folders(folders) == {folder: folder for folder in folders}
+
+    def test_classify_folders_output(self, series, tmp_path):
+        folders = BatchClassification.find_folders([str(series / '*')])
+        output_folder = str(tmp_path / 'masks')
+        rows = BatchClassification.classify_folders(folders, ['full_mask'], output_folder, max_workers=1)
+        assert [row['status'] for row in rows] == ['classified', 'classified']
+        for name in ('section_1', 'section_2'):
+            assert os.path.isfile(os.path.join(output_folder, name, 'section_full_mask.tiff'))
@@ -0,0 +1,171 @@
+import numpy
+import pytest
+import SLIX
+import tifffile
+
+from QtSLIX.ThreadWorkers import Classification
+
+
+@pytest.fixture
+def parameter_maps():
+    rng = numpy.random.default_rng(0)
+    shape = (50, 60)
+    return (rng.integers(0, 7, shape).astype(numpy.uint16), rng.integers(0, 4, shape).astype(numpy.uint16),
+            rng.random(shape).astype(numpy.float32) * 240, rng.random(shape).astype(numpy.float32))
+
+
+class TestClassificationEngine:
+    def test_masks(self, parameter_maps):
+        high_prominence_peaks, low_prominence_peaks, peakdistance, max_image = parameter_maps
+        engine = Classification.ClassificationEngine(*parameter_maps)
+        masks = engine.evaluate(['flat_mask', 'crossing_mask', 'inclined_mask', 'full_mask'])
+
+        flat_mask = SLIX.classification.flat_mask(high_prominence_peaks, low_prominence_peaks, peakdistance)
+        assert numpy.array_equal(masks['flat_mask'], flat_mask)
+        assert numpy.array_equal(masks['crossing_mask'],
+                                 SLIX.classification.crossing_mask(high_prominence_peaks, max_image))
+        assert numpy.array_equal(masks['inclined_mask'],
+                                 SLIX.classification.inclinated_mask(high_prominence_peaks, peakdistance,
+                                                                     max_image, flat_mask))
+        assert numpy.array_equal(masks['full_mask'], SLIX.classification.full_mask(*parameter_maps))
+
+    def test_masks_are_computed_once(self, parameter_maps, monkeypatch):
+        engine = Classification.ClassificationEngine(*parameter_maps)
+        calls = []
+        compute_flat_mask = engine.compute_flat_mask
+        monkeypatch.setattr(engine, 'compute_flat_mask', lambda: calls.append(1) or compute_flat_mask())
+
+        full_mask = engine.evaluate(['full_mask', 'inclined_mask'])['full_mask']
+        engine.evaluate(['flat_mask'])
+        assert len(calls) == 1
+        assert engine.mask('full_mask') is full_mask
+
+    def test_required_masks(self, parameter_maps):
+        engine = Classification.ClassificationEngine(*parameter_maps)
+        assert engine.required_masks(['inclined_mask']) == ['flat_mask', 'inclined_mask']
+        assert sorted(engine.required_masks(['full_mask', 'flat_mask'])) == \
+            ['crossing_mask', 'flat_mask', 'full_mask', 'inclined_mask']
+
+    def test_thresholds(self, parameter_maps):
+        thresholds = {'flat_min_peakdistance': 130, 'flat_max_peakdistance': 200, 'flat_max_low_prominence_peaks': 2,
+                      'crossing_min_signal': 0.8, 'inclined_min_signal': 1.2, 'inclined_min_peakdistance': 100,
+                      'inclined_max_peakdistance': 160}
+        engine = Classification.ClassificationEngine(*parameter_maps)
+        engine.evaluate(['full_mask'])
+        for name, value in thresholds.items():
+            old_masks = {name: mask.copy() for name, mask in engine.masks.items()}
+            pixels = engine.set_thresholds(**{name: value})
+            # Only the returned pixels were changed
+            for mask_name, mask in engine.masks.items():
+                changed = numpy.flatnonzero(mask != old_masks[mask_name])
+                assert numpy.all(numpy.isin(changed, pixels))
+
+        expected = Classification.ClassificationEngine(*parameter_maps, thresholds=thresholds)
+        for name in ('flat_mask', 'crossing_mask', 'inclined_mask', 'full_mask'):
+            assert numpy.array_equal(engine.mask(name), expected.mask(name))
+        with pytest.raises(ValueError):
+            engine.set_thresholds(unknown=1)
+
+    def test_copy(self, parameter_maps):
+        engine = Classification.ClassificationEngine(*parameter_maps)
+        full_mask = engine.evaluate(['full_mask'])['full_mask'].copy()
+        copied_engine = engine.copy()
+        engine.set_thresholds(flat_min_peakdistance=90)
+        assert numpy.array_equal(copied_engine.mask('full_mask'), full_mask)
+        assert not numpy.array_equal(engine.mask('full_mask'), full_mask)
+
+    def test_save(self, parameter_maps, tmp_path):
+        engine = Classification.ClassificationEngine(*parameter_maps)
+        filenames = {'flat_mask': str(tmp_path / 'flat_mask.tiff'),
+                     'full_mask': str(tmp_path / 'full_mask.tiff')}
+        worker = Classification.ClassificationWorker(engine, filenames)
+        results = []
+        progress = []
+        worker.finishedWork.connect(results.append)
+        worker.progress.connect(progress.append)
+        worker.process()
+
+        assert results == [list(filenames.values())]
+        # The dependencies of the full mask are computed, but only the chosen masks are written
+        assert progress[-1] == 4
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['flat_mask.tiff', 'full_mask.tiff']
+        assert numpy.array_equal(SLIX.io.imread(filenames['full_mask']), SLIX.classification.full_mask(*parameter_maps))
+        assert numpy.array_equal(SLIX.io.imread(filenames['flat_mask']), engine.mask('flat_mask'))
+
+
+class TestTiledClassification:
+    @pytest.mark.parametrize("extension", [".tiff", ".h5", ".nii"])
+    def test_open_parameter_map(self, parameter_maps, tmp_path, extension):
+        filename = str(tmp_path / f'peakdistance{extension}')
+        SLIX.io.imwrite(filename, parameter_maps[2])
+        parameter_map = Classification.open_parameter_map(filename)
+        expected = SLIX.io.imread(filename)
+        assert parameter_map.shape == expected.shape
+        assert numpy.array_equal(parameter_map[5:20, 10:45], expected[5:20, 10:45])
+
+    def test_open_parameter_maps_closes_files(self, parameter_maps, tmp_path):
+        filename = str(tmp_path / 'peakdistance.h5')
+        SLIX.io.imwrite(filename, parameter_maps[2])
+        with Classification.open_parameter_maps([filename, parameter_maps[3]]) as opened_maps:
+            assert isinstance(opened_maps[0], Classification.HDF5ParameterMap)
+            assert opened_maps[1] is parameter_maps[3]
+            assert numpy.array_equal(opened_maps[0][:, :], parameter_maps[2])
+        assert not opened_maps[0].file
+
+    def test_worker_invalid_nifti(self, tmp_path):
+        filename = str(tmp_path / 'peakdistance.nii')
+        with open(filename, 'wb') as file:
+            file.write(b'invalid')
+        worker = Classification.TiledClassificationWorker([filename] * 4, {'full_mask': str(tmp_path / 'mask.tiff')},
+                                                          {})
+        errors = []
+        results = []
+        worker.errorMessage.connect(errors.append)
+        worker.finishedWork.connect(results.append)
+        worker.process()
+        assert len(errors) == 1
+        assert results == [None]
+
+    def test_open_uncompressed_tiff(self, parameter_maps, tmp_path):
+        filename = str(tmp_path / 'peakdistance.tiff')
+        tifffile.imwrite(filename, parameter_maps[2])
+        parameter_map = Classification.open_parameter_map(filename)
+        assert isinstance(parameter_map, numpy.memmap)
+        assert numpy.array_equal(parameter_map, parameter_maps[2])
+
+    def test_evaluate_tiled(self, parameter_maps, tmp_path):
+        thresholds = {'crossing_min_signal': 0.8, 'inclined_min_signal': 1.1}
+        names = ['flat_mask', 'crossing_mask', 'inclined_mask', 'full_mask']
+        filenames = {name: str(tmp_path / f'{name}.tiff') for name in names}
+        progress = []
+        assert Classification.ClassificationEngine.evaluate_tiled(list(parameter_maps), filenames, thresholds,
+                                                                  tile_size=16, callback=progress.append)
+        assert progress[-1] == 100
+
+        engine = Classification.ClassificationEngine(*parameter_maps, thresholds=thresholds)
+        for name in names:
+            assert numpy.array_equal(tifffile.imread(filenames[name]), engine.mask(name))
+
+    def test_evaluate_tiled_cancel(self, parameter_maps, tmp_path):
+        filenames = {'full_mask': str(tmp_path / 'full_mask.tiff')}
+        steps = []
+        assert not Classification.ClassificationEngine.evaluate_tiled(
+            list(parameter_maps), filenames, tile_size=16, callback=lambda progress: len(steps) < 30 and
+            steps.append(progress) is None)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_worker(self, parameter_maps, tmp_path):
+        sources = []
+        for name, parameter_map in zip(['high_prominence_peaks', 'low_prominence_peaks', 'peakdistance', 'max'],
+                                       parameter_maps):
+            sources.append(str(tmp_path / f'{name}.tiff'))
+            SLIX.io.imwrite(sources[-1], parameter_map)
+        filenames = {'full_mask': str(tmp_path / 'full_mask.tiff')}
+        worker = Classification.TiledClassificationWorker(sources, filenames)
+        results = []
+        worker.finishedWork.connect(results.append)
+        worker.process()
+
+        assert results == [[filenames['full_mask']]]
+        assert numpy.array_equal(tifffile.imread(filenames['full_mask']),
+                                 SLIX.classification.full_mask(*parameter_maps))
@@ -0,0 +1,71 @@
+import numpy
+import pytest
+from PyQt5.QtGui import qRed, qGreen, qBlue, qAlpha
+
+from QtSLIX import ColorMapEngine
+
+
+class TestColorMapEngine:
+    def test_quantize(self):
+        image = numpy.linspace(10, 20, 100, dtype=numpy.float32).reshape((10, 10))
+        index_image = ColorMapEngine.ColorMapEngine.quantize(image, chunk_rows=3)
+        assert index_image.dtype == numpy.uint8
+        assert index_image[0, 0] == 0
+        assert index_image[-1, -1] == 254
+        assert numpy.all(numpy.diff(index_image.ravel().astype(int)) >= 0)
+
+    @pytest.mark.parametrize("colormap", ["viridis", "gray", "jet"])
+    def test_colorize_matches_matplotlib(self, colormap):
+        image = numpy.random.default_rng(0).random((20, 30)).astype(numpy.float32) * 100
+        engine = ColorMapEngine.ColorMapEngine(image)
+        rgb = engine.colorize(colormap)
+        assert rgb.shape == (20, 30, 3)
+        assert rgb.dtype == numpy.uint8
+
+        normalized = (image - image.min()) / (image.max() - image.min())
+        colors = ColorMapEngine.get_colormap(colormap).resampled(255)(normalized)
+        expected = (255 * colors[..., :3]).astype(numpy.uint8)
+        assert numpy.abs(rgb.astype(int) - expected.astype(int)).max() <= 1
+
+    def test_to_qimage(self):
+        image = numpy.random.rand(7, 13)
+        engine = ColorMapEngine.ColorMapEngine(image)
+        rgb = engine.colorize("viridis")
+        qimage = engine.to_qimage("viridis")
+        assert qimage.width() == 13
+        assert qimage.height() == 7
+        for y in range(7):
+            for x in range(13):
+                pixel = qimage.pixel(x, y)
+                assert (qRed(pixel), qGreen(pixel), qBlue(pixel)) == tuple(rgb[y, x])
+
+    def test_to_qimage_stride(self):
+        image = numpy.random.rand(17, 13)
+        engine = ColorMapEngine.ColorMapEngine(image)
+        rgb = engine.colorize("viridis")[::4, ::4]
+        qimage = engine.to_qimage("viridis", stride=4)
+        assert (qimage.height(), qimage.width()) == rgb.shape[:2]
+        for y in range(rgb.shape[0]):
+            for x in range(rgb.shape[1]):
+                pixel = qimage.pixel(x, y)
+                assert (qRed(pixel), qGreen(pixel), qBlue(pixel)) == tuple(rgb[y, x])
+
+    def test_nan(self):
+        image = numpy.random.default_rng(2).random((6, 8))
+        image[1, 2] = numpy.nan
+        engine = ColorMapEngine.ColorMapEngine(image)
+        assert engine.index_image[1, 2] == ColorMapEngine.ColorMapEngine.nan_index
+        assert numpy.count_nonzero(engine.index_image == ColorMapEngine.ColorMapEngine.nan_index) == 1
+        assert tuple(engine.colorize("viridis")[1, 2]) == (0, 0, 0)
+        qimage = engine.to_qimage("viridis")
+        assert qAlpha(qimage.pixel(2, 1)) == 0
+        assert qAlpha(qimage.pixel(0, 0)) == 255
+
+    def test_update(self):
+        image = numpy.random.default_rng(1).integers(0, 7, (20, 30))
+        engine = ColorMapEngine.ColorMapEngine(image, value_range=(0, 6))
+        indices = numpy.array([0, 5, 599])
+        image.ravel()[indices] = [6, 0, 3]
+        engine.update(indices, image.ravel()[indices])
+        assert numpy.array_equal(engine.index_image,
+                                 ColorMapEngine.ColorMapEngine.quantize(image, value_range=(0, 6)))
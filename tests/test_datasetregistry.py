@@ -0,0 +1,41 @@
+import numpy
+
+from QtSLIX import DatasetRegistry
+
+
+class TestDatasetRegistry:
+    def test_to_memmap(self, tmp_path):
+        image = numpy.arange(12, dtype=numpy.float32).reshape(3, 4)
+        mapped_image = DatasetRegistry.to_memmap(image, str(tmp_path))
+        assert isinstance(mapped_image, numpy.memmap)
+        assert numpy.array_equal(mapped_image, image)
+        # The array is copied, so the original can be released
+        image[:] = 0
+        assert mapped_image[2, 3] == 11
+
+    def test_to_memmap_missing_directory(self, tmp_path):
+        image = numpy.ones((3, 4))
+        # The array is kept in memory if it cannot be memory mapped
+        assert DatasetRegistry.to_memmap(image, str(tmp_path / 'missing')) is image
+
+    def test_register(self, qtbot):
+        registry = DatasetRegistry.DatasetRegistry()
+        directions = numpy.zeros((5, 5, 3), dtype=numpy.float32)
+        with qtbot.waitSignal(registry.datasetsChanged):
+            registry.register('first', {'directions': directions, 'dir_1': directions[..., 0],
+                                        'peakdistance': numpy.zeros((5, 5))})
+        registry.register('second', {'dir': numpy.zeros((5, 5)), 'max': numpy.zeros((5, 5))})
+        # Empty datasets are ignored
+        registry.register('third', {})
+
+        assert registry.names() == ['first', 'second']
+        assert registry.names(['peakdistance']) == ['first']
+        assert registry.directions('first') is directions
+        assert registry.directions('second').shape == (5, 5)
+        assert registry.memory_usage() == directions.nbytes + 3 * 5 * 5 * 8
+
+        with qtbot.waitSignal(registry.datasetsChanged):
+            registry.remove('first')
+        assert registry.names() == ['second']
+        registry.clear()
+        assert registry.names() == []
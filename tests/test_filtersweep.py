@@ -0,0 +1,68 @@
+import numpy
+import pytest
+import SLIX
+
+from QtSLIX import FilterSweepDialog
+from QtSLIX.ThreadWorkers import FilterSweep, ParameterGenerator
+
+
+def measurement(shape=(12, 10)):
+    rng = numpy.random.default_rng(0)
+    angles = numpy.linspace(0, 2 * numpy.pi, 24, endpoint=False)
+    image = 1 + numpy.cos(2 * (angles - rng.random(shape + (1,)) * numpy.pi)) + 0.2 * rng.random(shape + (24,))
+    return image.astype(numpy.float32)
+
+
+class TestFilterSweep:
+    def test_sweep(self):
+        image = measurement()
+        settings = FilterSweep.sweep_settings('Fourier', [0.1, 0.3], [0.01, 0.025, 0.05])
+        assert len(settings) == 6
+        assert settings[1] == ('Fourier', 0.1, 0.025)
+
+        finished = []
+        results = FilterSweep.sweep(image, settings, 'peakdistance', max_workers=2, callback=finished.append)
+        assert len(finished) == 6
+        assert [(result['parameter_1'], result['parameter_2']) for result in results] == \
+               [setting[1:] for setting in settings]
+        for result, setting in zip(results, settings):
+            filtered = ParameterGenerator.filter_measurement(image, *setting)
+            peaks = SLIX.toolbox.significant_peaks(filtered, use_gpu=False, return_numpy=True)
+            number_of_peaks = numpy.sum(peaks, axis=-1)
+            assert result['mean_peaks'] == pytest.approx(numpy.mean(number_of_peaks))
+            assert result['two_peak_fraction'] == pytest.approx(numpy.mean(number_of_peaks == 2))
+            assert result['parameter_map'].shape == image.shape[:2]
+
+        # The remaining settings are skipped
+        assert len(FilterSweep.sweep(image, settings, 'high_prominence_peaks', max_workers=1,
+                                     callback=lambda result: False)) == 1
+        with pytest.raises(ValueError):
+            FilterSweep.sweep(image, settings[:1], 'unknown')
+
+    def test_worker_and_dialog(self, qtbot):
+        image = measurement((30, 20))
+        settings = FilterSweep.sweep_settings('Savitzky-Golay', [5, 9], [2])
+        worker = FilterSweep.FilterSweepWorker(image, (10, 5, 22, 15), settings, 'dir_1', max_workers=2)
+        results = []
+        progress = []
+        worker.finishedWork.connect(results.append)
+        worker.progress.connect(progress.append)
+        worker.process()
+        assert progress == [1, 2]
+        assert [result['parameter_map'].shape for result in results[0]] == [(12, 10), (12, 10)]
+
+        dialog = FilterSweepDialog.FilterSweepResultsDialog(None, results[0], 'dir_1')
+        qtbot.addWidget(dialog)
+        assert dialog.table.rowCount() == 2
+        dialog.table.selectRow(1)
+        dialog.use_selected_setting()
+        assert dialog.chosen_setting == ('Savitzky-Golay', 9, 2)
+
+        settings_dialog = FilterSweepDialog.FilterSweepDialog(None, 'Fourier')
+        qtbot.addWidget(settings_dialog)
+        settings_dialog.parameters_1.setText('0.1; 0.2, 0.2')
+        settings_dialog.parameters_2.setText('0.05')
+        assert settings_dialog.settings() == [('Fourier', 0.1, 0.05), ('Fourier', 0.2, 0.05)]
+        settings_dialog.parameters_2.setText('')
+        with pytest.raises(ValueError):
+            settings_dialog.settings()
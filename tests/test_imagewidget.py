@@ -113,3 +113,129 @@ class TestImageWidget:
         assert widget.image_scroll_bar.value() == 1
         qtbot.mouseClick(widget.image_scroll_bar, QtCore.Qt.LeftButton)
         assert widget.image_scroll_bar.value() == 2
+
+    def test_prefetch_neighbouring_slices(self, qtbot):
+        image = numpy.zeros((10, 10, 24), dtype=float)
+        image[..., 0] = 1
+        qimage = ImageWidget.convert_numpy_to_qimage(image)
+
+        widget = ImageWidget.ImageWidget()
+        qtbot.addWidget(widget)
+        widget.set_image(qimage)
+
+        # The next and previous slices (wrapping around) are prepared in the background
+        expected_slices = {0, 1, 2, 3, 4, 20, 21, 22, 23}
+        qtbot.waitUntil(lambda: expected_slices.issubset(widget.slice_cache.keys()))
+
+        widget.image_scroll_bar.setValue(10)
+        qtbot.waitUntil(lambda: {6, 7, 8, 9, 10, 11, 12, 13, 14}.issubset(widget.slice_cache.keys()))
+        assert widget.image_label.pixmap() is not None
+
+    def test_playback(self, qtbot):
+        image = numpy.zeros((10, 10, 24), dtype=float)
+        qimage = ImageWidget.convert_numpy_to_qimage(image)
+
+        widget = ImageWidget.ImageWidget()
+        qtbot.addWidget(widget)
+        assert not widget.playback_button.isEnabled()
+        widget.set_image(qimage)
+        assert widget.playback_button.isEnabled()
+
+        widget.playback_fps.setValue(100)
+        qtbot.mouseClick(widget.playback_button, QtCore.Qt.LeftButton)
+        assert widget.playback_timer.isActive()
+        qtbot.waitUntil(lambda: widget.image_scroll_bar.value() > 2)
+        assert "FPS" in widget.playback_label.text()
+
+        qtbot.mouseClick(widget.playback_button, QtCore.Qt.LeftButton)
+        assert not widget.playback_timer.isActive()
+
+    @pytest.mark.parametrize("dtype", [numpy.uint8, numpy.uint16, numpy.float32])
+    def test_quantize_image(self, dtype):
+        image = numpy.arange(100, dtype=dtype).reshape((10, 10))
+        index_image, histogram = ImageWidget.quantize_image(image, chunk_rows=3)
+        assert index_image.shape == image.shape
+        assert histogram.sum() == image.size
+        if dtype == numpy.uint8:
+            assert len(histogram) == 256
+        else:
+            assert len(histogram) == 65536
+        assert index_image.argmin() == 0
+        assert index_image.argmax() == 99
+
+    def test_levels_lookup_table(self):
+        # A single hot pixel should not wash out the image when clipping the upper percentile
+        image = numpy.zeros((10, 10), dtype=numpy.uint16)
+        image[:5] = 100
+        image[0, 0] = 60000
+        _, histogram = ImageWidget.quantize_image(image)
+
+        lookup_table = ImageWidget.levels_lookup_table(histogram, 0, 100)
+        assert lookup_table.dtype == numpy.uint8
+        assert lookup_table[0] == 0
+        assert lookup_table[100] < 5
+        assert lookup_table[60000] == 255
+
+        lookup_table = ImageWidget.levels_lookup_table(histogram, 0, 98)
+        assert lookup_table[0] == 0
+        assert lookup_table[100] == 255
+
+        lookup_table = ImageWidget.levels_lookup_table(histogram, 0, 100, gamma=2)
+        assert lookup_table[30000] > 127
+
+    def test_set_array_levels(self, qtbot):
+        image = numpy.zeros((10, 10, 24), dtype=numpy.uint16)
+        image[0:5] = 100
+        image[0, 0] = 60000
+
+        widget = ImageWidget.ImageWidget()
+        qtbot.addWidget(widget)
+        assert not widget.levels_gamma.isEnabled()
+        widget.set_array(image)
+        assert len(widget.image) == 24
+        assert widget.levels_gamma.isEnabled()
+
+        widget.levels_lower_percentile.setValue(0)
+        widget.levels_upper_percentile.setValue(100)
+        assert qRed(widget.image[0].pixel(1, 1)) < 5
+        widget.levels_upper_percentile.setValue(90)
+        assert qRed(widget.image[0].pixel(1, 1)) == 255
+        assert qRed(widget.image[0].pixel(9, 9)) == 0
+
+        widget.set_image(ImageWidget.convert_numpy_to_qimage(image))
+        assert not widget.levels_gamma.isEnabled()
+
+    def test_select_roi(self, qtbot):
+        widget = ImageWidget.ImageWidget()
+        qtbot.addWidget(widget)
+        widget.resize(400, 400)
+        widget.show()
+        widget.set_array(numpy.random.default_rng(0).random((200, 100, 4)))
+        widget.set_roi_selection_enabled(True)
+
+        def mouse_event(event_type, point):
+            point = widget.image_label.mapTo(widget, widget.pixmap_offset() + point)
+            return QtGui.QMouseEvent(event_type, point, QtCore.Qt.LeftButton, QtCore.Qt.LeftButton,
+                                     QtCore.Qt.NoModifier)
+
+        selection = widget.image_to_pixmap(QtCore.QRect(QtCore.QPoint(10, 20), QtCore.QPoint(50, 80)))
+        with qtbot.waitSignal(widget.roiSelected) as blocker:
+            widget.mousePressEvent(mouse_event(QtCore.QEvent.MouseButtonPress, selection.topLeft()))
+            widget.mouseMoveEvent(mouse_event(QtCore.QEvent.MouseMove, selection.bottomRight()))
+            widget.mouseReleaseEvent(mouse_event(QtCore.QEvent.MouseButtonRelease, selection.bottomRight()))
+        roi = blocker.args[0]
+        assert abs(roi.left() - 10) <= 1 and abs(roi.top() - 20) <= 1
+        assert abs(roi.right() - 50) <= 1 and abs(roi.bottom() - 80) <= 1
+        assert widget.rubber_band.isVisible()
+
+        overlay = QtGui.QImage(roi.width(), roi.height(), QtGui.QImage.Format_RGB32)
+        overlay.fill(QtGui.QColor(255, 0, 0))
+        widget.set_roi_overlay(overlay)
+        center = widget.image_to_pixmap(roi).center()
+        assert QtGui.QColor(widget.pixmap.toImage().pixel(center)) == QtGui.QColor(255, 0, 0)
+
+        # A new image removes the region
+        with qtbot.waitSignal(widget.roiSelected) as blocker:
+            widget.set_array(numpy.zeros((20, 20)))
+        assert blocker.args == [None]
+        assert widget.roi is None
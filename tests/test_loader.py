@@ -0,0 +1,185 @@
+import gc
+import threading
+import time
+import weakref
+
+import numpy
+import pytest
+import SLIX
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QWidget
+
+from QtSLIX.ThreadWorkers import Loader
+
+
+class TestStackLoaderWorker:
+    @pytest.mark.parametrize("number_of_files", [1, 3])
+    def test_load_stack(self, tmp_path, number_of_files):
+        filenames = []
+        for i in range(number_of_files):
+            filename = str(tmp_path / f'dir_{i + 1}.tiff')
+            SLIX.io.imwrite(filename, numpy.full((10, 12), i, dtype=numpy.float32))
+            filenames.append(filename)
+
+        worker = Loader.StackLoaderWorker(list(reversed(filenames)))
+        results = []
+        progress = []
+        worker.finishedWork.connect(results.append)
+        worker.progress.connect(progress.append)
+        worker.process()
+
+        assert len(results) == 1
+        stack = results[0]
+        assert progress[-1] == number_of_files
+        if number_of_files == 1:
+            assert stack.shape == (10, 12)
+        else:
+            assert stack.shape == (10, 12, number_of_files)
+            for i in range(number_of_files):
+                assert numpy.all(stack[..., i] == i)
+
+    def test_shape_mismatch(self, tmp_path):
+        SLIX.io.imwrite(str(tmp_path / 'dir_1.tiff'), numpy.zeros((10, 12), dtype=numpy.float32))
+        SLIX.io.imwrite(str(tmp_path / 'dir_2.tiff'), numpy.zeros((5, 12), dtype=numpy.float32))
+
+        worker = Loader.StackLoaderWorker([str(tmp_path / 'dir_1.tiff'), str(tmp_path / 'dir_2.tiff')])
+        results = []
+        errors = []
+        worker.finishedWork.connect(results.append)
+        worker.errorMessage.connect(errors.append)
+        worker.process()
+
+        assert results == [None]
+        assert len(errors) == 1
+
+    def test_missing_file(self, tmp_path):
+        SLIX.io.imwrite(str(tmp_path / 'dir_1.tiff'), numpy.zeros((10, 12), dtype=numpy.float32))
+
+        worker = Loader.StackLoaderWorker([str(tmp_path / 'dir_1.tiff'), str(tmp_path / 'dir_2.tiff')])
+        results = []
+        errors = []
+        worker.finishedWork.connect(results.append)
+        worker.errorMessage.connect(errors.append)
+        worker.process()
+
+        assert results == [None]
+        assert len(errors) == 1
+
+
+class TestImageLoaderWorker:
+    def test_load_image(self, tmp_path):
+        filename = str(tmp_path / 'image.tiff')
+        SLIX.io.imwrite(filename, numpy.full((10, 12), 2, dtype=numpy.float32))
+
+        worker = Loader.ImageLoaderWorker(filename, lambda image: image * 2)
+        results = []
+        worker.finishedWork.connect(results.append)
+        worker.process()
+
+        assert len(results) == 1
+        assert numpy.all(results[0] == 4)
+
+    def test_missing_file(self, tmp_path):
+        worker = Loader.ImageLoaderWorker(str(tmp_path / 'missing.tiff'))
+        results = []
+        errors = []
+        worker.finishedWork.connect(results.append)
+        worker.errorMessage.connect(errors.append)
+        worker.process()
+
+        assert results == [None]
+        assert len(errors) == 1
+
+
+class TestLoadingService:
+    def test_load(self, qtbot, tmp_path):
+        filename = str(tmp_path / 'image.tiff')
+        SLIX.io.imwrite(filename, numpy.full((10, 12), 2, dtype=numpy.float32))
+
+        widget = QWidget()
+        qtbot.addWidget(widget)
+        service = Loader.LoadingService(widget)
+        results = []
+        service.load('image', Loader.ImageLoaderWorker(filename), 'Loading...', results.append)
+        assert service.is_loading('image')
+        qtbot.waitUntil(lambda: not service.is_loading('image'))
+        assert len(results) == 1
+        assert results[0].shape == (10, 12)
+
+    def test_cancel(self, qtbot, tmp_path):
+        filename = str(tmp_path / 'image.tiff')
+        SLIX.io.imwrite(filename, numpy.full((10, 12), 2, dtype=numpy.float32))
+
+        widget = QWidget()
+        qtbot.addWidget(widget)
+        service = Loader.LoadingService(widget)
+        results = []
+        service.load('image', Loader.ImageLoaderWorker(filename), 'Loading...', results.append)
+        service.cancel('image')
+        assert not service.is_loading('image')
+        qtbot.waitUntil(lambda: len(service.cancelled_jobs) == 0)
+        assert results == []
+
+    def test_discard_stale_results(self, qtbot, tmp_path):
+        filename = str(tmp_path / 'image.tiff')
+        SLIX.io.imwrite(filename, numpy.full((10, 12), 2, dtype=numpy.float32))
+
+        widget = QWidget()
+        qtbot.addWidget(widget)
+        service = Loader.LoadingService(widget)
+        first_results = []
+        second_results = []
+        service.load('image', Loader.ImageLoaderWorker(filename), None, first_results.append)
+        # Restarting the job discards the results of the first one, even if they were already queued
+        service.load('image', Loader.ImageLoaderWorker(filename), None, second_results.append)
+        qtbot.waitUntil(lambda: not service.is_loading('image') and len(service.cancelled_jobs) == 0)
+        assert first_results == []
+        assert len(second_results) == 1
+
+    def test_release_worker(self, qtbot, tmp_path):
+        filename = str(tmp_path / 'image.tiff')
+        SLIX.io.imwrite(filename, numpy.full((10, 12), 2, dtype=numpy.float32))
+
+        widget = QWidget()
+        qtbot.addWidget(widget)
+        service = Loader.LoadingService(widget)
+        worker = Loader.ImageLoaderWorker(filename)
+        worker_reference = weakref.ref(worker)
+        results = []
+        service.load('image', worker, 'Loading...', results.append)
+        del worker
+        qtbot.waitUntil(lambda: not service.is_loading('image'))
+        # The finished worker is no longer referenced by its connections
+        gc.collect()
+        assert worker_reference() is None
+        assert len(results) == 1
+
+    def test_shutdown_timeout(self, qtbot):
+        release = threading.Event()
+
+        class BlockingWorker(QObject):
+            finishedWork = pyqtSignal(object)
+            currentStep = pyqtSignal(str)
+            errorMessage = pyqtSignal(str)
+
+            def process(self):
+                # Ignores the cancellation like a long call into SLIX
+                release.wait(60)
+                self.finishedWork.emit(None)
+
+        widget = QWidget()
+        qtbot.addWidget(widget)
+        service = Loader.LoadingService(widget)
+        service.shutdown_timeout = 200
+        worker = BlockingWorker()
+        service.load('job', worker, None, lambda data: None)
+        thread = service.jobs['job'][1]
+        qtbot.waitUntil(thread.isRunning)
+        start_time = time.perf_counter()
+        service.shutdown()
+        assert time.perf_counter() - start_time < 5
+        assert not service.is_loading('job')
+        # A thread which could not be terminated is kept alive
+        assert thread.isFinished() or (worker, thread) in Loader.LoadingService.abandoned_jobs
+        release.set()
+        assert thread.wait(10000)
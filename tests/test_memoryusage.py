@@ -0,0 +1,85 @@
+import threading
+import time
+
+import numpy
+from PyQt5.QtGui import QImage
+
+from QtSLIX import MemoryUsage
+
+
+class TestMemoryUsage:
+    def test_arrays(self):
+        image = numpy.zeros((10, 10), dtype=numpy.float32)
+        assert MemoryUsage.get_memory_usage(image) == 400
+        # Views and repeated arrays are only counted once
+        assert MemoryUsage.get_memory_usage(image, image[::2], [image, (image.T,)]) == 400
+        assert MemoryUsage.get_memory_usage(image, numpy.zeros(10, dtype=numpy.uint8)) == 410
+        assert MemoryUsage.get_memory_usage(None, 'text', 1) == 0
+
+    def test_objects(self):
+        class Engine:
+            def __init__(self):
+                self.image = numpy.zeros(100, dtype=numpy.uint8)
+                self.cache = {'a': numpy.zeros(50, dtype=numpy.uint8)}
+
+        qimage = QImage(10, 10, QImage.Format_RGB32)
+        engine = Engine()
+        assert MemoryUsage.get_memory_usage(engine, qimage) == 150 + 400
+        assert MemoryUsage.get_memory_usage(engine, engine.image) == 150
+
+    def test_changed_container(self):
+        class ChangedList(list):
+            changes = 1
+
+            def __iter__(self):
+                # Behaves like a list changed by another thread while it is copied
+                if self.changes > 0:
+                    self.changes -= 1
+                    raise RuntimeError('list changed size during iteration')
+                return super().__iter__()
+
+        images = ChangedList([numpy.zeros(100, dtype=numpy.uint8)])
+        assert MemoryUsage.get_memory_usage({'images': images}) == 100
+
+    def test_memmap(self, tmp_path):
+        image = numpy.memmap(str(tmp_path / 'image.raw'), dtype=numpy.float32, mode='w+', shape=(10, 10))
+        assert MemoryUsage.get_memory_usage(image, image[1:]) == 0
+
+    def test_format(self):
+        assert MemoryUsage.format_memory_usage(0) == '0 B'
+        assert MemoryUsage.format_memory_usage(1023) == '1023 B'
+        assert MemoryUsage.format_memory_usage(1536) == '1.5 KiB'
+        assert MemoryUsage.format_memory_usage(3 * 2 ** 30) == '3.0 GiB'
+        assert MemoryUsage.format_memory_usage(2 ** 41) == '2.0 TiB'
+
+    def test_available_memory(self):
+        memory = MemoryUsage.available_memory()
+        assert memory is None or memory > 0
+
+    def test_memory_budget(self):
+        budget = MemoryUsage.MemoryBudget(100)
+        started = []
+        release_first = threading.Event()
+
+        def task(name):
+            started.append(name)
+            if name == 'first':
+                release_first.wait(5)
+
+        first = threading.Thread(target=budget.run, args=(80, task, 'first'))
+        first.start()
+        while 'first' not in started:
+            time.sleep(0.001)
+        # The second task waits until the first one released its memory
+        second = threading.Thread(target=budget.run, args=(80, task, 'second'))
+        second.start()
+        time.sleep(0.05)
+        assert started == ['first']
+        release_first.set()
+        first.join()
+        second.join()
+        assert started == ['first', 'second']
+        assert budget.reserved == 0
+
+        # A single task always runs, even if it exceeds the budget
+        assert budget.run(1000, lambda: 'done') == 'done'
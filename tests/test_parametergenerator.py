@@ -0,0 +1,133 @@
+import os
+
+import numpy
+import pytest
+import SLIX
+
+from QtSLIX.ThreadWorkers import ParameterGenerator
+
+
+def measurement(shape=(16, 12)):
+    rng = numpy.random.default_rng(0)
+    angles = numpy.linspace(0, 2 * numpy.pi, 24, endpoint=False)
+    image = 1 + numpy.cos(2 * (angles - rng.random(shape + (1,)) * numpy.pi)) + 0.2 * rng.random(shape + (24,))
+    return image.astype(numpy.float32)
+
+
+def generate(folder, image, max_workers):
+    worker = ParameterGenerator.ParameterGeneratorWorker(str(folder / 'measurement.tiff'), image, str(folder),
+                                                         'None', 0, 0, False, False, True, True, True, True, True,
+                                                         True, True, True, True, 0, max_workers=max_workers)
+    results = []
+    worker.finishedWork.connect(results.append)
+    worker.process()
+    assert results[-1] is not None
+    return {filename: SLIX.io.imread(str(folder / filename)) for filename in sorted(os.listdir(folder))}
+
+
+def test_filter_measurement(monkeypatch):
+    from SLIX._preparation import _fourier_smoothing
+
+    image = measurement()
+    # Filter a few rows at once
+    monkeypatch.setattr(ParameterGenerator, 'fourier_chunk_size', 3 * 16 * image[0].size)
+    filtered = ParameterGenerator.filter_measurement(image, 'Fourier', 0.2, 0.025)
+    assert filtered.dtype == image.dtype
+    # SLIX filters each line profile on its own
+    for x, y in [(0, 0), (5, 7), (15, 11)]:
+        assert numpy.allclose(filtered[x, y], _fourier_smoothing(image[x, y].astype(numpy.float64), 0.2, 0.025))
+    assert numpy.array_equal(ParameterGenerator.filter_measurement(image, 'Savitzky-Golay', 5, 2),
+                             SLIX.preparation.savitzky_golay_smoothing(image, 5, 2))
+    assert ParameterGenerator.filter_measurement(image, 'None', 0, 0) is image
+
+
+class TestParameterGeneratorWorker:
+    def test_concurrent_stages(self, tmp_path):
+        image = measurement()
+        (tmp_path / 'sequential').mkdir()
+        (tmp_path / 'concurrent').mkdir()
+        sequential = generate(tmp_path / 'sequential', image, 1)
+        concurrent = generate(tmp_path / 'concurrent', image, 4)
+        assert 'measurement_peakprominence.tiff' in sequential
+        assert sequential.keys() == concurrent.keys()
+        for filename in sequential:
+            assert numpy.array_equal(sequential[filename], concurrent[filename], equal_nan=True)
+
+    def test_preview(self):
+        image = measurement()
+        worker = ParameterGenerator.ParameterPreviewWorker('measurement.tiff', image, (2, 3, 10, 12), 'None', 0, 0,
+                                                           False, False, True, False, True, False, True, False,
+                                                           True, False, 0)
+        results = []
+        worker.finishedWork.connect(results.append)
+        worker.process()
+        roi, parameter_maps, seconds = results[-1]
+        assert roi == (2, 3, 10, 12)
+        assert sorted(parameter_maps) == ['dir_1', 'dir_2', 'dir_3', 'high_prominence_peaks',
+                                          'low_prominence_peaks', 'max', 'peakdistance']
+        assert parameter_maps['max'] == pytest.approx(numpy.max(image[2:10, 3:12], axis=-1))
+        assert seconds >= 0
+
+    def test_resume(self, tmp_path, monkeypatch):
+        image = measurement()
+        filename = str(tmp_path / 'measurement.tiff')
+        SLIX.io.imwrite(filename, image)
+        (tmp_path / 'output').mkdir()
+        arguments = (filename, image, str(tmp_path / 'output'), 'Savitzky-Golay', 5, 2, False, False, True, True,
+                     True, True, True, True, True, True, True, 0)
+
+        # The first run is killed while generating the peak width
+        def crash(*args, **kwargs):
+            raise RuntimeError('killed')
+        mean_peak_width = SLIX.toolbox.mean_peak_width
+        monkeypatch.setattr(SLIX.toolbox, 'mean_peak_width', crash)
+        worker = ParameterGenerator.ParameterGeneratorWorker(*arguments, max_workers=1, checkpoint=True)
+        with pytest.raises(RuntimeError):
+            worker.process()
+        monkeypatch.setattr(SLIX.toolbox, 'mean_peak_width', mean_peak_width)
+        assert os.path.isfile(tmp_path / 'output' / 'measurement_manifest.json')
+
+        # Other settings can't resume the run
+        worker = ParameterGenerator.ParameterGeneratorWorker(*arguments[:4], 7, *arguments[5:], checkpoint=True)
+        assert worker.resumable_manifest() is None
+        # The run can be found without a worker
+        output_path_name = ParameterGenerator.ParameterGeneratorWorker.output_path_name_of(filename,
+                                                                                           str(tmp_path / 'output'))
+        run_parameters = ParameterGenerator.ParameterGeneratorWorker.run_parameters_of('Savitzky-Golay', 5, 2,
+                                                                                       False, 0)
+        assert ParameterGenerator.ParameterGeneratorWorker.find_resumable_manifest(output_path_name, filename,
+                                                                                   run_parameters) is not None
+        worker = ParameterGenerator.ParameterGeneratorWorker(*arguments, max_workers=1, checkpoint=True, resume=True,
+                                                             dataset_directory=str(tmp_path))
+        manifest = worker.resumable_manifest()
+        assert 'peakdistance' in manifest.data['completed_maps']
+        assert 'peakwidth' not in manifest.data['completed_maps']
+        assert sorted(manifest.data['checkpoints']) == ['centroids', 'filtered', 'peaks']
+
+        # The resumed run neither filters nor searches the peaks again and only generates the missing maps
+        for function in ('savitzky_golay_smoothing', 'significant_peaks', 'mean_peak_distance'):
+            module = SLIX.preparation if function == 'savitzky_golay_smoothing' else SLIX.toolbox
+            monkeypatch.setattr(module, function, crash)
+        results = []
+        worker.finishedWork.connect(results.append)
+        worker.process()
+        monkeypatch.undo()
+        assert results[-1] is not None
+        assert not os.path.exists(tmp_path / 'output' / 'measurement_checkpoints')
+        assert worker.resumable_manifest() is None
+
+        # The parameter maps equal the ones of an uninterrupted run
+        (tmp_path / 'uninterrupted').mkdir()
+        worker = ParameterGenerator.ParameterGeneratorWorker(*arguments[:2], str(tmp_path / 'uninterrupted'),
+                                                             *arguments[3:], max_workers=1,
+                                                             dataset_directory=str(tmp_path))
+        worker.finishedWork.connect(results.append)
+        worker.process()
+        # The maps read again by the resumed run have the data types of the generated maps
+        resumed_maps, uninterrupted_maps = results[0][1], results[-1][1]
+        assert resumed_maps.keys() == uninterrupted_maps.keys()
+        for name, parameter_map in uninterrupted_maps.items():
+            assert resumed_maps[name].dtype == parameter_map.dtype
+        for name in os.listdir(tmp_path / 'uninterrupted'):
+            assert numpy.array_equal(SLIX.io.imread(str(tmp_path / 'output' / name)),
+                                     SLIX.io.imread(str(tmp_path / 'uninterrupted' / name)), equal_nan=True)
@@ -0,0 +1,59 @@
+import os
+
+import numpy
+import SLIX
+
+from QtSLIX import ParameterMapCache
+
+
+def write_parameter_maps(folder, parameters, value=1):
+    for parameter in parameters:
+        SLIX.io.imwrite(str(folder / f'measurement_{parameter}.tiff'), numpy.full((4, 5), value, dtype=numpy.float32))
+
+
+class TestParameterMapCache:
+    def test_find_files(self, tmp_path):
+        write_parameter_maps(tmp_path, ['high_prominence_peaks', 'low_prominence_peaks', 'peakdistance',
+                                        'peakdistance_detailed', 'max', 'avg'])
+        (tmp_path / 'notes_max.txt').write_text('')
+
+        filenames, basename = ParameterMapCache.ParameterMapCache.find_files(
+            str(tmp_path), ParameterMapCache.ParameterMapCache.classification_parameters)
+        assert basename == 'measurement_basename'
+        assert sorted(filenames) == sorted(ParameterMapCache.ParameterMapCache.classification_parameters)
+        # Detailed parameter maps and other files are ignored
+        assert filenames['peakdistance'].endswith('measurement_peakdistance.tiff')
+        assert filenames['max'].endswith('measurement_max.tiff')
+
+    def test_load(self, tmp_path):
+        write_parameter_maps(tmp_path, ['high_prominence_peaks', 'peakdistance', 'avg'])
+        cache = ParameterMapCache.ParameterMapCache()
+
+        parameter_maps, _ = cache.load(str(tmp_path))
+        # Only the requested parameter maps are read, missing ones are left out
+        assert sorted(parameter_maps) == ['high_prominence_peaks', 'peakdistance']
+        assert len(cache.parameter_maps) == 2
+
+        # Unchanged files are not read again
+        cached_parameter_maps, _ = cache.load(str(tmp_path))
+        assert cached_parameter_maps['peakdistance'] is parameter_maps['peakdistance']
+
+    def test_modified_file(self, tmp_path):
+        write_parameter_maps(tmp_path, ['max'])
+        filename = str(tmp_path / 'measurement_max.tiff')
+        cache = ParameterMapCache.ParameterMapCache()
+        parameter_map = cache.get(filename)
+
+        write_parameter_maps(tmp_path, ['max'], value=2)
+        status = os.stat(filename)
+        os.utime(filename, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+        modified_parameter_map = cache.get(filename)
+        assert modified_parameter_map is not parameter_map
+        assert numpy.all(modified_parameter_map == 2)
+
+    def test_cache_limit(self, tmp_path):
+        write_parameter_maps(tmp_path, ['max', 'peakdistance'])
+        cache = ParameterMapCache.ParameterMapCache(cache_limit=1)
+        cache.load(str(tmp_path))
+        # Only the most recently read parameter map is kept
+        assert len(cache.parameter_maps) == 1
@@ -0,0 +1,67 @@
+import os
+
+import numpy
+import SLIX
+
+from QtSLIX import PreviewCache
+from QtSLIX.ImageWidget import LevelsImageStack
+
+
+def write_measurement(filename, shape=(300, 200, 24), seed=0):
+    image = numpy.random.default_rng(seed).random(shape).astype(numpy.float32)
+    SLIX.io.imwrite(filename, image)
+    return image
+
+
+class TestPreviewCache:
+    def test_put_get(self, tmp_path):
+        filename = str(tmp_path / 'measurement.tiff')
+        image = write_measurement(filename)
+        cache = PreviewCache.PreviewCache(str(tmp_path / 'cache'))
+        assert cache.get(filename) is None
+
+        stack = LevelsImageStack(image)
+        cache.preview_size = 128
+        cache.put(filename, stack.index_image, stack.histogram)
+        preview = cache.get(filename)
+        assert preview['shape'] == stack.index_image.shape
+        assert numpy.array_equal(preview['histogram'], stack.histogram)
+        # Strided levels from fine to coarse, the finest one is not larger than the preview size
+        assert [level.shape for level in preview['levels']] == [(100, 67, 24), (50, 34, 24), (25, 17, 24)]
+        assert numpy.array_equal(preview['levels'][1], stack.index_image[::6, ::6])
+        assert cache.choose_level(preview, 30, 40).shape == (50, 34, 24)
+        assert cache.choose_level(preview, 400, 300).shape == (100, 67, 24)
+
+        preview_stack = LevelsImageStack.from_index_image(preview['levels'][0], preview['histogram'])
+        assert numpy.array_equal(preview_stack.lookup_table, stack.lookup_table)
+
+        # The preview is invalid after the measurement changed
+        os.utime(filename, ns=(0, 0))
+        assert cache.get(filename) is None
+
+    def test_evict(self, tmp_path):
+        cache = PreviewCache.PreviewCache(str(tmp_path / 'cache'))
+        filenames = []
+        for index in range(3):
+            filenames.append(str(tmp_path / f'measurement_{index}.tiff'))
+            stack = LevelsImageStack(write_measurement(filenames[-1], seed=index))
+            cache.put(filenames[-1], stack.index_image, stack.histogram)
+            # Make sure that the modification times of the previews differ
+            os.utime(cache.path(filenames[-1]), ns=(index * 10 ** 9, index * 10 ** 9))
+        assert len(cache.files()) == 3
+
+        # Reading a preview marks it as recently used
+        assert cache.get(filenames[0]) is not None
+        cache.cache_limit = cache.memory_usage() - 1
+        cache.evict()
+        assert cache.get(filenames[1]) is None
+        assert cache.get(filenames[0]) is not None
+        assert cache.get(filenames[2]) is not None
+
+        # The newest preview is kept even if it is larger than the cache limit
+        cache.cache_limit = 0
+        cache.evict(keep=cache.path(filenames[2]))
+        assert [entry.path for entry in cache.files()] == [cache.path(filenames[2])]
+
+        cache.clear()
+        assert cache.files() == []
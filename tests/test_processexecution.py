@@ -0,0 +1,151 @@
+import os
+import time
+
+import numpy
+import SLIX
+from PyQt5.QtCore import QObject, QThread, Qt, pyqtSignal
+
+from QtSLIX.ThreadWorkers import ProcessExecution
+from QtSLIX.ThreadWorkers.Visualization import FOMEngine, FOMWorker
+
+
+class SleepWorker(QObject):
+    finishedWork = pyqtSignal(object)
+    currentStep = pyqtSignal(str)
+    errorMessage = pyqtSignal(str)
+
+    def __init__(self, filename, seconds):
+        super().__init__()
+        self.filename = filename
+        self.seconds = seconds
+
+    def process(self):
+        with open(self.filename, 'w') as file:
+            file.write(str(os.getpid()))
+        self.currentStep.emit("Sleeping...")
+        time.sleep(self.seconds)
+        self.finishedWork.emit(self.seconds)
+
+
+class CrashWorker(SleepWorker):
+    def process(self):
+        os._exit(3)
+
+
+class JobThread(QThread):
+    def __init__(self, worker):
+        super().__init__()
+        self.worker = worker
+
+    def run(self):
+        self.worker.process()
+
+
+def connect(worker):
+    signals = {'finishedWork': [], 'currentStep': [], 'errorMessage': [], 'quantized': []}
+    for name, values in signals.items():
+        # There is no event loop which could deliver signals emitted in other threads
+        getattr(worker, name).connect(values.append, Qt.DirectConnection)
+    return signals
+
+
+class TestSharedArrays:
+    def test_dump_load(self, tmp_path):
+        large = numpy.arange(100000, dtype=numpy.float32).reshape(200, 500)
+        small = numpy.arange(10)
+        data = ProcessExecution.dump_shared({'large': large[:, ::2], 'small': small, 'name': 'test'}, str(tmp_path))
+        # Only the large array is written into a file, the pickled data only contains its description
+        assert len(os.listdir(tmp_path)) == 1
+        assert len(data) < large.nbytes // 10
+
+        result = ProcessExecution.load_shared(data)
+        assert isinstance(result['large'], numpy.memmap)
+        assert numpy.array_equal(result['large'], large[:, ::2])
+        assert numpy.array_equal(result['small'], small)
+        assert result['name'] == 'test'
+        assert os.listdir(tmp_path) == []
+
+
+class TestProcessWorker:
+    def test_fom(self, tmp_path):
+        directions = numpy.random.default_rng(0).random((100, 80, 1)).astype(numpy.float32) * 180
+        inclinations = numpy.zeros_like(directions)
+        color_map = SLIX._cmd.VisualizeParameter.available_colormaps['rgb']
+
+        expected = []
+        local_worker = FOMWorker(None, None, color_map, directions, inclinations)
+        local_worker.finishedWork.connect(expected.append)
+        local_worker.process()
+
+        worker = ProcessExecution.ProcessWorker(FOMWorker, (None, None, color_map, directions, inclinations),
+                                                directory=str(tmp_path))
+        signals = connect(worker)
+        worker.process()
+        assert signals['errorMessage'] == []
+        assert "Generating FOM..." in signals['currentStep']
+        assert numpy.array_equal(signals['finishedWork'][0], expected[0])
+        # The quantized directions are sent back for the next generation
+        for received, expected_array in zip(signals['quantized'][0], local_worker.fom_engine.quantization()):
+            assert numpy.array_equal(received, expected_array)
+        # The files of the job are removed
+        assert os.listdir(tmp_path) == []
+
+    def test_fom_quantization_reused(self, tmp_path):
+        rng = numpy.random.default_rng(1)
+        directions = rng.random((60, 50, 3)).astype(numpy.float32) * 180
+        directions[rng.random(directions.shape) < 0.3] = -1
+        color_map = SLIX._cmd.VisualizeParameter.available_colormaps['hsvBlack']
+
+        expected = []
+        local_worker = FOMWorker(None, None, color_map, directions, None)
+        local_worker.finishedWork.connect(expected.append)
+        local_worker.process()
+
+        # The first generation runs in the job process and quantizes a copy of the engine
+        engine = FOMEngine(directions)
+        worker = ProcessExecution.ProcessWorker(FOMWorker, (None, None, color_map, directions, None, engine),
+                                                directory=str(tmp_path))
+        signals = connect(worker)
+        worker.process()
+        assert signals['errorMessage'] == []
+        assert not engine.is_quantized
+        engine.set_quantization(signals['quantized'][0])
+        assert engine.number_of_valid_directions is not None
+
+        # The second generation reuses the quantization in this process
+        results = []
+        errors = []
+        worker = FOMWorker(None, None, color_map, directions, None, engine)
+        worker.finishedWork.connect(results.append)
+        worker.errorMessage.connect(errors.append)
+        worker.process()
+        assert errors == []
+        assert numpy.array_equal(results[0], expected[0])
+        assert numpy.array_equal(signals['finishedWork'][0], expected[0])
+
+    def test_crash(self, tmp_path):
+        worker = ProcessExecution.ProcessWorker(CrashWorker, (str(tmp_path / 'pid'), 0))
+        signals = connect(worker)
+        worker.process()
+        assert signals['finishedWork'] == [None]
+        assert len(signals['errorMessage']) == 1
+        assert 'exit code 3' in signals['errorMessage'][0]
+
+    def test_cancel(self, tmp_path):
+        pid_file = tmp_path / 'pid'
+        worker = ProcessExecution.ProcessWorker(SleepWorker, (str(pid_file), 60))
+        signals = connect(worker)
+        thread = JobThread(worker)
+        thread.start()
+        # Wait until the job process runs the worker
+        for _ in range(600):
+            if pid_file.exists() and pid_file.read_text():
+                break
+            time.sleep(0.1)
+        start_time = time.perf_counter()
+        thread.requestInterruption()
+        assert thread.wait(10000)
+        assert time.perf_counter() - start_time < 5
+        assert signals['finishedWork'] == [None]
+        assert signals['errorMessage'] == []
+        assert worker.job_process.exitcode is not None
@@ -0,0 +1,66 @@
+import numpy
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QColor
+
+from QtSLIX.VectorOverlayWidget import VectorOverlayWidget
+from QtSLIX.ThreadWorkers.Visualization import VectorEngine, VectorLevelWorker
+
+
+class TestVectorOverlayWidget:
+    def test_thinout_for_zoom(self):
+        assert VectorOverlayWidget.thinout_for_zoom(16, 12, 1024) == 1
+        assert VectorOverlayWidget.thinout_for_zoom(1, 12, 1024) == 16
+        assert VectorOverlayWidget.thinout_for_zoom(0.01, 12, 1024) == 1024
+        assert VectorOverlayWidget.thinout_for_zoom(0.01, 12, 100) == 64
+
+    def test_visible_lines(self):
+        engine = VectorEngine(numpy.zeros((100, 100), dtype=numpy.float32))
+        worker = VectorLevelWorker(engine, 4, 0)
+        levels = []
+        worker.finishedWork.connect(levels.append)
+        worker.process()
+        thinout, lines, color_indices, centers_y = levels[0]
+        assert thinout == 4
+        assert numpy.all(numpy.diff(centers_y) >= 0)
+
+        visible, visible_colors = VectorOverlayWidget.visible_lines((lines, color_indices, centers_y),
+                                                                    QRectF(10, 20, 30, 10), 0)
+        centers = (visible[:, :2] + visible[:, 2:]) / 2
+        assert len(visible) == len(visible_colors) == 8 * 3
+        assert numpy.all((centers[:, 0] >= 10) & (centers[:, 0] <= 40))
+        assert numpy.all((centers[:, 1] >= 20) & (centers[:, 1] <= 30))
+
+    def test_levels_memory_limit(self, qtbot):
+        widget = VectorOverlayWidget()
+        qtbot.addWidget(widget)
+        lines = numpy.zeros((100, 4))
+        level_size = lines.nbytes + 100 + 100 * 8
+        widget.levels_memory_limit = 2 * level_size
+        for thinout in (1, 2):
+            widget.set_level((thinout, lines, numpy.zeros(100, dtype=numpy.uint8), numpy.zeros(100)))
+        # Showing a level keeps it, the least recently shown level is removed
+        widget.levels.move_to_end(1)
+        widget.set_level((4, lines, numpy.zeros(100, dtype=numpy.uint8), numpy.zeros(100)))
+        assert list(widget.levels) == [1, 4]
+
+    def test_paint(self, qtbot):
+        directions = numpy.full((64, 64), 90, dtype=numpy.float32)
+        widget = VectorOverlayWidget()
+        qtbot.addWidget(widget)
+        widget.resize(256, 256)
+        widget.set_vector_engine(VectorEngine(directions))
+        assert widget.zoom == 4
+
+        # Zoomed out, vectors are combined. Painting requests the level.
+        widget.grab()
+        qtbot.waitUntil(lambda: widget.current_thinout() in widget.levels)
+        image = widget.grab().toImage()
+        assert widget.current_thinout() == 4
+        colors = {QColor(image.pixel(x, 128)).name() for x in range(256)}
+        assert len(colors) > 1
+
+        # Zooming in switches to a finer level
+        widget.zoom = 16
+        widget.update()
+        widget.grab()
+        qtbot.waitUntil(lambda: 1 in widget.levels)
@@ -0,0 +1,291 @@
+import os
+
+import numpy
+import pytest
+import SLIX
+import tifffile
+from SLIX.visualization import Colormap
+
+from QtSLIX.ThreadWorkers import Visualization
+
+
+class TestFOMEngine:
+    @pytest.mark.parametrize("shape", [(20, 30), (20, 30, 3)])
+    @pytest.mark.parametrize("colormap", [Colormap.hsv_black, Colormap.rgb])
+    @pytest.mark.parametrize("use_inclination", [False, True])
+    @pytest.mark.parametrize("use_weighting", [False, True])
+    def test_matches_slix(self, shape, colormap, use_inclination, use_weighting):
+        rng = numpy.random.default_rng(0)
+        directions = rng.uniform(0, 180, shape).astype(numpy.float32)
+        directions[rng.random(shape) < 0.2] = -1
+        if len(shape) == 3:
+            # Valid directions come first
+            directions = -numpy.sort(-directions, axis=-1)
+        inclinations = rng.uniform(-60, 60, shape[:2]).astype(numpy.float32) if use_inclination else None
+        saturation = rng.random(shape[:2]) if use_weighting else None
+        value = rng.random(shape[:2]) if use_weighting else None
+
+        expected = SLIX.visualization.direction(directions.copy(),
+                                                inclination=None if inclinations is None else inclinations.copy(),
+                                                saturation=saturation, value=value, colormap=colormap)
+        engine = Visualization.FOMEngine(directions, inclinations)
+        assert engine.quantize(chunk_rows=7)
+        fom = engine.generate(colormap, saturation, value, chunk_rows=7)
+
+        assert fom.shape == expected.shape
+        assert fom.dtype == numpy.uint8
+        assert numpy.abs(fom.astype(int) - expected.astype(int)).max() <= 3
+
+    def test_cancel(self):
+        engine = Visualization.FOMEngine(numpy.zeros((20, 30), dtype=numpy.float32))
+        assert not engine.quantize(chunk_rows=5, callback=lambda progress: False)
+        assert not engine.is_quantized
+
+        progress = []
+        assert engine.quantize(chunk_rows=5, callback=lambda percent: progress.append(percent) or True)
+        assert progress == [25, 50, 75, 100]
+        assert engine.generate(Colormap.hsv_black, chunk_rows=5, callback=lambda percent: False) is None
+
+    @pytest.mark.parametrize("shape", [(20, 30), (20, 30, 3)])
+    def test_stride(self, shape):
+        rng = numpy.random.default_rng(0)
+        directions = rng.uniform(0, 180, shape).astype(numpy.float32)
+        value = rng.random(shape[:2])
+        engine = Visualization.FOMEngine(directions)
+        assert engine.quantize()
+
+        fom = engine.generate(Colormap.hsv_black, value=value)
+        preview = engine.generate(Colormap.hsv_black, value=value, chunk_rows=2, stride=4)
+        if len(shape) == 3:
+            # Each pixel is shown as a 2x2 square
+            expected = fom.reshape(20, 2, 30, 2, 3)[::4, :, ::4].reshape(10, 16, 3)
+        else:
+            expected = fom[::4, ::4]
+        assert numpy.array_equal(preview, expected)
+
+    def test_lookup_table_cache(self, monkeypatch):
+        monkeypatch.setattr(Visualization.FOMEngine, 'lookup_tables', Visualization.collections.OrderedDict())
+        monkeypatch.setattr(Visualization.FOMEngine, 'lookup_tables_size', 2)
+        engine = Visualization.FOMEngine(numpy.zeros((4, 4), dtype=numpy.float32))
+        rgb = engine.lookup_table(Colormap.rgb)
+        engine.lookup_table(Colormap.hsv_black)
+        assert engine.lookup_table(Colormap.rgb) is rgb
+        # The least recently used lookup table is removed
+        engine.lookup_table(Colormap.hsv_white)
+        assert [key[0] for key in engine.lookup_tables] == [Colormap.rgb, Colormap.hsv_white]
+
+
+def test_get_preview_strides():
+    assert Visualization.get_preview_strides((2000, 3000)) == [16, 4]
+    assert Visualization.get_preview_strides((500, 3000, 3)) == [4]
+    assert Visualization.get_preview_strides((100, 100)) == []
+
+
+def test_downsample():
+    # Median of the valid pixels of each area, the background is ignored
+    image = numpy.array([[1, 2, 3, 0],
+                         [0, 0, 0, 0],
+                         [1, 2, 0, 5],
+                         [3, 4, 0, 0]], dtype=numpy.float32)
+    assert numpy.array_equal(Visualization.downsample(image, 2), [[1.5, 3], [2.5, 5]])
+    assert numpy.array_equal(Visualization.downsample(image[:1, :3], 3), [[2]])
+    # Areas with too few valid pixels are background
+    assert numpy.array_equal(Visualization.downsample(image, 2, background_threshold=0.5), [[1.5, 0], [2.5, 0]])
+
+    rng = numpy.random.default_rng(0)
+    image = rng.uniform(-1, 1, (23, 17, 3)).astype(numpy.float32)
+    image[rng.random(image.shape) < 0.3] = 0
+    result = Visualization.downsample(image, 5)
+    area = image[5:10, 15:17, 1]
+    assert result[1, 3, 1] == pytest.approx(numpy.median(area[area != 0]))
+    # The dimensions are kept
+    assert result.shape == (5, 4, 3)
+    assert Visualization.downsample(image[..., :1], 5).shape == (5, 4, 1)
+    assert Visualization.downsample(image[..., 0], 5).shape == (5, 4)
+
+
+class TestFOMWorker:
+    def test_previews(self):
+        directions = numpy.random.default_rng(0).uniform(0, 180, (1024, 1024)).astype(numpy.float32)
+        worker = Visualization.FOMWorker(None, None, Colormap.hsv_black, directions, None)
+        previews = []
+        results = []
+        worker.previewReady.connect(previews.append)
+        worker.finishedWork.connect(results.append)
+        worker.process()
+
+        assert [preview.shape for preview in previews] == [(64, 64, 3), (256, 256, 3)]
+        assert results[0].shape == (1024, 1024, 3)
+        assert numpy.array_equal(previews[-1], results[0][::4, ::4])
+
+
+class TestParameterMapWorker:
+    def test_previews(self):
+        from QtSLIX.ColorMapEngine import ColorMapEngine
+
+        engine = ColorMapEngine(numpy.random.rand(300, 400))
+        worker = Visualization.ParameterMapWorker(engine, "viridis")
+        previews = []
+        results = []
+        worker.previewReady.connect(previews.append)
+        worker.finishedWork.connect(results.append)
+        worker.process()
+
+        assert [(preview.width(), preview.height()) for preview in previews] == [(100, 75)]
+        assert (results[0].width(), results[0].height()) == (400, 300)
+
+
+class TestVectorEngine:
+    def test_segments(self):
+        directions = numpy.array([[0, 90], [-1, 50]], dtype=numpy.float32)
+        engine = Visualization.VectorEngine(directions)
+        lines, color_indices = engine.segments(thinout=1, scale=2, distribution=False, threshold=0)
+
+        # The invalid direction is not drawn
+        assert lines.shape == (3, 4)
+        # Horizontal vector centered on the first pixel
+        assert numpy.allclose(lines[0], [1, 0, -1, 0], atol=1e-6)
+        # Vertical vector centered on the second pixel
+        assert numpy.allclose(lines[1], [1, -1, 1, 1], atol=1e-6)
+        assert numpy.isclose(numpy.hypot(lines[2, 2] - lines[2, 0], lines[2, 3] - lines[2, 1]), 2)
+        # The color index follows the direction
+        assert list(color_indices) == [0, 128, 71]
+
+    def test_segments_thinout(self):
+        directions = numpy.full((10, 10, 2), -1, dtype=numpy.float32)
+        directions[..., 0] = 30
+        engine = Visualization.VectorEngine(directions)
+
+        lines, _ = engine.segments(thinout=5, scale=-1, distribution=False, threshold=0.5)
+        assert lines.shape == (4, 4)
+        # The default scale is the thinout
+        assert numpy.allclose(numpy.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1]), 5)
+
+        lines, _ = engine.segments(thinout=5, scale=1, distribution=True, threshold=0,
+                                   weighting=numpy.full((10, 10), 0.5))
+        assert lines.shape == (100, 4)
+        centers = (lines[:, :2] + lines[:, 2:]) / 2
+        assert set(numpy.round(centers.ravel(), 6)) == {2.5, 7.5}
+        assert numpy.allclose(numpy.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1]), 0.5)
+
+    def test_segments_thinout_weighting(self):
+        directions = numpy.full((10, 10), 30, dtype=numpy.float32)
+        weighting = numpy.zeros((10, 10))
+        weighting[:5] = 0.5
+        engine = Visualization.VectorEngine(directions)
+
+        lines, _ = engine.segments(thinout=5, scale=1, distribution=False, threshold=0, weighting=weighting)
+        # Only the vectors of the weighted upper areas are drawn, with half of their length
+        assert lines.shape == (2, 4)
+        assert numpy.allclose(numpy.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1]), 0.5)
+
+    def test_vector_field_cache(self):
+        directions = numpy.full((10, 10, 2), -1, dtype=numpy.float32)
+        directions[..., 0] = 30
+        engine = Visualization.VectorEngine(directions)
+
+        field = engine.vector_field(thinout=5, distribution=False, threshold=0.5)
+        assert engine.vector_field(thinout=5, distribution=False, threshold=0.5) is field
+        # Changing the scale reuses the cached vectors
+        short_lines, _ = engine.segments(thinout=5, scale=1, distribution=False, threshold=0.5)
+        long_lines, _ = engine.segments(thinout=5, scale=3, distribution=False, threshold=0.5)
+        assert len(engine.vector_field_cache) == 1
+        assert numpy.allclose(long_lines[:, 2:] - long_lines[:, :2], 3 * (short_lines[:, 2:] - short_lines[:, :2]))
+
+        # A different weighting is cached separately
+        weighting = numpy.full((10, 10), 0.5)
+        assert engine.vector_field(thinout=5, distribution=False, threshold=0.5, weighting=weighting) is not field
+        assert len(engine.vector_field_cache) == 2
+
+    def test_vector_field_cache_limit(self):
+        directions = numpy.full((10, 10, 2), -1, dtype=numpy.float32)
+        directions[..., 0] = 30
+        engine = Visualization.VectorEngine(directions)
+        engine.vector_field_cache_limit = 1
+
+        engine.vector_field(thinout=1, distribution=False, threshold=0)
+        engine.vector_field(thinout=2, distribution=False, threshold=0)
+        # Only the newest vector field is kept
+        assert list(engine.vector_field_cache) == [(2, False, 0, id(None))]
+
+    def test_generate(self):
+        directions = numpy.full((20, 20), -1, dtype=numpy.float32)
+        directions[10, 10] = 90
+        engine = Visualization.VectorEngine(directions)
+        image = engine.generate(Colormap.rgb, alpha=1, thinout=1, scale=10, vector_width=1,
+                                distribution=False, threshold=0, pixel_scale=2)
+
+        assert image.shape == (40, 40, 3)
+        assert image.dtype == numpy.uint8
+        # White background, the vertical vector is drawn in the middle
+        assert numpy.all(image[0, 0] == 255)
+        expected_color = engine.lookup_table(Colormap.rgb)[128]
+        assert numpy.abs(image[21, 21].astype(int) - expected_color).max() <= 3
+        assert numpy.all(image[21, 5] == 255)
+
+    def test_generate_background(self):
+        directions = numpy.full((10, 10), -1, dtype=numpy.float32)
+        background = numpy.zeros((10, 10))
+        background[:, 5:] = 2
+        engine = Visualization.VectorEngine(directions)
+        image = engine.generate(Colormap.rgb, alpha=1, thinout=1, scale=1, vector_width=1,
+                                distribution=False, threshold=0, background=background)
+        assert numpy.all(image[:, :5] == 0)
+        assert numpy.all(image[:, 5:] == 255)
+
+    def test_rasterize_too_large(self):
+        engine = Visualization.VectorEngine(numpy.zeros((10, 10), dtype=numpy.float32))
+        lines, color_indices = engine.segments(thinout=1, scale=1, distribution=False, threshold=0)
+        with pytest.raises(ValueError, match="too large"):
+            engine.rasterize(lines, color_indices, Colormap.rgb, 1, 1, 1, region=(0, 0, 2 ** 20, 2 ** 20))
+
+    def test_cancel(self):
+        engine = Visualization.VectorEngine(numpy.zeros((10, 10), dtype=numpy.float32))
+        assert engine.generate(Colormap.rgb, alpha=1, thinout=1, scale=1, vector_width=1,
+                               distribution=False, threshold=0, callback=lambda percent: False) is None
+
+    @pytest.mark.parametrize("pixel_scale", [1, 2.5])
+    def test_export_matches_rasterize(self, tmp_path, pixel_scale):
+        rng = numpy.random.default_rng(0)
+        directions = rng.uniform(0, 180, (40, 50)).astype(numpy.float32)
+        background = rng.random((40, 50))
+        engine = Visualization.VectorEngine(directions)
+        lines, color_indices = engine.segments(thinout=1, scale=6, distribution=False, threshold=0)
+
+        expected = engine.rasterize(lines, color_indices, Colormap.hsv_black, 0.7, 1.5, pixel_scale, background)
+        filename = str(tmp_path / 'vectors.tiff')
+        progress = []
+        assert engine.export(filename, lines, color_indices, Colormap.hsv_black, 0.7, 1.5, pixel_scale,
+                             background, tile_size=16, callback=lambda percent: progress.append(percent) or True)
+
+        exported = tifffile.imread(filename)
+        assert exported.shape == expected.shape
+        # Vectors crossing the strip borders are drawn in both strips. The antialiasing
+        # in the first row differs as the strips are drawn with overlapping rows.
+        assert numpy.abs(exported[1:].astype(int) - expected[1:].astype(int)).max() <= 3
+        assert progress[-1] == 100
+
+    def test_export_cancel(self, tmp_path):
+        engine = Visualization.VectorEngine(numpy.zeros((40, 40), dtype=numpy.float32))
+        lines, color_indices = engine.segments(thinout=1, scale=1, distribution=False, threshold=0)
+        filename = str(tmp_path / 'vectors.tiff')
+        assert not engine.export(filename, lines, color_indices, Colormap.rgb, 1, 1, 1, tile_size=16,
+                                 callback=lambda percent: False)
+        assert not os.path.exists(filename)
+
+    def test_export_error(self, tmp_path, monkeypatch):
+        engine = Visualization.VectorEngine(numpy.zeros((40, 40), dtype=numpy.float32))
+        lines, color_indices = engine.segments(thinout=1, scale=1, distribution=False, threshold=0)
+        filename = str(tmp_path / 'vectors.tiff')
+        calls = []
+
+        def rasterize(*args, **kwargs):
+            calls.append(1)
+            if len(calls) > 1:
+                raise OSError('No space left on device')
+            return Visualization.VectorEngine.rasterize(engine, *args, **kwargs)
+        monkeypatch.setattr(engine, 'rasterize', rasterize)
+
+        with pytest.raises(OSError):
+            engine.export(filename, lines, color_indices, Colormap.rgb, 1, 1, 1, tile_size=16)
+        assert not os.path.exists(filename)